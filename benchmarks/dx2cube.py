@@ -0,0 +1,267 @@
+"""Benchmark converting DX files to Cube files.
+
+Compares value-by-value conversion (a Python float list from the DX file
+and one formatted string per value, as before the NumPy reader was added)
+with the streamed conversion used by :program:`dx2cube`
+(:func:`pdb2pqr.io.iter_dx_values` and :func:`pdb2pqr.io.write_cube_values`)
+on a synthetic grid.
+Each conversion runs in a new process so that the peak resident set sizes
+(RSS) do not carry over; the outputs are checked to be identical::
+
+    python benchmarks/dx2cube.py --points 257 --suffixes "" .gz
+"""
+import argparse
+import hashlib
+import json
+import logging
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from pdb2pqr import io
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+#: Number of values written at a time when building the synthetic grid
+CHUNK_SIZE = 3 * 2**16
+
+
+def build_parser():
+    """Build argument parser.
+
+    :return:  argument parser
+    :rtype:  argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--points",
+        type=int,
+        default=257,
+        help="Number of grid points in each direction",
+    )
+    parser.add_argument(
+        "--suffixes",
+        nargs="+",
+        default=[""],
+        help="Compression suffixes of the streamed inputs and outputs",
+    )
+    parser.add_argument(
+        "--pqr-path",
+        default=DATA_DIR / "dx2cube.pqr",
+        help="PQR file with the atoms for the Cube file",
+    )
+    parser.add_argument(
+        "--child",
+        nargs=4,
+        default=None,
+        help=argparse.SUPPRESS,
+    )
+    return parser
+
+
+def write_grid(dx_path, points):
+    """Write a DX file with a smooth potential and noise.
+
+    :param dx_path:  path of the DX file (optionally compressed)
+    :type dx_path:  str
+    :param points:  number of grid points in each direction
+    :type points:  int
+    """
+    rng = np.random.default_rng(0)
+    num_values = points**3
+    with io.open_file(dx_path, "wt") as dx_file:
+        dx_file.write(
+            "# Synthetic grid\n"
+            f"object 1 class gridpositions counts {points} {points} {points}\n"
+            "origin -2.500000e+01 -2.500000e+01 -2.500000e+01\n"
+            "delta 2.000000e-01 0.000000e+00 0.000000e+00\n"
+            "delta 0.000000e+00 2.000000e-01 0.000000e+00\n"
+            "delta 0.000000e+00 0.000000e+00 2.000000e-01\n"
+            f"object 2 class gridconnections counts {points} {points} "
+            f"{points}\n"
+            f"object 3 class array type double rank 0 items {num_values} "
+            "data follows\n"
+        )
+        for start in range(0, num_values, CHUNK_SIZE):
+            index = np.arange(start, min(start + CHUNK_SIZE, num_values))
+            distance = np.sqrt(
+                sum(
+                    (index // points**axis % points - points / 2) ** 2
+                    for axis in range(3)
+                )
+            )
+            values = 100.0 / (distance + 1.0)
+            values += rng.normal(scale=1e-3, size=len(values))
+            template = "%e %e %e\n" * (len(values) // 3)
+            template += " ".join(["%e"] * (len(values) % 3))
+            dx_file.write(template % tuple(values.tolist()))
+        dx_file.write(
+            '\nattribute "dep" string "positions"\n'
+            'object "regular positions regular connections" class field\n'
+            'component "positions" value 1\n'
+            'component "connections" value 2\n'
+            'component "data" value 3\n'
+        )
+
+
+def convert_values(dx_path, pqr_path, cube_path):
+    """Convert a DX file value by value.
+
+    :param dx_path:  path of the DX file
+    :type dx_path:  str
+    :param pqr_path:  path of the PQR file
+    :type pqr_path:  str
+    :param cube_path:  path of the Cube file
+    :type cube_path:  str
+    """
+    with open(pqr_path, "rt") as pqr_file:
+        atom_list = io.read_pqr(pqr_file)
+    with open(dx_path, "rt") as dx_file:
+        dx_dict = io.read_dx_header(dx_file)
+        values = []
+        for line in dx_file:
+            words = line.split()
+            if words and words[0] in ["attribute", "object", "component"]:
+                break
+            for word in words:
+                values.append(float(word))
+    with open(cube_path, "wt") as cube_file:
+        io.write_cube_header(cube_file, dx_dict, atom_list)
+        stride = 6
+        for i in range(0, len(values), 6):
+            if i + stride < len(values):
+                imax = i + 6
+                words = [f"{val:< 13.5E}" for val in values[i:imax]]
+                cube_file.write(" ".join(words) + "\n")
+            else:
+                words = [f"{val:< 13.5E}" for val in values[i:]]
+                cube_file.write(" ".join(words))
+
+
+def convert_stream(dx_path, pqr_path, cube_path):
+    """Convert a DX file in chunks, as :program:`dx2cube` does.
+
+    :param dx_path:  path of the DX file (optionally compressed)
+    :type dx_path:  str
+    :param pqr_path:  path of the PQR file
+    :type pqr_path:  str
+    :param cube_path:  path of the Cube file (optionally compressed)
+    :type cube_path:  str
+    """
+    with io.open_file(pqr_path) as pqr_file:
+        atom_list = io.read_pqr(pqr_file)
+    with io.open_file(dx_path) as dx_file:
+        dx_dict = io.read_dx_header(dx_file)
+        with io.open_file(cube_path, "wt") as cube_file:
+            io.write_cube_header(cube_file, dx_dict, atom_list)
+            io.write_cube_values(
+                cube_file, io.iter_dx_values(dx_file, dx_dict)
+            )
+
+
+def peak_rss():
+    """Get the peak resident set size of this process.
+
+    :return:  peak RSS in bytes
+    :rtype:  int
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes and macOS reports bytes
+    return peak if sys.platform == "darwin" else 1024 * peak
+
+
+def measure(mode, dx_path, pqr_path, cube_path):
+    """Time a conversion and measure its peak RSS.
+
+    :param mode:  ``values`` or ``stream``
+    :type mode:  str
+    :param dx_path:  path of the DX file
+    :type dx_path:  str
+    :param pqr_path:  path of the PQR file
+    :type pqr_path:  str
+    :param cube_path:  path of the Cube file
+    :type cube_path:  str
+    :return:  time (seconds), peak RSS before and after the conversion
+        (bytes)
+    :rtype:  dict
+    """
+    converter = {"values": convert_values, "stream": convert_stream}[mode]
+    base = peak_rss()
+    start = time.perf_counter()
+    converter(dx_path, pqr_path, cube_path)
+    return {
+        "time": time.perf_counter() - start,
+        "base": base,
+        "peak": peak_rss(),
+    }
+
+
+def checksum(path):
+    """Get the SHA-256 hash of the (decompressed) contents of a file.
+
+    :param path:  path of the file
+    :type path:  str
+    :return:  hexadecimal digest
+    :rtype:  str
+    """
+    digest = hashlib.sha256()
+    with io.open_file(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def main():
+    """Run the benchmark."""
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if args.child is not None:
+        print(json.dumps(measure(*args.child)))
+        return
+    print(f"{'mode':>10s} {'values':>10s} {'time':>9s} {'peak RSS':>10s}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        runs = [("values", "")]
+        runs += [("stream", suffix) for suffix in args.suffixes]
+        checksums = set()
+        for mode, suffix in runs:
+            dx_path = tmp_dir / f"grid.dx{suffix}"
+            if not dx_path.exists():
+                write_grid(dx_path, args.points)
+            cube_path = tmp_dir / f"{mode}.cube{suffix}"
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--child",
+                    mode,
+                    str(dx_path),
+                    str(args.pqr_path),
+                    str(cube_path),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            checksums.add(checksum(cube_path))
+            cube_path.unlink()
+            row = f"{mode + suffix:>10s} {args.points**3:10d}"
+            row += f" {result['time']:8.2f}s"
+            row += f" {(result['peak'] - result['base']) / 2**20:8.0f}MB"
+            print(row)
+        if len(checksums) > 1:
+            raise ValueError("Cube files differ between conversions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark the memory used by large structures.
+
+Builds assemblies from translated copies of the protein chains of a PDB file
+and reports the peak resident set size (RSS) per input atom after reading
+the records, building the biomolecule, and adding hydrogens.
+Each assembly is measured in a new process so that the peaks do not carry
+over; the RSS after loading the topology definitions is subtracted::
+
+    python benchmarks/memory.py --copies 1 10 100 200
+"""
+import argparse
+import json
+import logging
+import resource
+import string
+import subprocess
+import sys
+from io import StringIO
+from pathlib import Path
+from pdb2pqr import io, main, pdb
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+#: Chain IDs for the copies of the chains
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+#: Residue number offset for reusing chain IDs
+RESIDUE_OFFSET = 1000
+#: Distance between copies (in Angstroms)
+SPACING = 100.0
+
+
+def build_parser():
+    """Build argument parser.
+
+    :return:  argument parser
+    :rtype:  argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--pdb-path",
+        default=DATA_DIR / "1AFS.pdb",
+        help="PDB file with the chains to copy",
+    )
+    parser.add_argument(
+        "--copies",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50, 100],
+        help="Numbers of copies of the chains",
+    )
+    parser.add_argument(
+        "--child",
+        type=int,
+        default=None,
+        help=argparse.SUPPRESS,
+    )
+    return parser
+
+
+def assembly(pdb_text, copies):
+    """Build PDB text for translated copies of the protein chains.
+
+    :param pdb_text:  PDB file contents
+    :type pdb_text:  str
+    :param copies:  number of copies
+    :type copies:  int
+    :return:  PDB file contents
+    :rtype:  str
+    """
+    chains = {}
+    for line in pdb_text.splitlines():
+        if line.startswith("ATOM"):
+            chains.setdefault(line[21], []).append(line)
+    side = int(round(copies ** (1.0 / 3.0) + 0.5))
+    max_copies = (
+        len(CHAIN_IDS) * (10000 // RESIDUE_OFFSET) // max(len(chains), 1)
+    )
+    if copies > max_copies:
+        raise ValueError(f"Too many copies: {copies}")
+    lines = []
+    ichain = 0
+    for icopy in range(copies):
+        shift = [
+            SPACING * (icopy % side),
+            SPACING * (icopy // side % side),
+            SPACING * (icopy // side // side),
+        ]
+        for chain_lines in chains.values():
+            chain_id = CHAIN_IDS[ichain % len(CHAIN_IDS)]
+            offset = RESIDUE_OFFSET * (ichain // len(CHAIN_IDS))
+            for line in chain_lines:
+                x, y, z = (
+                    float(line[30 + 8 * axis : 38 + 8 * axis]) + shift[axis]
+                    for axis in range(3)
+                )
+                res_seq = int(line[22:26]) + offset
+                lines.append(
+                    f"{line[:21]}{chain_id}{res_seq:4d}{line[26:30]}"
+                    f"{x:8.3f}{y:8.3f}{z:8.3f}{line[54:]}\n"
+                )
+            lines.append("TER\n")
+            ichain += 1
+    lines.append("END\n")
+    return "".join(lines)
+
+
+def peak_rss():
+    """Get the peak resident set size of this process.
+
+    :return:  peak RSS in bytes
+    :rtype:  int
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes and macOS reports bytes
+    return peak if sys.platform == "darwin" else 1024 * peak
+
+
+def measure(pdb_path, copies):
+    """Measure the peak RSS of the setup steps for an assembly.
+
+    :param pdb_path:  PDB file with the chains to copy
+    :type pdb_path:  str
+    :param copies:  number of copies
+    :type copies:  int
+    :return:  number of input atoms, peak RSS after loading the definitions,
+        and peak RSS after each step (in bytes)
+    :rtype:  dict
+    """
+    pdb_text = assembly(Path(pdb_path).read_text(), copies)
+    definition = io.get_definitions()
+    peaks = {"base": peak_rss()}
+    pdblist, _ = pdb.read_pdb(StringIO(pdb_text))
+    del pdb_text
+    num_atoms = sum(
+        isinstance(record, (pdb.ATOM, pdb.HETATM)) for record in pdblist
+    )
+    peaks["read"] = peak_rss()
+    biomolecule, definition, _ = main.setup_molecule(
+        pdblist, definition, None
+    )
+    del pdblist
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    peaks["biomolecule"] = peak_rss()
+    biomolecule.add_hydrogens()
+    peaks["hydrogens"] = peak_rss()
+    return {"atoms": num_atoms, "peaks": peaks}
+
+
+def main_driver():
+    """Run the benchmark."""
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    if args.child is not None:
+        print(json.dumps(measure(args.pdb_path, args.child)))
+        return
+    steps = ["read", "biomolecule", "hydrogens"]
+    print(
+        f"{'copies':>6s} {'atoms':>9s} {'base':>8s}"
+        + "".join(f" {step + ' B/atom':>18s}" for step in steps)
+    )
+    for copies in args.copies:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--pdb-path",
+                str(args.pdb_path),
+                "--child",
+                str(copies),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        num_atoms = result["atoms"]
+        peaks = result["peaks"]
+        row = f"{copies:6d} {num_atoms:9d} {peaks['base'] / 2**20:6.0f}MB"
+        row += "".join(
+            f" {(peaks[step] - peaks['base']) / num_atoms:18.0f}"
+            for step in steps
+        )
+        print(row)
+
+
+if __name__ == "__main__":
+    main_driver()
@@ -0,0 +1,139 @@
+"""Benchmark hydrogen bond optimization of water boxes.
+
+Builds boxes of water oxygens on a jittered cubic lattice, adds the water
+hydrogens with :meth:`pdb2pqr.hydrogens.HydrogenRoutines.optimize_hydrogens`,
+and reports the time per water for each box size; near-constant times per
+water indicate linear scaling::
+
+    python benchmarks/optimize_hydrogens.py --waters 1000 10000 100000
+"""
+import argparse
+import logging
+import string
+import time
+from io import StringIO
+import numpy as np
+from pdb2pqr import debump, hydrogens, io, main, pdb
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: Distance between neighboring water oxygens (in Angstroms)
+SPACING = 3.1
+#: Chain IDs used to keep residue numbers within the PDB format
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+#: Waters per chain
+CHAIN_WATERS = 9999
+
+
+def build_parser():
+    """Build argument parser.
+
+    :return:  argument parser
+    :rtype:  argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--waters",
+        type=int,
+        nargs="+",
+        default=[1000, 3000, 10000, 30000, 100000],
+        help="Numbers of waters in the boxes",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes for optimizing independent networks",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the lattice jitter"
+    )
+    return parser
+
+
+def water_box(num_waters, seed=0):
+    """Build PDB text for a box of water oxygens.
+
+    :param num_waters:  number of waters
+    :type num_waters:  int
+    :param seed:  random number seed for the lattice jitter
+    :type seed:  int
+    :return:  PDB file contents
+    :rtype:  str
+    """
+    if num_waters > CHAIN_WATERS * len(CHAIN_IDS):
+        raise ValueError(f"Too many waters: {num_waters}")
+    side = int(np.ceil(num_waters ** (1.0 / 3.0)))
+    grid = np.stack(
+        np.meshgrid(*(3 * [np.arange(side)]), indexing="ij"), axis=-1
+    )
+    coords = SPACING * grid.reshape(-1, 3)[:num_waters].astype(float)
+    rng = np.random.default_rng(seed)
+    coords += rng.uniform(-0.2, 0.2, coords.shape)
+    lines = []
+    for iwater, (x, y, z) in enumerate(coords):
+        chain_id = CHAIN_IDS[iwater // CHAIN_WATERS]
+        res_seq = iwater % CHAIN_WATERS + 1
+        lines.append(
+            f"HETATM{iwater % 99999 + 1:5d}  O   HOH {chain_id}{res_seq:4d}"
+            f"    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           O\n"
+        )
+    lines.append("END\n")
+    return "".join(lines)
+
+
+def time_optimization(pdb_text, definition, handler, num_procs):
+    """Time the hydrogen bond optimization of a structure.
+
+    :param pdb_text:  PDB file contents
+    :type pdb_text:  str
+    :param definition:  topology definitions
+    :type definition:  Definition
+    :param handler:  hydrogen topology definitions
+    :type handler:  HydrogenHandler
+    :param num_procs:  number of processes for independent networks
+    :type num_procs:  int
+    :return:  (setup time, optimization time) in seconds
+    :rtype:  (float, float)
+    """
+    start = time.perf_counter()
+    pdblist, _ = pdb.read_pdb(StringIO(pdb_text))
+    biomolecule, definition, _ = main.setup_molecule(
+        pdblist, definition, None
+    )
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    biomolecule.add_hydrogens()
+    routines = hydrogens.HydrogenRoutines(debump.Debump(biomolecule), handler)
+    routines.initialize_wat_optimization()
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    routines.optimize_hydrogens(num_procs)
+    return setup, time.perf_counter() - start
+
+
+def main_driver():
+    """Run the benchmark."""
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    definition = io.get_definitions()
+    handler = hydrogens.create_handler()
+    print(f"{'waters':>8s} {'setup':>9s} {'optimize':>9s} {'us/water':>9s}")
+    for num_waters in args.waters:
+        pdb_text = water_box(num_waters, args.seed)
+        setup, optimize = time_optimization(
+            pdb_text, definition, handler, args.jobs
+        )
+        print(
+            f"{num_waters:8d} {setup:8.2f}s {optimize:8.2f}s "
+            f"{1e6 * optimize / num_waters:9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main_driver()
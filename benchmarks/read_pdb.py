@@ -0,0 +1,149 @@
+"""Benchmark reading PDB files.
+
+Compares record-by-record parsing (one record object per line, as before the
+column reader was added) with :func:`pdb2pqr.pdb.read_pdb` (column reader
+plus record objects) and :func:`pdb2pqr.pdb.read_pdb_columns` (column arrays
+only) on the PDB files in ``tests/data``.
+The coordinate records of each file are repeated to emulate large
+assemblies::
+
+    python benchmarks/read_pdb.py --copies 100
+"""
+import argparse
+import logging
+import time
+from io import StringIO
+from pathlib import Path
+from pdb2pqr import pdb
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+
+
+def build_parser():
+    """Build argument parser.
+
+    :return:  argument parser
+    :rtype:  argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "pdb_paths",
+        nargs="*",
+        default=sorted(DATA_DIR.glob("*.pdb")),
+        help="PDB files to read (default: test data)",
+    )
+    parser.add_argument(
+        "--copies",
+        type=int,
+        default=20,
+        help="Number of copies of the coordinate records of each file",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of timings for each reader (the best is reported)",
+    )
+    return parser
+
+
+def read_records(pdb_file):
+    """Parse PDB data record by record.
+
+    :param pdb_file:  PDB file object
+    :type pdb_file:  file
+    :return:  list of objects from :mod:`pdb2pqr.pdb`
+    :rtype:  list
+    """
+    records = []
+    errlist = []
+    while True:
+        line = pdb_file.readline().strip()
+        if line == "":
+            break
+        record = pdb.parse_record(line, errlist)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def replicate(pdb_text, copies):
+    """Build a large structure by repeating coordinate records.
+
+    :param pdb_text:  PDB file contents
+    :type pdb_text:  str
+    :param copies:  number of copies of the coordinate records
+    :type copies:  int
+    :return:  PDB file contents
+    :rtype:  str
+    """
+    lines = pdb_text.splitlines(keepends=True)
+    atom_lines = [
+        line for line in lines if line.startswith(("ATOM", "HETATM"))
+    ]
+    other_lines = [
+        line
+        for line in lines
+        if line.strip() and not line.startswith(("ATOM", "HETATM", "END"))
+    ]
+    return "".join(other_lines + atom_lines * copies + ["END\n"])
+
+
+def time_reader(reader, pdb_text, repeats):
+    """Time a PDB reader.
+
+    :param reader:  function that reads a PDB file object
+    :type reader:  function
+    :param pdb_text:  PDB file contents
+    :type pdb_text:  str
+    :param repeats:  number of timings
+    :type repeats:  int
+    :return:  best time (seconds)
+    :rtype:  float
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        reader(StringIO(pdb_text))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    """Run the benchmark."""
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    readers = [
+        ("records", read_records),
+        ("read_pdb", pdb.read_pdb),
+        ("columns", pdb.read_pdb_columns),
+    ]
+    header = f"{'file':>12s} {'atoms':>9s}"
+    header += "".join(f" {name:>10s}" for name, _ in readers)
+    header += f" {'gain':>8s} {'col gain':>8s}"
+    print(header)
+    for pdb_path in args.pdb_paths:
+        pdb_path = Path(pdb_path)
+        pdb_text = replicate(pdb_path.read_text(), args.copies)
+        _, columns, _ = pdb.read_pdb_columns(StringIO(pdb_text))
+        times = [
+            time_reader(reader, pdb_text, args.repeats)
+            for _, reader in readers
+        ]
+        row = f"{pdb_path.stem:>12s} {len(columns):9d}"
+        row += "".join(f" {seconds:9.3f}s" for seconds in times)
+        row += f" {times[0] / times[1]:7.1f}x {times[0] / times[2]:7.1f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ For more information, see http://www.poissonboltzmann.org/
 import logging
 from sys import version_info
 from .main import main_driver, build_main_parser
+from .api import process, Result
 from ._version import get_versions
 
 
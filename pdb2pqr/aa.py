@@ -21,6 +21,8 @@ class Amino(residue.Residue):
     This class provides standard features of the amino acids.
     """
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -53,6 +55,7 @@ class Amino(residue.Residue):
         self.is3term = 0
         self.missing = []
         self.reference = ref
+        self.type = None
         self.fixed = 0
         self.stateboolean = {}
         # Create each atom
@@ -99,6 +102,7 @@ class Amino(residue.Residue):
         :type atom:  Atom
         """
         self.atoms.append(atom)
+        self.atoms_changed()
         atomname = atom.name
         self.map[atomname] = atom
         try:
@@ -139,38 +143,55 @@ class Amino(residue.Residue):
                 self.ffname = f"C{self.ffname}"
         return
 
-    def rebuild_tetrahedral(self, atomname):
-        """Rebuild a tetrahedral hydrogen group.
+    def get_tetrahedral_group(self, atomname):
+        """Get the tetrahedral group of a hydrogen.
 
-        This is necessary due to the shortcomings of the quatfit routine -
-        given a tetrahedral geometry and two existing hydrogens, the quatfit
-        routines have two potential solutions.
-        This function uses basic tetrahedral geometry to fix this issue.
+        A hydrogen is part of a tetrahedral group if it is bonded to an
+        existing atom with four bonds, three of which are hydrogens.
 
-        :param atomname:  the atom name to add
+        :param atomname:  the hydrogen atom name
         :type atomname:  str
-        :return:  indication of whether this was successful
-        :rtype:  bool
+        :return:  (name of the bonded atom, name of its non-hydrogen
+            neighbor) or None if the hydrogen is not part of a tetrahedral
+            group
+        :rtype:  (str, str)
         """
         hcount = 0
         nextatomname = None
         atomref = self.reference.map.get(atomname)
         if atomref is None:
-            return False
+            return None
         bondname = atomref.bonds[0]
         # Return if the bonded atom does not exist
         if not self.has_atom(bondname):
-            return False
-        # This group is tetrahedral if bondatom has 4 bonds,
-        #  3 of which are hydrogens
+            return None
         for bond in self.reference.map[bondname].bonds:
             if bond.startswith("H"):
                 hcount += 1
             elif bond != "C-1" and bond != "N+1":
                 nextatomname = bond
-        # Check if this is a tetrahedral group
         if hcount != 3 or nextatomname is None:
+            return None
+        return bondname, nextatomname
+
+    def rebuild_tetrahedral(self, atomname):
+        """Rebuild a tetrahedral hydrogen group.
+
+        This is necessary due to the shortcomings of the quatfit routine -
+        given a tetrahedral geometry and two existing hydrogens, the quatfit
+        routines have two potential solutions.
+        This function uses basic tetrahedral geometry to fix this issue.
+
+        :param atomname:  the atom name to add
+        :type atomname:  str
+        :return:  indication of whether this was successful
+        :rtype:  bool
+        """
+        group = self.get_tetrahedral_group(atomname)
+        if group is None:
             return False
+        bondname, nextatomname = group
+        atomref = self.reference.map[atomname]
         # Now rebuild according to the tetrahedral geometry
         bondatom = self.get_atom(bondname)
         nextatom = self.get_atom(nextatomname)
@@ -260,6 +281,8 @@ class Amino(residue.Residue):
 class ALA(Amino):
     """Alanine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -286,6 +309,8 @@ class ALA(Amino):
 class ARG(Amino):
     """Arginine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -318,6 +343,8 @@ class ARG(Amino):
 class ASN(Amino):
     """Asparagine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -344,6 +371,8 @@ class ASN(Amino):
 class ASP(Amino):
     """Aspartic acid class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -376,6 +405,8 @@ class ASP(Amino):
 class CYS(Amino):
     """Cysteine class."""
 
+    __slots__ = ("ss_bonded", "ss_bonded_partner")
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -420,6 +451,8 @@ class CYS(Amino):
 class GLN(Amino):
     """Glutamine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -446,6 +479,8 @@ class GLN(Amino):
 class GLU(Amino):
     """Glutamic acid class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -478,6 +513,8 @@ class GLU(Amino):
 class GLY(Amino):
     """Glycine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -504,6 +541,8 @@ class GLY(Amino):
 class HIS(Amino):
     """Histidine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -577,6 +616,8 @@ class HIS(Amino):
 class ILE(Amino):
     """Isoleucine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -603,6 +644,8 @@ class ILE(Amino):
 class LEU(Amino):
     """Leucine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -629,6 +672,8 @@ class LEU(Amino):
 class LYS(Amino):
     """Lysine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -661,6 +706,8 @@ class LYS(Amino):
 class MET(Amino):
     """Methionine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -687,6 +734,8 @@ class MET(Amino):
 class PHE(Amino):
     """Phenylalanine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -713,6 +762,8 @@ class PHE(Amino):
 class PRO(Amino):
     """Proline class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -752,6 +803,8 @@ class PRO(Amino):
 class SER(Amino):
     """Serine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -778,6 +831,8 @@ class SER(Amino):
 class THR(Amino):
     """Threonine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -804,6 +859,8 @@ class THR(Amino):
 class TRP(Amino):
     """Tryptophan class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -830,6 +887,8 @@ class TRP(Amino):
 class TYR(Amino):
     """Tyrosine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -862,6 +921,8 @@ class TYR(Amino):
 class VAL(Amino):
     """Valine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize object.
 
@@ -892,6 +953,8 @@ class WAT(residue.Residue):
 
     """
 
+    __slots__ = ()
+
     water_residue_names = ["HOH", "WAT"]
 
     def __init__(self, atoms, ref):
@@ -915,6 +978,9 @@ class WAT(residue.Residue):
         self.ffname = "WAT"
         self.map = {}
         self.reference = ref
+        self.type = None
+        self.is_n_term = 0
+        self.is_c_term = 0
         # Create each atom
         for atom_ in atoms:
             if atom_.name in ref.altnames:  # Rename atoms
@@ -960,6 +1026,7 @@ class WAT(residue.Residue):
         :type atom:  Atom
         """
         self.atoms.append(atom)
+        self.atoms_changed()
         atomname = atom.name
         self.map[atomname] = atom
         try:
@@ -979,6 +1046,8 @@ class WAT(residue.Residue):
 class LIG(residue.Residue):
     """Generic ligand class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize this object.
 
@@ -1002,6 +1071,7 @@ class LIG(residue.Residue):
         self.ffname = "WAT"
         self.map = {}
         self.reference = ref
+        self.type = None
         self.is_n_term = 0
         self.is_c_term = 0
         # Create each atom
@@ -1045,6 +1115,7 @@ class LIG(residue.Residue):
         :type atom:  Atom
         """
         self.atoms.append(atom)
+        self.atoms_changed()
         atomname = atom.name
         self.map[atomname] = atom
         try:
@@ -0,0 +1,332 @@
+"""Library interface for running PDB2PQR in memory.
+
+:func:`process` runs the same calculation as the ``pdb2pqr30`` command on a
+structure given as a path, file object, or string and returns a
+:class:`Result` without writing any files::
+
+    import pdb2pqr
+
+    options = {"ff": "AMBER", "pka_method": "propka", "ph": 7.0}
+    result = pdb2pqr.process("1abc.pdb", options)
+    charges = result.charges
+    pqr_text = result.pqr_text
+
+Options use the same names as the ``dest`` of the command-line options
+(e.g., ``ff``, ``ffout``, ``pka_method``, ``ph``, ``drop_water``); see
+``pdb2pqr30 --help``.
+With the ``profile`` option, :attr:`Result.profile` holds the stage timings,
+memory use, and counters described in :mod:`pdb2pqr.profiling`.
+
+.. codeauthor:: Nathan Baker (et al.)
+"""
+import argparse
+import logging
+from io import StringIO
+from os import PathLike
+from pathlib import Path
+import numpy as np
+from . import io
+from . import main as pdb2pqr_main
+from . import profiling
+from .structures import get_coordinates
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Options that name output files, which process() does not write
+FILE_OUTPUT_OPTIONS = ["pdb_output", "apbs_input"]
+
+
+class Result:
+    """Results of a PDB2PQR calculation."""
+
+    def __init__(self, args, results, is_cif, profile=None):
+        """Initialize results.
+
+        :param args:  options used for the calculation
+        :type args:  argparse.Namespace
+        :param results:  dictionary returned by
+            :func:`pdb2pqr.main.process_biomolecule`
+        :type results:  dict
+        :param is_cif:  indicates whether the structure is in CIF format
+        :type is_cif:  bool
+        :param profile:  profile report (see
+            :meth:`pdb2pqr.profiling.Profile.report`), if requested
+        :type profile:  dict
+        """
+        self.args = args
+        self.is_cif = is_cif
+        self.profile = profile
+        self.biomolecule = results["biomolecule"]
+        self.atoms = results["atoms"]
+        self.records = results["lines"]
+        self.header = results["header"]
+        self.missing_atoms = results["missed_residues"]
+        self.pka_table = results["pka"]
+        self.lines = pdb2pqr_main.format_pqr(
+            self.records,
+            args.whitespace,
+            is_cif,
+            atoms=self.atoms,
+            chainflag=args.keep_chain,
+        )
+
+    @property
+    def pqr_text(self):
+        """Contents of the PQR file, as written by ``pdb2pqr30``.
+
+        :return:  PQR file contents
+        :rtype:  str
+        """
+        return "".join(self.lines)
+
+    @property
+    def pdb_lines(self):
+        """Lines of a PDB file for the biomolecule, as written by
+        ``pdb2pqr30 --pdb-output``.
+
+        :return:  PDB file lines
+        :rtype:  [str]
+        """
+        return pdb2pqr_main.format_pdb(
+            io.print_biomolecule_atoms(
+                self.biomolecule.atoms,
+                chainflag=self.args.keep_chain,
+                pdbfile=True,
+            ),
+            self.is_cif,
+        )
+
+    @property
+    def coordinates(self):
+        """Coordinates of the output atoms.
+
+        :return:  (N, 3) array of coordinates
+        :rtype:  numpy.ndarray
+        """
+        return get_coordinates(self.atoms)
+
+    @property
+    def charges(self):
+        """Charges of the output atoms (None values become NaN).
+
+        :return:  array of charges
+        :rtype:  numpy.ndarray
+        """
+        return np.array(
+            [
+                np.nan if atom.ffcharge is None else atom.ffcharge
+                for atom in self.atoms
+            ],
+            dtype=float,
+        )
+
+    @property
+    def radii(self):
+        """Radii of the output atoms (None values become NaN).
+
+        :return:  array of radii
+        :rtype:  numpy.ndarray
+        """
+        return np.array(
+            [
+                np.nan if atom.radius is None else atom.radius
+                for atom in self.atoms
+            ],
+            dtype=float,
+        )
+
+
+def build_args(options=None, input_path="structure.pdb"):
+    """Build a checked set of PDB2PQR options.
+
+    :param options:  mapping from option names (the ``dest`` of the
+        command-line options) to values, a sequence of command-line
+        arguments, or an :class:`argparse.Namespace`
+    :type options:  dict or [str] or argparse.Namespace
+    :param input_path:  name of the input structure
+    :type input_path:  str
+    :raises ValueError:  for unknown or unsupported options (including more
+        than one pH value)
+    :return:  transformed and checked options
+    :rtype:  argparse.Namespace
+    """
+    parser = pdb2pqr_main.build_main_parser()
+    if options is None:
+        options = {}
+    if isinstance(options, argparse.Namespace):
+        options = vars(options)
+    if isinstance(options, (str, bytes)):
+        raise ValueError(
+            "Options must be a mapping or a sequence of arguments."
+        )
+    if isinstance(options, dict):
+        args = parser.parse_args([str(input_path), "output.pqr"])
+        for name, value in options.items():
+            if not hasattr(args, name):
+                raise ValueError(f"Unknown option: {name}")
+            setattr(args, name, value)
+    else:
+        args = parser.parse_args(
+            list(options) + [str(input_path), "output.pqr"]
+        )
+    args.input_path = str(input_path)
+    args.output_pqr = None
+    for name in FILE_OUTPUT_OPTIONS:
+        if getattr(args, name, None):
+            raise ValueError(
+                f"The {name} option is not supported by process(); "
+                "use Result.pdb_lines or write the PQR file instead."
+            )
+    args = pdb2pqr_main.transform_arguments(args)
+    if len(args.ph_values) > 1:
+        raise ValueError(
+            "process() accepts a single pH value; call it once per pH or "
+            "use pdb2pqr.main.run_ph_scan() instead."
+        )
+    pdb2pqr_main.check_files(args)
+    pdb2pqr_main.check_options(args)
+    return args
+
+
+def is_cif_text(text):
+    """Guess whether structure text is in CIF format.
+
+    :param text:  structure file contents
+    :type text:  str
+    :return:  True if the first data line starts a CIF data block
+    :rtype:  bool
+    """
+    for line in StringIO(text):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return line.startswith("data_")
+    return False
+
+
+def get_structure_name(structure):
+    """Get the name of a structure given as a path, file object, or string.
+
+    :param structure:  path or PDB ID, open file object, or file contents
+    :type structure:  str or os.PathLike or file
+    :return:  structure name
+    :rtype:  str
+    """
+    if hasattr(structure, "read"):
+        return Path(getattr(structure, "name", "structure.pdb")).name
+    if isinstance(structure, str) and "\n" in structure:
+        return "structure.pdb"
+    if isinstance(structure, PathLike):
+        return str(structure)
+    if isinstance(structure, str):
+        return structure
+    return "structure.pdb"
+
+
+def read_structure(structure, is_cif=None):
+    """Parse a structure given as a path, file object, or string.
+
+    Compressed paths and binary file objects (gzip, bzip2, or xz) are
+    decompressed (see :func:`pdb2pqr.io.open_file`).
+
+    :param structure:  path or PDB ID, open file object, or file contents
+    :type structure:  str or os.PathLike or file
+    :param is_cif:  indicates whether the structure is in CIF format; guessed
+        from the file suffix or contents if None
+    :type is_cif:  bool
+    :return:  (list of molecule records, CIF flag, structure name)
+    :rtype:  ([str], bool, str)
+    """
+    name = get_structure_name(structure)
+    if hasattr(structure, "read"):
+        text = structure.read()
+        if isinstance(text, bytes):
+            codec = io.detect_compression(text[:6])
+            if codec is not None:
+                text = codec.decompress(text)
+            text = text.decode("utf-8")
+    elif isinstance(structure, str) and "\n" in structure:
+        text = structure
+    elif isinstance(structure, (str, PathLike)):
+        path = io.strip_compression_suffix(structure)
+        if is_cif is None:
+            is_cif = path.suffix.lower() == ".cif"
+        input_file = io.get_pdb_file(name)
+        text = None
+    else:
+        raise TypeError(f"Unsupported structure type: {type(structure)}")
+    if text is not None:
+        if is_cif is None:
+            is_cif = is_cif_text(text)
+        input_file = StringIO(text)
+    with input_file:
+        pdblist = io.read_molecule(input_file, is_cif, name)
+    return pdblist, is_cif, name
+
+
+def process(
+    structure,
+    options=None,
+    is_cif=None,
+    definition=None,
+    forcefields=None,
+    hydrogen_handler=None,
+    use_cache=False,
+):
+    """Run PDB2PQR on a structure and return the results in memory.
+
+    No files are written and no log file is created; messages go to the
+    ``logging`` module as configured by the caller.
+    Topology definitions and forcefields are parsed without the on-disk cache
+    (see :mod:`pdb2pqr.cache`) unless ``use_cache`` is set; structures given
+    as PDB IDs are still downloaded through the cache of
+    :mod:`pdb2pqr.remote` unless caching is disabled.
+
+    :param structure:  path or PDB ID, open file object, or contents of a
+        PDB or CIF file
+    :type structure:  str or os.PathLike or file
+    :param options:  PDB2PQR options (see :func:`build_args`)
+    :type options:  dict or [str] or argparse.Namespace
+    :param is_cif:  indicates whether the structure is in CIF format; guessed
+        from the file suffix or contents if None
+    :type is_cif:  bool
+    :param definition:  already-loaded topology definitions
+    :type definition:  Definition
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :param use_cache:  use the on-disk caches of parsed topology definitions
+        and forcefields
+    :type use_cache:  bool
+    :raises ValueError:  for invalid options or problems that prevent the
+        calculation
+    :return:  results of the calculation
+    :rtype:  Result
+    """
+    args = build_args(options, input_path=get_structure_name(structure))
+    with profiling.profile(args.profile) as profile_:
+        with profiling.stage("parse") as counters:
+            pdblist, is_cif, _ = read_structure(structure, is_cif)
+            counters["records"] = len(pdblist)
+        if definition is None:
+            with profiling.stage("definitions"):
+                definition = io.get_definitions(use_cache=use_cache)
+        biomolecule, definition, ligand = pdb2pqr_main.setup_biomolecule(
+            args, pdblist, definition
+        )
+        # Release the coordinate records; the biomolecule keeps the headers
+        del pdblist
+        results = pdb2pqr_main.process_biomolecule(
+            args,
+            biomolecule,
+            ligand,
+            definition,
+            is_cif,
+            forcefields=forcefields,
+            hydrogen_handler=hydrogen_handler,
+            use_cache=use_cache,
+        )
+    report = None if profile_ is None else profile_.report()
+    return Result(args, results, is_cif, profile=report)
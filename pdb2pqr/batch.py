@@ -0,0 +1,415 @@
+"""Run PDB2PQR on many structures with a single invocation.
+
+The structures are listed in a manifest file with one job per line::
+
+    # input      output       [PDB2PQR options]
+    1abc.pdb     1abc.pqr     --ff=AMBER --titration-state-method=propka
+    2xyz.cif     2xyz.pqr     --ff=PARSE --drop-water
+
+Blank lines and lines starting with ``#`` are ignored.
+Each line is split with shell quoting rules and parsed with the same options
+as the ``pdb2pqr30`` command; PDB2PQR options given on the
+``pdb2pqr30-batch`` command line after the manifest are prepended to every
+job.
+Relative paths are interpreted with respect to the current working directory.
+Inputs that are PDB IDs rather than files are downloaded (see
+:mod:`pdb2pqr.remote`); with ``--prefetch``, they are all downloaded
+concurrently before the jobs start.
+
+Topology definitions, forcefields, and hydrogen definitions are loaded once
+and shared with a pool of worker processes.
+Each job writes its usual outputs (including its log file next to the output
+PQR file); a failed job is recorded in the summary report and does not stop
+the rest of the batch.
+
+.. codeauthor:: Nathan Baker (et al.)
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import shlex
+import sys
+import time
+import traceback
+from io import StringIO
+from pathlib import Path
+from . import forcefield
+from . import hydrogens
+from . import io
+from . import main as pdb2pqr_main
+from . import remote
+from .config import TITLE_STR, PREFETCH_JOBS
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Shared resources for the current process; set by load_resources() in the
+# parent before the worker pool is forked.
+_RESOURCES = {}
+
+
+class ErrorCollector(logging.Handler):
+    """Logging handler that keeps the messages of error records."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        """Save the message of a log record.
+
+        :param record:  log record
+        :type record:  logging.LogRecord
+        """
+        self.messages.append(record.getMessage())
+
+
+def build_parser():
+    """Build argument parser.
+
+    :return:  argument parser
+    :rtype:  argparse.ArgumentParser
+    """
+    desc = f"{TITLE_STR}\npdb2pqr30-batch: running PDB2PQR on many "
+    desc += "structures at once."
+    parser = argparse.ArgumentParser(
+        description=desc,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "manifest",
+        help=(
+            "File with one job per line: input path, output PQR path, and "
+            "optional PDB2PQR options"
+        ),
+    )
+    parser.add_argument(
+        "common_options",
+        nargs=argparse.REMAINDER,
+        help=(
+            "PDB2PQR options applied to every job; must follow the manifest "
+            "and any batch options"
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="Write a JSON summary report of the batch to this path",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        default=False,
+        help=(
+            "Download the inputs that are PDB IDs concurrently before "
+            "running the jobs"
+        ),
+    )
+    parser.add_argument(
+        "--log-level",
+        help="Logging level for the batch summary",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+def read_manifest(manifest_file, common_options=None):
+    """Read jobs from a manifest.
+
+    :param manifest_file:  manifest file object
+    :type manifest_file:  file
+    :param common_options:  options prepended to every job
+    :type common_options:  [str]
+    :return:  list of jobs; each job is a dictionary with the manifest line
+        number, the line text, and either the parsed arguments (``args``)
+        or a parsing error (``error``)
+    :rtype:  [dict]
+    """
+    if common_options is None:
+        common_options = []
+    parser = pdb2pqr_main.build_main_parser()
+    jobs = []
+    for line_num, line in enumerate(manifest_file, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        job = {"line_num": line_num, "line": line, "args": None, "error": None}
+        messages = StringIO()
+        try:
+            with contextlib.redirect_stderr(messages):
+                job["args"] = parser.parse_args(
+                    common_options + shlex.split(line)
+                )
+        except (ValueError, SystemExit) as err:
+            message = messages.getvalue().strip().splitlines()
+            message = message[-1] if message else str(err)
+            job["error"] = f"Unable to parse line {line_num}: {message}"
+        jobs.append(job)
+    return jobs
+
+
+def get_remote_inputs(jobs):
+    """Get the inputs of jobs that are PDB IDs rather than files.
+
+    :param jobs:  jobs from :func:`read_manifest`
+    :type jobs:  [dict]
+    :return:  map from file format (``pdb`` or ``cif``) to PDB IDs
+    :rtype:  {str: [str]}
+    """
+    inputs = {}
+    for job in jobs:
+        if job["args"] is None:
+            continue
+        path = Path(job["args"].input_path)
+        if path.is_file():
+            continue
+        path = io.strip_compression_suffix(path)
+        file_format = "cif" if path.suffix.lower() == ".cif" else "pdb"
+        inputs.setdefault(file_format, []).append(path.stem)
+    return inputs
+
+
+def load_resources(jobs):
+    """Load the data files needed by a set of jobs.
+
+    Only forcefields requested via ``--ff`` and ``--ffout`` are preloaded;
+    user-defined forcefields are loaded by each job.
+
+    :param jobs:  jobs from :func:`read_manifest`
+    :type jobs:  [dict]
+    :return:  dictionary with ``definition``, ``forcefields``, and
+        ``hydrogen_handler`` entries suitable for
+        :func:`pdb2pqr.main.main_driver`
+    :rtype:  dict
+    """
+    _LOGGER.info("Loading topology files.")
+    definition = io.get_definitions()
+    ff_names = set()
+    for job in jobs:
+        args = job["args"]
+        if args is None:
+            continue
+        if args.userff is None and args.ff is not None:
+            ff_names.add(args.ff.lower())
+        if args.ffout is not None:
+            ff_names.add(args.ffout.lower())
+    forcefields = {}
+    for ff_name in sorted(ff_names):
+        _LOGGER.info(f"Loading {ff_name} forcefield.")
+        forcefields[ff_name] = forcefield.Forcefield(ff_name, definition, None)
+    _LOGGER.info("Loading hydrogen topology definitions.")
+    hydrogen_handler = hydrogens.create_handler()
+    return {
+        "definition": definition,
+        "forcefields": forcefields,
+        "hydrogen_handler": hydrogen_handler,
+    }
+
+
+def init_worker(resources):
+    """Set the shared resources in a worker process.
+
+    :param resources:  resources from :func:`load_resources`; if None, the
+        resources inherited from the parent process are used
+    :type resources:  dict
+    """
+    if resources is not None:
+        _RESOURCES.update(resources)
+
+
+def run_job(job):
+    """Run PDB2PQR for a single job with the shared resources.
+
+    The job's log is written next to its output PQR file, as for
+    ``pdb2pqr30``.
+    Exceptions are caught and recorded so that one job cannot stop the
+    batch.
+
+    :param job:  job from :func:`read_manifest`
+    :type job:  dict
+    :return:  job summary with ``status`` (``"success"`` or ``"failed"``),
+        ``error``, and ``seconds`` entries
+    :rtype:  dict
+    """
+    args = job["args"]
+    summary = {
+        "line_num": job["line_num"],
+        "input": args.input_path,
+        "output": args.output_pqr,
+        "status": "failed",
+        "error": None,
+        "seconds": None,
+    }
+    output_path = io.strip_compression_suffix(args.output_pqr)
+    log_path = output_path.parent / f"{output_path.stem}.log"
+    root_logger = logging.getLogger("")
+    old_level = root_logger.level
+    error_handler = ErrorCollector()
+    root_logger.addHandler(error_handler)
+    root_logger.setLevel(getattr(logging, args.log_level))
+    log_handler = None
+    start = time.perf_counter()
+    try:
+        log_handler = logging.FileHandler(log_path, mode="w")
+        log_handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s:%(filename)s:%(lineno)d:"
+                "%(funcName)s:%(message)s"
+            )
+        )
+        root_logger.addHandler(log_handler)
+        results = pdb2pqr_main.main_driver(
+            args,
+            definition=_RESOURCES.get("definition"),
+            forcefields=_RESOURCES.get("forcefields"),
+            hydrogen_handler=_RESOURCES.get("hydrogen_handler"),
+            setup_logging=False,
+        )
+        if results is None:
+            summary["error"] = "; ".join(error_handler.messages)
+        else:
+            summary["status"] = "success"
+    except Exception as err:  # pylint: disable=broad-except
+        root_logger.error(traceback.format_exc())
+        summary["error"] = f"{type(err).__name__}: {err}"
+    finally:
+        summary["seconds"] = time.perf_counter() - start
+        root_logger.removeHandler(error_handler)
+        root_logger.setLevel(old_level)
+        if log_handler is not None:
+            root_logger.removeHandler(log_handler)
+            log_handler.close()
+    return summary
+
+
+def run_batch(jobs, num_procs=1):
+    """Run a batch of jobs.
+
+    Shared resources are loaded once in this process; with more than one
+    process, the workers are forked (where supported) so that they inherit
+    the resources without reloading them.
+
+    :param jobs:  jobs from :func:`read_manifest`
+    :type jobs:  [dict]
+    :param num_procs:  number of worker processes
+    :type num_procs:  int
+    :return:  job summaries in manifest order
+    :rtype:  [dict]
+    """
+    summaries = {}
+    runnable = []
+    for job in jobs:
+        if job["args"] is None:
+            summaries[job["line_num"]] = {
+                "line_num": job["line_num"],
+                "input": None,
+                "output": None,
+                "status": "failed",
+                "error": job["error"],
+                "seconds": 0.0,
+            }
+        else:
+            runnable.append(job)
+    if runnable:
+        resources = load_resources(runnable)
+        _RESOURCES.update(resources)
+        num_procs = max(1, min(num_procs, len(runnable)))
+        if num_procs == 1:
+            job_summaries = map(run_job, runnable)
+        else:
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+                initargs = (None,)
+            else:
+                context = multiprocessing.get_context()
+                initargs = (resources,)
+            pool = context.Pool(
+                num_procs, initializer=init_worker, initargs=initargs
+            )
+            job_summaries = pool.imap_unordered(run_job, runnable)
+        try:
+            for summary in job_summaries:
+                if summary["status"] == "success":
+                    _LOGGER.info(
+                        f"Finished {summary['input']} in "
+                        f"{summary['seconds']:.2f} s."
+                    )
+                else:
+                    _LOGGER.error(
+                        f"Failed {summary['input']}: {summary['error']}"
+                    )
+                summaries[summary["line_num"]] = summary
+        finally:
+            if num_procs > 1:
+                pool.close()
+                pool.join()
+    return [summaries[job["line_num"]] for job in jobs]
+
+
+def main_driver(args):
+    """Run a batch from parsed command-line arguments.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :return:  job summaries in manifest order
+    :rtype:  [dict]
+    """
+    common_options = args.common_options
+    if common_options and common_options[0] == "--":
+        common_options = common_options[1:]
+    with open(args.manifest, "rt") as manifest_file:
+        jobs = read_manifest(manifest_file, common_options)
+    start = time.perf_counter()
+    if getattr(args, "prefetch", False):
+        for file_format, pdb_ids in get_remote_inputs(jobs).items():
+            _LOGGER.info(f"Downloading {len(pdb_ids)} {file_format} files.")
+            remote.prefetch(pdb_ids, file_format, PREFETCH_JOBS)
+    summaries = run_batch(jobs, num_procs=args.jobs)
+    elapsed = time.perf_counter() - start
+    num_failed = sum(
+        1 for summary in summaries if summary["status"] != "success"
+    )
+    _LOGGER.info(
+        f"Processed {len(summaries)} jobs in {elapsed:.2f} s: "
+        f"{len(summaries) - num_failed} succeeded, {num_failed} failed."
+    )
+    if args.report is not None:
+        report = {
+            "manifest": str(args.manifest),
+            "seconds": elapsed,
+            "succeeded": len(summaries) - num_failed,
+            "failed": num_failed,
+            "jobs": summaries,
+        }
+        with open(args.report, "wt") as report_file:
+            json.dump(report, report_file, indent=2)
+    return summaries
+
+
+def main():
+    """Hook for command-line usage."""
+    parser = build_parser()
+    args = parser.parse_args()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(levelname)s:%(message)s"))
+    _LOGGER.addHandler(console)
+    _LOGGER.setLevel(getattr(logging, args.log_level))
+    _LOGGER.propagate = False
+    summaries = main_driver(args)
+    if any(summary["status"] != "success" for summary in summaries):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ Authors:  Todd Dolinsky, Yong Huang
 """
 import logging
 import copy
+import itertools
 import pprint
 import string
+import numpy as np
 from . import residue as residue_
 from . import aa
 from . import na
@@ -44,7 +46,14 @@ class Biomolecule(object):
         self.chains = []
         self.residues = []
         self.definition = definition
-        self.pdblist = pdblist
+        # Only the records before the coordinates are kept (for the headers
+        # of output files); the atoms keep their own copies of the
+        # coordinate records
+        self.pdblist = []
+        for record in pdblist:
+            if isinstance(record, (pdb.ATOM, pdb.HETATM)):
+                break
+            self.pdblist.append(record)
         chain_dict = {}
         previous_atom = None
         residue = []
@@ -114,9 +123,16 @@ class Biomolecule(object):
         keys.sort()
         for key in keys:
             self.chains.append(chain_dict[key])
+        # Keep the sequence of atoms until atoms or residues change
+        self.atom_index = struct.AtomIndex(self.chains)
         for chain in self.chains:
+            chain.atom_index = self.atom_index
             for residue in chain.residues:
                 self.residues.append(residue)
+                residue.atom_index = self.atom_index
+        # Keep the coordinates of all atoms in one array
+        self.coordinates = struct.CoordinateStore()
+        self.coordinates.attach(self.atoms)
 
     @property
     def num_missing_heavy(self):
@@ -270,11 +286,12 @@ class Biomolecule(object):
                         _LOGGER.warning(message)
                     # Make a new chain with these residues
                     newchain = struct.Chain(chainid[0])
+                    newchain.atom_index = self.atom_index
                     self.chainmap[chainid] = newchain
                     self.chains.insert(ch_num, newchain)
                     for res in reslist:
+                        chain.remove_residue(res)
                         newchain.add_residue(res)
-                        chain.residues.remove(res)
                         res.set_chain_id(chainid[0])
                     self.assign_termini(chain, neutraln, neutralc)
                     self.assign_termini(newchain, neutraln, neutralc)
@@ -332,64 +349,137 @@ class Biomolecule(object):
         nearby bonds to rebuild the atom; the closer the bonds, the more
         accurate the results.  As such the peptide bonds are used when
         available.
+
+        Hydrogens are added in rounds: each round adds the next missing
+        hydrogens of every residue up to the first one that needs a quatfit
+        placement, and the quatfit placements of all residues in the round
+        are done together with :func:`quatfit.find_coordinates_batch`.
+        Tetrahedral hydrogens that need rotations of the existing hydrogens
+        are rebuilt one at a time.
+        The hydrogens of each residue are added in the same order (and with
+        the same coordinates) as when adding them one residue at a time.
         """
         count = 0
+        templates = {}
+        pending = []
         for residue in self.residues:
-            if not isinstance(residue, (aa.Amino, na.Nucleic)):
-                continue
-            for atomname in residue.reference.map:
-                if not atomname.startswith("H"):
-                    continue
-                if residue.has_atom(atomname):
-                    continue
-                if isinstance(residue, aa.CYS) and (
-                    residue.ss_bonded and atomname == "HG"
-                ):
-                    continue
-                if hasattr(residue, "rebuild_tetrahedral"):
-                    # If this hydrogen is part of a tetrahedral group,
-                    # follow a different codepath
-                    if residue.rebuild_tetrahedral(atomname):
+            if isinstance(residue, (aa.Amino, na.Nucleic)):
+                pending.append((residue, iter(residue.reference.map)))
+        while pending:
+            fits = {2: [], 3: []}
+            waiting = []
+            for residue, atomnames in pending:
+                for atomname in atomnames:
+                    fit = self.get_hydrogen_fit(residue, atomname, templates)
+                    if fit is True:
                         count += 1
-                        continue
-                else:
-                    _LOGGER.warning(
-                        "Tetrahedral hydrogen reconstruction not available "
-                        "for nucleic acids. Some hydrogens may be missing (if "
-                        "so, this is a bug)."
-                    )
-                # Otherwise use the standard quatfit methods
-                coords = []
-                refcoords = []
-                refatomcoords = residue.reference.map[atomname].coords
-                bondlist = residue.reference.get_nearest_bonds(atomname)
-                for bond in bondlist:
-                    if bond == "N+1":
-                        atom = residue.peptide_n
-                    elif bond == "C-1":
-                        atom = residue.peptide_c
-                    else:
-                        atom = residue.get_atom(bond)
-                    if atom is None:
-                        continue
-                    # Get coordinates, reference coordinates
-                    coords.append(atom.coords)
-                    refcoords.append(residue.reference.map[bond].coords)
-                    # Exit if we have enough atoms
-                    if len(coords) == 3:
+                    elif fit is not None:
+                        fits[len(fit[0])].append((residue, atomname, fit))
+                        waiting.append((residue, atomnames))
                         break
-                if len(coords) == 3:
-                    newcoords = quat.find_coordinates(
-                        3, coords, refcoords, refatomcoords
-                    )
-                    residue.create_atom(atomname, newcoords)
-                    count += 1
-                else:
-                    _LOGGER.warning(
-                        f"Couldn't rebuild {atomname} in {residue}!"
-                    )
+            for jobs in fits.values():
+                if not jobs:
+                    continue
+                newcoords = quat.find_coordinates_batch(
+                    np.array([fit[0] for _, _, fit in jobs]),
+                    np.array([fit[1] for _, _, fit in jobs]),
+                    np.array([fit[2] for _, _, fit in jobs]),
+                )
+                for (residue, atomname, _), coords in zip(
+                    jobs, newcoords.tolist()
+                ):
+                    residue.create_atom(atomname, coords)
+                count += len(jobs)
+            pending = waiting
         _LOGGER.debug(f" Added {count} hydrogen atoms.")
 
+    @staticmethod
+    def get_hydrogen_fit(residue, atomname, templates):
+        """Get the quatfit placement of a missing hydrogen.
+
+        Tetrahedral hydrogens that cannot be placed by a quatfit are rebuilt
+        by :meth:`aa.Amino.rebuild_tetrahedral`.
+
+        :param residue:  residue
+        :type residue:  Residue
+        :param atomname:  name of the atom to add
+        :type atomname:  str
+        :param templates:  cache of the reference atoms near each hydrogen,
+            keyed by residue definition and atom name
+        :type templates:  dict
+        :return:  None if the atom is not a missing hydrogen or cannot be
+            placed, True if the atom was rebuilt, or (coordinates of the
+            reference atoms, definition coordinates of the reference atoms,
+            definition coordinates of the atom) for the quatfit
+        :rtype:  None or bool or ([[float, float, float]],
+            [[float, float, float]], [float, float, float])
+        """
+        if not atomname.startswith("H"):
+            return None
+        if residue.has_atom(atomname):
+            return None
+        if isinstance(residue, aa.CYS) and (
+            residue.ss_bonded and atomname == "HG"
+        ):
+            return None
+        reference = residue.reference
+        if hasattr(residue, "get_tetrahedral_group"):
+            # If this hydrogen is part of a tetrahedral group,
+            # follow a different codepath
+            group = residue.get_tetrahedral_group(atomname)
+            if group is not None:
+                bondname, nextatomname = group
+                bondatom = residue.get_atom(bondname)
+                if len(bondatom.bonds) == 1 and not isinstance(
+                    residue, (aa.LEU, aa.ILE)
+                ):
+                    # Place according to two atoms
+                    return (
+                        [
+                            bondatom.coords,
+                            residue.get_atom(nextatomname).coords,
+                        ],
+                        [
+                            reference.map[bondname].coords,
+                            reference.map[nextatomname].coords,
+                        ],
+                        reference.map[atomname].coords,
+                    )
+                if residue.rebuild_tetrahedral(atomname):
+                    return True
+        else:
+            _LOGGER.warning(
+                "Tetrahedral hydrogen reconstruction not available "
+                "for nucleic acids. Some hydrogens may be missing (if "
+                "so, this is a bug)."
+            )
+        # Otherwise use the standard quatfit methods
+        key = (id(reference), atomname)
+        if key not in templates:
+            templates[key] = [
+                (bond, reference.map[bond].coords)
+                for bond in reference.get_nearest_bonds(atomname)
+            ]
+        coords = []
+        refcoords = []
+        for bond, bondrefcoords in templates[key]:
+            if bond == "N+1":
+                atom = residue.peptide_n
+            elif bond == "C-1":
+                atom = residue.peptide_c
+            else:
+                atom = residue.get_atom(bond)
+            if atom is None:
+                continue
+            # Get coordinates, reference coordinates
+            coords.append(atom.coords)
+            refcoords.append(bondrefcoords)
+            # Exit if we have enough atoms
+            if len(coords) == 3:
+                return coords, refcoords, reference.map[atomname].coords
+        _LOGGER.warning(f"Couldn't rebuild {atomname} in {residue}!")
+        return None
+
     def set_donors_acceptors(self):
         """Set the donors and acceptors within the biomolecule."""
         for residue in self.residues:
@@ -421,8 +511,11 @@ class Biomolecule(object):
         """Set the distance to the CA atom in the residue.
 
         This is necessary for determining which atoms are allowed to move
-        during rotations.  Uses the :func:`shortest_path` algorithm found in
-        :mod:`utilities`.
+        during rotations.  The distances of each set of atoms of a residue
+        definition are found once (see
+        :meth:`definitions.DefinitionResidue.get_reference_distances`); atoms
+        that are not connected to the CA atom in the definition use a
+        breadth-first search of the bonds of the residue.
 
         :raises ValueError:  if shortest path cannot be found (e.g., if the
             atoms are not connected)
@@ -430,17 +523,15 @@ class Biomolecule(object):
         for residue in self.residues:
             if not isinstance(residue, aa.Amino):
                 continue
-            # Initialize some variables
-            map_ = {}
             caatom = residue.get_atom("CA")
             if caatom is None:
                 # TODO: What does the %s mean? Is it the residue name?
                 text = "Cannot set references to %s without CA atom!"
                 raise ValueError(text)
-            # Set up the linked map
-            for atom in residue.atoms:
-                map_[atom] = atom.bonds
-            # Run the algorithm
+            distances = residue.reference.get_reference_distances(
+                frozenset(residue.map)
+            )
+            bond_distances = None
             for atom in residue.atoms:
                 if atom.is_backbone:
                     atom.refdistance = -1
@@ -450,15 +541,26 @@ class Biomolecule(object):
                     atom.name == "H3" or atom.name == "H2"
                 ):
                     atom.refdistance = 2
+                elif atom.name in distances:
+                    atom.refdistance = distances[atom.name]
                 else:
-                    path = util.shortest_path(map_, atom, caatom)
-                    if path is not None:
-                        atom.refdistance = len(path) - 1
+                    if bond_distances is None:
+                        # Search from the CA atom along reversed bonds
+                        map_ = {}
+                        for resatom in residue.atoms:
+                            for bondatom in resatom.bonds:
+                                map_.setdefault(bondatom, []).append(resatom)
+                        bond_distances = util.shortest_path_lengths(
+                            map_, caatom
+                        )
+                    if atom in bond_distances:
+                        atom.refdistance = bond_distances[atom]
                     else:
                         raise ValueError(
                             "Found gap in biomolecule structure for atom "
                             f"{atom}"
                         )
+            residue.moveable_names = None
 
     def remove_hydrogens(self):
         """Remove hydrogens from the biomolecule."""
@@ -584,6 +686,60 @@ class Biomolecule(object):
                     res2.peptide_c = None
                     res1.peptide_n = None
 
+    def __deepcopy__(self, memo):
+        """Copy the biomolecule, sharing its topology definitions.
+
+        Atom bonds and peptide links are detached while the rest of the
+        biomolecule is copied and then reconnected, so the copy does not
+        recurse through the whole bond network.
+
+        :param memo:  memo dictionary from :func:`copy.deepcopy`
+        :type memo:  dict
+        :return:  copy of the biomolecule
+        :rtype:  Biomolecule
+        """
+        memo[id(self.definition)] = self.definition
+        for def_residue in itertools.chain(
+            self.definition.map.values(), self.definition.patches.values()
+        ):
+            memo[id(def_residue)] = def_residue
+            for def_atom in def_residue.map.values():
+                memo[id(def_atom)] = def_atom
+        atoms = self.atoms
+        residues = [
+            residue
+            for residue in self.residues
+            if hasattr(residue, "peptide_c")
+        ]
+        bonds = [atom.bonds for atom in atoms]
+        links = [
+            (residue.peptide_c, residue.peptide_n) for residue in residues
+        ]
+        new = copy.copy(self)
+        memo[id(self)] = new
+        try:
+            for atom in atoms:
+                atom.bonds = []
+            for residue in residues:
+                residue.peptide_c = None
+                residue.peptide_n = None
+            for key, value in vars(self).items():
+                setattr(new, key, copy.deepcopy(value, memo))
+        finally:
+            for atom, atom_bonds in zip(atoms, bonds):
+                atom.bonds = atom_bonds
+            for residue, (peptide_c, peptide_n) in zip(residues, links):
+                residue.peptide_c = peptide_c
+                residue.peptide_n = peptide_n
+        for atom, atom_bonds in zip(atoms, bonds):
+            memo[id(atom)].bonds = copy.deepcopy(atom_bonds, memo)
+        for residue, link in zip(residues, links):
+            new_residue = memo[id(residue)]
+            new_residue.peptide_c, new_residue.peptide_n = copy.deepcopy(
+                link, memo
+            )
+        return new
+
     def apply_patch(self, patchname, residue):
         """Apply a patch to the given residue.
 
@@ -634,6 +790,7 @@ class Biomolecule(object):
         for dihedral_ in patch.dihedrals:
             newreference.dihedrals.append(dihedral_)
         # Point at the new reference
+        newreference.reference_distances = {}
         residue.reference = newreference
         residue.patches.append(patchname)
         # Rename atoms as directed by patch
@@ -706,23 +863,38 @@ class Biomolecule(object):
             list of atoms that were not found in the forcefield)
         :rtype:  (list, list)
         """
-        misslist = []
-        hitlist = []
+        atoms, indices = self.get_forcefield_indices(forcefield_)
+        found = indices >= 0
+        table = forcefield_.table
+        charges = table.charges[indices[found]].tolist()
+        radii = table.radii[indices[found]].tolist()
+        hitlist = [atoms[iatom] for iatom in np.flatnonzero(found)]
+        misslist = [atoms[iatom] for iatom in np.flatnonzero(~found)]
+        for atom, charge, radius in zip(hitlist, charges, radii):
+            atom.ffcharge = charge
+            atom.radius = radius
+        return hitlist, misslist
+
+    def get_forcefield_indices(self, forcefield_):
+        """Find the forcefield parameter table entries for all atoms.
+
+        :param forcefield_:  forcefield object
+        :type forcefield_:  Forcefield
+        :return:  (list of atoms, array of indices into
+            :class:`ForcefieldTable` with -1 for atoms not in the forcefield)
+        :rtype:  ([Atom], numpy.ndarray)
+        """
+        atoms = []
+        keys = []
         for residue in self.residues:
             if isinstance(residue, (aa.Amino, aa.WAT, na.Nucleic)):
                 resname = residue.ffname
             else:
                 resname = residue.name
             for atom in residue.atoms:
-                atomname = atom.name
-                charge, radius = forcefield_.get_params(resname, atomname)
-                if charge is not None and radius is not None:
-                    atom.ffcharge = charge
-                    atom.radius = radius
-                    hitlist.append(atom)
-                else:
-                    misslist.append(atom)
-        return hitlist, misslist
+                atoms.append(atom)
+                keys.append((resname, atom.name))
+        return atoms, forcefield_.table.lookup(keys)
 
     def apply_name_scheme(self, forcefield_):
         """Apply the naming scheme of the given forcefield.
@@ -730,13 +902,22 @@ class Biomolecule(object):
         :param forcefield_:  forcefield object
         :type forcefield_:  Forcefield
         """
+        _, indices = self.get_forcefield_indices(forcefield_)
+        indices = indices.tolist()
+        table = forcefield_.table
+        iatom = 0
         for residue in self.residues:
             if isinstance(residue, (aa.Amino, aa.WAT, na.Nucleic)):
                 resname = residue.ffname
             else:
                 resname = residue.name
             for atom in residue.atoms:
-                rname, aname = forcefield_.get_names(resname, atom.name)
+                index = indices[iatom]
+                iatom += 1
+                if index < 0:
+                    continue
+                rname = table.resnames[index]
+                aname = table.atomnames[index]
                 if resname not in ["LIG", "WAT", "ACE", "NME"] and (
                     rname is not None
                 ):
@@ -1106,16 +1287,51 @@ class Biomolecule(object):
 
     @property
     def atoms(self):
-        """Return all Atom objects in list format.
+        """Return all Atom objects in chain order.
+
+        The sequence is kept until atoms are added, removed, or reordered
+        (see :class:`~pdb2pqr.structures.AtomIndex`).
 
         :return:  all atom objects
-        :rtype:  [Atom]
+        :rtype:  (Atom)
         """
-        atomlist = []
-        for chain in self.chains:
-            for atom in chain.atoms:
-                atomlist.append(atom)
-        return atomlist
+        return self.atom_index.atoms
+
+    @property
+    def atom_indices(self):
+        """Return the map from atoms to their indices in :attr:`atoms`.
+
+        :return:  map from atoms to indices
+        :rtype:  {Atom: int}
+        """
+        return self.atom_index.indices
+
+    def get_coordinates(self, atoms=None):
+        """Get atom coordinates as an array.
+
+        Atoms that are not yet in :attr:`coordinates` (e.g., atoms added
+        since the biomolecule was built) are attached to it first.
+
+        :param atoms:  atoms to get (all atoms if None)
+        :type atoms:  [Atom]
+        :return:  (N, 3) array of coordinates
+        :rtype:  numpy.ndarray
+        """
+        if atoms is None:
+            atoms = self.atoms
+        return self.coordinates.array[self.coordinates.attach(atoms)]
+
+    def set_coordinates(self, coords, atoms=None):
+        """Set atom coordinates from an array.
+
+        :param coords:  (N, 3) array of coordinates
+        :type coords:  numpy.ndarray
+        :param atoms:  atoms to set (all atoms if None)
+        :type atoms:  [Atom]
+        """
+        if atoms is None:
+            atoms = self.atoms
+        self.coordinates.array[self.coordinates.attach(atoms)] = coords
 
     @property
     def charge(self):
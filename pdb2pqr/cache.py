@@ -0,0 +1,141 @@
+"""On-disk cache for parsed data files.
+
+Objects built from data files (e.g., topology definitions) are pickled to a
+per-user cache directory.  Each entry is keyed by a hash of the PDB2PQR
+version, the cache format version, and the contents of the files the object
+was built from, so edits to those files or a new PDB2PQR release invalidate
+the cache automatically.
+
+The cache directory can be changed with the :makevar:`PDB2PQR_CACHE_DIR`
+environment variable and caching can be disabled by setting
+:makevar:`PDB2PQR_NO_CACHE`.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from .config import VERSION, CACHE_DIR_ENV, NO_CACHE_ENV
+from .config import CACHE_FORMAT_VERSION
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_cache_dir():
+    """Get the directory used for cached files.
+
+    :return:  path to cache directory (may not exist yet)
+    :rtype:  Path
+    """
+    env_dir = os.environ.get(CACHE_DIR_ENV)
+    if env_dir:
+        return Path(env_dir)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData/Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library/Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pdb2pqr"
+
+
+def is_enabled():
+    """Check whether on-disk caching is enabled.
+
+    :return:  False if disabled by the :makevar:`PDB2PQR_NO_CACHE`
+        environment variable
+    :rtype:  bool
+    """
+    return not os.environ.get(NO_CACHE_ENV)
+
+
+def get_key(*contents):
+    """Get a cache key for an object built from the given contents.
+
+    :param contents:  contents of the files (or other data) used to build the
+        cached object
+    :type contents:  str or bytes
+    :return:  hexadecimal hash key
+    :rtype:  str
+    """
+    hasher = hashlib.sha256()
+    header = f"{VERSION}:{CACHE_FORMAT_VERSION}:{sys.version_info[:2]}"
+    hasher.update(header.encode("utf-8"))
+    for content in contents:
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        hasher.update(len(content).to_bytes(8, "little"))
+        hasher.update(content)
+    return hasher.hexdigest()
+
+
+def get_path(kind, key):
+    """Get the path of a cache entry.
+
+    :param kind:  category of cached object (subdirectory name)
+    :type kind:  str
+    :param key:  cache key from :func:`get_key`
+    :type key:  str
+    :return:  path to cache file
+    :rtype:  Path
+    """
+    return get_cache_dir() / kind / f"{key}.pickle"
+
+
+def load(kind, key):
+    """Load an object from the cache.
+
+    Missing or unreadable entries are treated as cache misses.
+
+    :param kind:  category of cached object (subdirectory name)
+    :type kind:  str
+    :param key:  cache key from :func:`get_key`
+    :type key:  str
+    :return:  cached object or None if not available
+    """
+    path = get_path(kind, key)
+    try:
+        with open(path, "rb") as cache_file:
+            obj = pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except Exception as err:  # pylint: disable=broad-except
+        _LOGGER.debug(f"Ignoring unreadable cache file {path}: {err}")
+        return None
+    _LOGGER.debug(f"Loaded {kind} from cache file {path}.")
+    return obj
+
+
+def store(kind, key, obj):
+    """Store an object in the cache.
+
+    The entry is written to a temporary file and then moved into place so
+    that concurrent processes never see a partial file.  Failures to write
+    the cache are logged and otherwise ignored.
+
+    :param kind:  category of cached object (subdirectory name)
+    :type kind:  str
+    :param key:  cache key from :func:`get_key`
+    :type key:  str
+    :param obj:  object to cache
+    """
+    path = get_path(kind, key)
+    temp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=path.parent, suffix=".tmp", delete=False
+        ) as temp_file:
+            temp_path = temp_file.name
+            pickle.dump(obj, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError) as err:
+        _LOGGER.debug(f"Unable to write cache file {path}: {err}")
+        return
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+    _LOGGER.debug(f"Stored {kind} in cache file {path}.")
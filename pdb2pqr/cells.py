@@ -1,10 +1,102 @@
-"""Cell list to facilitate neighbor searching."""
+"""Cell list to facilitate neighbor searching.
+
+The cell list is stored as NumPy arrays: every placement of an atom in a cell
+is an *entry* and the entries are kept sorted by packed integer cell id so
+that the contents of any cell are a contiguous slice of the sorted array.
+Entries added after the last (re)build are kept in a small pending table and
+merged back into the sorted arrays when that table grows too large.
+"""
 import logging
+import numpy as np
+from . import profiling
+from .structures import get_coordinates
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+#: Bits used for each packed cell index
+_CELL_BITS = 20
+#: Offset that keeps packed cell indices positive
+_CELL_OFFSET = 1 << (_CELL_BITS - 1)
+#: Rebuild the sorted arrays once this many entries are pending
+_MIN_PENDING = 4096
+
+
+def cell_indices(coords, cellsize):
+    """Get the integer cell indices for a set of coordinates.
+
+    Negative coordinates are binned as ``(int(x) - 1) // cellsize`` to match
+    the historical behavior of :class:`Cells`.
+
+    :param coords:  array of coordinates with shape (..., 3)
+    :type coords:  numpy.ndarray
+    :param cellsize:  the size of each cell (in Angstroms)
+    :type cellsize:  int
+    :return:  integer cell indices with the same shape as ``coords``
+    :rtype:  numpy.ndarray
+    """
+    coords = np.asarray(coords, dtype=float)
+    trunc = np.trunc(coords).astype(np.int64)
+    trunc[coords < 0] -= 1
+    return trunc // cellsize
+
+
+def pack_cell_indices(indices):
+    """Pack integer cell indices into a single integer cell id.
+
+    :param indices:  integer cell indices with shape (..., 3)
+    :type indices:  numpy.ndarray
+    :return:  packed cell ids with shape (...)
+    :rtype:  numpy.ndarray
+    """
+    indices = np.asarray(indices, dtype=np.int64) + _CELL_OFFSET
+    return (
+        (indices[..., 0] << (2 * _CELL_BITS))
+        | (indices[..., 1] << _CELL_BITS)
+        | indices[..., 2]
+    )
+
+
+def _neighbor_deltas(layers):
+    """Get the packed cell id offsets of all cells within ``layers`` cells.
+
+    The offsets are ordered with x varying slowest and z fastest.
+
+    :param layers:  number of neighboring cells to include in each direction
+    :type layers:  int
+    :return:  array of packed cell id offsets
+    :rtype:  numpy.ndarray
+    """
+    steps = np.arange(-layers, layers + 1, dtype=np.int64)
+    grid = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1)
+    return pack_cell_indices(grid.reshape(-1, 3)) - pack_cell_indices(
+        np.zeros(3, dtype=np.int64)
+    )
+
+
+def _expand_ranges(starts, stops):
+    """Concatenate ``arange(start, stop)`` for each pair of bounds.
+
+    :param starts:  range starts
+    :type starts:  numpy.ndarray
+    :param stops:  range stops
+    :type stops:  numpy.ndarray
+    :return:  (concatenated positions, index of the range for each position)
+    :rtype:  (numpy.ndarray, numpy.ndarray)
+    """
+    counts = stops - starts
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(starts)), counts)
+    if total == 0:
+        return np.empty(0, dtype=np.int64), owner
+    ends = np.cumsum(counts)
+    positions = np.arange(total, dtype=np.int64) + np.repeat(
+        starts - (ends - counts), counts
+    )
+    return positions, owner
+
+
 class Cells:
     """Accelerate the search for nearby atoms.
 
@@ -14,6 +106,11 @@ class Cells:
     breaks down the xyz biomolecule space into several 3-D cells of desired
     size - then by simply examining atoms that fall into the adjacent cells
     one can quickly find nearby cells.
+
+    Atoms known to the cells are numbered in the order they were first added;
+    the batched queries (:meth:`query_radius`, :meth:`get_near_pairs`) return
+    these indices, which can be mapped back to atoms with :attr:`atoms`.
+    Within a cell, atoms are returned in the order they were placed there.
     """
 
     def __init__(self, cellsize):
@@ -22,8 +119,27 @@ class Cells:
         :param cellsize:  the size of each cell (in Angstroms)
         :type cellsize:  int
         """
-        self.cellmap = {}
         self.cellsize = cellsize
+        self._near_deltas = _neighbor_deltas(1)
+        self._near_delta_list = self._near_deltas.tolist()
+        self._reset()
+
+    def _reset(self):
+        """Remove all atoms from the cells."""
+        self.atoms = []
+        self._atom_index = {}
+        self._atom_entries = {}
+        # Per-entry arrays; entries below _num_sorted are sorted by cell id
+        self._entry_coords = np.empty((0, 3))
+        self._entry_atom = np.empty(0, dtype=np.int64)
+        self._entry_cell = np.empty(0, dtype=np.int64)
+        self._entry_active = np.empty(0, dtype=bool)
+        self._entry_objects = []
+        self._num_entries = 0
+        self._num_sorted = 0
+        self._cell_ranges = {}
+        self._pending = {}
+        self._num_pending = 0
 
     def assign_cells(self, biomolecule):
         """Place each atom in a virtual cell for easy neighbor comparison.
@@ -31,9 +147,12 @@ class Cells:
         :param biomolecule:  biomolecule with atoms to assign to cells
         :type biomolecule:  Biomolecule
         """
-        for atom in biomolecule.atoms:
+        atoms = list(biomolecule.atoms)
+        self._reset()
+        for atom in atoms:
             atom.cell = None
-            self.add_cell(atom)
+        self.add_atoms(atoms, get_coordinates(atoms))
+        self.rebuild()
 
     def add_cell(self, atom):
         """Add an atom to the cell.
@@ -43,17 +162,53 @@ class Cells:
         """
         size = self.cellsize
         x = atom.x
-        x = (int(x) - 1) // size * size if x < 0 else int(x) // size * size
+        x = (int(x) - 1) // size if x < 0 else int(x) // size
         y = atom.y
-        y = (int(y) - 1) // size * size if y < 0 else int(y) // size * size
+        y = (int(y) - 1) // size if y < 0 else int(y) // size
         z = atom.z
-        z = (int(z) - 1) // size * size if z < 0 else int(z) // size * size
-        key = (x, y, z)
-        try:
-            self.cellmap[key].append(atom)
-        except KeyError:
-            self.cellmap[key] = [atom]
-        atom.cell = key
+        z = (int(z) - 1) // size if z < 0 else int(z) // size
+        cell_id = (
+            ((x + _CELL_OFFSET) << (2 * _CELL_BITS))
+            | ((y + _CELL_OFFSET) << _CELL_BITS)
+            | (z + _CELL_OFFSET)
+        )
+        entry = self._num_entries
+        self._grow(entry + 1)
+        self._entry_coords[entry] = (atom.x, atom.y, atom.z)
+        self._entry_cell[entry] = cell_id
+        self._add_entry(atom, entry, cell_id)
+        self._num_entries += 1
+        atom.cell = (x * size, y * size, z * size)
+        self._check_pending()
+
+    def add_atoms(self, atoms, coords=None):
+        """Add several atoms to the cells in one batch.
+
+        Equivalent to calling :meth:`add_cell` for each atom in turn.
+
+        :param atoms:  the atoms to add
+        :type atoms:  [Atom]
+        :param coords:  (N, 3) array with the coordinates of the atoms
+            (read from the atoms if None)
+        :type coords:  numpy.ndarray
+        """
+        if len(atoms) == 0:
+            return
+        if coords is None:
+            coords = np.array([atom.coords for atom in atoms], dtype=float)
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        indices = cell_indices(coords, self.cellsize)
+        cell_ids = pack_cell_indices(indices)
+        first = self._num_entries
+        self._grow(first + len(atoms))
+        self._entry_coords[first : first + len(atoms)] = coords
+        self._entry_cell[first : first + len(atoms)] = cell_ids
+        keys = (indices * self.cellsize).tolist()
+        for iatom, (atom, cell_id) in enumerate(zip(atoms, cell_ids.tolist())):
+            self._add_entry(atom, first + iatom, cell_id)
+            atom.cell = tuple(keys[iatom])
+        self._num_entries += len(atoms)
+        self._check_pending()
 
     def remove_cell(self, atom):
         """Remove an atom from a cell.
@@ -65,7 +220,73 @@ class Cells:
         if oldcell is None:
             return
         atom.cell = None
-        self.cellmap[oldcell].remove(atom)
+        cell_id = self._key_to_id(oldcell)
+        entries = self._atom_entries[self._atom_index[atom]]
+        for ientry, (entry, entry_cell) in enumerate(entries):
+            if entry_cell == cell_id:
+                break
+        else:
+            raise ValueError(f"{atom} is not in cell {oldcell}")
+        del entries[ientry]
+        self._entry_active[entry] = False
+        self._entry_objects[entry] = None
+
+    def move_atoms(self, atoms):
+        """Update the cells of atoms whose coordinates have changed.
+
+        Equivalent to calling :meth:`remove_cell` and then :meth:`add_cell`
+        for each atom in turn.
+
+        :param atoms:  the atoms that moved
+        :type atoms:  [Atom]
+        """
+        for atom in atoms:
+            self.remove_cell(atom)
+        for atom in atoms:
+            self.add_cell(atom)
+
+    def rebuild(self):
+        """Merge pending entries into the sorted cell arrays.
+
+        Inactive entries are discarded and the remaining entries are
+        renumbered so that their order within each cell is preserved.
+        """
+        num = self._num_entries
+        active = np.flatnonzero(self._entry_active[:num])
+        order = active[np.argsort(self._entry_cell[active], kind="stable")]
+        count = len(order)
+        old_to_new = np.full(num, -1, dtype=np.int64)
+        old_to_new[order] = np.arange(count, dtype=np.int64)
+        for name in (
+            "_entry_coords",
+            "_entry_atom",
+            "_entry_cell",
+        ):
+            array = getattr(self, name)
+            array[:count] = array[order]
+        self._entry_active[:count] = True
+        self._entry_active[count:num] = False
+        objects = self._entry_objects
+        self._entry_objects = [objects[entry] for entry in order.tolist()]
+        for entries in self._atom_entries.values():
+            if entries:
+                new_entries = old_to_new[[entry for entry, _ in entries]]
+                entries[:] = sorted(
+                    zip(new_entries.tolist(), [cell for _, cell in entries])
+                )
+        cell_ids, starts, counts = np.unique(
+            self._entry_cell[:count], return_index=True, return_counts=True
+        )
+        self._cell_ranges = {
+            cell_id: (start, start + num_cell)
+            for cell_id, start, num_cell in zip(
+                cell_ids.tolist(), starts.tolist(), counts.tolist()
+            )
+        }
+        self._num_entries = count
+        self._num_sorted = count
+        self._pending = {}
+        self._num_pending = 0
 
     def get_near_cells(self, atom):
         """Find all atoms in cells bordering an atom.
@@ -75,24 +296,188 @@ class Cells:
         :return:  a list of nearby atoms
         :rtype:  [Atom]
         """
+        profiling.count("neighbor_queries")
         closeatoms = []
         cell = atom.cell
         if cell is not None:
-            x = cell[0]
-            y = cell[1]
-            z = cell[2]
-            size = self.cellsize
-            for i in range(-1 * size, 2 * size, size):
-                for j in range(-1 * size, 2 * size, size):
-                    for k in range(-1 * size, 2 * size, size):
-                        newkey = (x + i, y + j, z + k)
-                        try:
-                            newatoms = self.cellmap[newkey]
-                            for atom2 in newatoms:
-                                if atom == atom2:
-                                    continue
-                                closeatoms.append(atom2)
-                        except KeyError:
-                            pass
-
+            cell_id = self._key_to_id(cell)
+            objects = self._entry_objects
+            ranges = self._cell_ranges
+            pending = self._pending
+            for delta in self._near_delta_list:
+                newkey = cell_id + delta
+                bounds = ranges.get(newkey)
+                if bounds is not None:
+                    for atom2 in objects[bounds[0] : bounds[1]]:
+                        if atom2 is None or atom2 is atom:
+                            continue
+                        closeatoms.append(atom2)
+                entries = pending.get(newkey)
+                if entries is not None:
+                    for entry in entries:
+                        atom2 = objects[entry]
+                        if atom2 is None or atom2 is atom:
+                            continue
+                        closeatoms.append(atom2)
         return closeatoms
+
+    def get_near_pairs(self, atoms):
+        """Find all atoms in cells bordering each of several atoms.
+
+        Batched version of :meth:`get_near_cells`.
+
+        :param atoms:  the atoms to test
+        :type atoms:  [Atom]
+        :return:  ``(query, index)`` arrays such that ``index[query == i]``
+            are the indices (see :attr:`atoms`) of the atoms that
+            :meth:`get_near_cells` returns for ``atoms[i]``, in the same order
+        :rtype:  (numpy.ndarray, numpy.ndarray)
+        """
+        profiling.count("neighbor_queries", len(atoms))
+        if self._pending:
+            self.rebuild()
+        cells = [atom.cell for atom in atoms]
+        placed = np.array([cell is not None for cell in cells], dtype=bool)
+        keys = np.array(
+            [cell if cell is not None else (0, 0, 0) for cell in cells],
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        self_index = np.array(
+            [self._atom_index.get(atom, -1) for atom in atoms], dtype=np.int64
+        )
+        query, entries = self._near_entries(
+            pack_cell_indices(keys // self.cellsize), self._near_deltas
+        )
+        index = self._entry_atom[entries]
+        keep = placed[query] & (index != self_index[query])
+        return query[keep], index[keep]
+
+    def query_radius(self, coords, radius):
+        """Find the atoms within a distance of one or more points.
+
+        Distances are measured to the coordinates that atoms had when they
+        were last placed in a cell.
+
+        :param coords:  a single point with shape (3,) or several points with
+            shape (n, 3)
+        :type coords:  numpy.ndarray
+        :param radius:  the search radius (in Angstroms)
+        :type radius:  float
+        :return:  for a single point, an array of atom indices (see
+            :attr:`atoms`) within the radius; for several points, a
+            ``(query, index)`` pair of arrays listing each point/atom match
+        :rtype:  numpy.ndarray or (numpy.ndarray, numpy.ndarray)
+        """
+        coords = np.asarray(coords, dtype=float)
+        single = coords.ndim == 1
+        points = coords.reshape(-1, 3)
+        profiling.count("neighbor_queries", len(points))
+        # Binning of negative integer coordinates can shift an atom by up to
+        # one Angstrom into the neighboring cell
+        layers = max(1, int(np.ceil((radius + 1.0) / self.cellsize)))
+        query, entries = self._near_entries(
+            pack_cell_indices(cell_indices(points, self.cellsize)),
+            _neighbor_deltas(layers),
+        )
+        if self._num_pending:
+            # Pending entries are few, so test them against every point
+            pending = np.arange(self._num_sorted, self._num_entries)
+            pending = pending[self._entry_active[pending]]
+            query = np.concatenate(
+                (query, np.repeat(np.arange(len(points)), len(pending)))
+            )
+            entries = np.concatenate((entries, np.tile(pending, len(points))))
+            order = np.argsort(query, kind="stable")
+            query, entries = query[order], entries[order]
+        diff = self._entry_coords[entries] - points[query]
+        within = np.einsum("ij,ij->i", diff, diff) <= radius * radius
+        query, index = query[within], self._entry_atom[entries[within]]
+        if single:
+            return index
+        return query, index
+
+    def _add_entry(self, atom, entry, cell_id):
+        """Record a new entry placing an atom in a cell.
+
+        :param atom:  the atom to place
+        :type atom:  Atom
+        :param entry:  the entry number
+        :type entry:  int
+        :param cell_id:  packed cell id
+        :type cell_id:  int
+        """
+        index = self._atom_index.get(atom)
+        if index is None:
+            index = len(self.atoms)
+            self._atom_index[atom] = index
+            self._atom_entries[index] = []
+            self.atoms.append(atom)
+        self._atom_entries[index].append((entry, cell_id))
+        self._entry_atom[entry] = index
+        self._entry_active[entry] = True
+        self._entry_objects.append(atom)
+        try:
+            self._pending[cell_id].append(entry)
+        except KeyError:
+            self._pending[cell_id] = [entry]
+        self._num_pending += 1
+
+    def _check_pending(self):
+        """Rebuild the sorted arrays if too many entries are pending."""
+        if self._num_pending > max(_MIN_PENDING, self._num_sorted):
+            self.rebuild()
+
+    def _near_entries(self, cell_ids, deltas):
+        """Get active sorted entries in the cells next to several cells.
+
+        :param cell_ids:  packed cell ids to search around
+        :type cell_ids:  numpy.ndarray
+        :param deltas:  packed cell id offsets of the neighboring cells
+        :type deltas:  numpy.ndarray
+        :return:  ``(query, entry)`` arrays, grouped by query in the order of
+            ``deltas`` and then entry order within each cell
+        :rtype:  (numpy.ndarray, numpy.ndarray)
+        """
+        sorted_cells = self._entry_cell[: self._num_sorted]
+        targets = (cell_ids[:, np.newaxis] + deltas[np.newaxis, :]).ravel()
+        starts = np.searchsorted(sorted_cells, targets, side="left")
+        stops = np.searchsorted(sorted_cells, targets, side="right")
+        entries, owner = _expand_ranges(starts, stops)
+        query = owner // len(deltas)
+        active = self._entry_active[entries]
+        return query[active], entries[active]
+
+    def _key_to_id(self, key):
+        """Convert a cell key to a packed cell id.
+
+        :param key:  cell key as stored in :attr:`Atom.cell`
+        :type key:  (int, int, int)
+        :return:  packed cell id
+        :rtype:  int
+        """
+        size = self.cellsize
+        return (
+            ((key[0] // size + _CELL_OFFSET) << (2 * _CELL_BITS))
+            | ((key[1] // size + _CELL_OFFSET) << _CELL_BITS)
+            | (key[2] // size + _CELL_OFFSET)
+        )
+
+    def _grow(self, num_entries):
+        """Ensure the entry arrays are large enough.
+
+        :param num_entries:  required number of entry slots
+        :type num_entries:  int
+        """
+        if num_entries <= len(self._entry_atom):
+            return
+        size = max(num_entries, 2 * len(self._entry_atom))
+        for name in (
+            "_entry_coords",
+            "_entry_atom",
+            "_entry_cell",
+            "_entry_active",
+        ):
+            old = getattr(self, name)
+            new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
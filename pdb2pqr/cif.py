@@ -8,6 +8,7 @@ This methods use the pdbx/cif parser provided by WWPDB
 """
 import logging
 from datetime import datetime
+import numpy as np
 from numpy import minimum, ceil
 import pdbx
 from . import pdb
@@ -16,6 +17,94 @@ from . import pdb
 _LOGGER = logging.getLogger(__name__)
 
 
+# The atom_site items used for each atom record field, in order of preference
+ATOM_SITE_ITEMS = {
+    "record": ["group_PDB"],
+    "serial": ["id"],
+    "name": ["auth_atom_id", "label_atom_id"],
+    "alt_loc": ["label_alt_id"],
+    "res_name": ["auth_comp_id", "label_comp_id"],
+    "chain_id": ["auth_asym_id", "label_asym_id"],
+    "res_seq": ["auth_seq_id", "label_seq_id"],
+    "ins_code": ["pdbx_PDB_ins_code"],
+    "x": ["Cartn_x"],
+    "y": ["Cartn_y"],
+    "z": ["Cartn_z"],
+    "occupancy": ["occupancy"],
+    "temp_factor": ["B_iso_or_equiv"],
+    "element": ["type_symbol"],
+    "charge": ["pdbx_formal_charge"],
+    "model": ["pdbx_PDB_model_num"],
+}
+
+
+def get_column(category, names):
+    """Get the values of the first available item of a category.
+
+    :param category:  PDBx category
+    :type category:  pdbx.containers.DataCategory
+    :param names:  item names in order of preference
+    :type names:  [str]
+    :return:  list of values (None for unknown or missing values; empty
+        strings for inapplicable values) or None if none of the items exist
+    :rtype:  list
+    """
+    for name in names:
+        if category.has_attribute(name):
+            index = category.get_attribute_index(name)
+            return [row[index] for row in category.row_list]
+    return None
+
+
+def get_numbers(values, type_, default=None):
+    """Convert a column of values to numbers.
+
+    :param values:  values from :func:`get_column`
+    :type values:  list
+    :param type_:  number type (int or float)
+    :type type_:  type
+    :param default:  value for missing values; missing values are invalid if
+        None
+    :type default:  int or float
+    :return:  (array of numbers, array indicating valid values)
+    :rtype:  (numpy.ndarray, numpy.ndarray)
+    """
+    if None not in values and "" not in values:
+        try:
+            return (
+                np.array(values, dtype=type_),
+                np.ones(len(values), dtype=bool),
+            )
+        except (TypeError, ValueError, OverflowError):
+            pass
+    numbers = np.zeros(len(values), dtype=type_)
+    valid = np.ones(len(values), dtype=bool)
+    for ivalue, value in enumerate(values):
+        if value in (None, "") and default is not None:
+            numbers[ivalue] = default
+            continue
+        try:
+            numbers[ivalue] = type_(value)
+        except (TypeError, ValueError, OverflowError):
+            valid[ivalue] = False
+    return numbers, valid
+
+
+def get_strings(values, rows):
+    """Get strings from a column of values.
+
+    :param values:  values from :func:`get_column` (or None)
+    :type values:  list
+    :param rows:  indices of the rows to get
+    :type rows:  numpy.ndarray
+    :return:  list of strings (empty for missing values)
+    :rtype:  [str]
+    """
+    if values is None:
+        return [""] * len(rows)
+    return ["" if values[irow] is None else values[irow] for irow in rows]
+
+
 def atom_site(block):
     """Handle ATOM_SITE block.
 
@@ -24,347 +113,130 @@ def atom_site(block):
     atomic displacement parameters, magnetic moments and directions.
     (Source: https://j.mp/2Zprx41)
 
+    The category is read column by column and the atom records are built
+    directly from the typed values (see :data:`ATOM_SITE_ITEMS`), so serial
+    numbers, residue numbers, chain IDs, and names are not limited to the
+    widths of PDB columns.
+    Multiple models are separated by MODEL and ENDMDL records.
+
     :param block:  PDBx data block
     :type block:  [str]
     :return:  (array of pdb.ATOM objects, array of things that weren't handled
         by parser)
     :rtype:  ([Atom], [str])
     """
-    line = 0
     pdb_arr = []
     err_arr = []
     atoms = block.get_object("atom_site")
-    num_model_arr = count_models(block)
-    if len(num_model_arr) == 1:
-        # TODO - this part of the conditional should be a separate function
-        for i in range(atoms.row_count):
-            if atoms.get_value("group_PDB", i) == "ATOM":
-                try:
-                    line = ""
-                    # 1  - 6 RECORD NAME (ATOM)
-                    line += atoms.get_value("group_PDB", i) + " " * (
-                        6 - len(atoms.get_value("group_PDB", i))
-                    )
-                    # 7  - 11 ATOM SERIAL
-                    line += " " * (
-                        5 - len(str(atoms.get_value("id", i)))
-                    ) + str(atoms.get_value("id", i))
-                    # 12 - 13
-                    line += "  "
-                    # 14 - 16 ATOM NAME
-                    line += atoms.get_value("label_atom_id", i) + " " * (
-                        3 - len(atoms.get_value("label_atom_id", i))
-                    )
-                    # 17 ALT LOCATION
-                    if atoms.get_value("label_alt_id", i) == ".":
-                        line += " "
-                    else:
-                        atoms.get_value("label_alt_id", i)
-                    # 18 - 20 RES NAME
-                    line += " " * (
-                        3 - len(atoms.get_value("label_comp_id", i))
-                    ) + atoms.get_value("label_comp_id", i)
-                    # 21
-                    line += " "
-                    # 22 CHAIN ID
-                    line += " " * (
-                        1 - len(atoms.get_value("label_asym_id", i))
-                    ) + atoms.get_value("label_asym_id", i)
-                    # 23 - 26 RES SEQ ID
-                    line += " " * (
-                        4 - len(str(atoms.get_value("auth_seq_id", i)))
-                    ) + str(atoms.get_value("auth_seq_id", i))
-                    # 27 - 30
-                    line += " " * 3
-                    # 31 - 38 X Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_x", i)))
-                    ) + str(atoms.get_value("Cartn_x", i))
-                    # 39 - 46 Y Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_y", i)))
-                    ) + str(atoms.get_value("Cartn_y", i))
-                    # 47 - 54 Z Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_z", i)))
-                    ) + str(atoms.get_value("Cartn_z", i))
-                    # 55 - 60 OCCUPANCY
-                    line += " " * (
-                        6 - len(str(atoms.get_value("occupancy", i)))
-                    ) + str(atoms.get_value("occupancy", i))
-                    # 61 - 66 TEMP FACTOR
-                    line += " " * (
-                        6 - len(str(atoms.get_value("B_iso_or_equiv", i)))
-                    ) + str(atoms.get_value("B_iso_or_equiv", i))
-                    # 67 - 76
-                    line += " " * 10
-                    # 77 - 78 ELEMENT SYMBOL
-                    line += " " * (
-                        2 - len(atoms.get_value("type_symbol", i))
-                    ) + atoms.get_value("type_symbol", i)
-                    # 79 - 80 CHARGE OF ATOM
-                    if atoms.get_value("pdbx_formal_charge", i) == "?":
-                        line += " " * 2
-                    else:
-                        atoms.get_value("pdbx_formal_charge", i)
-                    pdb_arr.append(pdb.ATOM(line))
-                except KeyError:
-                    _LOGGER.error(f"atom_site: Error reading line: #{line}#\n")
-            elif atoms.get_value("group_PDB", i) == "HETATM":
-                try:
-                    line = ""
-                    # 1  - 6 RECORD NAME (HETATM)
-                    line += atoms.get_value("group_PDB", i) + "" * (
-                        6 - len(atoms.get_value("group_PDB", i))
-                    )
-                    # 7  - 11 ATOM SERIAL
-                    line += " " * (
-                        5 - len(str(atoms.get_value("id", i)))
-                    ) + str(atoms.get_value("id", i))
-                    # 12 - 13
-                    line += "  "
-                    # 14 - 16 ATOM NAME
-                    line += atoms.get_value("label_atom_id", i) + " " * (
-                        3 - len(atoms.get_value("label_atom_id", i))
-                    )
-                    # 17 ALT LOCATION
-                    if atoms.get_value("label_alt_id", i) == ".":
-                        line += " "
-                    else:
-                        atoms.get_value("label_alt_id", i)
-                    # 18 - 20 RES NAME
-                    line += " " * (
-                        3 - len(atoms.get_value("label_comp_id", i))
-                    ) + atoms.get_value("label_comp_id", i)
-                    # 21
-                    line += " "
-                    # 22 CHAIN ID
-                    line += " " * (
-                        1 - len(atoms.get_value("label_asym_id", i))
-                    ) + atoms.get_value("label_asym_id", i)
-                    # 23 - 26 RES SEQ ID
-                    line += " " * (
-                        4 - len(str(atoms.get_value("auth_seq_id", i)))
-                    ) + str(atoms.get_value("auth_seq_id", i))
-                    # 27 - 30
-                    line += " " * 3
-                    # 31 - 38 X Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_x", i)))
-                    ) + str(atoms.get_value("Cartn_x", i))
-                    # 39 - 46 Y Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_y", i)))
-                    ) + str(atoms.get_value("Cartn_y", i))
-                    # 47 - 54 Z Coords
-                    line += " " * (
-                        8 - len(str(atoms.get_value("Cartn_z", i)))
-                    ) + str(atoms.get_value("Cartn_z", i))
-                    # 55 - 60 OCCUPANCY
-                    line += " " * (
-                        6 - len(str(atoms.get_value("occupancy", i)))
-                    ) + str(atoms.get_value("occupancy", i))
-                    # 61 - 66 TEMP FACTOR
-                    line += " " * (
-                        6 - len(str(atoms.get_value("B_iso_or_equiv", i)))
-                    ) + str(atoms.get_value("B_iso_or_equiv", i))
-                    # 67 - 76
-                    line += " " * (10)
-                    # 77 - 78 ELEMENT SYMBOL
-                    line += " " * (
-                        2 - len(atoms.get_value("type_symbol", i))
-                    ) + atoms.get_value("type_symbol", i)
-                    # 79 - 80 CHARGE OF ATOM
-                    if atoms.get_value("pdbx_formal_charge", i) == "?":
-                        line += " " * 2
-                    else:
-                        atoms.get_value("pdbx_formal_charge", i)
-                    pdb_arr.append(pdb.HETATM(line))
-                except KeyError:
-                    _LOGGER.error(f"atom_site: Error reading line:\n{line}")
-        return pdb_arr, err_arr
-    # TODO - Given the return statement above, is this "else" ever reached?
-    else:
-        # TODO - this part of the conditional should be a separate function
-        for j in num_model_arr:
-            try:
-                line = "MODEL "
-                line += " " * 4
-                line += " " * (4 - len(str(j))) + str(j)
-                pdb_arr.append(pdb.MODEL(line))
-            except ValueError:
-                _LOGGER.error(f"atom_site: Error readline line:\n{line}")
-                err_arr.append("MODEL")
-
-            for i in range(atoms.row_count):
-                if atoms.get_value("pdbx_PDB_model_num", i) == j:
-                    if atoms.get_value("group_PDB", i) == "ATOM":
-                        try:
-                            line = ""
-                            # 1  - 6 RECORD NAME (ATOM)
-                            line += atoms.get_value("group_PDB", i) + " " * (
-                                6 - len(atoms.get_value("group_PDB", i))
-                            )
-                            # 7  - 11 ATOM SERIAL
-                            line += " " * (
-                                5 - len(str(atoms.get_value("id", i)))
-                            ) + str(atoms.get_value("id", i))
-                            # 12 - 13
-                            line += "  "
-                            # 14 - 16 ATOM NAME
-                            line += atoms.get_value(
-                                "label_atom_id", i
-                            ) + " " * (
-                                3 - len(atoms.get_value("label_atom_id", i))
-                            )
-                            # 17 ALT LOCATION
-                            if atoms.get_value("label_alt_id", i) == ".":
-                                line += " "
-                            else:
-                                atoms.get_value("label_alt_id", i)
-                            # 18 - 20 RES NAME
-                            line += " " * (
-                                3 - len(atoms.get_value("label_comp_id", i))
-                            ) + atoms.get_value("label_comp_id", i)
-                            # 21
-                            line += " "
-                            # 22 CHAIN ID
-                            line += " " * (
-                                1 - len(atoms.get_value("label_asym_id", i))
-                            ) + atoms.get_value("label_asym_id", i)
-                            # 23 - 26 RES SEQ ID
-                            line += " " * (
-                                4 - len(str(atoms.get_value("auth_seq_id", i)))
-                            ) + str(atoms.get_value("auth_seq_id", i))
-                            # 27 - 30
-                            line += " " * 3
-                            # 31 - 38 X Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_x", i)))
-                            ) + str(atoms.get_value("Cartn_x", i))
-                            # 39 - 46 Y Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_y", i)))
-                            ) + str(atoms.get_value("Cartn_y", i))
-                            # 47 - 54 Z Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_z", i)))
-                            ) + str(atoms.get_value("Cartn_z", i))
-                            # 55 - 60 OCCUPANCY
-                            line += " " * (
-                                6 - len(str(atoms.get_value("occupancy", i)))
-                            ) + str(atoms.get_value("occupancy", i))
-                            # 61 - 66 TEMP FACTOR
-                            line += " " * (
-                                6
-                                - len(
-                                    str(atoms.get_value("B_iso_or_equiv", i))
-                                )
-                            ) + str(atoms.get_value("B_iso_or_equiv", i))
-                            # 67 - 76
-                            line += " " * 10
-                            # 77 - 78 ELEMENT SYMBOL
-                            line += " " * (
-                                2 - len(atoms.get_value("type_symbol", i))
-                            ) + atoms.get_value("type_symbol", i)
-                            # 79 - 80 CHARGE OF ATOM
-                            if atoms.get_value("pdbx_formal_charge", i) == "?":
-                                line += " " * 2
-                            else:
-                                atoms.get_value("pdbx_formal_charge", i)
-                            pdb_arr.append(pdb.ATOM(line))
-                        except KeyError:
-                            _LOGGER.error(
-                                f"atom_site: Error reading line:\n{line}"
-                            )
-                            err_arr.append("ATOM")
-                    elif atoms.get_value("group_PDB", i) == "HETATM":
-                        try:
-                            line = ""
-                            # 1  - 6 RECORD NAME (HETATM)
-                            line += atoms.get_value("group_PDB", i) + "" * (
-                                6 - len(atoms.get_value("group_PDB", i))
-                            )
-                            # 7  - 11 ATOM SERIAL
-                            line += " " * (
-                                5 - len(str(atoms.get_value("id", i)))
-                            ) + str(atoms.get_value("id", i))
-                            # 12 - 13
-                            line += "  "
-                            # 14 - 16 ATOM NAME
-                            line += atoms.get_value(
-                                "label_atom_id", i
-                            ) + " " * (
-                                3 - len(atoms.get_value("label_atom_id", i))
-                            )
-                            # 17      ALT LOCATION
-                            if atoms.get_value("label_alt_id", i) == ".":
-                                line += " "
-                            else:
-                                atoms.get_value("label_alt_id", i)
-                            # 18 - 20 RES NAME
-                            line += " " * (
-                                3 - len(atoms.get_value("label_comp_id", i))
-                            ) + atoms.get_value("label_comp_id", i)
-                            # 21
-                            line += " "
-                            # 22      CHAIN ID
-                            line += " " * (
-                                1 - len(atoms.get_value("label_asym_id", i))
-                            ) + atoms.get_value("label_asym_id", i)
-                            # 23 - 26 RES SEQ ID
-                            line += " " * (
-                                4 - len(str(atoms.get_value("auth_seq_id", i)))
-                            ) + str(atoms.get_value("auth_seq_id", i))
-                            # 27 - 30
-                            line += " " * 3
-                            # 31 - 38 X Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_x", i)))
-                            ) + str(atoms.get_value("Cartn_x", i))
-                            # 39 - 46 Y Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_y", i)))
-                            ) + str(atoms.get_value("Cartn_y", i))
-                            # 47 - 54 Z Coords
-                            line += " " * (
-                                8 - len(str(atoms.get_value("Cartn_z", i)))
-                            ) + str(atoms.get_value("Cartn_z", i))
-                            # 55 - 60 OCCUPANCY
-                            line += " " * (
-                                6 - len(str(atoms.get_value("occupancy", i)))
-                            ) + str(atoms.get_value("occupancy", i))
-                            # 61 - 66 TEMP FACTOR
-                            line += " " * (
-                                6
-                                - len(
-                                    str(atoms.get_value("B_iso_or_equiv", i))
-                                )
-                            ) + str(atoms.get_value("B_iso_or_equiv", i))
-                            # 67 - 76
-                            line += " " * 10
-                            # 77 - 78 ELEMENT SYMBOL
-                            line += " " * (
-                                2 - len(atoms.get_value("type_symbol", i))
-                            ) + atoms.get_value("type_symbol", i)
-                            # 79 - 80 CHARGE OF ATOM
-                            if atoms.get_value("pdbx_formal_charge", i) == "?":
-                                line += " " * 2
-                            else:
-                                atoms.get_value("pdbx_formal_charge", i)
-                            pdb_arr.append(pdb.HETATM(line))
-                        except KeyError:
-                            _LOGGER.error(
-                                f"atom_site: Error reading line:\n{line}"
-                            )
-                            err_arr.append("HETATOM")
-            try:
-                line = "ENDMDL"
-                pdb_arr.append(pdb.ENDMDL(line))
-            except KeyError:
-                _LOGGER.error(f"atom_site: Error reading line:\n{line}")
-                err_arr.append("ENDMDL")
+    if atoms is None or atoms.row_count == 0:
         return pdb_arr, err_arr
+    num_rows = atoms.row_count
+    columns = {
+        field: get_column(atoms, names)
+        for field, names in ATOM_SITE_ITEMS.items()
+    }
+    for field in ["record", "serial", "x", "y", "z"]:
+        if columns[field] is None:
+            _LOGGER.error(f"atom_site: Missing item for {field}.")
+            err_arr.append("ATOM")
+            return pdb_arr, err_arr
+    for field in ["name", "res_name", "chain_id", "res_seq"]:
+        if columns[field] is None:
+            columns[field] = [None] * num_rows
+    records = np.array(
+        [value if value is not None else "" for value in columns["record"]],
+        dtype=str,
+    )
+    valid = np.isin(records, ["ATOM", "HETATM"])
+    serial, valid_serial = get_numbers(columns["serial"], int)
+    res_seq, valid_res_seq = get_numbers(columns["res_seq"], int, default=0)
+    coords = []
+    valid_coords = np.ones(num_rows, dtype=bool)
+    for field in ["x", "y", "z"]:
+        values, valid_values = get_numbers(columns[field], float)
+        coords.append(values)
+        valid_coords &= valid_values
+    numbers = {}
+    for field in ["occupancy", "temp_factor"]:
+        if columns[field] is None:
+            numbers[field] = np.zeros(num_rows)
+        else:
+            numbers[field], _ = get_numbers(columns[field], float, default=0.0)
+    bad_rows = valid & ~(valid_serial & valid_res_seq & valid_coords)
+    for irow in np.flatnonzero(bad_rows):
+        line = " ".join(str(value) for value in atoms.row_list[irow])
+        _LOGGER.error(f"atom_site: Error reading line:\n{line}")
+        err_arr.append(records[irow])
+    valid &= ~bad_rows
+    models = columns["model"]
+    if models is None:
+        models = [None] * num_rows
+    model_nums = []
+    for model in models:
+        if model not in model_nums:
+            model_nums.append(model)
+    model_index = {model: imodel for imodel, model in enumerate(model_nums)}
+    rows = np.flatnonzero(valid)
+    # Group the rows by model (in order of appearance)
+    row_models = np.array(
+        [model_index[models[irow]] for irow in rows], dtype=int
+    )
+    rows = rows[np.argsort(row_models, kind="stable")]
+    model_counts = np.bincount(row_models, minlength=len(model_nums))
+    positions = np.arange(len(rows))
+    if len(model_nums) > 1:
+        # Make room for the MODEL and ENDMDL records before each model
+        positions += 1 + 2 * np.repeat(
+            np.arange(len(model_nums)), model_counts
+        )
+    values = {
+        field: get_strings(columns[field], rows)
+        for field in [
+            "name",
+            "alt_loc",
+            "res_name",
+            "chain_id",
+            "ins_code",
+            "element",
+            "charge",
+        ]
+    }
+    lines = [
+        " ".join(
+            "?" if value is None else (value if value != "" else ".")
+            for value in atoms.row_list[irow]
+        )
+        for irow in rows
+    ]
+    atom_columns = pdb.AtomColumns.from_values(
+        lines,
+        positions,
+        record=records[rows],
+        serial=serial[rows],
+        res_seq=res_seq[rows],
+        coords=np.column_stack(coords)[rows],
+        occupancy=numbers["occupancy"][rows],
+        temp_factor=numbers["temp_factor"][rows],
+        seg_id=[""] * len(rows),
+        **values,
+    )
+    atom_records = atom_columns.records()
+    if len(model_nums) == 1:
+        return atom_records, err_arr
+    start = 0
+    for model, count in zip(model_nums, model_counts):
+        try:
+            line = "MODEL "
+            line += " " * 4
+            line += " " * (4 - len(str(model))) + str(model)
+            pdb_arr.append(pdb.MODEL(line))
+        except ValueError:
+            _LOGGER.error(f"atom_site: Error readline line:\n{line}")
+            err_arr.append("MODEL")
+        pdb_arr += atom_records[start : start + count]
+        start += count
+        pdb_arr.append(pdb.ENDMDL("ENDMDL"))
+    return pdb_arr, err_arr
 
 
 def conect(block):
@@ -165,3 +165,38 @@ VACUUM_PERMIT = 8.8541878128e-12
 
 #: Boltzmann constant (in J/K)
 BOLTZMANN = 1.380649e-23
+
+#: Environment variable to override the directory used for on-disk caches
+CACHE_DIR_ENV = "PDB2PQR_CACHE_DIR"
+
+#: Environment variable that disables on-disk caches when set to a value
+NO_CACHE_ENV = "PDB2PQR_NO_CACHE"
+
+#: Version of the on-disk cache format (increment to invalidate old caches)
+CACHE_FORMAT_VERSION = 3
+
+#: Suffixes of compressed files (gzip, bzip2, and xz)
+COMPRESSION_SUFFIXES = [".gz", ".bz2", ".xz"]
+
+#: URL template for downloading structures by PDB ID
+PDB_URL = "https://files.rcsb.org/download/{ID}.{format}"
+
+#: Environment variable with a URL template or local directory to use instead
+#: of :data:`PDB_URL`
+PDB_MIRROR_ENV = "PDB2PQR_PDB_MIRROR"
+
+#: Environment variable to override the size limit of the structure cache
+#: (in megabytes)
+PDB_CACHE_MB_ENV = "PDB2PQR_PDB_CACHE_MB"
+
+#: Default size limit of the structure cache (in megabytes)
+PDB_CACHE_MB = 1024
+
+#: Timeout for connecting to and reading from the PDB server (in seconds)
+DOWNLOAD_TIMEOUT = 60
+
+#: Default number of concurrent downloads when prefetching structures
+PREFETCH_JOBS = 8
+
+#: Number of values parsed at a time from the data section of OpenDX files
+DX_CHUNK_SIZE = 1 << 16
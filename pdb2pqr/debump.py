@@ -6,11 +6,14 @@
 .. codeauthor::  Nathan Baker
 """
 import logging
+import numpy as np
 from . import aa
 from . import utilities as util
 from . import io
 from . import quatfit as quat
 from . import cells
+from . import profiling
+from . import structures as struct
 from .config import DEBUMP_ANGLE_STEP_SIZE, DEBUMP_ANGLE_STEPS
 from .config import DEBUMP_ANGLE_TEST_COUNT, SMALL_NUMBER, CELL_SIZE
 from .config import BUMP_HYDROGEN_SIZE, BUMP_HEAVY_SIZE
@@ -28,16 +31,20 @@ class Debump:
         with clear responsibilities.
     """
 
-    def __init__(self, biomolecule, definition=None):
+    def __init__(self, biomolecule, definition=None, batch_angles=True):
         """Initialize the Debump object.
 
         :param biomolecule:  the biomolecule to debump
         :type biomolecule:  Biomolecule
         :param definition:  topology definition file
         :type definition:  Definition
+        :param batch_angles:  score all trial dihedral angles of a residue in
+            one vectorized pass instead of rotating the residue to each angle
+        :type batch_angles:  bool
         """
         self.biomolecule = biomolecule
         self.definition = definition
+        self.batch_angles = batch_angles
         self.aadef = None
         self.cells = {}
         if definition is not None:
@@ -213,6 +220,7 @@ class Debump:
         :return:  score for dihedral angle
         :rtype:  float
         """
+        profiling.count("dihedral_trials")
         score = 0
         atomnames = residue.reference.dihedrals[anglenum].split()
         pivot = atomnames[2]
@@ -252,15 +260,27 @@ class Debump:
                 f"Using dihedral angle number {anglenum} to debump "
                 "the residue."
             )
-            bestscore = self.score_dihedral_angle(residue, anglenum)
             found_improved = False
             bestangle = orig_angle = residue.dihedrals[anglenum]
+            angles = orig_angle + DEBUMP_ANGLE_STEP_SIZE * np.arange(
+                DEBUMP_ANGLE_STEPS
+            )
+            if self.batch_angles:
+                scores = self.score_dihedral_angles(residue, anglenum, angles)
+                bestscore = scores[0]
+            else:
+                bestscore = self.score_dihedral_angle(residue, anglenum)
             # Skip the first angle as it's already known.
             for i in range(1, DEBUMP_ANGLE_STEPS):
                 newangle = orig_angle + (DEBUMP_ANGLE_STEP_SIZE * i)
-                self.set_dihedral_angle(residue, anglenum, newangle)
-                # Check for conflicts
-                score = self.score_dihedral_angle(residue, anglenum)
+                if self.batch_angles:
+                    score = scores[i]
+                    if score == 0:
+                        self.set_dihedral_angle(residue, anglenum, newangle)
+                else:
+                    self.set_dihedral_angle(residue, anglenum, newangle)
+                    # Check for conflicts
+                    score = self.score_dihedral_angle(residue, anglenum)
                 if score == 0:
                     if not self.find_residue_conflicts(residue):
                         _LOGGER.debug(
@@ -310,9 +330,8 @@ class Debump:
         bestwatatom = None
         residue = atom.residue
         # Get atoms from nearby cells
-        closeatoms = self.cells.get_near_cells(atom)
-        # Loop through and see which is the closest
-        for closeatom in closeatoms:
+        closeatoms = []
+        for closeatom in self.cells.get_near_cells(atom):
             closeresidue = closeatom.residue
             if closeresidue == residue:
                 continue
@@ -336,7 +355,11 @@ class Debump:
                 and atom.hacceptor
             ):
                 continue
-            dist = util.distance(atom.coords, closeatom.coords)
+            closeatoms.append(closeatom)
+        dists = self.get_distances(atom, closeatoms)
+        # Loop through and see which is the closest
+        for closeatom, dist in zip(closeatoms, dists):
+            closeresidue = closeatom.residue
             if isinstance(closeresidue, aa.WAT):
                 if dist < bestwatdist:
                     bestwatdist = dist
@@ -374,37 +397,14 @@ class Debump:
         residue = atom.residue
         atom_size = BUMP_HYDROGEN_SIZE if atom.is_hydrogen else BUMP_HEAVY_SIZE
         # Get atoms from nearby cells
-        closeatoms = self.cells.get_near_cells(atom)
+        closeatoms = [
+            closeatom
+            for closeatom in self.cells.get_near_cells(atom)
+            if not self.is_bump_exempt(atom, closeatom)
+        ]
+        dists = self.get_distances(atom, closeatoms)
         # Loop through and see if any are within the cutoff
-        for closeatom in closeatoms:
-            closeresidue = closeatom.residue
-            if closeresidue == residue and (
-                closeatom in atom.bonds or atom in closeatom.bonds
-            ):
-                continue
-            if not isinstance(closeresidue, (aa.Amino, aa.WAT)):
-                continue
-            if (
-                isinstance(residue, aa.CYS)
-                and residue.ss_bonded_partner == closeatom
-            ):
-                continue
-            # Also ignore if this is a donor/acceptor pair
-            if (
-                atom.is_hydrogen
-                and len(atom.bonds) != 0
-                and atom.bonds[0].hdonor
-                and closeatom.hacceptor
-            ):
-                continue
-            if (
-                closeatom.is_hydrogen
-                and len(closeatom.bonds) != 0
-                and closeatom.bonds[0].hdonor
-                and atom.hacceptor
-            ):
-                continue
-            dist = util.distance(atom.coords, closeatom.coords)
+        for closeatom, dist in zip(closeatoms, dists):
             other_size = (
                 BUMP_HYDROGEN_SIZE
                 if closeatom.is_hydrogen
@@ -415,6 +415,190 @@ class Debump:
                 nearatoms[closeatom] = cutoff - dist
         return nearatoms
 
+    @staticmethod
+    def get_distances(atom, closeatoms):
+        """Get the distances from an atom to several other atoms.
+
+        :param atom:  the atom
+        :type atom:  Atom
+        :param closeatoms:  the other atoms
+        :type closeatoms:  [Atom]
+        :return:  distances
+        :rtype:  [float]
+        """
+        if not closeatoms:
+            return []
+        coords = struct.get_coordinates(closeatoms) - atom.coords
+        return np.sqrt(np.einsum("ij,ij->i", coords, coords)).tolist()
+
+    @staticmethod
+    def is_bump_exempt(atom, closeatom):
+        """Check whether a nearby atom is ignored for conflict-checking.
+
+        Conflicts are ignored for bonded atoms in the same residue, atoms
+        outside of amino acids and waters, bonded CYS bridges, and
+        donor/acceptor pairs.
+
+        :param atom:  the atom being checked
+        :type atom:  Atom
+        :param closeatom:  the nearby atom
+        :type closeatom:  Atom
+        :return:  True if the pair should be ignored
+        :rtype:  bool
+        """
+        residue = atom.residue
+        closeresidue = closeatom.residue
+        if closeresidue == residue and (
+            closeatom in atom.bonds or atom in closeatom.bonds
+        ):
+            return True
+        if not isinstance(closeresidue, (aa.Amino, aa.WAT)):
+            return True
+        if (
+            isinstance(residue, aa.CYS)
+            and residue.ss_bonded_partner == closeatom
+        ):
+            return True
+        # Also ignore if this is a donor/acceptor pair
+        if (
+            atom.is_hydrogen
+            and len(atom.bonds) != 0
+            and atom.bonds[0].hdonor
+            and closeatom.hacceptor
+        ):
+            return True
+        if (
+            closeatom.is_hydrogen
+            and len(closeatom.bonds) != 0
+            and closeatom.bonds[0].hdonor
+            and atom.hacceptor
+        ):
+            return True
+        return False
+
+    def score_dihedral_angles(self, residue, anglenum, angles):
+        """Assign scores to several values of a dihedral angle at once.
+
+        Equivalent to calling :func:`set_dihedral_angle` followed by
+        :func:`score_dihedral_angle` for each angle, but the rotated
+        coordinates of the moveable atoms are generated and scored against
+        their (fixed) environment as arrays; the atoms are not moved.
+
+        :param residue:  residue with dihedral angles to score
+        :type residue:  Residue
+        :param anglenum:  specific dihedral angle index
+        :type anglenum:  int
+        :param angles:  the dihedral angle values to score
+        :type angles:  [float]
+        :return:  score for each dihedral angle value
+        :rtype:  numpy.ndarray
+        :raises ValueError:  if dihedral atoms are missing
+        """
+        profiling.count("dihedral_trials", len(angles))
+        scores = np.zeros(len(angles))
+        atomnames = residue.reference.dihedrals[anglenum].split()
+        coordlist = []
+        for atomname in atomnames:
+            if residue.has_atom(atomname):
+                coordlist.append(residue.get_atom(atomname).coords)
+            else:
+                raise ValueError("Error occurred while trying to debump!")
+        moveable = [
+            residue.get_atom(name)
+            for name in residue.get_moveable_names(atomnames[2])
+        ]
+        if not moveable:
+            return scores
+        origin = np.asarray(coordlist[1], dtype=float)
+        rotations = quat.qchichange_matrices(
+            util.subtract(coordlist[2], coordlist[1]),
+            np.asarray(angles, dtype=float) - residue.dihedrals[anglenum],
+        )
+        relative = struct.get_coordinates(moveable) - origin
+        # Rotated coordinates with shape (angles, moveable atoms, 3)
+        movecoords = np.einsum("mk,akj->amj", relative, rotations) + origin
+        movecells = cells.cell_indices(movecoords, self.cells.cellsize)
+        # Fixed environment: every atom that can come within the largest
+        # cutoff of a moveable atom during the rotation
+        max_cutoff = 2.0 * max(BUMP_HEAVY_SIZE, BUMP_HYDROGEN_SIZE)
+        reach = np.linalg.norm(relative, axis=1)
+        moveable_ids = {id(atom) for atom in moveable}
+        env = []
+        env_ids = set()
+        for index in self.cells.query_radius(
+            origin, reach.max() + max_cutoff
+        ).tolist():
+            atom = self.cells.atoms[index]
+            if atom.cell is None or id(atom) in moveable_ids:
+                continue
+            if id(atom) not in env_ids:
+                env_ids.add(id(atom))
+                env.append(atom)
+        env_coords = struct.get_coordinates(env)
+        env_cells = (
+            np.array([atom.cell for atom in env], dtype=np.int64).reshape(
+                -1, 3
+            )
+            // self.cells.cellsize
+        )
+        env_reach = np.linalg.norm(env_coords - origin, axis=1)
+        # Build the list of (moveable atom, close atom) pairs to check
+        pair_atom = []
+        pair_env = []
+        pair_move = []
+        pair_cutoff = []
+        for imove, atom in enumerate(moveable):
+            atom_size = (
+                BUMP_HYDROGEN_SIZE if atom.is_hydrogen else BUMP_HEAVY_SIZE
+            )
+            candidates = np.flatnonzero(
+                np.abs(env_reach - reach[imove]) < max_cutoff
+            ).tolist()
+            for ienv in candidates + [-1 - i for i in range(len(moveable))]:
+                if ienv >= 0:
+                    closeatom = env[ienv]
+                else:
+                    closeatom = moveable[-1 - ienv]
+                    if closeatom is atom:
+                        continue
+                if self.is_bump_exempt(atom, closeatom):
+                    continue
+                other_size = (
+                    BUMP_HYDROGEN_SIZE
+                    if closeatom.is_hydrogen
+                    else BUMP_HEAVY_SIZE
+                )
+                pair_atom.append(imove)
+                pair_env.append(max(ienv, 0))
+                pair_move.append(-1 - ienv if ienv < 0 else -1)
+                pair_cutoff.append(atom_size + other_size)
+        if not pair_atom:
+            return scores
+        pair_atom = np.array(pair_atom)
+        pair_move = np.array(pair_move)
+        is_moving = pair_move >= 0
+        pair_cutoff = np.array(pair_cutoff)
+        # Positions and cells of the close atoms with shape (angles, pairs, 3)
+        other_coords = np.where(
+            is_moving[np.newaxis, :, np.newaxis],
+            movecoords[:, pair_move],
+            env_coords[pair_env][np.newaxis] if env else 0.0,
+        )
+        other_cells = np.where(
+            is_moving[np.newaxis, :, np.newaxis],
+            movecells[:, pair_move],
+            env_cells[pair_env][np.newaxis] if env else 0,
+        )
+        dist = np.linalg.norm(movecoords[:, pair_atom] - other_coords, axis=2)
+        # Only atoms in neighboring cells are considered nearby
+        neighbors = np.all(
+            np.abs(movecells[:, pair_atom] - other_cells) <= 1, axis=2
+        )
+        overlap = np.where(
+            neighbors & (dist < pair_cutoff), pair_cutoff - dist, 0.0
+        )
+        return overlap.sum(axis=1)
+
     def set_dihedral_angle(self, residue, anglenum, angle):
         """Rotate a residue about a given angle.
 
@@ -445,13 +629,10 @@ class Debump:
             atom = residue.get_atom(name)
             movecoords.append(util.subtract(atom.coords, coordlist[1]))
         newcoords = quat.qchichange(initcoords, movecoords, diff)
-        for iatom, atom_name in enumerate(moveablenames):
-            atom = residue.get_atom(atom_name)
-            self.cells.remove_cell(atom)
-            atom.x = newcoords[iatom][0] + coordlist[1][0]
-            atom.y = newcoords[iatom][1] + coordlist[1][1]
-            atom.z = newcoords[iatom][2] + coordlist[1][2]
-            self.cells.add_cell(atom)
+        moved = [residue.get_atom(name) for name in moveablenames]
+        newcoords = np.array(newcoords, dtype=float).reshape(-1, 3)
+        struct.set_coordinates(moved, newcoords + coordlist[1])
+        self.cells.move_atoms(moved)
         # Set the new angle
         coordlist = []
         for atomname in atomnames:
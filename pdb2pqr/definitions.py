@@ -10,6 +10,7 @@ import logging
 from xml import sax
 from . import structures
 from . import residue
+from . import utilities as util
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -199,6 +200,7 @@ class Definition:
             for dihedral in patch.dihedrals:
                 patch_residue.dihedrals.append(dihedral)
             # Point at the new reference
+            patch_residue.reference_distances = {}
             self.map[newname] = patch_residue
             # Store the patch
             self.patches[newname] = patch
@@ -240,6 +242,7 @@ class DefinitionResidue(residue.Residue):
         self.dihedrals = []
         self.map = {}
         self.altnames = {}
+        self.reference_distances = {}
 
     def __str__(self):
         text = f"{self.name}\n"
@@ -253,6 +256,34 @@ class DefinitionResidue(residue.Residue):
         text += f"\t{self.altnames}\n"
         return text
 
+    def get_reference_distances(self, atomnames):
+        """Get the number of bonds between atoms and the CA atom.
+
+        The distances are found with a breadth-first search of the bonds
+        between the given atoms and are cached for each set of atom names.
+
+        :param atomnames:  names of the atoms of a residue
+        :type atomnames:  frozenset
+        :return:  number of bonds to the CA atom for the atoms that are
+            connected to it
+        :rtype:  {str: int}
+        """
+        distances = self.reference_distances.get(atomnames)
+        if distances is None:
+            graph = {name: [] for name in atomnames}
+            for name in atomnames:
+                if name not in self.map:
+                    continue
+                for bond in self.map[name].bonds:
+                    if bond in graph:
+                        graph[name].append(bond)
+                        graph[bond].append(name)
+            distances = {}
+            if "CA" in graph:
+                distances = util.shortest_path_lengths(graph, "CA")
+            self.reference_distances[atomnames] = distances
+        return distances
+
     def get_nearest_bonds(self, atomname):
         """Get bonded atoms near a given atom.
 
@@ -298,9 +329,9 @@ class DefinitionAtom(structures.Atom):
         :type z:  float
         """
         self.name = name
-        self.x = x
-        self.y = y
-        self.z = z
+        self._store = None
+        self._index = None
+        self._row = [x, y, z]
         if name is None:
             self.name = ""
         if x is None:
@@ -9,7 +9,9 @@ forcefield is considered a chain of residues of atoms.
 import re
 import logging
 from xml import sax
+import numpy as np
 from . import io
+from . import cache
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -175,9 +177,16 @@ class Forcefield:
     forcefield - all transformations are done within.
     """
 
-    def __init__(self, ff_name, definition, userff, usernames=None):
+    def __init__(
+        self, ff_name, definition, userff, usernames=None, use_cache=True
+    ):
         """Initialize the class by parsing the definition file.
 
+        The parsed parameters (including the name mappings) are stored in the
+        on-disk cache (see :mod:`cache`) and reused as long as the parameter
+        and names files, topology definitions, and PDB2PQR version do not
+        change.
+
         .. todo:: Why are files being loaded so deep in this function?
 
         :param ff_name: the name of the forcefield (can be None)
@@ -188,62 +197,83 @@ class Forcefield:
         :type userff:  str
         :param usernames:  path to user-defined atom/residue names file
         :type usernames:  str
+        :param use_cache:  use the on-disk cache of parsed forcefields
+        :type use_cache:  bool
         :raises ValueError:  if invalid force field names specified
         """
         self.map = {}
+        self.table = None
         self.name = str(ff_name)
         defpath = ""
         defpath = io.test_dat_file(ff_name) if userff is None else userff
         with open(defpath, "rt", encoding="utf-8") as ff_file:
-            lines = ff_file.readlines()
-            for line in lines:
-                if not line.startswith("#"):
-                    fields = line.split()
-                    if fields == []:
-                        continue
-                    try:
-                        resname = fields[0]
-                        atomname = fields[1]
-                        charge = float(fields[2])
-                        radius = float(fields[3])
-                    except ValueError:
-                        txt = (
-                            "Unable to recognize user-defined forcefield file"
-                        )
-                        txt += f" {defpath}!" if defpath != "" else "!"
-                        txt += " Please use a valid parameter file."
-                        raise ValueError(txt)
-                    try:
-                        group = fields[4]
-                        atom = ForcefieldAtom(
-                            atomname, charge, radius, resname, group
-                        )
-                    except IndexError:
-                        atom = ForcefieldAtom(
-                            atomname, charge, radius, resname
-                        )
-
-                    my_residue = self.get_residue(resname)
-                    if my_residue is None:
-                        my_residue = ForcefieldResidue(resname)
-                        self.map[resname] = my_residue
-                    my_residue.add_atom(atom)
-        # Now parse the XML file, associating with FF objects -
+            ff_text = ff_file.read()
+        # Now find the XML file, associating with FF objects -
         # This is not necessary (if canonical names match ff names)
         try:
-            defpath = io.test_names_file(ff_name)
+            names_defpath = io.test_names_file(ff_name)
         except FileNotFoundError:
-            defpath = None
+            names_defpath = None
         if usernames:
             names_path = usernames
-        elif defpath:
-            names_path = defpath
+        elif names_defpath:
+            names_path = names_defpath
         else:
             raise ValueError("Unable to identify .names file.")
+        with open(names_path, "rt", encoding="utf-8") as namesfile:
+            names_text = namesfile.read()
+        use_cache = use_cache and cache.is_enabled()
+        if use_cache:
+            key = cache.get_key(ff_text, names_text, *sorted(definition.map))
+            cached = cache.load("forcefields", key)
+            if isinstance(cached, tuple) and len(cached) == 2:
+                self.map, self.table = cached
+                return
+        self.parse_dat(ff_text, defpath)
         handler = ForcefieldHandler(self.map, definition.map)
         sax.make_parser()
-        with open(names_path, "rt", encoding="utf-8") as namesfile:
-            sax.parseString(namesfile.read(), handler)
+        sax.parseString(names_text, handler)
+        self.table = ForcefieldTable(self.map)
+        if use_cache:
+            cache.store("forcefields", key, (self.map, self.table))
+
+    def parse_dat(self, ff_text, defpath):
+        """Parse forcefield parameters in DAT format into the map.
+
+        :param ff_text:  contents of the DAT file
+        :type ff_text:  str
+        :param defpath:  path to the DAT file (for error messages)
+        :type defpath:  str
+        :raises ValueError:  if the file cannot be parsed
+        """
+        for line in ff_text.splitlines():
+            if not line.startswith("#"):
+                fields = line.split()
+                if fields == []:
+                    continue
+                try:
+                    resname = fields[0]
+                    atomname = fields[1]
+                    charge = float(fields[2])
+                    radius = float(fields[3])
+                except ValueError:
+                    txt = "Unable to recognize user-defined forcefield file"
+                    txt += f" {defpath}!" if defpath != "" else "!"
+                    txt += " Please use a valid parameter file."
+                    raise ValueError(txt)
+                try:
+                    group = fields[4]
+                    atom = ForcefieldAtom(
+                        atomname, charge, radius, resname, group
+                    )
+                except IndexError:
+                    atom = ForcefieldAtom(atomname, charge, radius, resname)
+
+                my_residue = self.get_residue(resname)
+                if my_residue is None:
+                    my_residue = ForcefieldResidue(resname)
+                    self.map[resname] = my_residue
+                my_residue.add_atom(atom)
 
     def has_residue(self, resname):
         """Check if the residue name is in the map or not.
@@ -957,6 +987,51 @@ class Forcefield:
         return resname, atomname
 
 
+class ForcefieldTable:
+    """Dense lookup table of forcefield parameters.
+
+    Every (residue name, atom name) pair in a forcefield map is assigned an
+    index into flat arrays of charges and radii and lists of forcefield names
+    so that parameters for many atoms can be gathered at once.
+    Names that point to the same :class:`ForcefieldAtom` share an index.
+    """
+
+    def __init__(self, map_):
+        """Initialize the table.
+
+        :param map_:  forcefield map of residue names to residues
+        :type map_:  {str: ForcefieldResidue}
+        """
+        self.index = {}
+        atoms = []
+        atom_indices = {}
+        for resname, residue in map_.items():
+            for atomname, atom in residue.atoms.items():
+                iatom = atom_indices.get(id(atom))
+                if iatom is None:
+                    iatom = len(atoms)
+                    atom_indices[id(atom)] = iatom
+                    atoms.append(atom)
+                self.index[(resname, atomname)] = iatom
+        self.charges = np.array([atom.charge for atom in atoms], dtype=float)
+        self.radii = np.array([atom.radius for atom in atoms], dtype=float)
+        self.resnames = [atom.resname for atom in atoms]
+        self.atomnames = [atom.name for atom in atoms]
+
+    def lookup(self, keys):
+        """Get the table indices for several (residue name, atom name) pairs.
+
+        :param keys:  (residue name, atom name) pairs
+        :type keys:  [(str, str)]
+        :return:  array of indices, with -1 for pairs not in the table
+        :rtype:  numpy.ndarray
+        """
+        get = self.index.get
+        return np.fromiter(
+            (get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+
 class ForcefieldResidue:
     """ForcefieldResidue class
 
@@ -12,14 +12,18 @@ This is an module for hydrogen optimization routines.
 """
 __author__ = "Todd Dolinsky, Jens Erik Nielsen, Yong Huang, Nathan Baker"
 import logging
+import multiprocessing
+import numpy as np
 from xml import sax
 from .. import io
 from .. import aa
 from .. import cells
 from .. import definitions as defns
+from .. import profiling
 from .. import utilities as util
 from .. import quatfit as quat
 from ..config import HYD_DEF_PATH
+from ..structures import Atom, get_attributes, set_attributes
 from . import structures
 from .structures import HydrogenConformation, HydrogenDefinition
 from .structures import HydrogenHandler, PotentialBond
@@ -61,6 +65,212 @@ TITRATION_DICT = {
 }
 
 
+#: Maximum distance (in Angstroms) of atoms added by the hydrogen
+#: optimization from the atoms they are bonded to (see
+#: :func:`HydrogenRoutines.group_networks`)
+ADDED_ATOM_RANGE = 1.5
+
+#: Atom attributes that refer to other objects and are not copied from
+#: worker processes (see :func:`get_residue_state`); coordinates are
+#: copied separately
+ATOM_LINKS = [
+    "bonds",
+    "reference",
+    "residue",
+    "cell",
+    "_store",
+    "_index",
+    "_row",
+]
+
+# State shared with forked network optimization workers; see
+# HydrogenRoutines.optimize_networks_parallel()
+_NETWORK_JOB = {}
+
+
+def cell_offsets(layers):
+    """Get the integer offsets of all cells within ``layers`` cells.
+
+    :param layers:  number of neighboring cells in each direction
+    :type layers:  int
+    :return:  (N, 3) array of cell index offsets
+    :rtype:  numpy.ndarray
+    """
+    steps = np.arange(-layers, layers + 1)
+    grid = np.meshgrid(steps, steps, steps, indexing="ij")
+    return np.stack(grid, axis=-1).reshape(-1, 3)
+
+
+def changing_atoms(obj):
+    """Get the atoms that optimizing a residue may add, move, or modify.
+
+    These are the optimizeable donors and acceptors, the flippable atoms,
+    and the hydrogens and lone pairs bonded to them.
+    Atoms added later are bonded to these atoms.
+
+    :param obj:  optimization object
+    :type obj:  optimize.Optimize
+    :return:  atoms of the residue
+    :rtype:  [Atom]
+    """
+    residue = obj.residue
+    atoms = list(obj.atomlist)
+    for atom in residue.atoms:
+        if atom.name.endswith("FLIP") or residue.has_atom(f"{atom.name}FLIP"):
+            atoms.append(atom)
+    atoms += [
+        bondatom
+        for atom in atoms
+        for bondatom in atom.bonds
+        if bondatom.is_hydrogen or bondatom.name.startswith("LP")
+    ]
+    return atoms
+
+
+def get_residue_state(residue, original_atoms, residue_index):
+    """Describe the atoms of a residue after hydrogen optimization.
+
+    Atoms are described by their attribute values; atoms that were already
+    present before the optimization are identified by their position in
+    ``original_atoms`` and bonds by the position of the bonded atom in the
+    residue or, for bonds to other residues, by residue position and atom
+    name.
+
+    :param residue:  optimized residue
+    :type residue:  Residue
+    :param original_atoms:  atoms of the residue before the optimization
+    :type original_atoms:  [Atom]
+    :param residue_index:  map from residues to their positions in the
+        biomolecule
+    :type residue_index:  {Residue: int}
+    :raises ValueError:  if an atom created by the optimization is bonded to
+        another residue or an atom reference cannot be described by name
+    :return:  residue state for :func:`set_residue_state`
+    :rtype:  dict
+    """
+    origins = {atom: iatom for iatom, atom in enumerate(original_atoms)}
+    positions = {atom: iatom for iatom, atom in enumerate(residue.atoms)}
+    atoms = []
+    for atom in residue.atoms:
+        origin = origins.get(atom)
+        bonds = []
+        for bondatom in atom.bonds:
+            if bondatom in positions:
+                bonds.append((None, positions[bondatom]))
+            elif origin is None:
+                raise ValueError(
+                    f"New atom {atom.name} in {residue} is bonded to "
+                    f"{bondatom.name} in {bondatom.residue}."
+                )
+            else:
+                bonds.append(
+                    (residue_index[bondatom.residue], bondatom.name)
+                )
+        values = {
+            name: value
+            for name, value in get_attributes(atom).items()
+            if name not in ATOM_LINKS
+        }
+        values["coords"] = atom.coords
+        reference = atom.reference
+        if reference is not None:
+            if residue.reference.map.get(reference.name) is not reference:
+                raise ValueError(
+                    f"Atom {atom.name} in {residue} has a reference that "
+                    "is not part of the residue definition."
+                )
+            reference = reference.name
+        atoms.append((origin, values, reference, bonds))
+    values = {
+        name: value
+        for name, value in get_attributes(residue).items()
+        if isinstance(value, (str, int, float, bool, type(None)))
+    }
+    return {
+        "atoms": atoms,
+        "map": [(name, positions[atom]) for name, atom in residue.map.items()],
+        "values": values,
+    }
+
+
+def set_residue_state(residue, state, residues):
+    """Restore the atoms of a residue from a :func:`get_residue_state`
+    description.
+
+    :param residue:  residue in its state before the optimization
+    :type residue:  Residue
+    :param state:  residue state from :func:`get_residue_state`
+    :type state:  dict
+    :param residues:  residues of the biomolecule
+    :type residues:  [Residue]
+    """
+    original_atoms = list(residue.atoms)
+    atoms = []
+    for origin, values, _, _ in state["atoms"]:
+        if origin is None:
+            atom = Atom()
+            atom.residue = residue
+        else:
+            atom = original_atoms[origin]
+        values = dict(values)
+        coords = values.pop("coords")
+        set_attributes(atom, values)
+        atom.coords = coords
+        atoms.append(atom)
+    # Remove deleted atoms from the bonds of other residues' atoms
+    for atom in set(original_atoms).difference(atoms):
+        for bondatom in atom.bonds:
+            if atom in bondatom.bonds:
+                bondatom.bonds.remove(atom)
+        if atom.coordinate_store is not None:
+            atom.coordinate_store.detach([atom])
+    # Keep new atoms with the coordinates of the residue
+    stores = {atom.coordinate_store for atom in original_atoms}
+    if len(stores) == 1 and None not in stores:
+        stores.pop().attach(atoms)
+    for atom, (_, _, reference, bonds) in zip(atoms, state["atoms"]):
+        if reference is not None:
+            reference = residue.reference.map[reference]
+        atom.reference = reference
+        atom.bonds = [
+            atoms[position]
+            if iresidue is None
+            else residues[iresidue].get_atom(position)
+            for iresidue, position in bonds
+        ]
+    residue.atoms[:] = atoms
+    residue.atoms_changed()
+    residue.map = {name: atoms[position] for name, position in state["map"]}
+    set_attributes(residue, state["values"])
+
+
+def optimize_network_group(igroup):
+    """Optimize a group of hydrogen bond networks in a forked worker.
+
+    :param igroup:  index of the group in the shared job state
+    :type igroup:  int
+    :return:  list of (residue position, residue state) pairs for the
+        residues of the group
+    :rtype:  [(int, dict)]
+    """
+    routines = _NETWORK_JOB["routines"]
+    networks = _NETWORK_JOB["groups"][igroup]
+    residue_index = _NETWORK_JOB["residue_index"]
+    residues = [obj.residue for network in networks for obj in network]
+    original_atoms = {residue: list(residue.atoms) for residue in residues}
+    for network in networks:
+        routines.optimize_network(network)
+    return [
+        (
+            residue_index[residue],
+            get_residue_state(
+                residue, original_atoms[residue], residue_index
+            ),
+        )
+        for residue in residues
+    ]
+
+
 def create_handler(hyd_path=HYD_DEF_PATH):
     """Create and populate a hydrogen handler.
 
@@ -96,6 +306,7 @@ class HydrogenRoutines:
         self.biomolecule = debumper.biomolecule
         self.optlist = []
         self.atomlist = []
+        self.atomset = set()
         self.resmap = {}
         self.hydrodefs = []
         self.map = handler.map
@@ -390,7 +601,7 @@ class HydrogenRoutines:
                 self.resmap[residue] = myobj
         _LOGGER.debug("Done.")
 
-    def optimize_hydrogens(self):
+    def optimize_hydrogens(self, num_procs=1):
         """The main driver for the optimization.
 
         .. note::
@@ -400,8 +611,10 @@ class HydrogenRoutines:
            Remove hard-coded :makevar:`progress` threshold and increment
            values.
 
-        .. todo::
-           This function needs to be simplified.
+        :param num_procs:  number of worker processes for optimizing
+            independent groups of hydrogen bond networks (see
+            :func:`group_networks`)
+        :type num_procs:  int
         """
         _LOGGER.debug("Optimization progress:")
         optlist = self.optlist
@@ -412,10 +625,23 @@ class HydrogenRoutines:
         _LOGGER.debug("  Detecting potential hydrogen bonds")
         progress = 0.0
         increment = 1.0 / len(optlist)
+        cells_ = self.debumper.cells
+        self.atomset = set(self.atomlist)
+        queryatoms = [atom for obj in optlist for atom in obj.atomlist]
+        query, nearindex = cells_.get_near_pairs(queryatoms)
+        bounds = np.searchsorted(query, np.arange(len(queryatoms) + 1))
+        iquery = 0
         for obj in optlist:
-            connectivity[obj] = []
+            # Ordered set of connected objects
+            connectivity[obj] = {}
             for atom in obj.atomlist:
-                closeatoms = self.debumper.cells.get_near_cells(atom)
+                closeatoms = [
+                    cells_.atoms[index]
+                    for index in nearindex[
+                        bounds[iquery] : bounds[iquery + 1]
+                    ].tolist()
+                ]
+                iquery += 1
                 for closeatom in closeatoms:
                     # Conditions for continuing
                     if atom.residue == closeatom.residue:
@@ -435,10 +661,9 @@ class HydrogenRoutines:
                         # Store the potential bond
                         obj.hbonds.append(hbond)
                         # Keep track of connectivity
-                        if closeatom in self.atomlist:
+                        if closeatom in self.atomset:
                             closeobj = self.resmap[closeatom.residue]
-                            if closeobj not in connectivity[obj]:
-                                connectivity[obj].append(closeobj)
+                            connectivity[obj][closeobj] = None
             progress += increment
             while progress >= 0.0499:
                 progress -= 0.05
@@ -452,111 +677,247 @@ class HydrogenRoutines:
                     f"{obj.residue} has no nearby partners - fixing."
                 )
                 obj.finalize()
-        # Determine the distinct networks
+        # Determine the distinct networks; the potential bonds are
+        # symmetric, so the networks are the connected groups of objects
+        components = util.DisjointSet(optlist)
+        for obj, closeobjs in connectivity.items():
+            for closeobj in closeobjs:
+                components.union(obj, closeobj)
         networks = []
-        seen = []
+        seen = set()
         for obj1 in optlist:
             if obj1.residue.fixed:
                 continue
-            if obj1 in seen:
+            root = components.find(obj1)
+            if root in seen:
                 continue
-            network = util.analyze_connectivity(connectivity, obj1)
-            for obj2 in network:
-                if obj2 not in seen:
-                    seen.append(obj2)
-            networks.append(network)
-        # Initialize the output progress
+            seen.add(root)
+            # Breadth-first order sets the order of optimization
+            networks.append(util.analyze_connectivity(connectivity, obj1))
+        profiling.count("hbond_networks", len(networks))
         if len(networks) > 0:
             _LOGGER.debug("Optimizing hydrogen bonds")
-            progress = 0.0
-            increment = 1.0 / len(networks)
-        # Work on the networks
+        if num_procs > 1 and len(networks) > 1:
+            self.optimize_networks_parallel(networks, num_procs)
+            return
         for network in networks:
-            txt = ""
-            for obj in network:
-                txt += f"{obj}, "
-            _LOGGER.debug(f"Starting network {txt[:-2]}")
-            #  FIRST:  Only optimizeable to backbone atoms
-            _LOGGER.debug("* Optimizeable to backbone *")
-            hbondmap = {}
-            for obj in network:
-                for hbond in obj.hbonds:
-                    if hbond.atom2 not in self.atomlist:
-                        hbondmap[hbond] = hbond.dist
-            hbondlist = util.sort_dict_by_value(hbondmap)
-            hbondlist.reverse()
-            for hbond in hbondlist:
-                atom = hbond.atom1
-                atom2 = hbond.atom2
-                obj = self.resmap[atom.residue]
-
-                if atom.residue.fixed:
-                    continue
-                if atom.hdonor:
-                    obj.try_donor(atom, atom2)
-                if atom.hacceptor:
-                    obj.try_acceptor(atom, atom2)
-            # SECOND:  Non-dual water Optimizeable to Optimizeable
-            _LOGGER.debug("* Optimizeable to optimizeable *")
-            hbondmap = {}
-            seenlist = []
-            for obj in network:
-                for hbond in obj.hbonds:
-                    if hbond.atom2 in self.atomlist:
-                        if not isinstance(hbond.atom1.residue, aa.WAT):
-                            if not isinstance(hbond.atom2.residue, aa.WAT):
-                                # Only get one hbond pair
-                                if (hbond.atom2, hbond.atom1) not in seenlist:
-                                    hbondmap[hbond] = hbond.dist
-                                    seenlist.append((hbond.atom1, hbond.atom2))
-            hbondlist = util.sort_dict_by_value(hbondmap)
-            hbondlist.reverse()
-            for hbond in hbondlist:
-                atom = hbond.atom1
-                atom2 = hbond.atom2
-                obj1 = self.resmap[atom.residue]
-                obj2 = self.resmap[atom2.residue]
-                # Atoms may no longer exist if already optimized
-                if not atom.residue.has_atom(atom.name):
-                    continue
-                if not atom2.residue.has_atom(atom2.name):
-                    continue
-                res = 0
-                if atom.hdonor and atom2.hacceptor:
-                    res = obj1.try_both(atom, atom2, obj2)
-                if atom.hacceptor and atom2.hdonor and res == 0:
-                    obj2.try_both(atom2, atom, obj1)
-            # THIRD:  All water-water residues
-            _LOGGER.debug("* Water to Water *")
-            hbondmap = {}
-            seenlist = []
-            for obj in network:
-                for hbond in obj.hbonds:
-                    residue = hbond.atom1.residue
-                    if isinstance(residue, aa.WAT):
-                        if isinstance(hbond.atom2.residue, aa.WAT):
-                            if (hbond.atom2, hbond.atom1) not in seenlist:
+            self.optimize_network(network)
+
+    def optimize_network(self, network):
+        """Optimize the hydrogen bonds of a single network.
+
+        :param network:  connected optimization objects (see
+            :func:`optimize_hydrogens`)
+        :type network:  list
+        """
+        txt = ""
+        for obj in network:
+            txt += f"{obj}, "
+        _LOGGER.debug(f"Starting network {txt[:-2]}")
+        #  FIRST:  Only optimizeable to backbone atoms
+        _LOGGER.debug("* Optimizeable to backbone *")
+        hbondmap = {}
+        for obj in network:
+            for hbond in obj.hbonds:
+                if hbond.atom2 not in self.atomset:
+                    hbondmap[hbond] = hbond.dist
+        hbondlist = util.sort_dict_by_value(hbondmap)
+        hbondlist.reverse()
+        for hbond in hbondlist:
+            atom = hbond.atom1
+            atom2 = hbond.atom2
+            obj = self.resmap[atom.residue]
+
+            if atom.residue.fixed:
+                continue
+            if atom.hdonor:
+                obj.try_donor(atom, atom2)
+            if atom.hacceptor:
+                obj.try_acceptor(atom, atom2)
+        # SECOND:  Non-dual water Optimizeable to Optimizeable
+        _LOGGER.debug("* Optimizeable to optimizeable *")
+        hbondmap = {}
+        seenpairs = set()
+        for obj in network:
+            for hbond in obj.hbonds:
+                if hbond.atom2 in self.atomset:
+                    if not isinstance(hbond.atom1.residue, aa.WAT):
+                        if not isinstance(hbond.atom2.residue, aa.WAT):
+                            # Only get one hbond pair
+                            if (hbond.atom2, hbond.atom1) not in seenpairs:
                                 hbondmap[hbond] = hbond.dist
-                                seenlist.append((hbond.atom1, hbond.atom2))
-            hbondlist = util.sort_dict_by_value(hbondmap)
-            hbondlist.reverse()
-            for hbond in hbondlist:
-                atom = hbond.atom1
-                atom2 = hbond.atom2
-                obj1 = self.resmap[atom.residue]
-                obj2 = self.resmap[atom2.residue]
-                res = 0
-                if atom.hdonor and atom2.hacceptor:
-                    res = obj1.try_both(atom, atom2, obj2)
-                if atom.hacceptor and atom2.hdonor and res == 0:
-                    obj2.try_both(atom2, atom, obj1)
-            # FOURTH: Complete all residues
-            for obj in network:
-                obj.complete()
-            # STEP 5:  Update progress meter
-            progress += 100.0 * increment
-            while progress >= 5.0:
-                progress -= 5.0
+                                seenpairs.add((hbond.atom1, hbond.atom2))
+        hbondlist = util.sort_dict_by_value(hbondmap)
+        hbondlist.reverse()
+        for hbond in hbondlist:
+            atom = hbond.atom1
+            atom2 = hbond.atom2
+            obj1 = self.resmap[atom.residue]
+            obj2 = self.resmap[atom2.residue]
+            # Atoms may no longer exist if already optimized
+            if not atom.residue.has_atom(atom.name):
+                continue
+            if not atom2.residue.has_atom(atom2.name):
+                continue
+            res = 0
+            if atom.hdonor and atom2.hacceptor:
+                res = obj1.try_both(atom, atom2, obj2)
+            if atom.hacceptor and atom2.hdonor and res == 0:
+                obj2.try_both(atom2, atom, obj1)
+        # THIRD:  All water-water residues
+        _LOGGER.debug("* Water to Water *")
+        hbondmap = {}
+        seenpairs = set()
+        for obj in network:
+            for hbond in obj.hbonds:
+                residue = hbond.atom1.residue
+                if isinstance(residue, aa.WAT):
+                    if isinstance(hbond.atom2.residue, aa.WAT):
+                        if (hbond.atom2, hbond.atom1) not in seenpairs:
+                            hbondmap[hbond] = hbond.dist
+                            seenpairs.add((hbond.atom1, hbond.atom2))
+        hbondlist = util.sort_dict_by_value(hbondmap)
+        hbondlist.reverse()
+        for hbond in hbondlist:
+            atom = hbond.atom1
+            atom2 = hbond.atom2
+            obj1 = self.resmap[atom.residue]
+            obj2 = self.resmap[atom2.residue]
+            res = 0
+            if atom.hdonor and atom2.hacceptor:
+                res = obj1.try_both(atom, atom2, obj2)
+            if atom.hacceptor and atom2.hdonor and res == 0:
+                obj2.try_both(atom2, atom, obj1)
+        # FOURTH: Complete all residues
+        for obj in network:
+            obj.complete()
+
+    def group_networks(self, networks):
+        """Group hydrogen bond networks that can affect each other.
+
+        Optimizing a network adds, moves, and removes atoms (see
+        :func:`changing_atoms`) that the energy and closest-atom searches of
+        other networks can see through the neighboring cells of
+        :attr:`debumper.cells`.
+        Each network occupies the cells within :data:`ADDED_ATOM_RANGE` of
+        its changing atoms; networks that occupy the same or neighboring
+        cells are placed in the same group.
+        Distinct groups do not interact, so optimizing them in any order (or
+        in parallel) gives the same result as the serial loop over all
+        networks.
+
+        :param networks:  networks from :func:`optimize_hydrogens`
+        :type networks:  [list]
+        :return:  groups of networks; networks keep their original order
+            within each group and groups are ordered by their first network
+        :rtype:  [[list]]
+        """
+        cellsize = self.debumper.cells.cellsize
+        near_offsets = cell_offsets(1)
+        # The corners of a box around each atom touch every cell that an
+        # atom added within ADDED_ATOM_RANGE can be placed in
+        corners = ADDED_ATOM_RANGE * near_offsets[
+            np.all(near_offsets != 0, axis=1)
+        ]
+        components = util.DisjointSet(range(len(networks)))
+        owners = {}
+        for inetwork, network in enumerate(networks):
+            coords = np.array(
+                [
+                    atom.coords
+                    for obj in network
+                    for atom in changing_atoms(obj)
+                ],
+                dtype=float,
+            ).reshape(-1, 1, 3)
+            occupied = np.unique(
+                cells.cell_indices(coords + corners, cellsize).reshape(-1, 3),
+                axis=0,
+            )
+            near = cells.pack_cell_indices(
+                occupied[:, np.newaxis, :] + near_offsets
+            )
+            for key in np.unique(near).tolist():
+                owner = owners.get(key)
+                if owner is not None:
+                    components.union(inetwork, owner)
+            for key in cells.pack_cell_indices(occupied).tolist():
+                owners.setdefault(key, inetwork)
+        return [
+            [networks[inetwork] for inetwork in group]
+            for group in components.groups()
+        ]
+
+    def optimize_networks_parallel(self, networks, num_procs):
+        """Optimize independent groups of networks in worker processes.
+
+        Each forked worker inherits the current biomolecule, optimizes whole
+        groups (see :func:`group_networks`), and returns the resulting
+        states of the group's residues, which are then copied back into the
+        biomolecule.
+        The result is identical to optimizing the networks serially.
+        Falls back to serial optimization when there is only one group or
+        worker processes cannot be forked.
+
+        :param networks:  networks from :func:`optimize_hydrogens`
+        :type networks:  [list]
+        :param num_procs:  number of worker processes
+        :type num_procs:  int
+        """
+        groups = self.group_networks(networks)
+        num_procs = min(num_procs, len(groups))
+        if num_procs > 1 and (
+            "fork" not in multiprocessing.get_all_start_methods()
+            or multiprocessing.current_process().daemon
+        ):
+            _LOGGER.warning(
+                "Unable to start hydrogen optimization workers; running "
+                "serially."
+            )
+            num_procs = 1
+        if num_procs < 2:
+            for network in networks:
+                self.optimize_network(network)
+            return
+        _LOGGER.info(
+            f"Optimizing {len(networks)} hydrogen bond networks in "
+            f"{len(groups)} independent groups with {num_procs} processes."
+        )
+        residues = self.biomolecule.residues
+        _NETWORK_JOB.update(
+            routines=self,
+            groups=groups,
+            residue_index={
+                residue: iresidue for iresidue, residue in enumerate(residues)
+            },
+        )
+        # Start with the groups that have the most potential hydrogen bonds
+        num_hbonds = [
+            sum(len(obj.hbonds) for network in group for obj in network)
+            for group in groups
+        ]
+        order = sorted(
+            range(len(groups)), key=lambda igroup: -num_hbonds[igroup]
+        )
+        try:
+            context = multiprocessing.get_context("fork")
+            with context.Pool(num_procs) as pool:
+                group_states = pool.map(optimize_network_group, order, 1)
+        except ValueError as error:
+            # Nothing has been changed here yet
+            _LOGGER.warning(
+                f"Unable to merge optimized networks ({error}); running "
+                "serially."
+            )
+            for network in networks:
+                self.optimize_network(network)
+            return
+        finally:
+            _NETWORK_JOB.clear()
+        for states in group_states:
+            for iresidue, state in states:
+                set_residue_state(residues[iresidue], state, residues)
+        self.debumper.cells.assign_cells(self.biomolecule)
 
     def parse_hydrogen(self, res, topo):
         """Parse a list of lines in order to make a hydrogen definition.
@@ -6,7 +6,7 @@
 .. codeauthor:: Nathan Baker
 """
 import logging
-import math
+import numpy as np
 from .. import quatfit as quat
 from .. import utilities as util
 from ..config import ANGLE_CUTOFF, DIST_CUTOFF
@@ -15,6 +15,216 @@ from ..config import ANGLE_CUTOFF, DIST_CUTOFF
 _LOGGER = logging.getLogger(__name__)
 
 
+#: Energy penalty for H(D)-H(A) bumps
+BUMP_ENERGY = 10.0
+#: H(D)-H(A) distance below which atoms bump (in Angstroms)
+BUMP_DISTANCE = 1.5
+#: Energy of an ideal hydrogen bond
+MAX_HBOND_ENERGY = -10.0
+#: Energy scale of the electrostatic term
+MAX_ELE_ENERGY = -1.0
+#: H(D)-H(A)-A angle cutoff (in degrees)
+DHAHA_ANGLE_CUTOFF = 110.0
+#: H(D)-A distance beyond which only electrostatic energies are counted
+MAX_ELE_DIST = 5.0
+
+
+def pair_coordinates(donor, acceptor):
+    """Get the coordinates needed to score a donor/acceptor pair.
+
+    The coordinates are copied, so the result is a snapshot that does not
+    change when the atoms are moved.
+
+    :param donor:  hydrogen bond donor
+    :type donor:  Atom
+    :param acceptor:  hydrogen bond acceptor
+    :type acceptor:  Atom
+    :return:  donor, acceptor, donor hydrogen, and acceptor hydrogen
+        coordinates
+    :rtype:  (list, list, [list], [list])
+    """
+    return (
+        donor.coords,
+        acceptor.coords,
+        [atom.coords for atom in donor.bonds if atom.is_hydrogen],
+        [atom.coords for atom in acceptor.bonds if atom.is_hydrogen],
+    )
+
+
+def stack_pair_coordinates(pairs):
+    """Stack the coordinates of donor/acceptor pairs into arrays.
+
+    Donors and acceptors have different numbers of hydrogens; missing
+    hydrogens are padded with NaN coordinates.
+
+    :param pairs:  coordinates from :func:`pair_coordinates`
+    :type pairs:  list
+    :return:  (N, 3) donor, (N, 3) acceptor, (N, K, 3) donor hydrogen, and
+        (N, M, 3) acceptor hydrogen coordinate arrays
+    :rtype:  (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    num_pairs = len(pairs)
+    donors = np.array([pair[0] for pair in pairs], dtype=float)
+    acceptors = np.array([pair[1] for pair in pairs], dtype=float)
+    hydrogens = []
+    for index in (2, 3):
+        width = max((len(pair[index]) for pair in pairs), default=0)
+        coords = np.full((num_pairs, width, 3), np.nan)
+        for ipair, pair in enumerate(pairs):
+            if pair[index]:
+                coords[ipair, : len(pair[index])] = pair[index]
+        hydrogens.append(coords)
+    return (
+        donors.reshape(num_pairs, 3),
+        acceptors.reshape(num_pairs, 3),
+        hydrogens[0],
+        hydrogens[1],
+    )
+
+
+def norms(vectors):
+    """Get the lengths of vectors.
+
+    :param vectors:  (..., 3) array of vectors
+    :type vectors:  numpy.ndarray
+    :return:  (...) array of lengths
+    :rtype:  numpy.ndarray
+    """
+    return np.sqrt(np.einsum("...i,...i->...", vectors, vectors))
+
+
+def get_hbond_angles(coords1, coords2, coords3):
+    """Get the angles between triples of coordinates.
+
+    This is the vectorized form of :meth:`Optimize.get_hbond_angle`;
+    angles involving NaN coordinates are NaN.
+
+    :param coords1:  (..., 3) coordinates of the first atoms
+    :type coords1:  numpy.ndarray
+    :param coords2:  (..., 3) coordinates of the second (vertex) atoms
+    :type coords2:  numpy.ndarray
+    :param coords3:  (..., 3) coordinates of the third atoms
+    :type coords3:  numpy.ndarray
+    :return:  angles in degrees
+    :rtype:  numpy.ndarray
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vec1 = coords3 - coords2
+        vec2 = coords1 - coords2
+        norm1 = vec1 / norms(vec1)[..., np.newaxis]
+        norm2 = vec2 / norms(vec2)[..., np.newaxis]
+        # If normalized, values outside [-1, 1] are due to rounding error
+        dotted = np.clip(np.einsum("...i,...i->...", norm1, norm2), -1.0, 1.0)
+        return np.abs(np.arccos(dotted)) * 180.0 / np.pi
+
+
+def find_hbonds(donors, acceptors, donor_hs, acceptor_hs):
+    """Determine which donor/acceptor pairs are hydrogen bonds.
+
+    This is the vectorized form of :meth:`Optimize.is_hbond`.
+
+    :param donors:  (N, 3) donor coordinates
+    :type donors:  numpy.ndarray
+    :param acceptors:  (N, 3) acceptor coordinates
+    :type acceptors:  numpy.ndarray
+    :param donor_hs:  (N, K, 3) donor hydrogen coordinates (NaN-padded)
+    :type donor_hs:  numpy.ndarray
+    :param acceptor_hs:  (N, M, 3) acceptor hydrogen coordinates
+        (NaN-padded)
+    :type acceptor_hs:  numpy.ndarray
+    :return:  (N) array indicating hydrogen bonds
+    :rtype:  numpy.ndarray
+    """
+    has_acceptor_hs = ~np.isnan(acceptor_hs[..., 0]).all(axis=1)
+    found = np.zeros(len(donors), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for idonor_h in range(donor_hs.shape[1]):
+            donor_h = donor_hs[:, idonor_h]
+            # Check the H(D)-A distance
+            dist = norms(donor_h - acceptors)
+            # Ensure no conflicts if H(A)s are present; as in the scalar
+            # routine, the last H(A) decides
+            flag = ~has_acceptor_hs
+            for iacceptor_h in range(acceptor_hs.shape[1]):
+                acceptor_h = acceptor_hs[:, iacceptor_h]
+                hdist = norms(donor_h - acceptor_h)
+                angle = get_hbond_angles(donor_h, acceptor_h, acceptors)
+                flag = np.where(
+                    np.isnan(acceptor_h[:, 0]),
+                    flag,
+                    (hdist >= BUMP_DISTANCE) & (angle < DHAHA_ANGLE_CUTOFF),
+                )
+            # Check the A-D-H(D) angle
+            angle = get_hbond_angles(acceptors, donors, donor_h)
+            found |= (dist <= DIST_CUTOFF) & flag & (angle <= ANGLE_CUTOFF)
+    return found
+
+
+def get_pair_energies(donors, acceptors, donor_hs, acceptor_hs):
+    """Get the energies of donor/acceptor pairs.
+
+    This is the vectorized form of :meth:`Optimize.get_pair_energy`; the
+    terms of each energy are added in the same order.
+    All pairs are treated as donor/acceptor pairs (see
+    :meth:`Optimize.get_pair_energies`).
+
+    :param donors:  (N, 3) donor coordinates
+    :type donors:  numpy.ndarray
+    :param acceptors:  (N, 3) acceptor coordinates
+    :type acceptors:  numpy.ndarray
+    :param donor_hs:  (N, K, 3) donor hydrogen coordinates (NaN-padded)
+    :type donor_hs:  numpy.ndarray
+    :param acceptor_hs:  (N, M, 3) acceptor hydrogen coordinates
+        (NaN-padded)
+    :type acceptor_hs:  numpy.ndarray
+    :return:  (N) array of energies
+    :rtype:  numpy.ndarray
+    """
+    has_acceptor_hs = ~np.isnan(acceptor_hs[..., 0]).all(axis=1)
+    energies = np.zeros(len(donors))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for idonor_h in range(donor_hs.shape[1]):
+            donor_h = donor_hs[:, idonor_h]
+            present = ~np.isnan(donor_h[:, 0])
+            dist = norms(donor_h - acceptors)
+            electrostatic = (
+                present & (dist > DIST_CUTOFF) & (dist < MAX_ELE_DIST)
+            )
+            energies += np.where(
+                electrostatic, MAX_ELE_ENERGY / (dist * dist), 0.0
+            )
+            hbond = present & ~electrostatic
+            # Assign energies based on angles
+            angle1 = get_hbond_angles(acceptors, donors, donor_h)
+            angleterm = (ANGLE_CUTOFF - angle1) / ANGLE_CUTOFF
+            aligned = hbond & (angle1 <= ANGLE_CUTOFF)
+            # Case 1: Both donor and acceptor hydrogens are present
+            for iacceptor_h in range(acceptor_hs.shape[1]):
+                acceptor_h = acceptor_hs[:, iacceptor_h]
+                exists = ~np.isnan(acceptor_h[:, 0])
+                # Penalize if H(D) is too close to H(A)
+                hdist = norms(donor_h - acceptor_h)
+                bump = hbond & exists & (hdist < BUMP_DISTANCE)
+                energies += np.where(bump, BUMP_ENERGY, 0.0)
+                angle2 = get_hbond_angles(donor_h, acceptor_h, acceptors)
+                angle2 = np.where(
+                    angle2 < DHAHA_ANGLE_CUTOFF,
+                    1.0,
+                    (DHAHA_ANGLE_CUTOFF - angle2) / DHAHA_ANGLE_CUTOFF,
+                )
+                hbond_energy = MAX_HBOND_ENERGY / dist**3 * angleterm * angle2
+                energies += np.where(
+                    aligned & exists & ~bump, hbond_energy, 0.0
+                )
+            # Case 2: Only donor hydrogens are present
+            energies += np.where(
+                aligned & ~has_acceptor_hs,
+                MAX_HBOND_ENERGY / dist**2 * angleterm,
+                0.0,
+            )
+    return energies
+
+
 class Optimize:
     """The holder class for the hydrogen optimization routines.
 
@@ -43,21 +253,13 @@ class Optimize:
         :return:  the angle between the atoms in degrees
         :rtype:  float
         """
-        atom_coords = atom2.coords
-        coords1 = util.subtract(atom3.coords, atom_coords)
-        coords2 = util.subtract(atom1.coords, atom_coords)
-        norm1 = util.normalize(coords1)
-        norm2 = util.normalize(coords2)
-        dotted = util.dot(norm1, norm2)
-        if dotted > 1.0:  # If normalized, this is due to rounding error
-            dotted = 1.0
-        elif dotted < -1.0:  # If normalized, this is due to rounding error
-            dotted = -1.0
-        rad = abs(math.acos(dotted))
-        angle = rad * 180.0 / math.pi
-        if angle > 180.0:
-            angle = 360.0 - angle
-        return angle
+        return float(
+            get_hbond_angles(
+                np.array(atom1.coords, dtype=float),
+                np.array(atom2.coords, dtype=float),
+                np.array(atom3.coords, dtype=float),
+            )
+        )
 
     def is_hbond(self, donor, acc):
         """Determine whether this donor acceptor pair is a hydrogen bond.
@@ -70,49 +272,32 @@ class Optimize:
         :return:  whether this pair is a hydrogen bond
         :rtype:  bool
         """
-        for donorhatom in donor.bonds:
-            if not donorhatom.is_hydrogen:
-                continue
-            # Check the H(D)-A distance
-            dist = util.distance(donorhatom.coords, acc.coords)
-            if dist > DIST_CUTOFF:
-                continue
-            # Ensure no conflicts if H(A)s if present
-            flag = True
-            for acchatom in acc.bonds:
-                if not acchatom.is_hydrogen:
-                    continue
-                flag = False
-                # Check the H(D)-H(A) distance
-                hdist = util.distance(donorhatom.coords, acchatom.coords)
-                if hdist < 1.5:
-                    continue
-                # Check the H(D)-H(A)-A angle
-                angle = self.get_hbond_angle(donorhatom, acchatom, acc)
-                if angle < 110.0:
-                    flag = True
-            if not flag:
-                continue
-            # Check the A-D-H(D) angle
-            angle = self.get_hbond_angle(acc, donor, donorhatom)
-            if angle <= ANGLE_CUTOFF:
-                _LOGGER.debug(f"Found HBOND! {dist:.4f} {angle:.4f}")
-                return True
-        # If we get here, no bond is formed
-        return False
+        return bool(self.find_hbonds([(donor, acc)])[0])
+
+    @staticmethod
+    def find_hbonds(pairs, coords=None):
+        """Determine which of several donor/acceptor pairs are hydrogen bonds.
+
+        :param pairs:  (donor, acceptor) pairs of atoms
+        :type pairs:  [(Atom, Atom)]
+        :param coords:  coordinates of the pairs from
+            :func:`stack_pair_coordinates` (gathered from the atoms if None)
+        :type coords:  tuple
+        :return:  array indicating hydrogen bonds
+        :rtype:  numpy.ndarray
+        """
+        if not pairs:
+            return np.zeros(0, dtype=bool)
+        if coords is None:
+            coords = stack_pair_coordinates(
+                [pair_coordinates(donor, acc) for donor, acc in pairs]
+            )
+        return find_hbonds(*coords)
 
     @staticmethod
     def get_pair_energy(donor, acceptor):
         """Get the energy between two atoms
 
-        .. todo::
-           Lots of code in this function could be accelerated with
-           :mod:`numpy`.
-
-        .. todo::
-           Lots of hard-coded parameters in this function that need to be
-           abstracted out.
-
         :param donor:  the first atom in the pair
         :type donor:  Atom
         :param acceptor:  the second atom in the pair
@@ -120,57 +305,60 @@ class Optimize:
         :return:  the energy of the pair
         :rtype:  float
         """
-        # Initialize some variables
-        bump_energy = 10.0
-        bump_distance = 1.5
-        max_hbond_energy = -10.0
-        max_ele_energy = -1.0
-        adh_angle_cutoff = ANGLE_CUTOFF
-        dhaha_angle_cutoff = 110.0
-        max_dha_dist = DIST_CUTOFF
-        max_ele_dist = 5.0
-        energy = 0.0
-        if not (donor.hdonor and acceptor.hacceptor):
-            return energy
-        # See if hydrogens are presently bonded to the acceptor and donor
-        donorhs = (bond for bond in donor.bonds if bond.is_hydrogen)
-        acceptorhs = [bond for bond in acceptor.bonds if bond.is_hydrogen]
-        for donorhatom in donorhs:
-            dist = util.distance(donorhatom.coords, acceptor.coords)
-            if dist > max_dha_dist and dist < max_ele_dist:
-                energy += max_ele_energy / (dist * dist)
-                continue
-            # Case 1: Both donor and acceptor hydrogens are present
-            for acceptorhatom in acceptorhs:
-                # Penalize if H(D) is too close to H(A)
-                hdist = util.distance(donorhatom.coords, acceptorhatom.coords)
-                if hdist < bump_distance:
-                    energy += bump_energy
-                    continue
-                # Assign energies based on angles
-                angle1 = Optimize.get_hbond_angle(acceptor, donor, donorhatom)
-                if angle1 <= adh_angle_cutoff:
-                    angle2 = Optimize.get_hbond_angle(
-                        donorhatom, acceptorhatom, acceptor
-                    )
-                    if angle2 < dhaha_angle_cutoff:
-                        angle2 = 1.0
-                    else:
-                        angle2 = (
-                            dhaha_angle_cutoff - angle2
-                        ) / dhaha_angle_cutoff
-                    angleterm = (adh_angle_cutoff - angle1) / adh_angle_cutoff
-                    energy += (
-                        max_hbond_energy / pow(dist, 3) * angleterm * angle2
-                    )
-            # Case 2: Only donor hydrogens are present
-            if not acceptorhs:
-                # Assign energies based on A-D-H(D) angle alone
-                angle1 = Optimize.get_hbond_angle(acceptor, donor, donorhatom)
-                if angle1 <= adh_angle_cutoff:
-                    angleterm = (adh_angle_cutoff - angle1) / adh_angle_cutoff
-                    energy += max_hbond_energy / pow(dist, 2) * angleterm
-        return energy
+        return float(Optimize.get_pair_energies([(donor, acceptor)])[0])
+
+    @staticmethod
+    def get_pair_energies(pairs, coords=None):
+        """Get the energies of several pairs of atoms.
+
+        :param pairs:  (donor, acceptor) pairs of atoms
+        :type pairs:  [(Atom, Atom)]
+        :param coords:  coordinates of the pairs from
+            :func:`stack_pair_coordinates` (gathered from the atoms if None)
+        :type coords:  tuple
+        :return:  array of energies (zero unless the first atom of a pair is
+            a donor and the second is an acceptor)
+        :rtype:  numpy.ndarray
+        """
+        active = np.array(
+            [bool(donor.hdonor and acc.hacceptor) for donor, acc in pairs],
+            dtype=bool,
+        )
+        energies = np.zeros(len(pairs))
+        if not active.any():
+            return energies
+        if coords is None:
+            coords = stack_pair_coordinates(
+                [
+                    pair_coordinates(donor, acc)
+                    for (donor, acc), is_active in zip(pairs, active)
+                    if is_active
+                ]
+            )
+        else:
+            coords = [array[active] for array in coords]
+        energies[active] = get_pair_energies(*coords)
+        return energies
+
+    def get_contact_energy(self, atom, closeatoms):
+        """Get the energy of an atom with nearby atoms.
+
+        Each nearby atom is scored both as acceptor and as donor of the atom.
+
+        :param atom:  the atom to score
+        :type atom:  Atom
+        :param closeatoms:  nearby atoms
+        :type closeatoms:  [Atom]
+        :return:  the total energy
+        :rtype:  float
+        """
+        if not closeatoms:
+            return 0.0
+        pairs = [(atom, catom) for catom in closeatoms]
+        pairs += [(catom, atom) for catom in closeatoms]
+        energies = self.get_pair_energies(pairs).reshape(2, -1)
+        # Sum the pair terms in order (numpy.sum would reorder them)
+        return float(np.cumsum(energies[0] + energies[1])[-1])
 
     def make_atom_with_no_bonds(self, atom, closeatom, addname):
         """Create an atom with no bonds.
@@ -319,13 +507,21 @@ class Optimize:
         bestcoords = []
         residue = donor.residue
         pivot = donor.bonds[0]
+        # Record all rotations and score them together
+        coords = []
+        newcoords = []
         for _ in range(72):
             residue.rotate_tetrahedral(pivot, donor, 5.0)
-            if self.is_hbond(donor, acc):
-                energy = self.get_pair_energy(donor, acc)
-                if energy < besten:
-                    bestcoords = newatom.coords
-                    besten = energy
+            coords.append(pair_coordinates(donor, acc))
+            newcoords.append(newatom.coords)
+        pairs = len(coords) * [(donor, acc)]
+        coords = stack_pair_coordinates(coords)
+        hbonds = self.find_hbonds(pairs, coords)
+        energies = self.get_pair_energies(pairs, coords)
+        for ihbond in np.flatnonzero(hbonds):
+            if energies[ihbond] < besten:
+                bestcoords = newcoords[ihbond]
+                besten = energies[ihbond]
         # If a hydrogen bond was made, set at best coordinates
         if bestcoords != []:
             newatom.x = bestcoords[0]
@@ -375,12 +571,18 @@ class Optimize:
             ):
                 the_donorhatom = donorhatom
                 break
+        coords = []
         for _ in range(72):
             residue.rotate_tetrahedral(pivot, acc, 5.0)
-            angle = abs(self.get_hbond_angle(the_donorhatom, acc, newatom))
-            if angle < bestangle:
-                bestangle = angle
-                bestcoords = newatom.coords
+            coords.append(
+                [the_donorhatom.coords, acc.coords, newatom.coords]
+            )
+        coords = np.array(coords, dtype=float)
+        angles = get_hbond_angles(coords[:, 0], coords[:, 1], coords[:, 2])
+        ibest = int(np.argmin(angles))
+        if angles[ibest] < bestangle:
+            bestangle = float(angles[ibest])
+            bestcoords = coords[ibest, 2].tolist()
         # Remove if geometry does not work
         if bestangle > (ANGLE_CUTOFF * 2.0):
             _LOGGER.debug(
@@ -446,20 +648,22 @@ class Optimize:
         besten = 999.99
         bestcoords = []
         residue = donor.residue
-        # Try the first position
+        # Record both positions and score them together
         residue.create_atom(newname, loc1)
-        if self.is_hbond(donor, acc):
-            besten = self.get_pair_energy(donor, acc)
-            bestcoords = loc1
-        # Try the second
+        coords = [pair_coordinates(donor, acc)]
         newatom = residue.get_atom(newname)
         newatom.x = loc2[0]
         newatom.y = loc2[1]
         newatom.z = loc2[2]
-        if self.is_hbond(donor, acc):
-            energy = self.get_pair_energy(donor, acc)
-            if energy < besten:
-                bestcoords = loc2
+        coords.append(pair_coordinates(donor, acc))
+        pairs = 2 * [(donor, acc)]
+        coords = stack_pair_coordinates(coords)
+        hbonds = self.find_hbonds(pairs, coords)
+        energies = self.get_pair_energies(pairs, coords)
+        for ihbond in np.flatnonzero(hbonds):
+            if energies[ihbond] < besten:
+                bestcoords = (loc1, loc2)[ihbond]
+                besten = energies[ihbond]
         # Set at best coords
         if bestcoords != []:
             newatom.x = bestcoords[0]
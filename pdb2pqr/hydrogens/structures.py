@@ -453,14 +453,11 @@ class Alcoholic(optimize.Optimize):
             self.make_atom_with_one_bond_h(atom, addname)
             newatom = residue.get_atom(addname)
             self.routines.cells.add_cell(newatom)
+            # The cells are not updated while rotating
+            closeatoms = self.routines.cells.get_near_cells(atom)
             for _ in range(18):
                 residue.rotate_tetrahedral(pivot, atom, 20.0)
-                closeatoms = self.routines.cells.get_near_cells(atom)
-                energy = 0.0
-                for catom in closeatoms:
-                    energy += self.get_pair_energy(
-                        atom, catom
-                    ) + self.get_pair_energy(catom, atom)
+                energy = self.get_contact_energy(atom, closeatoms)
                 if energy < bestenergy:
                     bestenergy = energy
                     bestcoords = newatom.coords
@@ -475,22 +472,14 @@ class Alcoholic(optimize.Optimize):
             self.routines.cells.add_cell(newatom)
             # Debump residue if necessary by trying the other location
             closeatoms = self.routines.cells.get_near_cells(atom)
-            energy1 = 0.0
-            for catom in closeatoms:
-                energy1 += self.get_pair_energy(
-                    atom, catom
-                ) + self.get_pair_energy(catom, atom)
+            energy1 = self.get_contact_energy(atom, closeatoms)
             # Place at other location
             self.routines.cells.remove_cell(newatom)
             newatom.x = loc2[0]
             newatom.y = loc2[1]
             newatom.z = loc2[2]
             self.routines.cells.add_cell(newatom)
-            energy2 = 0.0
-            for catom in closeatoms:
-                energy2 += self.get_pair_energy(
-                    atom, catom
-                ) + self.get_pair_energy(catom, atom)
+            energy2 = self.get_contact_energy(atom, closeatoms)
             # If this is worse, switch back
             if energy2 > energy1:
                 self.routines.cells.remove_cell(newatom)
@@ -1068,13 +1057,9 @@ class Carboxylic(optimize.Optimize):
         # For each atom, get the closest atom
         bestenergy = 999.99
         for hydatom in self.hlist:
-            energy = 0
             bondedatom = hydatom.bonds[0]
             closeatoms = self.routines.cells.get_near_cells(bondedatom)
-            for catom in closeatoms:
-                energy += self.get_pair_energy(
-                    bondedatom, catom
-                ) + self.get_pair_energy(catom, bondedatom)
+            energy = self.get_contact_energy(bondedatom, closeatoms)
             if energy < bestenergy:
                 bestenergy = energy
                 bestatom = hydatom
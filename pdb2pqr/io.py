@@ -1,26 +1,84 @@
-"""Functions related to reading and writing data."""
+"""Functions related to reading and writing data.
+
+Structure, PQR, PDB, and APBS input files with ``.gz``, ``.bz2``, or ``.xz``
+suffixes are read and written through the matching compression codec (see
+:func:`open_file`); compressed input files without those suffixes are
+recognized by their first bytes.
+"""
+import bz2
+import gzip
 import logging
 import io
+import lzma
+import re
+import warnings
 
 # import argparse
 from collections import Counter
 from pathlib import Path
 from sys import path as sys_path
-import requests
+import numpy as np
 from . import psize
 from . import inputgen
+from . import cache
 from . import cif
 from . import pdb
+from . import remote
 from . import definitions as defns
-from .structures import Atom
+from .structures import Atom, get_coordinates
 from .config import FORCE_FIELDS, TITLE_STR
 from .config import FILTER_WARNINGS_LIMIT, FILTER_WARNINGS
 from .config import AA_DEF_PATH, NA_DEF_PATH, PATCH_DEF_PATH
+from .config import COMPRESSION_SUFFIXES, DX_CHUNK_SIZE
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+#: Compression codecs by file suffix (see :data:`COMPRESSION_SUFFIXES`)
+CODECS = dict(zip(COMPRESSION_SUFFIXES, [gzip, bz2, lzma]))
+#: Compression codecs by the magic bytes at the start of compressed data
+CODEC_MAGIC = {b"\x1f\x8b": gzip, b"BZh": bz2, b"\xfd7zXZ\x00": lzma}
+#: Format of a value in a Cube-format file
+CUBE_VALUE_TEMPLATE = "% -13.5E"
+#: Layout of a formatted Cube value (see :func:`format_cube_values`)
+CUBE_VALUE_DTYPE = np.dtype(
+    [
+        ("sign", "S1"),
+        ("leading", "S4"),
+        ("trailing", "S4"),
+        ("exponent", "S4"),
+        ("space", "S1"),
+    ]
+)
+#: First three significant digits of Cube values (e.g., ``1.23``)
+CUBE_LEADING_DIGITS = np.array(
+    [f"{num // 100}.{num % 100:02d}" for num in range(1000)], dtype="S4"
+)
+#: Last three significant digits of Cube values (e.g., ``456E``)
+CUBE_TRAILING_DIGITS = np.array(
+    [f"{num:03d}E" for num in range(1000)], dtype="S4"
+)
+#: Signs of Cube values
+CUBE_SIGNS = np.array([" ", "-"], dtype="S1")
+#: Offset of exponent zero in :data:`CUBE_EXPONENTS`
+CUBE_EXPONENT_OFFSET = 400
+#: Offset of the zeroth power in :data:`CUBE_SCALES`
+CUBE_SCALE_OFFSET = 310
+#: Powers of ten for scaling Cube values (from 1e-310 to 1e308)
+CUBE_SCALES = 10.0 ** np.arange(-CUBE_SCALE_OFFSET, 309, dtype=float)
+#: Exponents of Cube values (e.g., ``+07`` or ``-123``)
+CUBE_EXPONENTS = np.array(
+    [
+        f"{num:+03d}".ljust(4)
+        for num in range(-CUBE_EXPONENT_OFFSET, CUBE_EXPONENT_OFFSET)
+    ],
+    dtype="S4",
+)
+#: Start of the attributes that follow the data section of a DX-format file
+DX_FOOTER = re.compile(r"^\s*(attribute|object|component)\b", re.MULTILINE)
+
+
 class DuplicateFilter(logging.Filter):
     """Filter duplicate messages."""
 
@@ -46,28 +104,203 @@ class DuplicateFilter(logging.Filter):
         return True
 
 
-def print_biomolecule_atoms(atomlist, chainflag=False, pdbfile=False):
+#: Templates of PQR and PDB atom records; the coordinates, charges, radii,
+#: occupancies, and temperature factors are formatted with their minimum
+#: widths so that records that overflow their columns are longer than
+#: normal (see :func:`format_atoms`)
+PQR_TEMPLATE = "%-6.6s%5d %s%s %-1.1s%4d%s%8.3f%8.3f%8.3f%8.4f%7.4f\n"
+#: PQR atom record template with whitespace between the columns (see
+#: :func:`pdb2pqr.main.format_pqr`)
+PQR_WHITESPACE_TEMPLATE = (
+    "%-6.6s %5d %s %s %-1.1s%4d%s%8.3f %8.3f %8.3f%8.4f%7.4f\n"
+)
+PDB_TEMPLATE = (
+    "%-6.6s%5d %s%s %-1.1s%4d%s%8.3f%8.3f%8.3f%6.2f%6.2f       "
+    "%-4.4s%-2.2s%-2.2s\n"
+)
+
+
+def add_whitespace(line):
+    """Insert whitespace between the columns of a PQR atom record.
+
+    :param line:  PQR atom record
+    :type line:  str
+    :return:  record with whitespace between the columns
+    :rtype:  str
+    """
+    return (
+        line[0:6]
+        + " "
+        + line[6:16]
+        + " "
+        + line[16:38]
+        + " "
+        + line[38:46]
+        + " "
+        + line[46:]
+    )
+
+
+def get_name_field(name):
+    """Get the atom name columns of an atom record.
+
+    :param name:  atom name
+    :type name:  str
+    :return:  four-character atom name field
+    :rtype:  str
+    """
+    if len(name) == 4 or len(name.strip("FLIP")) == 4:
+        return str.ljust(name, 4)[:4]
+    return " " + str.ljust(name, 3)[:3]
+
+
+def get_res_name_field(res_name):
+    """Get the residue name columns of an atom record.
+
+    :param res_name:  residue name
+    :type res_name:  str
+    :return:  four-character residue name field
+    :rtype:  str
+    """
+    if len(res_name) == 4:
+        return str.ljust(res_name, 4)[:4]
+    return " " + str.ljust(res_name, 3)[:3]
+
+
+def get_fields(values, field_function):
+    """Get the fields of a column with few distinct values.
+
+    :param values:  column values
+    :type values:  [str]
+    :param field_function:  function from a value to its field
+    :type field_function:  function
+    :return:  column fields
+    :rtype:  [str]
+    """
+    fields = {value: field_function(value) for value in set(values)}
+    return [fields[value] for value in values]
+
+
+def format_atoms(atomlist, chainflag=False, pdbfile=False, whitespace=False):
+    """Format the PQR or PDB records of atoms.
+
+    The columns of all atoms are gathered first (the coordinates as one
+    array from the coordinate store) and every record is formatted with a
+    single template (:data:`PQR_TEMPLATE`, :data:`PQR_WHITESPACE_TEMPLATE`,
+    or :data:`PDB_TEMPLATE`).
+    The few records with values that overflow their columns are formatted
+    by :meth:`Atom.get_pqr_string` or :meth:`Atom.get_pdb_string` instead,
+    which truncate the values, so that the records always match those
+    methods.
+
+    :param atomlist:  atoms to format
+    :type atomlist:  [Atom]
+    :param chainflag:  flag whether to print chain IDs in PQR records
+    :type chainflag:  bool
+    :param pdbfile:  format PDB records instead of PQR records
+    :type pdbfile:  bool
+    :param whitespace:  insert whitespace between the columns of PQR records
+    :type whitespace:  bool
+    :return:  atom records (with newlines)
+    :rtype:  [str]
+    """
+    atoms = list(atomlist)
+    if not atoms:
+        return []
+    if pdbfile:
+        chainflag = True
+    chain_ids = (
+        [atom.chain_id for atom in atoms]
+        if chainflag
+        else [""] * len(atoms)
+    )
+    xs, ys, zs = get_coordinates(atoms).T.tolist()
+    columns = [
+        [atom.type for atom in atoms],
+        [atom.serial for atom in atoms],
+        get_fields([atom.name for atom in atoms], get_name_field),
+        get_fields([atom.res_name for atom in atoms], get_res_name_field),
+        chain_ids,
+        [atom.res_seq for atom in atoms],
+        get_fields(
+            [atom.ins_code for atom in atoms],
+            lambda ins_code: f"{ins_code}   " if ins_code != "" else "    ",
+        ),
+        xs,
+        ys,
+        zs,
+    ]
+    if pdbfile:
+        template = PDB_TEMPLATE
+        columns += [
+            [atom.occupancy for atom in atoms],
+            [atom.temp_factor for atom in atoms],
+            [atom.seg_id for atom in atoms],
+            [atom.element for atom in atoms],
+            [atom.charge for atom in atoms],
+        ]
+        empty = ("", 0, "    ", "    ", "", 0, "    ") + (0.0,) * 5
+        empty += ("", "", "")
+    else:
+        template = PQR_WHITESPACE_TEMPLATE if whitespace else PQR_TEMPLATE
+        columns += [
+            [
+                0.0 if atom.ffcharge is None else atom.ffcharge
+                for atom in atoms
+            ],
+            [0.0 if atom.radius is None else atom.radius for atom in atoms],
+        ]
+        empty = ("", 0, "    ", "    ", "", 0, "    ") + (0.0,) * 5
+    records = [template % row for row in zip(*columns)]
+    # Every field has a minimum width, so only records with overflowing
+    # columns are longer than an empty record
+    lengths = np.fromiter(map(len, records), dtype=int, count=len(records))
+    for iatom in np.flatnonzero(lengths != len(template % empty)).tolist():
+        atom = atoms[iatom]
+        if pdbfile:
+            record = atom.get_pdb_string()
+        else:
+            record = atom.get_pqr_string(chainflag=chainflag)
+            if whitespace:
+                record = add_whitespace(record)
+        records[iatom] = f"{record}\n"
+    return records
+
+
+def print_biomolecule_atoms(
+    atomlist, chainflag=False, pdbfile=False, whitespace=False
+):
     """Get PDB-format text lines for specified atoms.
 
+    The atoms are renumbered from 1 and the records are formatted in bulk by
+    :func:`format_atoms`.
+
     :param [Atom] atomlist:  the list of atoms to include
     :param bool chainflag:  flag whether to print chainid or not
+    :param bool pdbfile:  flag whether to print PDB records instead of PQR
+        records
+    :param bool whitespace:  insert whitespace between the columns of PQR
+        records; only the atom records are returned, as in the output of
+        :func:`pdb2pqr.main.format_pqr`
     :return:  list of strings, each representing an atom PDB line
     :rtype:  [str]
     """
-    text = []
-    currentchain_id = None
+    atomlist = list(atomlist)
     for iatom, atom in enumerate(atomlist):
-        # Print the "TER" records between chains
-        if currentchain_id is None:
-            currentchain_id = atom.chain_id
-        elif atom.chain_id != currentchain_id:
-            currentchain_id = atom.chain_id
-            text.append("TER\n")
         atom.serial = iatom + 1
-        if pdbfile is True:
-            text.append(f"{atom.get_pdb_string()}\n")
-        else:
-            text.append(f"{atom.get_pqr_string(chainflag=chainflag)}\n")
+    records = format_atoms(atomlist, chainflag, pdbfile, whitespace)
+    if whitespace and not pdbfile:
+        return records
+    # Print the "TER" records between chains
+    chain_ids = [atom.chain_id for atom in atomlist]
+    text = []
+    start = 0
+    for iatom in range(1, len(atomlist)):
+        if chain_ids[iatom] != chain_ids[iatom - 1]:
+            text += records[start:iatom]
+            text.append("TER\n")
+            start = iatom
+    text += records[start:]
     text.append("TER\nEND")
     return text
 
@@ -338,10 +571,12 @@ def dump_apbs(output_pqr, output_path):
     """
     method = "mg-auto"
     size = psize.Psize()
-    size.parse_input(output_pqr)
-    size.run_psize(output_pqr)
+    with open_file(output_pqr) as pqr_file:
+        size.parse_lines(pqr_file)
+    size.set_all()
     input_ = inputgen.Input(output_pqr, size, method, 0, potdx=True)
-    input_.print_input_files(output_path)
+    with open_file(output_path, "wt") as apbs_file:
+        apbs_file.write(str(input_))
 
 
 def test_for_file(name, type_):
@@ -412,32 +647,143 @@ def test_xml_file(name):
     return test_for_file(name, "xml")
 
 
+def detect_compression(data):
+    """Detect the compression codec of data from its first bytes.
+
+    :param data:  start of the data (at least six bytes if available)
+    :type data:  bytes
+    :return:  compression module (:mod:`gzip`, :mod:`bz2`, or :mod:`lzma`)
+        or None for uncompressed data
+    :rtype:  module
+    """
+    for magic, codec in CODEC_MAGIC.items():
+        if data.startswith(magic):
+            return codec
+    return None
+
+
+def get_compression(path, detect=False):
+    """Get the compression codec of a file.
+
+    :param path:  path to the file
+    :type path:  str or Path
+    :param detect:  check the first bytes of an existing file without a
+        compression suffix
+    :type detect:  bool
+    :return:  compression module (:mod:`gzip`, :mod:`bz2`, or :mod:`lzma`)
+        or None for uncompressed files
+    :rtype:  module
+    """
+    path = Path(path)
+    codec = CODECS.get(path.suffix.lower())
+    if codec is None and detect and path.is_file():
+        with open(path, "rb") as data_file:
+            codec = detect_compression(data_file.read(6))
+    return codec
+
+
+def strip_compression_suffix(path):
+    """Remove the compression suffix (if any) from a path.
+
+    :param path:  path to a file
+    :type path:  str or Path
+    :return:  path without the compression suffix (e.g., ``1abc.pdb`` for
+        ``1abc.pdb.gz``)
+    :rtype:  Path
+    """
+    path = Path(path)
+    if path.suffix.lower() in CODECS:
+        return path.with_suffix("")
+    return path
+
+
+def open_file(path, mode="rt", encoding="utf-8"):
+    """Open a plain or compressed file.
+
+    Compressed files are streamed through their codec (see
+    :func:`get_compression`); files opened for reading are also checked for
+    compression by their first bytes.
+
+    :param path:  path to the file
+    :type path:  str or Path
+    :param mode:  file mode, as for :func:`open`
+    :type mode:  str
+    :param encoding:  text encoding (ignored for binary modes)
+    :type encoding:  str
+    :return:  open file object
+    :rtype:  file
+    """
+    if "b" in mode:
+        encoding = None
+    codec = get_compression(path, detect="r" in mode)
+    if codec is None:
+        return open(path, mode, encoding=encoding)
+    if "t" not in mode and "b" not in mode:
+        mode += "t"
+    return codec.open(path, mode, encoding=encoding)
+
+
 def get_pdb_file(name):
     """Obtain a PDB file.
 
     First check the path given on the command line - if that file is not
     available, obtain the file from the PDB webserver at
-    http://www.rcsb.org/pdb/
+    http://www.rcsb.org/pdb/ (or the cache or a mirror; see
+    :mod:`pdb2pqr.remote`)
 
     .. todo::  This should be a context manager (to close the open file).
     .. todo::  Remove hard-coded parameters.
 
-    :param name:  name of PDB file (path) or PDB ID
+    :param name:  name of PDB file (path, possibly compressed; see
+        :func:`open_file`) or PDB ID
     :type name:  str
     :return:  file-like object containing PDB file
     :rtype:  file
     """
     path = Path(name)
     if path.is_file():
-        return open(path, "rt", encoding="utf-8")
+        return open_file(path)
     else:
-        url_path = f"https://files.rcsb.org/download/{path.stem}.pdb"
-        _LOGGER.debug(f"Attempting to fetch PDB from {url_path}")
-        resp = requests.get(url_path)
-        if resp.status_code != 200:
-            errstr = f"Got code {resp.status_code} while retrieving {url_path}"
-            raise IOError(errstr)
-        return io.StringIO(resp.text)
+        path = strip_compression_suffix(path)
+        file_format = "cif" if path.suffix.lower() == ".cif" else "pdb"
+        try:
+            data = remote.fetch(path.stem, file_format)
+        except ValueError:
+            raise FileNotFoundError(
+                f"{name} is neither a file nor a PDB ID"
+            ) from None
+        codec = detect_compression(data[:6])
+        if codec is not None:
+            data = codec.decompress(data)
+        return io.StringIO(data.decode("utf-8"))
+
+
+def read_molecule(input_file, is_cif=False, name="structure"):
+    """Parse molecular structure information from a file-like object.
+
+    :param input_file:  open file-like object with PDB or CIF data
+    :type input_file:  file
+    :param is_cif:  indicates whether the data is in CIF format
+    :type is_cif:  bool
+    :param name:  name of the structure for messages
+    :type name:  str
+    :return:  list of molecule records
+    :rtype:  [str]
+    :raises RuntimeError:  problems with structure file
+    """
+    if is_cif:
+        pdblist, errlist = cif.read_cif(input_file)
+    else:
+        pdblist, errlist = pdb.read_pdb(input_file)
+    if len(pdblist) == 0 and len(errlist) == 0:
+        raise RuntimeError(f"Unable to find file {name}!")
+    if len(errlist) != 0:
+        if is_cif:
+            _LOGGER.warning(f"Warning: {name} is a non-standard CIF file.\n")
+        else:
+            _LOGGER.warning(f"Warning: {name} is a non-standard PDB file.\n")
+        _LOGGER.error(errlist)
+    return pdblist
 
 
 def get_molecule(input_path):
@@ -451,47 +797,51 @@ def get_molecule(input_path):
     :raises RuntimeError:  problems with structure file
     """
     path = Path(input_path)
-    input_file = get_pdb_file(input_path)
-    is_cif = False
-    if path.suffix.lower() == ".cif":
-        pdblist, errlist = cif.read_cif(input_file)
-        is_cif = True
-    else:
-        pdblist, errlist = pdb.read_pdb(input_file)
-    if len(pdblist) == 0 and len(errlist) == 0:
-        raise RuntimeError(f"Unable to find file {path}!")
-    if len(errlist) != 0:
-        if is_cif:
-            _LOGGER.warning(f"Warning: {path} is a non-standard CIF file.\n")
-        else:
-            _LOGGER.warning(f"Warning: {path} is a non-standard PDB file.\n")
-        _LOGGER.error(errlist)
+    is_cif = strip_compression_suffix(path).suffix.lower() == ".cif"
+    with get_pdb_file(input_path) as input_file:
+        pdblist = read_molecule(input_file, is_cif, path)
     return pdblist, is_cif
 
 
 def get_definitions(
-    aa_path=AA_DEF_PATH, na_path=NA_DEF_PATH, patch_path=PATCH_DEF_PATH
+    aa_path=AA_DEF_PATH,
+    na_path=NA_DEF_PATH,
+    patch_path=PATCH_DEF_PATH,
+    use_cache=True,
 ):
     """Load topology definition files.
 
+    The fully-patched definitions are stored in the on-disk cache (see
+    :mod:`cache`) and reused as long as the definition files and PDB2PQR
+    version do not change.
+
     :param aa_path:  likely location of amino acid topology definitions
     :type aa_path:  str
     :param na_path:  likely location of nucleic acid topology definitions
     :type na_path:  str
     :param patch_path:  likely location of patch topology definitions
     :type patch_path:  str
+    :param use_cache:  use the on-disk cache of parsed definitions
+    :type use_cache:  bool
     :return:  topology Definitions object.
     :rtype:  Definition
     """
-    aa_path_ = test_xml_file(aa_path)
-    na_path_ = test_xml_file(na_path)
-    patch_path_ = test_xml_file(patch_path)
-    with open(aa_path_, "rt") as aa_file:
-        with open(na_path_, "rt") as na_file:
-            with open(patch_path_, "rt") as patch_file:
-                definitions = defns.Definition(
-                    aa_file=aa_file, na_file=na_file, patch_file=patch_file
-                )
+    contents = []
+    for path in [aa_path, na_path, patch_path]:
+        with open(test_xml_file(path), "rt") as def_file:
+            contents.append(def_file.read())
+    use_cache = use_cache and cache.is_enabled()
+    if use_cache:
+        key = cache.get_key(*contents)
+        definitions = cache.load("definitions", key)
+        if isinstance(definitions, defns.Definition):
+            return definitions
+    aa_file, na_file, patch_file = [io.StringIO(text) for text in contents]
+    definitions = defns.Definition(
+        aa_file=aa_file, na_file=na_file, patch_file=patch_file
+    )
+    if use_cache:
+        cache.store("definitions", key, definitions)
     return definitions
 
 
@@ -505,7 +855,7 @@ def setup_logger(output_pqr, level="DEBUG"):
     :param str level:  logging level
     """
     # Get the output logging location
-    output_pth = Path(output_pqr)
+    output_pth = strip_compression_suffix(output_pqr)
     log_file = Path(output_pth.parent, output_pth.stem + ".log")
     _LOGGER.info(f"Logs stored: {log_file}")
     logging.basicConfig(
@@ -554,40 +904,42 @@ def read_qcd(qcd_file):
     return atoms
 
 
-def read_dx(dx_file):
-    """Read DX-format volumetric information.
-
-    The OpenDX file format is defined at
-    <https://www.idvbook.com/wp-content/uploads/2010/12/opendx.pdf`.
+def read_dx_header(dx_file):
+    """Read the header of a DX-format file.
 
-    .. note:: This function is not a general-format OpenDX file parser and
-       makes many assumptions about the input data type, grid structure, etc.
-
-    .. todo:: This function should be moved into the APBS code base.
+    Lines are read up to and including the start of the data section
+    (``object 3 class array ... data follows``), so that the values can be
+    read next with :func:`iter_dx_values`.
 
     :param dx_file:  file object for DX file, ready for reading as text
     :type dx_file:  file
-    :returns:  dictionary with data from DX file
+    :returns:  dictionary with the grid information from the DX file
+        (without ``values``)
     :rtype:  dict
     :raises ValueError:  on parsing error
     """
     dx_dict = {
         "grid spacing": [],
-        "values": [],
         "number of grid points": None,
         "lower left corner": None,
+        "number of values": None,
     }
     for line in dx_file:
-        words = [w.strip() for w in line.split()]
-        if words[0] in ["#", "attribute", "component"]:
-            pass
-        elif words[0] == "object":
+        words = line.split()
+        if not words or words[0][0] == "#":
+            continue
+        if words[0] == "object":
             if words[1] == "1":
                 dx_dict["number of grid points"] = (
                     int(words[5]),
                     int(words[6]),
                     int(words[7]),
                 )
+            elif words[-2:] == ["data", "follows"]:
+                if "items" in words:
+                    num_values = int(words[words.index("items") + 1])
+                    dx_dict["number of values"] = num_values
+                break
         elif words[0] == "origin":
             dx_dict["lower left corner"] = [
                 float(words[1]),
@@ -597,25 +949,152 @@ def read_dx(dx_file):
         elif words[0] == "delta":
             spacing = [float(words[1]), float(words[2]), float(words[3])]
             dx_dict["grid spacing"].append(spacing)
-        else:
-            for word in words:
-                dx_dict["values"].append(float(word))
+        elif words[0] not in ["attribute", "component"]:
+            raise ValueError(f"Unexpected line in DX header: {line.strip()}")
+    else:
+        raise ValueError("DX file has no data section.")
+    num_points = dx_dict["number of grid points"]
+    if num_points is None:
+        raise ValueError("DX file has no grid positions.")
+    if dx_dict["number of values"] is None:
+        dx_dict["number of values"] = int(np.prod(num_points))
+    elif dx_dict["number of values"] != np.prod(num_points):
+        raise ValueError(
+            f"DX file has {dx_dict['number of values']} values for "
+            f"{num_points} grid points."
+        )
     return dx_dict
 
 
-def write_cube(cube_file, data_dict, atom_list, comment="CPMD CUBE FILE."):
-    """Write a Cube-format data file.
+def parse_dx_values(text, dtype=float):
+    """Parse whitespace-separated values from the data section of a
+    DX-format file.
 
-    Cube file format is defined at
-    <https://docs.chemaxon.com/display/Gaussian_Cube_format.html>.
+    :param text:  values
+    :type text:  str
+    :param dtype:  NumPy data type of the values
+    :type dtype:  numpy.dtype
+    :returns:  values
+    :rtype:  numpy.ndarray
+    :raises ValueError:  if the text includes anything other than values
+    """
+    try:
+        with warnings.catch_warnings():
+            # Older versions of NumPy warn instead of raising an error
+            warnings.simplefilter("error", DeprecationWarning)
+            return np.fromstring(text, dtype=dtype, sep=" ")
+    except DeprecationWarning as error:
+        raise ValueError(str(error))
+
+
+def iter_dx_values(dx_file, dx_dict, chunk_size=DX_CHUNK_SIZE, dtype=float):
+    """Iterate over the values in the data section of a DX-format file.
+
+    The values are parsed in bulk, a chunk at a time, so that grids larger
+    than the available memory can be processed without reading all values.
+
+    :param dx_file:  file object for DX file, positioned at the start of the
+        data section (see :func:`read_dx_header`)
+    :type dx_file:  file
+    :param dx_dict:  grid information from :func:`read_dx_header`
+    :type dx_dict:  dict
+    :param chunk_size:  number of values in each chunk (the last chunk may
+        be shorter)
+    :type chunk_size:  int
+    :param dtype:  NumPy data type of the values
+    :type dtype:  numpy.dtype
+    :returns:  iterator of one-dimensional arrays of values in file order
+        (with the z index varying fastest)
+    :rtype:  numpy.ndarray
+    :raises ValueError:  on parsing error or if the file ends early
+    """
+    remaining = dx_dict["number of values"]
+    pending = np.empty(0, dtype=dtype)
+    # Values are written with about 14 characters each (e.g., "1.234567e+00 ")
+    block_size = 14 * chunk_size
+    while remaining > 0:
+        block = dx_file.read(block_size)
+        if not block:
+            raise ValueError(f"DX file ended {remaining} values early.")
+        block += dx_file.readline()
+        try:
+            values = parse_dx_values(block, dtype)
+        except ValueError:
+            # The block includes the attributes that follow the data
+            footer = DX_FOOTER.search(block)
+            if footer is None:
+                raise
+            values = parse_dx_values(block[: footer.start()], dtype)
+        values = values[:remaining]
+        remaining -= len(values)
+        pending = np.concatenate([pending, values])
+        while len(pending) >= chunk_size:
+            yield pending[:chunk_size]
+            pending = pending[chunk_size:]
+    if len(pending) > 0:
+        yield pending
+
+
+def read_dx(dx_file, dtype=float, chunk_size=DX_CHUNK_SIZE, memmap_path=None):
+    """Read DX-format volumetric information.
+
+    The OpenDX file format is defined at
+    <https://www.idvbook.com/wp-content/uploads/2010/12/opendx.pdf`.
+    The values are parsed in chunks (see :func:`iter_dx_values`) into an
+    array; with *memmap_path*, the array is a memory-mapped NumPy file, so
+    grids larger than the available memory can be read.
+
+    .. note:: This function is not a general-format OpenDX file parser and
+       makes many assumptions about the input data type, grid structure, etc.
 
     .. todo:: This function should be moved into the APBS code base.
 
+    :param dx_file:  file object for DX file, ready for reading as text
+    :type dx_file:  file
+    :param dtype:  NumPy data type of the values (e.g., ``numpy.float32`` to
+        halve the memory of the grid)
+    :type dtype:  numpy.dtype
+    :param chunk_size:  number of values parsed at a time
+    :type chunk_size:  int
+    :param memmap_path:  path of a ``.npy`` file for the values; if None,
+        the values are kept in memory
+    :type memmap_path:  str
+    :returns:  dictionary with data from DX file; ``values`` is an array
+        with the shape of ``number of grid points``
+    :rtype:  dict
+    :raises ValueError:  on parsing error
+    """
+    dx_dict = read_dx_header(dx_file)
+    shape = dx_dict["number of grid points"]
+    if memmap_path is None:
+        values = np.empty(shape, dtype=dtype)
+    else:
+        values = np.lib.format.open_memmap(
+            memmap_path, mode="w+", dtype=dtype, shape=shape
+        )
+    flat_values = values.reshape(-1)
+    start = 0
+    for chunk in iter_dx_values(dx_file, dx_dict, chunk_size, dtype):
+        flat_values[start : start + len(chunk)] = chunk
+        start += len(chunk)
+    if memmap_path is not None:
+        values.flush()
+    dx_dict["values"] = values
+    return dx_dict
+
+
+def write_cube_header(
+    cube_file, data_dict, atom_list, comment="CPMD CUBE FILE."
+):
+    """Write the header and atoms of a Cube-format data file.
+
     :param cube_file:  file object ready for writing text data
     :type cube_file:  file
     :param data_dict:  dictionary of volumetric data as produced by
-        :func:`read_dx`
+        :func:`read_dx` or :func:`read_dx_header`
     :type data_dict:  dict
+    :param atom_list:  atoms of the structure
+    :type atom_list:  [Atom]
     :param comment:  comment for Cube file
     :type comment:  str
     """
@@ -641,13 +1120,114 @@ def write_cube(cube_file, data_dict, atom_list, comment="CPMD CUBE FILE."):
             f"{atom.serial:>4} {atom.charge:>11.6f} {atom.x:>11.6f} "
             f"{atom.y:>11.6f} {atom.z:>11.6f}\n"
         )
+
+
+def format_cube_values(values):
+    """Format values for a Cube-format file.
+
+    The result matches formatting each value with
+    :data:`CUBE_VALUE_TEMPLATE`, but the digits are computed with NumPy
+    arithmetic and table lookups; values that are not finite, are too small
+    for the scaling, or are too close to a rounding tie to round safely in
+    floating point are formatted by Python.
+
+    :param values:  values to format
+    :type values:  numpy.ndarray
+    :returns:  formatted values, each followed by a space
+    :rtype:  numpy.ndarray of 14-character byte strings
+    """
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    fast = np.isfinite(values) & ((magnitude >= 1e-300) | (magnitude == 0))
+    magnitude = np.where(fast, magnitude, 0.0)
+    nonzero = magnitude > 0
+    exponent = np.zeros(len(values), dtype=np.int64)
+    exponent[nonzero] = np.floor(np.log10(magnitude[nonzero]))
+    # Six significant digits; the exponent estimate may be off by one
+    scales = CUBE_SCALES[CUBE_SCALE_OFFSET + 5 - exponent]
+    scaled = magnitude * scales
+    low = nonzero & (scaled < 1e5)
+    exponent[low] -= 1
+    high = scaled >= 1e6
+    exponent[high] += 1
+    adjust = np.flatnonzero(low | high)
+    scales = CUBE_SCALES[CUBE_SCALE_OFFSET + 5 - exponent[adjust]]
+    scaled[adjust] = magnitude[adjust] * scales
+    fast &= np.abs(scaled - np.floor(scaled) - 0.5) > 1e-6
+    digits = np.floor(scaled + 0.5)
+    carry = digits >= 1e6
+    digits[carry] = 1e5
+    exponent[carry] += 1
+    leading = np.floor(digits / 1000)
+    codes = np.empty(len(values), dtype=CUBE_VALUE_DTYPE)
+    codes["sign"] = CUBE_SIGNS[np.signbit(values).astype(np.intp)]
+    codes["leading"] = CUBE_LEADING_DIGITS[leading.astype(np.intp)]
+    codes["trailing"] = CUBE_TRAILING_DIGITS[
+        (digits - 1000 * leading).astype(np.intp)
+    ]
+    codes["exponent"] = CUBE_EXPONENTS[exponent + CUBE_EXPONENT_OFFSET]
+    codes["space"] = b" "
+    codes = codes.view("S14")
+    # Values read from 7-digit DX files are often close to rounding ties
+    slow = np.flatnonzero(~fast)
+    if len(slow) > 0:
+        template = (CUBE_VALUE_TEMPLATE + " ") * len(slow)
+        text = template % tuple(values[slow].tolist())
+        codes[slow] = np.frombuffer(text.encode("ascii"), dtype="S14")
+    return codes
+
+
+def write_cube_values(cube_file, chunks):
+    """Write the volumetric values of a Cube-format data file.
+
+    Values are formatted in bulk (see :func:`format_cube_values`) and
+    written six per row as each chunk arrives, so the whole grid does not
+    need to be in memory.
+    Rows are separated by newlines; the last row has no trailing newline.
+
+    :param cube_file:  file object ready for writing text data
+    :type cube_file:  file
+    :param chunks:  arrays of values in file order (e.g., from
+        :func:`iter_dx_values`)
+    :type chunks:  iterable
+    """
     stride = 6
-    values = data_dict["values"]
-    for i in range(0, len(values), 6):
-        if i + stride < len(values):
-            imax = i + 6
-            words = [f"{val:< 13.5E}" for val in values[i:imax]]
-            cube_file.write(" ".join(words) + "\n")
-        else:
-            words = [f"{val:< 13.5E}" for val in values[i:]]
-            cube_file.write(" ".join(words))
+    pending = np.empty(0)
+    separator = ""
+    for chunk in chunks:
+        chunk = np.ravel(chunk)
+        pending = np.concatenate([pending, chunk]) if len(pending) else chunk
+        num_rows = len(pending) // stride
+        if num_rows == 0:
+            continue
+        codes = format_cube_values(pending[: num_rows * stride])
+        rows = codes.view(np.uint8).reshape(num_rows, 14 * stride)
+        rows[:, -1] = ord("\n")
+        cube_file.write(separator + rows.tobytes()[:-1].decode("ascii"))
+        separator = "\n"
+        pending = pending[num_rows * stride :]
+    if len(pending) > 0:
+        codes = format_cube_values(pending)
+        cube_file.write(separator + codes.tobytes()[:-1].decode("ascii"))
+
+
+def write_cube(cube_file, data_dict, atom_list, comment="CPMD CUBE FILE."):
+    """Write a Cube-format data file.
+
+    Cube file format is defined at
+    <https://docs.chemaxon.com/display/Gaussian_Cube_format.html>.
+
+    .. todo:: This function should be moved into the APBS code base.
+
+    :param cube_file:  file object ready for writing text data
+    :type cube_file:  file
+    :param data_dict:  dictionary of volumetric data as produced by
+        :func:`read_dx`
+    :type data_dict:  dict
+    :param atom_list:  atoms of the structure
+    :type atom_list:  [Atom]
+    :param comment:  comment for Cube file
+    :type comment:  str
+    """
+    write_cube_header(cube_file, data_dict, atom_list, comment)
+    write_cube_values(cube_file, [data_dict["values"]])
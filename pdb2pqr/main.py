@@ -8,13 +8,18 @@ It was created to avoid cluttering the __init__.py file.
 """
 import logging
 import argparse
+import copy
+import functools
+import multiprocessing
 from collections import OrderedDict
-from tempfile import NamedTemporaryFile
 from pathlib import Path
 from math import isclose
+import string
 import propka.lib
 import propka.output as pk_out
 import propka.input as pk_in
+from propka.atom import Atom as PropkaAtom
+from propka.conformation_container import ConformationContainer
 from propka.parameters import Parameters
 from propka.molecular_container import MolecularContainer
 from . import aa
@@ -23,6 +28,7 @@ from . import hydrogens
 from . import forcefield
 from . import biomolecule as biomol
 from . import io
+from . import profiling
 from .ligand.mol2 import Mol2Molecule
 from .config import VERSION, TITLE_STR, CITATIONS, FORCE_FIELDS
 from .config import REPAIR_LIMIT
@@ -35,6 +41,39 @@ _LOGGER = logging.getLogger(f"PDB2PQR{VERSION}")
 CHARGE_ERROR = 1e-3
 
 
+def parse_ph_values(text):
+    """Parse the pH values given with ``--with-ph``.
+
+    :param text:  comma-separated list of pH values and/or inclusive
+        ``start:stop:step`` ranges
+    :type text:  str
+    :raises argparse.ArgumentTypeError:  for values that cannot be parsed
+    :return:  list of pH values
+    :rtype:  [float]
+    """
+    ph_values = []
+    for item in text.split(","):
+        fields = item.split(":")
+        try:
+            fields = [float(field) for field in fields]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid pH value: {item}")
+        if len(fields) == 1:
+            ph_values += fields
+        elif len(fields) == 3 and fields[2] > 0 and fields[1] >= fields[0]:
+            start, stop, step = fields
+            num_steps = int((stop - start) / step + 1e-6)
+            ph_values += [
+                round(start + istep * step, 6)
+                for istep in range(num_steps + 1)
+            ]
+        else:
+            raise argparse.ArgumentTypeError(
+                f"Invalid pH range (expected start:stop:step): {item}"
+            )
+    return ph_values
+
+
 def build_main_parser():
     """Build an argument parser.
 
@@ -52,9 +91,18 @@ def build_main_parser():
     )
     pars.add_argument(
         "input_path",
-        help="Input PDB path or ID (to be retrieved from RCSB database",
+        help=(
+            "Input PDB path or ID (to be retrieved from RCSB database); "
+            "gzip, bzip2, and xz compressed files are read directly"
+        ),
+    )
+    pars.add_argument(
+        "output_pqr",
+        help=(
+            "Output PQR path; written compressed if the path ends with .gz, "
+            ".bz2, or .xz"
+        ),
     )
-    pars.add_argument("output_pqr", help="Output PQR path")
     pars.add_argument(
         "--log-level",
         help="Logging level",
@@ -103,6 +151,15 @@ def build_main_parser():
         default=True,
         help="Do not perform hydrogen optimization",
     )
+    grp2.add_argument(
+        "--opt-jobs",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes used to optimize independent "
+            "hydrogen bond networks"
+        ),
+    )
     grp2.add_argument(
         "--keep-chain",
         action="store_true",
@@ -187,6 +244,16 @@ def build_main_parser():
         default=False,
         help="Drop waters before processing biomolecule.",
     )
+    grp2.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help=(
+            "Write the wall time, CPU time, peak memory, and counters of "
+            "each stage of the calculation to a JSON file next to the output "
+            "PQR file (with the .profile.json suffix)."
+        ),
+    )
     grp2.add_argument(
         "--include-header",
         action="store_true",
@@ -212,12 +279,25 @@ def build_main_parser():
     grp3.add_argument(
         "--with-ph",
         dest="ph",
-        type=float,
+        type=parse_ph_values,
         action="store",
         default=7.0,
         help=(
             "pH values to use when applying the results of the selected pH "
-            "calculation method."
+            "calculation method. A comma-separated list of values and/or "
+            "inclusive start:stop:step ranges (e.g., 4,7.4 or 2:12:0.5) "
+            "runs the pKa calculation once and writes one set of output "
+            "files per pH, with the pH added to the file names (e.g., "
+            "out_pH7.40.pqr)."
+        ),
+    )
+    grp3.add_argument(
+        "--ph-jobs",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker processes used for the pH values given by "
+            "--with-ph"
         ),
     )
     pars = propka.lib.build_parser(pars)
@@ -273,12 +353,13 @@ def check_options(args):
     :type args:  argparse.Namespace
     :raises RuntimeError:  silly option combinations were encountered.
     """
-    if (args.ph < 0) or (args.ph > 14):
-        err = (
-            f"Specified pH ({args.ph}) is outside the range "
-            "[1, 14] of this program"
-        )
-        raise RuntimeError(err)
+    for ph in getattr(args, "ph_values", [args.ph]):
+        if (ph < 0) or (ph > 14):
+            err = (
+                f"Specified pH ({ph}) is outside the range "
+                "[1, 14] of this program"
+            )
+            raise RuntimeError(err)
     if args.neutraln and (args.ff is None or args.ff.lower() != "parse"):
         err = "--neutraln option only works with PARSE forcefield!"
         raise RuntimeError(err)
@@ -287,7 +368,52 @@ def check_options(args):
         raise RuntimeError(err)
 
 
-def print_pqr(args, pqr_lines, header_lines, missing_lines, is_cif):
+def format_pqr(pqr_lines, whitespace, is_cif, atoms=None, chainflag=False):
+    """Format PQR records for output.
+
+    :param [str] pqr_lines:  output lines (records)
+    :param bool whitespace:  insert whitespace between columns
+    :param bool is_cif:  flag indicating CIF format
+    :param [Atom] atoms:  atoms of the records; if given, the records with
+        whitespace are formatted directly from the atoms (see
+        :func:`io.format_atoms`) instead of by splitting the records
+    :param bool chainflag:  flag whether the records include chain IDs
+    :return:  lines to write to the PQR file
+    :rtype:  [str]
+    """
+    if whitespace and atoms is not None:
+        output = io.print_biomolecule_atoms(
+            atoms, chainflag=chainflag, whitespace=True
+        )
+    elif whitespace:
+        output = [
+            io.add_whitespace(line)
+            for line in pqr_lines
+            if line[0:4] == "ATOM" or line[0:6] == "HETATM"
+        ]
+    else:
+        output = [
+            line for line in pqr_lines if line[0:3] != "TER" or not is_cif
+        ]
+    if is_cif:
+        output.append("#\n")
+    return output
+
+
+def format_pdb(pdb_lines, is_cif):
+    """Format PDB records for output.
+
+    :param [str] pdb_lines:  output lines (records)
+    :param bool is_cif:  flag indicating CIF format
+    :return:  lines to write to the PDB file
+    :rtype:  [str]
+    """
+    return [line for line in pdb_lines if line[0:3] != "TER" or not is_cif]
+
+
+def print_pqr(
+    args, pqr_lines, header_lines, missing_lines, is_cif, atoms=None
+):
     """Print PQR-format output to specified file
 
     .. todo::  Move this to another module (io)
@@ -298,8 +424,9 @@ def print_pqr(args, pqr_lines, header_lines, missing_lines, is_cif):
     :param [str] missing_lines:  lines describing missing atoms (should go
         in header)
     :param bool is_cif:  flag indicating CIF format
+    :param [Atom] atoms:  atoms of the records (see :func:`format_pqr`)
     """
-    with open(args.output_pqr, "wt") as outfile:
+    with io.open_file(args.output_pqr, "wt") as outfile:
         # Adding whitespaces if --whitespace is in the options
         if header_lines:
             _LOGGER.warning(
@@ -309,26 +436,17 @@ def print_pqr(args, pqr_lines, header_lines, missing_lines, is_cif):
             _LOGGER.warning(
                 f"Ignoring {len(missing_lines)} missing lines in output."
             )
-        for line in pqr_lines:
-            if args.whitespace:
-                if line[0:4] == "ATOM" or line[0:6] == "HETATM":
-                    newline = (
-                        line[0:6]
-                        + " "
-                        + line[6:16]
-                        + " "
-                        + line[16:38]
-                        + " "
-                        + line[38:46]
-                        + " "
-                        + line[46:]
-                    )
-                    outfile.write(newline)
-            else:
-                if line[0:3] != "TER" or not is_cif:
-                    outfile.write(line)
-        if is_cif:
-            outfile.write("#\n")
+        outfile.write(
+            "".join(
+                format_pqr(
+                    pqr_lines,
+                    args.whitespace,
+                    is_cif,
+                    atoms=atoms,
+                    chainflag=args.keep_chain,
+                )
+            )
+        )
 
 
 def print_pdb(args, pdb_lines, header_lines, missing_lines, is_cif):
@@ -343,7 +461,7 @@ def print_pdb(args, pdb_lines, header_lines, missing_lines, is_cif):
         header)
     :param bool is_cif:  flag indicating CIF format
     """
-    with open(args.pdb_output, "wt") as outfile:
+    with io.open_file(args.pdb_output, "wt") as outfile:
         # Adding whitespaces if --whitespace is in the options
         if header_lines:
             _LOGGER.warning(
@@ -353,9 +471,7 @@ def print_pdb(args, pdb_lines, header_lines, missing_lines, is_cif):
             _LOGGER.warning(
                 f"Ignoring {len(missing_lines)} missing lines in output."
             )
-        for line in pdb_lines:
-            if line[0:3] != "TER" or not is_cif:
-                outfile.write(line)
+        outfile.write("".join(format_pdb(pdb_lines, is_cif)))
 
 
 def transform_arguments(args):
@@ -377,6 +493,11 @@ def transform_arguments(args):
         args.ff = args.ff.lower()
     if args.ffout is not None:
         args.ffout = args.ffout.lower()
+    if isinstance(args.ph, (list, tuple)):
+        args.ph_values = list(args.ph)
+    else:
+        args.ph_values = [args.ph]
+    args.ph = args.ph_values[0]
     return args
 
 
@@ -489,6 +610,145 @@ def drop_water(pdblist):
     return pdblist_new
 
 
+def get_propka_atoms(biomolecule, molecule):
+    """Convert biomolecule atoms to PROPKA atoms.
+
+    The PROPKA atoms are set up exactly as PROPKA would set them up when
+    reading the PDB-format records from :func:`io.print_biomolecule_atoms`
+    (see :func:`propka.input.get_atom_lines_from_pdb`), including the
+    precision of the PDB columns, without formatting and re-parsing text.
+
+    :param biomolecule:  biomolecule object
+    :type biomolecule:  Biomolecule
+    :param molecule:  PROPKA molecular container (for parameters and options)
+    :type molecule:  MolecularContainer
+    :return:  list of (conformation name, PROPKA atom) tuples
+    :rtype:  [(str, propka.atom.Atom)]
+    """
+    ignore_residues = molecule.version.parameters.ignore_residues
+    keep_protons = molecule.options.keep_protons
+    chains = molecule.options.chains
+    atoms = []
+    nterm_residue = "next_residue"
+    old_residue = None
+    chain_id = None
+    for iatom, atom in enumerate(biomolecule.atoms):
+        atom.serial = iatom + 1
+        # PROPKA treats chain breaks ("TER" records) as new N-termini
+        if chain_id is None:
+            chain_id = atom.chain_id
+        elif atom.chain_id != chain_id:
+            chain_id = atom.chain_id
+            nterm_residue = "next_residue"
+        tag = str.ljust(atom.type, 6)[:6]
+        if tag not in ("ATOM  ", "HETATM"):
+            continue
+        if len(atom.name) == 4 or len(atom.name.strip("FLIP")) == 4:
+            name_field = str.ljust(atom.name, 4)[:4]
+        else:
+            name_field = " " + str.ljust(atom.name, 3)[:3]
+        if len(atom.res_name) == 4:
+            res_field = str.ljust(atom.res_name, 4)[:4]
+        else:
+            res_field = " " + str.ljust(atom.res_name, 3)[:3]
+        if res_field[1:4] in ignore_residues:
+            continue
+        chain_field = str.ljust(atom.chain_id, 1)[:1]
+        if chains and chain_field not in chains:
+            continue
+        res_num_field = str.rjust(f"{atom.res_seq:d}", 4)[:4]
+        if nterm_residue == "next_residue" and tag == "ATOM  ":
+            if old_residue != res_num_field:
+                nterm_residue = res_num_field
+                old_residue = None
+        alt_conf = res_field[0]
+        if alt_conf in "123456789":
+            alt_conf = chr(ord(alt_conf) + 16)
+        if alt_conf == " ":
+            alt_conf = "A"
+        terminal = None
+        if tag == "ATOM  ":
+            if name_field.strip() == "N" and nterm_residue == res_num_field:
+                terminal = "N+"
+            if name_field.strip() in ["OXT", "O''"]:
+                terminal = "C-"
+                nterm_residue = "next_residue"
+                old_residue = res_num_field
+        pk_atom = PropkaAtom()
+        pk_atom.name = name_field.strip()
+        pk_atom.numb = atom.serial
+        pk_atom.x = float(str.ljust(f"{atom.x:8.3f}", 8)[:8])
+        pk_atom.y = float(str.ljust(f"{atom.y:8.3f}", 8)[:8])
+        pk_atom.z = float(str.ljust(f"{atom.z:8.3f}", 8)[:8])
+        pk_atom.res_num = int(res_num_field)
+        pk_atom.res_name = f"{res_field[1:4].strip():<3s}"
+        pk_atom.chain_id = chain_field.strip() or "_"
+        pk_atom.type = tag.strip().lower()
+        if pk_atom.res_name in ["DA ", "DC ", "DG ", "DT "]:
+            pk_atom.type = "hetatm"
+        pk_atom.occ = str.ljust(f"{atom.occupancy:6.2f}", 6)[1:6].strip()
+        pk_atom.beta = str.rjust(f"{atom.temp_factor:6.2f}", 6)[:6].strip()
+        pk_atom.icode = f"{atom.ins_code}   "[0]
+        element = name_field[0:2].strip().strip(string.digits)
+        if len(pk_atom.name) == 4:
+            element = element[0]
+        if len(element) == 2:
+            element = f"{element[0]}{element[1].lower()}"
+        pk_atom.element = element
+        pk_atom.residue_label = (
+            f"{pk_atom.name:3s}{pk_atom.res_num:>4d}{pk_atom.chain_id:>2s}"
+        )
+        pk_atom.terminal = terminal
+        if not (pk_atom.element == "H" and not keep_protons):
+            atoms.append((f"1{alt_conf}", pk_atom))
+    return atoms
+
+
+def get_propka_molecule(args, biomolecule):
+    """Set up a PROPKA molecular container for a biomolecule.
+
+    This follows :func:`propka.input.read_molecule_file` but takes the atoms
+    directly from the biomolecule instead of from a PDB file.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule object
+    :type biomolecule:  Biomolecule
+    :raises ValueError:  if the biomolecule has no atoms for PROPKA
+    :return:  PROPKA molecular container, ready for the pKa calculation
+    :rtype:  MolecularContainer
+    """
+    parameters = pk_in.read_parameter_file(args.parameters, Parameters())
+    molecule = MolecularContainer(parameters, args)
+    molecule.name = io.strip_compression_suffix(args.input_path).stem
+    conformations = {}
+    for name, atom in get_propka_atoms(biomolecule, molecule):
+        if name not in conformations:
+            conformations[name] = ConformationContainer(
+                name=name, parameters=parameters, molecular_container=molecule
+            )
+        conformations[name].add_atom(atom)
+    if not conformations:
+        raise ValueError(
+            "The biomolecule does not seem to contain any molecular "
+            "conformations for PROPKA"
+        )
+    molecule.conformations = conformations
+    molecule.conformation_names = sorted(
+        conformations.keys(), key=pk_in.conformation_sorter
+    )
+    molecule.top_up_conformations()
+    pk_in.protein_precheck(
+        molecule.conformations, molecule.conformation_names
+    )
+    molecule.version.setup_bonding_and_protonation(molecule)
+    molecule.extract_groups()
+    for name in molecule.conformation_names:
+        molecule.conformations[name].sort_atoms()
+    molecule.find_covalently_coupled_groups()
+    return molecule
+
+
 def run_propka(args, biomolecule):
     """Run a PROPKA calculation.
 
@@ -499,17 +759,7 @@ def run_propka(args, biomolecule):
     :return:  (DataFrame-convertible table of assigned pKa values, pKa information from PROPKA)
     :rtype:  (list, str)
     """
-    # TODO - eliminate need to write temporary file
-    lines = io.print_biomolecule_atoms(
-        atomlist=biomolecule.atoms, chainflag=args.keep_chain, pdbfile=True
-    )
-    with NamedTemporaryFile("wt", suffix=".pdb", delete=False) as pdb_file:
-        for line in lines:
-            pdb_file.write(line)
-        pdb_path = pdb_file.name
-    parameters = pk_in.read_parameter_file(args.parameters, Parameters())
-    molecule = MolecularContainer(parameters, args)
-    molecule = pk_in.read_molecule_file(pdb_path, molecule)
+    molecule = get_propka_molecule(args, biomolecule)
     molecule.calculate_pka()
 
     # Extract pKa information from PROPKA
@@ -563,184 +813,536 @@ def run_propka(args, biomolecule):
     return rows, pka_str
 
 
-def non_trivial(args, biomolecule, ligand, definition, is_cif):
-    """Perform a non-trivial PDB2PQR run.
-
-    .. todo::
-       These routines should be generalized to biomolecules; none of them are
-       specific to biomolecules.
+def get_forcefield(args, definition, forcefields=None, use_cache=True):
+    """Get the forcefield for a run.
 
     :param args:  command-line arguments
     :type args:  argparse.Namespace
-    :param biomolecule:  biomolecule
-    :type biomolecule:  Biomolecule
-    :param ligand:  ligand object or None
-    :type ligand:  Mol2Molecule
     :param definition:  topology definition
     :type definition:  Definition
-    :param is_cif:  indicates whether file is CIF format
-    :type is_cif:  bool
-    :raises ValueError:  for missing atoms that prevent debumping
-    :return:  dictionary with results
-    :rtype:  dict
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param use_cache:  use the on-disk cache of parsed forcefields
+    :type use_cache:  bool
+    :return:  forcefield
+    :rtype:  Forcefield
     """
     _LOGGER.info("Loading forcefield.")
-    forcefield_ = forcefield.Forcefield(
-        args.ff, definition, args.userff, args.usernames
+    if forcefields is not None and args.userff is None:
+        if args.ff in forcefields:
+            return forcefields[args.ff]
+    return forcefield.Forcefield(
+        args.ff,
+        definition,
+        args.userff,
+        args.usernames,
+        use_cache=use_cache,
     )
-    _LOGGER.info("Loading hydrogen topology definitions.")
-    hydrogen_handler = hydrogens.create_handler()
-    debumper = debump.Debump(biomolecule)
+
+
+def prepare_biomolecule(args, biomolecule):
+    """Perform the pH-independent steps of a non-trivial PDB2PQR run.
+
+    Repair the biomolecule, update disulfide bridges, debump, and calculate
+    pKa values (if requested).
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :raises ValueError:  for missing atoms that prevent debumping
+    :return:  table of pKa values (see :func:`run_propka`) or None
+    :rtype:  list
+    """
     if args.assign_only:
         # TODO - I don't understand why HIS needs to be set to HIP for
         # assign-only
         biomolecule.set_hip()
-    else:
-        if is_repairable(biomolecule, args.ligand is not None):
-            _LOGGER.info(
-                f"Attempting to repair {biomolecule.num_missing_heavy:d} "
-                "missing atoms in biomolecule."
-            )
+        return None
+    debumper = debump.Debump(biomolecule)
+    if is_repairable(biomolecule, args.ligand is not None):
+        _LOGGER.info(
+            f"Attempting to repair {biomolecule.num_missing_heavy:d} "
+            "missing atoms in biomolecule."
+        )
+        with profiling.stage("repair", biomolecule):
             biomolecule.repair_heavy()
-        _LOGGER.info("Updating disulfide bridges.")
+    _LOGGER.info("Updating disulfide bridges.")
+    with profiling.stage("ss_bridges", biomolecule):
         biomolecule.update_ss_bridges()
-        if args.debump:
-            _LOGGER.info("Debumping biomolecule.")
-            try:
+    if args.debump:
+        _LOGGER.info("Debumping biomolecule.")
+        try:
+            with profiling.stage("debump", biomolecule):
                 debumper.debump_biomolecule()
-            except ValueError as err:
-                err = f"Unable to debump biomolecule. {err}"
-                raise ValueError(err)
-        if args.pka_method == "propka":
-            _LOGGER.info("Assigning titration states with PROPKA.")
+        except ValueError as err:
+            err = f"Unable to debump biomolecule. {err}"
+            raise ValueError(err)
+    pka_df = None
+    if args.pka_method == "propka":
+        _LOGGER.info("Assigning titration states with PROPKA.")
+        with profiling.stage("propka", biomolecule):
             biomolecule.remove_hydrogens()
             pka_df, pka_str = run_propka(args, biomolecule)
-            _LOGGER.info(f"PROPKA information:\n{pka_str}")
-            biomolecule.apply_pka_values(
-                forcefield_.name,
-                args.ph,
-                dict((row['group_label'], row['pKa']) for row in pka_df),
-            )
+        _LOGGER.info(f"PROPKA information:\n{pka_str}")
+    return pka_df
+
+
+def protonate_biomolecule(
+    args,
+    biomolecule,
+    ligand,
+    definition,
+    is_cif,
+    forcefield_,
+    hydrogen_handler,
+    pka_df,
+    forcefields=None,
+    use_cache=True,
+):
+    """Perform the pH-dependent steps of a non-trivial PDB2PQR run.
+
+    Apply titration states for ``args.ph``, add and optimize hydrogens, and
+    assign forcefield parameters to a biomolecule prepared by
+    :func:`prepare_biomolecule`.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :param ligand:  ligand object or None
+    :type ligand:  Mol2Molecule
+    :param definition:  topology definition
+    :type definition:  Definition
+    :param is_cif:  indicates whether file is CIF format
+    :type is_cif:  bool
+    :param forcefield_:  forcefield
+    :type forcefield_:  Forcefield
+    :param hydrogen_handler:  hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :param pka_df:  table of pKa values from :func:`prepare_biomolecule`
+    :type pka_df:  list
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param use_cache:  use the on-disk cache of parsed forcefields
+    :type use_cache:  bool
+    :raises ValueError:  for residues with non-integer charges
+    :return:  dictionary with results (see :func:`process_molecule`)
+    :rtype:  dict
+    """
+    if forcefields is None:
+        forcefields = {}
+    if not args.assign_only:
+        if pka_df is not None:
+            with profiling.stage("titration_states", biomolecule):
+                biomolecule.apply_pka_values(
+                    forcefield_.name,
+                    args.ph,
+                    dict((row["group_label"], row["pKa"]) for row in pka_df),
+                )
+        debumper = debump.Debump(biomolecule)
         _LOGGER.info("Adding hydrogens to biomolecule.")
-        biomolecule.add_hydrogens()
+        with profiling.stage("add_hydrogens", biomolecule):
+            biomolecule.add_hydrogens()
         if args.debump:
             _LOGGER.info("Debumping biomolecule (again).")
-            debumper.debump_biomolecule()
+            with profiling.stage("debump", biomolecule):
+                debumper.debump_biomolecule()
         _LOGGER.info("Optimizing hydrogen bonds")
-        hydrogen_routines = hydrogens.HydrogenRoutines(
-            debumper, hydrogen_handler
-        )
-        if args.opt:
-            hydrogen_routines.set_optimizeable_hydrogens()
-            biomolecule.hold_residues(None)
-            hydrogen_routines.initialize_full_optimization()
-        else:
-            hydrogen_routines.initialize_wat_optimization()
-        hydrogen_routines.optimize_hydrogens()
-        hydrogen_routines.cleanup()
+        with profiling.stage("optimize", biomolecule):
+            hydrogen_routines = hydrogens.HydrogenRoutines(
+                debumper, hydrogen_handler
+            )
+            if args.opt:
+                hydrogen_routines.set_optimizeable_hydrogens()
+                biomolecule.hold_residues(None)
+                hydrogen_routines.initialize_full_optimization()
+            else:
+                hydrogen_routines.initialize_wat_optimization()
+            hydrogen_routines.optimize_hydrogens(args.opt_jobs)
+            hydrogen_routines.cleanup()
     _LOGGER.info("Applying force field to biomolecule states.")
-    biomolecule.set_states()
-    matched_atoms, missing_atoms = biomolecule.apply_force_field(forcefield_)
-    if args.ligand is not None:
-        _LOGGER.info("Processing ligand.")
-        _LOGGER.warning("Using ZAP9 forcefield for ligand radii.")
-        ligand.assign_parameters()
-        lig_atoms = []
+    with profiling.stage("forcefield", biomolecule):
+        biomolecule.set_states()
+        matched_atoms, missing_atoms = biomolecule.apply_force_field(
+            forcefield_
+        )
+        if args.ligand is not None:
+            _LOGGER.info("Processing ligand.")
+            _LOGGER.warning("Using ZAP9 forcefield for ligand radii.")
+            ligand.assign_parameters()
+            lig_atoms = []
+            for residue in biomolecule.residues:
+                tot_charge = 0
+                for pdb_atom in residue.atoms:
+                    # Only check residues with HETATM
+                    if pdb_atom.type == "ATOM":
+                        break
+                    try:
+                        mol2_atom = ligand.atoms[pdb_atom.name]
+                        pdb_atom.radius = mol2_atom.radius
+                        pdb_atom.ffcharge = mol2_atom.charge
+                        tot_charge += mol2_atom.charge
+                        lig_atoms.append(pdb_atom)
+                    except KeyError:
+                        err = (
+                            f"Can't find HETATM {residue.name} "
+                            f"{residue.res_seq} {pdb_atom.name} in MOL2 file"
+                        )
+                        _LOGGER.warning(err)
+                        missing_atoms.append(pdb_atom)
+            matched_atoms += lig_atoms
         for residue in biomolecule.residues:
-            tot_charge = 0
-            for pdb_atom in residue.atoms:
-                # Only check residues with HETATM
-                if pdb_atom.type == "ATOM":
-                    break
-                try:
-                    mol2_atom = ligand.atoms[pdb_atom.name]
-                    pdb_atom.radius = mol2_atom.radius
-                    pdb_atom.ffcharge = mol2_atom.charge
-                    tot_charge += mol2_atom.charge
-                    lig_atoms.append(pdb_atom)
-                except KeyError:
-                    err = (
-                        f"Can't find HETATM {residue.name} {residue.res_seq} "
-                        f"{pdb_atom.name} in MOL2 file"
-                    )
-                    _LOGGER.warning(err)
-                    missing_atoms.append(pdb_atom)
-        matched_atoms += lig_atoms
-    for residue in biomolecule.residues:
-        if not isclose(
-            residue.charge, int(residue.charge), abs_tol=CHARGE_ERROR
-        ):
-            err = (
-                f"Residue {residue.name} {residue.res_seq} charge is "
-                f"non-integer: {residue.charge}"
+            if not isclose(
+                residue.charge, int(residue.charge), abs_tol=CHARGE_ERROR
+            ):
+                err = (
+                    f"Residue {residue.name} {residue.res_seq} charge is "
+                    f"non-integer: {residue.charge}"
+                )
+                raise ValueError(err)
+        if args.ffout is not None:
+            _LOGGER.info(f"Applying custom naming scheme ({args.ffout}).")
+            if args.ffout in forcefields:
+                name_scheme = forcefields[args.ffout]
+            elif args.ffout != args.ff:
+                name_scheme = forcefield.Forcefield(
+                    args.ffout, definition, None, use_cache=use_cache
+                )
+            else:
+                name_scheme = forcefield_
+            biomolecule.apply_name_scheme(name_scheme)
+    with profiling.stage("output", biomolecule):
+        _LOGGER.info("Regenerating headers.")
+        reslist, charge = biomolecule.charge
+        if is_cif:
+            header = io.print_pqr_header_cif(
+                missing_atoms,
+                reslist,
+                charge,
+                args.ff,
+                args.pka_method,
+                args.ph,
+                args.ffout,
+                include_old_header=args.include_header,
             )
-            raise ValueError(err)
-    if args.ffout is not None:
-        _LOGGER.info(f"Applying custom naming scheme ({args.ffout}).")
-        if args.ffout != args.ff:
-            name_scheme = forcefield.Forcefield(args.ffout, definition, None)
         else:
-            name_scheme = forcefield_
-        biomolecule.apply_name_scheme(name_scheme)
-    _LOGGER.info("Regenerating headers.")
-    reslist, charge = biomolecule.charge
-    if is_cif:
-        header = io.print_pqr_header_cif(
-            missing_atoms,
-            reslist,
-            charge,
-            args.ff,
-            args.pka_method,
-            args.ph,
-            args.ffout,
-            include_old_header=args.include_header,
-        )
+            header = io.print_pqr_header(
+                biomolecule.pdblist,
+                missing_atoms,
+                reslist,
+                charge,
+                args.ff,
+                args.pka_method,
+                args.ph,
+                args.ffout,
+                include_old_header=args.include_header,
+            )
+        _LOGGER.info("Regenerating PDB lines.")
+        lines = io.print_biomolecule_atoms(matched_atoms, args.keep_chain)
+    return {
+        "lines": lines,
+        "header": header,
+        "missed_residues": missing_atoms,
+        "atoms": matched_atoms,
+        "pka": pka_df,
+    }
+
+
+def non_trivial(
+    args,
+    biomolecule,
+    ligand,
+    definition,
+    is_cif,
+    forcefields=None,
+    hydrogen_handler=None,
+    use_cache=True,
+):
+    """Perform a non-trivial PDB2PQR run.
+
+    .. todo::
+       These routines should be generalized to biomolecules; none of them are
+       specific to biomolecules.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :param ligand:  ligand object or None
+    :type ligand:  Mol2Molecule
+    :param definition:  topology definition
+    :type definition:  Definition
+    :param is_cif:  indicates whether file is CIF format
+    :type is_cif:  bool
+    :param forcefields:  already-loaded forcefields (for ``args.ff`` and
+        ``args.ffout``) keyed by lower-case name; others are loaded as needed
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :param use_cache:  use the on-disk cache of parsed forcefields
+    :type use_cache:  bool
+    :raises ValueError:  for missing atoms that prevent debumping
+    :return:  dictionary with results (see :func:`process_molecule`)
+    :rtype:  dict
+    """
+    forcefield_ = get_forcefield(args, definition, forcefields, use_cache)
+    if hydrogen_handler is None:
+        _LOGGER.info("Loading hydrogen topology definitions.")
+        hydrogen_handler = hydrogens.create_handler()
+    pka_df = prepare_biomolecule(args, biomolecule)
+    return protonate_biomolecule(
+        args,
+        biomolecule,
+        ligand,
+        definition,
+        is_cif,
+        forcefield_,
+        hydrogen_handler,
+        pka_df,
+        forcefields=forcefields,
+        use_cache=use_cache,
+    )
+
+
+# State shared with forked pH scan workers; see run_ph_scan()
+_PH_SCAN = {}
+
+
+def protonate_snapshot(iph):
+    """Run the pH-dependent steps for one pH of a scan.
+
+    Works on a fresh copy of the prepared biomolecule; in a forked worker,
+    the inherited copy is used directly.
+
+    :param iph:  index of the pH value in the scan
+    :type iph:  int
+    :return:  value returned by the scan's results handler
+    """
+    args = copy.copy(_PH_SCAN["args"])
+    args.ph = args.ph_values[iph]
+    args.ph_values = [args.ph]
+    _LOGGER.info(f"Protonating biomolecule at pH {args.ph:g}.")
+    if _PH_SCAN["copy"]:
+        biomolecule, ligand = copy.deepcopy(_PH_SCAN["snapshot"])
     else:
-        header = io.print_pqr_header(
-            biomolecule.pdblist,
-            missing_atoms,
-            reslist,
-            charge,
-            args.ff,
-            args.pka_method,
-            args.ph,
-            args.ffout,
-            include_old_header=args.include_header,
+        biomolecule, ligand = _PH_SCAN["snapshot"]
+    results = protonate_biomolecule(
+        args,
+        biomolecule,
+        ligand,
+        *_PH_SCAN["shared"],
+    )
+    results["biomolecule"] = biomolecule
+    return _PH_SCAN["handle_results"](args, results)
+
+
+def run_ph_scan(
+    args,
+    biomolecule,
+    ligand,
+    definition,
+    is_cif,
+    handle_results,
+    forcefields=None,
+    hydrogen_handler=None,
+):
+    """Run PDB2PQR for each of the pH values in ``args.ph_values``.
+
+    The pH-independent steps (including any pKa calculation) are performed
+    once; the pH-dependent steps then start from a copy of the prepared
+    biomolecule for each pH.
+    With ``args.ph_jobs`` greater than one, the pH values are processed by
+    forked worker processes.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :param ligand:  ligand object or None
+    :type ligand:  Mol2Molecule
+    :param definition:  topology definition
+    :type definition:  Definition
+    :param is_cif:  indicates whether file is CIF format
+    :type is_cif:  bool
+    :param handle_results:  function called with the arguments (with
+        ``ph`` set) and results dictionary for each pH, in the process that
+        calculated the results; its return values must be picklable when
+        using worker processes
+    :type handle_results:  function
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :raises ValueError:  for problems that prevent the calculation
+    :return:  values returned by ``handle_results`` in pH order
+    :rtype:  list
+    """
+    forcefield_ = get_forcefield(args, definition, forcefields)
+    if hydrogen_handler is None:
+        _LOGGER.info("Loading hydrogen topology definitions.")
+        hydrogen_handler = hydrogens.create_handler()
+    if args.pka_method is None:
+        _LOGGER.warning(
+            "pH values only affect titration states with "
+            "--titration-state-method."
         )
-    _LOGGER.info("Regenerating PDB lines.")
-    lines = io.print_biomolecule_atoms(matched_atoms, args.keep_chain)
-    return {"lines": lines, "header": header, "missed_residues": missing_atoms}
+    pka_df = prepare_biomolecule(args, biomolecule)
+    num_ph = len(args.ph_values)
+    num_procs = max(1, min(args.ph_jobs, num_ph))
+    if num_procs > 1 and (
+        "fork" not in multiprocessing.get_all_start_methods()
+        or multiprocessing.current_process().daemon
+    ):
+        _LOGGER.warning("Unable to start pH scan workers; running serially.")
+        num_procs = 1
+    _PH_SCAN.update(
+        args=args,
+        snapshot=(biomolecule, ligand),
+        shared=(
+            definition,
+            is_cif,
+            forcefield_,
+            hydrogen_handler,
+            pka_df,
+            forcefields,
+        ),
+        handle_results=handle_results,
+    )
+    try:
+        if num_procs > 1:
+            # Each worker is forked for a single pH value so that it
+            # inherits an untouched copy of the prepared biomolecule
+            _PH_SCAN["copy"] = False
+            context = multiprocessing.get_context("fork")
+            with context.Pool(num_procs, maxtasksperchild=1) as pool:
+                return pool.map(protonate_snapshot, range(num_ph), 1)
+        outputs = []
+        for iph in range(num_ph):
+            # The last pH value can use the prepared biomolecule itself
+            _PH_SCAN["copy"] = iph < num_ph - 1
+            outputs.append(protonate_snapshot(iph))
+        return outputs
+    finally:
+        _PH_SCAN.clear()
 
 
-def main_driver(args):
-    """Main driver for running program from the command line.
+def setup_biomolecule(args, pdblist, definition):
+    """Set up a biomolecule from structure records.
 
-    Validate inputs, launch PDB2PQR, handle output.
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param pdblist:  list of structure records from :func:`io.read_molecule`
+    :type pdblist:  list
+    :param definition:  topology definitions
+    :type definition:  Definition
+    :return:  (biomolecule, definition, ligand--may be None)
+    :rtype:  (Biomolecule, Definition, Mol2Molecule)
+    """
+    with profiling.stage("setup") as counters:
+        if args.drop_water:
+            _LOGGER.info("Dropping water from structure.")
+            pdblist = drop_water(pdblist)
+        _LOGGER.info("Setting up molecule.")
+        biomolecule, definition, ligand = setup_molecule(
+            pdblist, definition, args.ligand
+        )
+        _LOGGER.info("Setting termini states for biomolecule chains.")
+        biomolecule.set_termini(args.neutraln, args.neutralc)
+        biomolecule.update_bonds()
+        counters["atoms"] = len(biomolecule.atoms)
+        counters["residues"] = len(biomolecule.residues)
+    return biomolecule, definition, ligand
+
+
+def process_molecule(
+    args,
+    pdblist,
+    is_cif,
+    definition=None,
+    forcefields=None,
+    hydrogen_handler=None,
+):
+    """Run PDB2PQR on a parsed structure without writing any output.
+
+    The arguments must already have been transformed and checked with
+    :func:`transform_arguments`, :func:`check_files`, and
+    :func:`check_options`.
 
     :param args:  command-line arguments
     :type args:  argparse.Namespace
+    :param pdblist:  list of structure records from :func:`io.read_molecule`
+    :type pdblist:  list
+    :param is_cif:  indicates whether the structure is in CIF format
+    :type is_cif:  bool
+    :param definition:  already-loaded topology definitions
+    :type definition:  Definition
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :raises ValueError:  for problems that prevent the calculation
+    :return:  dictionary with the output PQR records (``lines``), header
+        (``header``), atoms missing parameters (``missed_residues``), atoms
+        in the output (``atoms``), PROPKA pKa table or None (``pka``), and
+        the biomolecule (``biomolecule``)
+    :rtype:  dict
+    """
+    if definition is None:
+        _LOGGER.info("Loading topology files.")
+        definition = io.get_definitions()
+    biomolecule, definition, ligand = setup_biomolecule(
+        args, pdblist, definition
+    )
+    # The records are not needed once the biomolecule is built
+    del pdblist
+    return process_biomolecule(
+        args,
+        biomolecule,
+        ligand,
+        definition,
+        is_cif,
+        forcefields=forcefields,
+        hydrogen_handler=hydrogen_handler,
+    )
+
+
+def process_biomolecule(
+    args,
+    biomolecule,
+    ligand,
+    definition,
+    is_cif,
+    forcefields=None,
+    hydrogen_handler=None,
+    use_cache=True,
+):
+    """Run PDB2PQR on a biomolecule from :func:`setup_biomolecule` without
+    writing any output.
+
+    Unlike :func:`process_molecule`, the caller can release the structure
+    records before the calculation.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :param ligand:  ligand object or None
+    :type ligand:  Mol2Molecule
+    :param definition:  topology definitions
+    :type definition:  Definition
+    :param is_cif:  indicates whether the structure is in CIF format
+    :type is_cif:  bool
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :param use_cache:  use the on-disk cache of parsed forcefields
+    :type use_cache:  bool
+    :raises ValueError:  for problems that prevent the calculation
+    :return:  dictionary with results (see :func:`process_molecule`)
+    :rtype:  dict
     """
-    io.setup_logger(args.output_pqr, args.log_level)
-    _LOGGER.debug(f"Invoked with arguments: {args}")
-    print_splash_screen(args)
-    _LOGGER.info("Checking and transforming input arguments.")
-    args = transform_arguments(args)
-    check_files(args)
-    check_options(args)
-    _LOGGER.info("Loading topology files.")
-    definition = io.get_definitions()
-    _LOGGER.info(f"Loading molecule: {args.input_path}")
-    pdblist, is_cif = io.get_molecule(args.input_path)
-    if args.drop_water:
-        _LOGGER.info("Dropping water from structure.")
-        pdblist = drop_water(pdblist)
-    _LOGGER.info("Setting up molecule.")
-    biomolecule, definition, ligand = setup_molecule(
-        pdblist, definition, args.ligand
-    )
-    _LOGGER.info("Setting termini states for biomolecule chains.")
-    biomolecule.set_termini(args.neutraln, args.neutralc)
-    biomolecule.update_bonds()
     if args.clean:
         _LOGGER.info(
             "Arguments specified cleaning only; skipping remaining steps."
@@ -748,36 +1350,73 @@ def main_driver(args):
         results = {
             "header": "",
             "missed_residues": None,
-            "biomolecule": biomolecule,
             "lines": io.print_biomolecule_atoms(
                 biomolecule.atoms, args.keep_chain
             ),
+            "atoms": biomolecule.atoms,
+            "pka": None,
         }
     else:
-        try:
-            results = non_trivial(
-                args=args,
-                biomolecule=biomolecule,
-                ligand=ligand,
-                definition=definition,
-                is_cif=is_cif,
-            )
-        except ValueError as err:
-            _LOGGER.critical(err)
-            _LOGGER.critical("Giving up.")
-            return
+        results = non_trivial(
+            args=args,
+            biomolecule=biomolecule,
+            ligand=ligand,
+            definition=definition,
+            is_cif=is_cif,
+            forcefields=forcefields,
+            hydrogen_handler=hydrogen_handler,
+            use_cache=use_cache,
+        )
+    results["biomolecule"] = biomolecule
+    return results
+
+
+def get_ph_path(path, ph):
+    """Get the name of an output file for one pH of a pH scan.
+
+    :param path:  output file path
+    :type path:  str
+    :param ph:  pH value
+    :type ph:  float
+    :return:  path with the pH added to the file name (before any
+        compression suffix)
+    :rtype:  str
+    """
+    path = Path(path)
+    base = io.strip_compression_suffix(path)
+    compression = path.suffix if base != path else ""
+    return str(
+        path.with_name(f"{base.stem}_pH{ph:.2f}{base.suffix}{compression}")
+    )
+
+
+def write_outputs(args, results, is_cif):
+    """Write the output files for a PDB2PQR run.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param results:  dictionary with results from :func:`process_molecule`
+    :type results:  dict
+    :param is_cif:  indicates whether the structure is in CIF format
+    :type is_cif:  bool
+    :return:  path of the output PQR file
+    :rtype:  str
+    """
     print_pqr(
         args=args,
         pqr_lines=results["lines"],
         header_lines=results["header"],
         missing_lines=results["missed_residues"],
         is_cif=is_cif,
+        atoms=results["atoms"],
     )
     if args.pdb_output:
         print_pdb(
             args=args,
             pdb_lines=io.print_biomolecule_atoms(
-                biomolecule.atoms, chainflag=args.keep_chain, pdbfile=True
+                results["biomolecule"].atoms,
+                chainflag=args.keep_chain,
+                pdbfile=True,
             ),
             header_lines=results["header"],
             missing_lines=results["missed_residues"],
@@ -785,6 +1424,132 @@ def main_driver(args):
         )
     if args.apbs_input:
         io.dump_apbs(args.output_pqr, args.apbs_input)
+    return args.output_pqr
+
+
+def write_ph_outputs(args, results, is_cif):
+    """Write the output files for one pH of a pH scan.
+
+    The pH value is added to the names of the output files (see
+    :func:`get_ph_path`).
+
+    :param args:  command-line arguments with ``ph`` set
+    :type args:  argparse.Namespace
+    :param results:  dictionary with results from :func:`process_molecule`
+    :type results:  dict
+    :param is_cif:  indicates whether the structure is in CIF format
+    :type is_cif:  bool
+    :return:  (pH, path of the output PQR file)
+    :rtype:  (float, str)
+    """
+    args = copy.copy(args)
+    for name in ["output_pqr", "pdb_output", "apbs_input"]:
+        if getattr(args, name):
+            setattr(args, name, get_ph_path(getattr(args, name), args.ph))
+    return args.ph, write_outputs(args, results, is_cif)
+
+
+def main_driver(
+    args,
+    definition=None,
+    forcefields=None,
+    hydrogen_handler=None,
+    setup_logging=True,
+):
+    """Main driver for running program from the command line.
+
+    Validate inputs, launch PDB2PQR, handle output.
+
+    Topology definitions, forcefields, and hydrogen definitions that have
+    already been loaded (e.g., by :mod:`batch`) can be passed in to avoid
+    reloading them for every structure.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :param definition:  already-loaded topology definitions
+    :type definition:  Definition
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :param setup_logging:  set up a log file next to the output PQR file
+    :type setup_logging:  bool
+    :return:  dictionary with results, list of (pH, output PQR path) tuples
+        for a pH scan, or None if the run failed
+    :rtype:  dict or [(float, str)]
+    """
+    if setup_logging:
+        io.setup_logger(args.output_pqr, args.log_level)
+    _LOGGER.debug(f"Invoked with arguments: {args}")
+    print_splash_screen(args)
+    _LOGGER.info("Checking and transforming input arguments.")
+    args = transform_arguments(args)
+    check_files(args)
+    check_options(args)
+    with profiling.profile(args.profile) as profile_:
+        results = run_driver(args, definition, forcefields, hydrogen_handler)
+    if profile_ is not None:
+        profile_path = profiling.get_profile_path(args.output_pqr)
+        _LOGGER.info(f"Writing profile to {profile_path}.")
+        profile_.write(profile_path)
+    return results
+
+
+def run_driver(args, definition, forcefields, hydrogen_handler):
+    """Load a structure, run PDB2PQR, and write the outputs.
+
+    :param args:  checked command-line arguments
+    :type args:  argparse.Namespace
+    :param definition:  already-loaded topology definitions
+    :type definition:  Definition
+    :param forcefields:  already-loaded forcefields keyed by lower-case name
+    :type forcefields:  {str: Forcefield}
+    :param hydrogen_handler:  already-loaded hydrogen topology definitions
+    :type hydrogen_handler:  HydrogenHandler
+    :return:  see :func:`main_driver`
+    :rtype:  dict or [(float, str)]
+    """
+    _LOGGER.info(f"Loading molecule: {args.input_path}")
+    with profiling.stage("parse") as counters:
+        pdblist, is_cif = io.get_molecule(args.input_path)
+        counters["records"] = len(pdblist)
+    try:
+        if definition is None:
+            _LOGGER.info("Loading topology files.")
+            with profiling.stage("definitions"):
+                definition = io.get_definitions()
+        biomolecule, definition, ligand = setup_biomolecule(
+            args, pdblist, definition
+        )
+        # Release the coordinate records; the biomolecule keeps the headers
+        del pdblist
+        if len(args.ph_values) > 1 and not args.clean:
+            return run_ph_scan(
+                args,
+                biomolecule,
+                ligand,
+                definition,
+                is_cif,
+                functools.partial(write_ph_outputs, is_cif=is_cif),
+                forcefields=forcefields,
+                hydrogen_handler=hydrogen_handler,
+            )
+        results = process_biomolecule(
+            args,
+            biomolecule,
+            ligand,
+            definition,
+            is_cif,
+            forcefields=forcefields,
+            hydrogen_handler=hydrogen_handler,
+        )
+    except ValueError as err:
+        _LOGGER.critical(err)
+        _LOGGER.critical("Giving up.")
+        return None
+    with profiling.stage("write"):
+        write_outputs(args, results, is_cif)
+    return results
 
 
 def main():
@@ -801,6 +1566,9 @@ def dx_to_cube():
     <https://www.idvbook.com/wp-content/uploads/2010/12/opendx.pdf` and the
     Cube file format is defined at
     <https://docs.chemaxon.com/display/Gaussian_Cube_format.html>.
+    The grid values are converted a chunk at a time, so memory use does not
+    grow with the size of the grid; compressed files are read and written
+    as in :func:`pdb2pqr.io.open_file`.
 
     .. todo:: This function should be moved into the APBS code base.
     """
@@ -810,9 +1578,21 @@ def dx_to_cube():
         description=desc,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    parser.add_argument("dx_input", help="name of the dx_input file")
-    parser.add_argument("pqr_input", help="name of the pqr_input file")
-    parser.add_argument("output", help="name of the output file")
+    parser.add_argument(
+        "dx_input",
+        help="name of the dx_input file (optionally compressed)",
+    )
+    parser.add_argument(
+        "pqr_input",
+        help="name of the pqr_input file (optionally compressed)",
+    )
+    parser.add_argument(
+        "output",
+        help=(
+            "name of the output file (compressed if the name ends with "
+            ".gz, .bz2, or .xz)"
+        ),
+    )
     parser.add_argument(
         "--log-level",
         help="set logging level",
@@ -824,11 +1604,14 @@ def dx_to_cube():
     logging.basicConfig(level=log_level)
     _LOGGER.debug(f"Got arguments: {args}", args)
     _LOGGER.info(f"Reading PQR from {args.pqr_input}...")
-    with open(args.pqr_input, "rt") as pqr_file:
+    with io.open_file(args.pqr_input) as pqr_file:
         atom_list = io.read_pqr(pqr_file)
-    _LOGGER.info(f"Reading DX from {args.dx_input}...")
-    with open(args.dx_input, "rt") as dx_file:
-        dx_dict = io.read_dx(dx_file)
-    _LOGGER.info(f"Writing Cube to {args.output}...")
-    with open(args.output, "wt") as cube_file:
-        io.write_cube(cube_file, dx_dict, atom_list)
+    _LOGGER.info(f"Converting DX from {args.dx_input} to {args.output}...")
+    with io.open_file(args.dx_input) as dx_file:
+        dx_dict = io.read_dx_header(dx_file)
+        with io.open_file(args.output, "wt") as cube_file:
+            io.write_cube_header(cube_file, dx_dict, atom_list)
+            # Stream the values so that the grid is never fully in memory
+            io.write_cube_values(
+                cube_file, io.iter_dx_values(dx_file, dx_dict)
+            )
@@ -14,6 +14,8 @@ class Nucleic(residue.Residue):
     below.
     """
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         sample_atom = atoms[-1]
 
@@ -33,6 +35,7 @@ class Nucleic(residue.Residue):
         self.is_n_term = 0
         self.missing = []
         self.reference = ref
+        self.type = None
 
         # Create each atom
         for atom in atoms:
@@ -77,6 +80,7 @@ class Nucleic(residue.Residue):
         :type atom:  Atom
         """
         self.atoms.append(atom)
+        self.atoms_changed()
         atomname = atom.name
         self.map[atomname] = atom
         try:
@@ -110,6 +114,8 @@ class Nucleic(residue.Residue):
 class ADE(Nucleic):
     """Adenosine class."""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize residue.
 
@@ -140,6 +146,8 @@ RA = ADE
 class CYT(Nucleic):
     """Cytidine class"""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize residue.
 
@@ -170,6 +178,8 @@ RC = CYT
 class GUA(Nucleic):
     """Guanosine class"""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize residue.
 
@@ -200,6 +210,8 @@ RG = GUA
 class THY(Nucleic):
     """Thymine class"""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize residue.
 
@@ -229,6 +241,8 @@ DT = THY
 class URA(Nucleic):
     """Uridine class"""
 
+    __slots__ = ()
+
     def __init__(self, atoms, ref):
         """Initialize residue.
 
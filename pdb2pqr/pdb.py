@@ -9,7 +9,11 @@ the classes is taken directly from the above PDB Format Description.
 .. codeauthor::  Yong Huang
 .. codeauthor::  Nathan Baker
 """
+import gc
+import itertools
 import logging
+from contextlib import contextmanager
+import numpy as np
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -33,6 +37,8 @@ class BaseRecord:
     Verifies the received record type.
     """
 
+    __slots__ = ("original_text",)
+
     def __init__(self, line):
         record = line[0:6].strip()
         if record != self.__class__.__name__:
@@ -510,6 +516,31 @@ class HETATM(BaseRecord):
     molecules and atoms presented in HET groups.
     """
 
+    __slots__ = (
+        "serial",
+        "name",
+        "alt_loc",
+        "res_name",
+        "chain_id",
+        "res_seq",
+        "ins_code",
+        "x",
+        "y",
+        "z",
+        "occupancy",
+        "temp_factor",
+        "seg_id",
+        "element",
+        "charge",
+        "sybyl_type",
+        "l_bonded_atoms",
+        "l_bonds",
+        "radius",
+        "is_c_term",
+        "is_n_term",
+        "mol2charge",
+    )
+
     def __init__(
         self, line, sybyl_type="A.aaa", l_bonds=[], l_bonded_atoms=[]
     ):
@@ -604,6 +635,24 @@ class ATOM(BaseRecord):
     optional.
     """
 
+    __slots__ = (
+        "serial",
+        "name",
+        "alt_loc",
+        "res_name",
+        "chain_id",
+        "res_seq",
+        "ins_code",
+        "x",
+        "y",
+        "z",
+        "occupancy",
+        "temp_factor",
+        "seg_id",
+        "element",
+        "charge",
+    )
+
     def __init__(self, line):
         """Initialize by parsing line
 
@@ -2548,60 +2597,387 @@ def read_atom(line):
     return klass(newline)
 
 
-def read_pdb(file_):
-    """Parse PDB-format data into array of Atom objects.
+@contextmanager
+def paused_gc():
+    """Pause garbage collection while building many record objects.
+
+    Records don't form reference cycles, so the collections triggered by
+    allocating them are wasted work.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def parse_record(line, errlist):
+    """Parse a single PDB record.
+
+    :param line:  the stripped line to parse
+    :type line:  str
+    :param errlist:  list of record names that couldn't be parsed; updated
+        with new failures
+    :type errlist:  [str]
+    :raises ValueError:  for ATOM and HETATM records that can't be parsed
+    :return:  object from this module or None
+    """
+    record = ""
+    try:
+        record = line[0:6].strip()
+        if record not in errlist:
+            klass = LINE_PARSERS[record]
+            return klass(line)
+    except (KeyError, ValueError) as details:
+        if record not in ["HETATM", "ATOM"]:
+            errlist.append(record)
+            _LOGGER.error(f"Error parsing line: {details}")
+            _LOGGER.error(f"<{line.strip()}>")
+            _LOGGER.error(
+                f"Truncating remaining errors for record type:{record}"
+            )
+        else:
+            raise details
+    except IndexError as details:
+        if record in ["ATOM", "HETATM"]:
+            try:
+                return read_atom(line)
+            except IndexError as details:
+                _LOGGER.error(f"Error parsing line: {details},")
+                _LOGGER.error(f"<{line.strip()}>")
+        elif record in ["SITE", "TURN"]:
+            pass
+        elif record in ["SSBOND", "LINK"]:
+            _LOGGER.error("Warning -- ignoring record:")
+            _LOGGER.error(f"<{line.strip()}>")
+        else:
+            _LOGGER.error(f"Error parsing line: {details},")
+            _LOGGER.error(f"<{line.strip()}>")
+    return None
+
+
+class AtomColumns:
+    """Column arrays for the ATOM and HETATM records of a PDB file.
+
+    The fixed-width fields of all records are sliced and converted at once
+    rather than record by record; :meth:`records` builds the equivalent
+    :class:`ATOM` and :class:`HETATM` objects when they are needed.
+    """
+
+    # Width of the fixed-width records
+    WIDTH = 80
+    # Fields stored as arrays of strings
+    STRING_FIELDS = [
+        "record",
+        "name",
+        "alt_loc",
+        "res_name",
+        "chain_id",
+        "ins_code",
+        "seg_id",
+        "element",
+        "charge",
+    ]
+
+    def __init__(self, lines, positions):
+        """Initialize by parsing lines.
+
+        :param lines:  stripped ATOM and HETATM lines that are at least long
+            enough to contain the coordinates
+        :type lines:  [str]
+        :param positions:  positions of the records in the complete list of
+            records from the file
+        :type positions:  [int]
+        :raises ValueError:  for records that can't be parsed this way
+        """
+        self.lines = list(lines)
+        self.positions = np.array(positions, dtype=int)
+        # Lines are truncated or padded (with null characters, which are
+        # ignored like trailing blanks) to the record width
+        try:
+            table = np.array(self.lines, dtype=f"S{self.WIDTH}")
+        except UnicodeEncodeError as err:
+            raise ValueError(f"Non-ASCII coordinate record: {err}")
+        self._table = table.view("S1").reshape(-1, self.WIDTH)
+        self.record = self._strings(0, 6)
+        self.serial = self._table_slice(6, 11).astype(int)
+        self.name = self._strings(12, 16)
+        self.alt_loc = self._strings(16, 17)
+        self.res_name = self._strings(17, 20)
+        self.chain_id = self._strings(21, 22)
+        self.res_seq = self._table_slice(22, 26).astype(int)
+        self.ins_code = self._strings(26, 27)
+        self.coords = np.column_stack(
+            [self._table_slice(start, start + 8) for start in (30, 38, 46)]
+        ).astype(float)
+        self.seg_id = self._strings(72, 76)
+        self.element = self._strings(76, 78)
+        self.charge = self._strings(78, 80)
+        try:
+            self.occupancy = self._table_slice(54, 60).astype(float)
+            self.temp_factor = self._table_slice(60, 66).astype(float)
+        except ValueError:
+            self._parse_optional()
+        del self._table
+
+    @classmethod
+    def from_values(cls, lines, positions, **values):
+        """Initialize from values that have already been parsed.
+
+        Unlike fixed-width PDB records, the values are not limited in size.
+
+        :param lines:  original text of the records
+        :type lines:  [str]
+        :param positions:  positions of the records in the complete list of
+            records
+        :type positions:  [int]
+        :param values:  sequences of values for the ``serial``, ``res_seq``,
+            ``coords`` (N, 3), ``occupancy``, and ``temp_factor`` fields and
+            the fields in :attr:`STRING_FIELDS`
+        :return:  new object
+        :rtype:  AtomColumns
+        """
+        columns = cls.__new__(cls)
+        columns.lines = list(lines)
+        columns.positions = np.array(positions, dtype=int)
+        for name in cls.STRING_FIELDS:
+            setattr(columns, name, np.array(values[name], dtype=str))
+        columns.serial = np.array(values["serial"], dtype=int)
+        columns.res_seq = np.array(values["res_seq"], dtype=int)
+        columns.coords = np.array(values["coords"], dtype=float).reshape(
+            -1, 3
+        )
+        columns.occupancy = np.array(values["occupancy"], dtype=float)
+        columns.temp_factor = np.array(values["temp_factor"], dtype=float)
+        return columns
+
+    def _table_slice(self, start, stop):
+        """Get a column slice of the records as fixed-width byte strings.
+
+        :param start:  first column (0-based)
+        :type start:  int
+        :param stop:  last column (exclusive)
+        :type stop:  int
+        :return:  array of byte strings
+        :rtype:  numpy.ndarray
+        """
+        return np.ascontiguousarray(self._table[:, start:stop]).view(
+            f"S{stop - start}"
+        )[:, 0]
+
+    def _strings(self, start, stop):
+        """Get a column slice of the records as stripped strings.
+
+        :param start:  first column (0-based)
+        :type start:  int
+        :param stop:  last column (exclusive)
+        :type stop:  int
+        :return:  array of strings
+        :rtype:  numpy.ndarray
+        """
+        # Widen the ASCII bytes to UCS4 code points rather than decoding
+        # each string
+        columns = np.ascontiguousarray(self._table[:, start:stop])
+        codes = columns.view(np.uint8).astype(np.uint32)
+        return np.char.strip(codes.view(f"U{stop - start}")[:, 0])
+
+    def _parse_optional(self):
+        """Parse the optional fields record by record.
+
+        As for :class:`ATOM`, records with missing or invalid occupancy or
+        temperature factor fields get default values for all optional
+        fields.
+        """
+        num_atoms = len(self.lines)
+        self.occupancy = np.zeros(num_atoms)
+        self.temp_factor = np.zeros(num_atoms)
+        for iatom, line in enumerate(self.lines):
+            try:
+                self.occupancy[iatom] = float(line[54:60].strip())
+                self.temp_factor[iatom] = float(line[60:66].strip())
+            except ValueError:
+                self.occupancy[iatom] = 0.00
+                self.temp_factor[iatom] = 0.00
+                self.seg_id[iatom] = ""
+                self.element[iatom] = ""
+                self.charge[iatom] = ""
+
+    def __len__(self):
+        return len(self.lines)
+
+    def records(self):
+        """Build the :class:`ATOM` and :class:`HETATM` objects.
+
+        The objects are the same as those built by parsing each line.
+
+        :return:  list of objects from this module
+        :rtype:  list
+        """
+        sybyl_type, l_bonds, l_bonded_atoms = HETATM.__init__.__defaults__
+        records = []
+        with paused_gc():
+            records += self._build_records(sybyl_type, l_bonds, l_bonded_atoms)
+        return records
+
+    def _build_records(self, sybyl_type, l_bonds, l_bonded_atoms):
+        """Generate the :class:`ATOM` and :class:`HETATM` objects.
+
+        :param sybyl_type:  default SYBYL type for :class:`HETATM` objects
+        :type sybyl_type:  str
+        :param l_bonds:  default bond list for :class:`HETATM` objects
+        :type l_bonds:  list
+        :param l_bonded_atoms:  default bonded atom list for :class:`HETATM`
+            objects
+        :type l_bonded_atoms:  list
+        :return:  generator of objects from this module
+        """
+        for (
+            line,
+            record,
+            serial,
+            name,
+            alt_loc,
+            res_name,
+            chain_id,
+            res_seq,
+            ins_code,
+            (x, y, z),
+            occupancy,
+            temp_factor,
+            seg_id,
+            element,
+            charge,
+        ) in zip(
+            self.lines,
+            self.record.tolist(),
+            self.serial.tolist(),
+            self.name.tolist(),
+            self.alt_loc.tolist(),
+            self.res_name.tolist(),
+            self.chain_id.tolist(),
+            self.res_seq.tolist(),
+            self.ins_code.tolist(),
+            self.coords.tolist(),
+            self.occupancy.tolist(),
+            self.temp_factor.tolist(),
+            self.seg_id.tolist(),
+            self.element.tolist(),
+            self.charge.tolist(),
+        ):
+            if record == "ATOM":
+                obj = ATOM.__new__(ATOM)
+            else:
+                obj = HETATM.__new__(HETATM)
+            obj.original_text = line
+            obj.serial = serial
+            obj.name = name
+            obj.alt_loc = alt_loc
+            obj.res_name = res_name
+            obj.chain_id = chain_id
+            obj.res_seq = res_seq
+            obj.ins_code = ins_code
+            obj.x = x
+            obj.y = y
+            obj.z = z
+            if record != "ATOM":
+                obj.sybyl_type = sybyl_type
+                obj.l_bonded_atoms = l_bonded_atoms
+                obj.l_bonds = l_bonds
+                obj.radius = 1.0
+                obj.is_c_term = 0
+                obj.is_n_term = 0
+                obj.mol2charge = None
+            obj.occupancy = occupancy
+            obj.temp_factor = temp_factor
+            obj.seg_id = seg_id
+            obj.element = element
+            obj.charge = charge
+            yield obj
+
+
+def read_pdb_columns(file_):
+    """Parse PDB-format data into column arrays of coordinate records.
+
+    ATOM and HETATM records are collected in an :class:`AtomColumns` object
+    and parsed column by column; all other records are parsed into objects
+    from this module.
 
     :param file_:  open File-like object
     :type file_:  file
-    :return:  (a list of objects from this module, a list of record names that
-        couldn't be parsed)
-    :rtype:  (list, list)
+    :return:  (a list of objects from this module for the other records,
+        column arrays for the ATOM and HETATM records, a list of record names
+        that couldn't be parsed)
+    :rtype:  (list, AtomColumns, list)
     """
     pdblist = []  # Array of parsed lines (as objects)
     errlist = []  # List of records we can't parse
 
     # We can come up with nothing if can't get our file off the web.
     if file_ is None:
-        return pdblist, errlist
-
-    while True:
-        line = file_.readline().strip()
-        if line == "":
-            break
-
-        # We assume we have a method for each PDB record and can therefore
-        # parse them automatically
-        record = ""
-        try:
-            record = line[0:6].strip()
-            if record not in errlist:
-                klass = LINE_PARSERS[record]
-                obj = klass(line)
-                pdblist.append(obj)
-        except (KeyError, ValueError) as details:
-            if record not in ["HETATM", "ATOM"]:
-                errlist.append(record)
-                _LOGGER.error(f"Error parsing line: {details}")
-                _LOGGER.error(f"<{line.strip()}>")
-                _LOGGER.error(
-                    f"Truncating remaining errors for record type:{record}"
-                )
+        return pdblist, AtomColumns([], []), errlist
+
+    lines = [line.strip() for line in file_.read().split("\n")]
+    # Parsing stops at the first blank line
+    if "" in lines:
+        del lines[lines.index("") :]
+    is_atom = [
+        line[0:6] in ("ATOM  ", "HETATM") and len(line) >= 54
+        for line in lines
+    ]
+    atom_lines = list(itertools.compress(lines, is_atom))
+    positions = []
+    with paused_gc():
+        for line, atom in zip(lines, is_atom):
+            if atom:
+                positions.append(len(pdblist) + len(positions))
             else:
-                raise details
-        except IndexError as details:
-            if record in ["ATOM", "HETATM"]:
-                try:
-                    obj = read_atom(line)
+                obj = parse_record(line, errlist)
+                if obj is not None:
                     pdblist.append(obj)
-                except IndexError as details:
-                    _LOGGER.error(f"Error parsing line: {details},")
-                    _LOGGER.error(f"<{line.strip()}>")
-            elif record in ["SITE", "TURN"]:
-                pass
-            elif record in ["SSBOND", "LINK"]:
-                _LOGGER.error("Warning -- ignoring record:")
-                _LOGGER.error(f"<{line.strip()}>")
-            else:
-                _LOGGER.error(f"Error parsing line: {details},")
-                _LOGGER.error(f"<{line.strip()}>")
-    return pdblist, errlist
+    try:
+        columns = AtomColumns(atom_lines, positions)
+    except ValueError:
+        # Find (and raise) the error by parsing each record; records that
+        # can be parsed that way are kept as objects
+        records = [parse_record(line, errlist) for line in atom_lines]
+        for position, record in zip(positions, records):
+            pdblist.insert(position, record)
+        columns = AtomColumns([], [])
+    return pdblist, columns, errlist
+
+
+def merge_records(pdblist, columns):
+    """Merge coordinate records into a list of other records.
+
+    :param pdblist:  list of other records from :func:`read_pdb_columns`
+    :type pdblist:  list
+    :param columns:  column arrays for coordinate records
+    :type columns:  AtomColumns
+    :return:  list of all records in file order
+    :rtype:  list
+    """
+    if len(columns) == 0:
+        return pdblist
+    records = [None] * (len(pdblist) + len(columns))
+    for position, record in zip(columns.positions.tolist(), columns.records()):
+        records[position] = record
+    other_records = iter(pdblist)
+    for position, record in enumerate(records):
+        if record is None:
+            records[position] = next(other_records)
+    return records
+
+
+def read_pdb(file_):
+    """Parse PDB-format data into array of Atom objects.
+
+    :param file_:  open File-like object
+    :type file_:  file
+    :return:  (a list of objects from this module, a list of record names that
+        couldn't be parsed)
+    :rtype:  (list, list)
+    """
+    pdblist, columns, errlist = read_pdb_columns(file_)
+    return merge_records(pdblist, columns), errlist
@@ -0,0 +1,226 @@
+"""Timing and memory profiles of the stages of a PDB2PQR run.
+
+While a :class:`Profile` is active (see :func:`profile`), each stage of the
+calculation (parsing, repairs, debumping, PROPKA, hydrogen addition and
+optimization, forcefield assignment, output) records its wall time, CPU
+time, peak memory, and counters such as the numbers of atoms, residues,
+neighbor queries, dihedral angle trials, and hydrogen bond networks::
+
+    import json
+    import pdb2pqr
+    from pdb2pqr import profiling
+
+    with profiling.profile() as prof:
+        result = pdb2pqr.process("1abc.pdb", {"ff": "AMBER"})
+    print(json.dumps(prof.report(), indent=2))
+
+``pdb2pqr30 --profile`` writes the same report next to the output PQR file
+and :func:`pdb2pqr.process` adds it to the result when the ``profile``
+option is set.
+Stages that run in worker processes (``--ph-jobs`` and ``--opt-jobs``) are
+recorded as part of the stage that started the workers.
+
+.. codeauthor:: Nathan Baker (et al.)
+"""
+import contextlib
+import json
+import logging
+import platform
+import sys
+import time
+from . import io
+from .config import VERSION
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Stack of active profiles; see profile()
+_ACTIVE = []
+
+
+def peak_memory():
+    """Get the peak resident set size of this process.
+
+    :return:  peak memory in bytes or None if it is not available
+    :rtype:  int
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes and macOS reports bytes
+    return peak if sys.platform == "darwin" else 1024 * peak
+
+
+def get_profile_path(output_pqr):
+    """Get the path of the profile report for an output PQR file.
+
+    :param output_pqr:  output PQR path
+    :type output_pqr:  str
+    :return:  path of the JSON profile report
+    :rtype:  str
+    """
+    path = io.strip_compression_suffix(output_pqr)
+    return str(path.with_name(f"{path.stem}.profile.json"))
+
+
+class Profile:
+    """Wall time, CPU time, peak memory, and counters of calculation
+    stages."""
+
+    def __init__(self):
+        self.stages = []
+        self.counters = None
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.wall_time = None
+        self.cpu_time = None
+
+    @contextlib.contextmanager
+    def stage(self, name, biomolecule=None):
+        """Record a stage of the calculation.
+
+        Counters incremented during the stage (see :func:`count`) are
+        recorded with the stage (with the innermost stage for nested
+        stages).
+
+        :param name:  name of the stage
+        :type name:  str
+        :param biomolecule:  biomolecule whose numbers of atoms and residues
+            are recorded at the end of the stage
+        :type biomolecule:  Biomolecule
+        :return:  counters of the stage
+        :rtype:  dict
+        """
+        outer_counters = self.counters
+        counters = self.counters = {}
+        start_memory = peak_memory()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield counters
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.process_time() - start_cpu
+            memory = peak_memory()
+            self.counters = outer_counters
+            if biomolecule is not None:
+                counters["atoms"] = len(biomolecule.atoms)
+                counters["residues"] = len(biomolecule.residues)
+            self.stages.append(
+                {
+                    "stage": name,
+                    "wall_time": wall_time,
+                    "cpu_time": cpu_time,
+                    "peak_memory": memory,
+                    "peak_memory_increase": (
+                        None if memory is None else memory - start_memory
+                    ),
+                    "counters": counters,
+                }
+            )
+            _LOGGER.debug(
+                f"Stage {name}: {wall_time:.3f} s wall, {cpu_time:.3f} s CPU"
+            )
+
+    def count(self, name, value=1):
+        """Increment a counter of the current stage.
+
+        :param name:  name of the counter
+        :type name:  str
+        :param value:  increment
+        :type value:  int
+        """
+        if self.counters is not None:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stop(self):
+        """Stop the overall timers of the profile."""
+        self.wall_time = time.perf_counter() - self.start_wall
+        self.cpu_time = time.process_time() - self.start_cpu
+
+    def report(self):
+        """Get the profile as a JSON-compatible dictionary.
+
+        :return:  PDB2PQR and Python versions, overall wall and CPU times
+            (in seconds), peak memory (in bytes), and the record of each
+            stage in order
+        :rtype:  dict
+        """
+        if self.wall_time is None:
+            wall_time = time.perf_counter() - self.start_wall
+            cpu_time = time.process_time() - self.start_cpu
+        else:
+            wall_time = self.wall_time
+            cpu_time = self.cpu_time
+        return {
+            "version": VERSION,
+            "python": platform.python_version(),
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "peak_memory": peak_memory(),
+            "stages": self.stages,
+        }
+
+    def write(self, path):
+        """Write the profile report as JSON.
+
+        :param path:  path of the report
+        :type path:  str
+        """
+        with open(path, "wt") as profile_file:
+            json.dump(self.report(), profile_file, indent=2)
+
+
+@contextlib.contextmanager
+def profile(enabled=True):
+    """Activate a profile of the calculations in a ``with`` block.
+
+    :param enabled:  create a profile; if False, nothing is recorded and
+        None is returned
+    :type enabled:  bool
+    :return:  the active profile
+    :rtype:  Profile
+    """
+    if not enabled:
+        yield None
+        return
+    prof = Profile()
+    _ACTIVE.append(prof)
+    try:
+        yield prof
+    finally:
+        _ACTIVE.pop()
+        prof.stop()
+
+
+def stage(name, biomolecule=None):
+    """Record a stage of the calculation in the active profile.
+
+    :param name:  name of the stage
+    :type name:  str
+    :param biomolecule:  biomolecule whose numbers of atoms and residues
+        are recorded at the end of the stage
+    :type biomolecule:  Biomolecule
+    :return:  context manager for the stage (see :meth:`Profile.stage`)
+    """
+    if not _ACTIVE:
+        return contextlib.nullcontext({})
+    return _ACTIVE[-1].stage(name, biomolecule)
+
+
+def count(name, value=1):
+    """Increment a counter of the current stage of the active profile.
+
+    :param name:  name of the counter
+    :type name:  str
+    :param value:  increment
+    :type value:  int
+    """
+    if _ACTIVE:
+        _ACTIVE[-1].count(name, value)
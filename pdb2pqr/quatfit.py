@@ -20,6 +20,7 @@ Jan Labanowski, jkl@osc.edu, jkl@ohstpy.bitnet, ohstpy::jkl
 .. codeauthor:: Todd Dolinsky
 """
 import math
+import numpy as np
 from .utilities import normalize
 
 
@@ -49,6 +50,31 @@ def find_coordinates(numpoints, refcoords, defcoords, defatomcoords):
     return newcoords[0]
 
 
+def find_coordinates_batch(refcoords, defcoords, defatomcoords):
+    """Find the coordinates of new atoms for many independent frames.
+
+    Batched version of :func:`find_coordinates`: the definition coordinates
+    of each frame are superimposed on its reference coordinates (see
+    :func:`qfit_batch`) and the same transformation places the definition
+    coordinates of the new atoms of the frame.
+    The results are identical to those of :func:`find_coordinates` for each
+    frame.
+
+    :param refcoords:  the reference coordinates of each frame
+    :type refcoords:  numpy.ndarray with shape (N, P, 3)
+    :param defcoords:  the definition coordinates of each frame
+    :type defcoords:  numpy.ndarray with shape (N, P, 3)
+    :param defatomcoords:  the definition coordinates of the atoms to be
+        placed in each frame; one atom or M atoms per frame
+    :type defatomcoords:  numpy.ndarray with shape (N, 3) or (N, M, 3)
+    :return:  the coordinates of the new atoms in the reference frames, with
+        the shape of ``defatomcoords``
+    :rtype:  numpy.ndarray
+    """
+    refcenters, defcenters, rotations = qfit_batch(refcoords, defcoords)
+    return qtransform_batch(defatomcoords, refcenters, defcenters, rotations)
+
+
 def qtransform(numpoints, defcoords, refcenter, fitcenter, rotation):
     """Transform coordinates using the reference.
 
@@ -101,6 +127,281 @@ def qfit(numpoints, refcoords, defcoords):
     return refcenter, defcenter, lrot
 
 
+def qtransform_batch(defcoords, refcenters, fitcenters, rotations):
+    """Transform coordinates in many frames.
+
+    Batched version of :func:`qtransform`.
+
+    :param defcoords:  coordinates to be transformed in each frame; one
+        point or M points per frame
+    :type defcoords:  numpy.ndarray with shape (N, 3) or (N, M, 3)
+    :param refcenters:  the reference center of each frame
+    :type refcenters:  numpy.ndarray with shape (N, 3)
+    :param fitcenters:  the definition center of each frame
+    :type fitcenters:  numpy.ndarray with shape (N, 3)
+    :param rotations:  the left rotation matrix of each frame
+    :type rotations:  numpy.ndarray with shape (N, 3, 3)
+    :return:  the transformed coordinates, with the shape of ``defcoords``
+    :rtype:  numpy.ndarray
+    """
+    defcoords = np.asarray(defcoords, dtype=float)
+    single = defcoords.ndim == 2
+    if single:
+        defcoords = defcoords[:, np.newaxis, :]
+    fitcoords = defcoords - fitcenters[:, np.newaxis, :]
+    rotated = rotmol_batch(fitcoords, rotations)
+    newcoords = rotated + refcenters[:, np.newaxis, :]
+    return newcoords[:, 0, :] if single else newcoords
+
+
+def qfit_batch(refcoords, defcoords, nrot=30):
+    """Superimpose many sets of definition coordinates on reference
+    coordinates.
+
+    Batched version of :func:`qfit`; the arithmetic of each frame is the
+    same as for :func:`qfit`, so the results are identical.
+
+    :param refcoords:  the reference coordinates of each frame
+    :type refcoords:  numpy.ndarray with shape (N, P, 3)
+    :param defcoords:  the definition coordinates of each frame
+    :type defcoords:  numpy.ndarray with shape (N, P, 3)
+    :param nrot:  the maximum number of Jacobi sweeps
+    :type nrot:  int
+    :return:  (reference centers (N, 3), definition centers (N, 3), left
+        rotation matrices (N, 3, 3))
+    :rtype:  (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    refcenters, refcoords = center_batch(refcoords)
+    defcenters, defcoords = center_batch(defcoords)
+    _, rotations = qtrfit_batch(defcoords, refcoords, nrot)
+    return refcenters, defcenters, rotations
+
+
+def qtrfit_batch(defcoords, refcoords, nrot):
+    """Find the best-fit quaternions for many frames.
+
+    Batched version of :func:`qtrfit`.
+
+    :param defcoords:  centered definition coordinates of each frame
+    :type defcoords:  numpy.ndarray with shape (N, P, 3)
+    :param refcoords:  centered reference coordinates of each frame
+    :type refcoords:  numpy.ndarray with shape (N, P, 3)
+    :param nrot:  the maximum number of Jacobi sweeps
+    :type nrot:  int
+    :return:  (best-fit quaternions (N, 4), left rotation matrices
+        (N, 3, 3))
+    :rtype:  (numpy.ndarray, numpy.ndarray)
+    """
+    # corr[:, i, j] is the sum over the points of the products of
+    # definition coordinate i and reference coordinate j (e.g., xxyy for
+    # i = 0 and j = 1), accumulated in the order of qtrfit()
+    corr = np.zeros((len(defcoords), 3, 3))
+    for ipoint in range(defcoords.shape[1]):
+        corr += (
+            defcoords[:, ipoint, :, np.newaxis]
+            * refcoords[:, ipoint, np.newaxis, :]
+        )
+    cmat = np.zeros((len(corr), 4, 4))
+    cmat[:, 0, 0] = corr[:, 0, 0] + corr[:, 1, 1] + corr[:, 2, 2]
+    cmat[:, 0, 1] = corr[:, 2, 1] - corr[:, 1, 2]
+    cmat[:, 0, 2] = corr[:, 0, 2] - corr[:, 2, 0]
+    cmat[:, 0, 3] = corr[:, 1, 0] - corr[:, 0, 1]
+    cmat[:, 1, 1] = corr[:, 0, 0] - corr[:, 1, 1] - corr[:, 2, 2]
+    cmat[:, 1, 2] = corr[:, 0, 1] + corr[:, 1, 0]
+    cmat[:, 1, 3] = corr[:, 2, 0] + corr[:, 0, 2]
+    cmat[:, 2, 2] = corr[:, 1, 1] - corr[:, 2, 2] - corr[:, 0, 0]
+    cmat[:, 2, 3] = corr[:, 1, 2] + corr[:, 2, 1]
+    cmat[:, 3, 3] = corr[:, 2, 2] - corr[:, 0, 0] - corr[:, 1, 1]
+    _, vmat = jacobi_batch(cmat, nrot)
+    quats = vmat[:, :, 3]
+    return quats, q2mat_batch(quats)
+
+
+def jacobi_batch(amat, nrot):
+    """Jacobi diagonalizer with sorted output for many 4x4 matrices.
+
+    Batched version of :func:`jacobi`: each matrix goes through the same
+    rotations (and stops after the same sweep) as with :func:`jacobi`.
+
+    :param amat:  matrices to diagonalize (only the upper triangles are
+        used)
+    :type amat:  numpy.ndarray with shape (N, 4, 4)
+    :param nrot:  maximum number of sweeps
+    :type nrot:  int
+    :return:  (eigenvalues (N, 4), eigenvectors (N, 4, 4))
+    :rtype:  (numpy.ndarray, numpy.ndarray)
+    """
+    amat = np.array(amat, dtype=float)
+    num = len(amat)
+    diagonal = (slice(None), range(4), range(4))
+    vmat = np.zeros((num, 4, 4))
+    vmat[diagonal] = 1.0
+    dvec = amat[diagonal].copy()
+    active = np.ones(num, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(nrot):
+            dnorm = np.zeros(num)
+            onorm = np.zeros(num)
+            for j in range(4):
+                dnorm += np.abs(dvec[:, j])
+                for i in range(j):
+                    onorm += np.abs(amat[:, i, j])
+            active &= ~((dnorm != 0) & (onorm / dnorm <= 1e-12))
+            if not active.any():
+                break
+            for j in range(1, 4):
+                for i in range(j):
+                    _jacobi_rotation(amat, vmat, dvec, active, i, j)
+    # Sort the eigenvalues (and eigenvectors) in ascending order
+    rows = np.arange(num)
+    for j in range(3):
+        kmin = np.full(num, j)
+        dtemp = dvec[:, j].copy()
+        for i in range(j + 1, 4):
+            less = dvec[:, i] < dtemp
+            kmin = np.where(less, i, kmin)
+            dtemp = np.where(less, dvec[:, i], dtemp)
+        dvec[rows, kmin] = dvec[:, j]
+        dvec[:, j] = dtemp
+        vtemp = vmat[rows, :, kmin].copy()
+        vmat[rows, :, kmin] = vmat[:, :, j]
+        vmat[:, :, j] = vtemp
+    return dvec, vmat
+
+
+def _jacobi_rotation(amat, vmat, dvec, active, i, j):
+    """Apply the Jacobi rotation for element (i, j) to many matrices.
+
+    The matrices, eigenvectors, and eigenvalues are updated in place for the
+    active matrices with a non-zero (i, j) element, in the same way as in
+    :func:`jacobi`.
+
+    :param amat:  matrices being diagonalized
+    :type amat:  numpy.ndarray with shape (N, 4, 4)
+    :param vmat:  eigenvectors
+    :type vmat:  numpy.ndarray with shape (N, 4, 4)
+    :param dvec:  eigenvalues
+    :type dvec:  numpy.ndarray with shape (N, 4)
+    :param active:  matrices that have not converged
+    :type active:  numpy.ndarray with shape (N,)
+    :param i:  row of the element
+    :type i:  int
+    :param j:  column of the element
+    :type j:  int
+    """
+    bscl = amat[:, i, j].copy()
+    update = active & (np.abs(bscl) > 0.0)
+    if not update.any():
+        return
+    dma = dvec[:, j] - dvec[:, i]
+    small = np.abs(dma) + np.abs(bscl) <= np.abs(dma)
+    qscl = 0.5 * dma / bscl
+    tscl = 1.0 / (np.abs(qscl) + np.sqrt(1 + qscl * qscl))
+    tscl = np.where(qscl < 0, tscl * -1, tscl)
+    tscl = np.where(small, bscl / dma, tscl)
+    cscl = 1.0 / np.sqrt(tscl * tscl + 1)
+    sscl = tscl * cscl
+
+    def rotate(array, index1, index2, index3):
+        """Rotate a pair of elements of the updated matrices."""
+        old1 = array[(slice(None),) + index1]
+        old2 = array[(slice(None),) + index2]
+        new1 = cscl * old1 - sscl * old2
+        new2 = sscl * old1 + cscl * old2
+        array[(slice(None),) + index3] = np.where(
+            update, new2, array[(slice(None),) + index3]
+        )
+        array[(slice(None),) + index1] = np.where(update, new1, old1)
+
+    amat[:, i, j] = np.where(update, 0.0, bscl)
+    for k in range(i):
+        rotate(amat, (k, i), (k, j), (k, j))
+    for k in range(i + 1, j):
+        rotate(amat, (i, k), (k, j), (k, j))
+    for k in range(j + 1, 4):
+        rotate(amat, (i, k), (j, k), (j, k))
+    for k in range(4):
+        rotate(vmat, (k, i), (k, j), (k, j))
+    dtemp = (
+        cscl * cscl * dvec[:, i]
+        + sscl * sscl * dvec[:, j]
+        - 2.0 * cscl * sscl * bscl
+    )
+    dnew = (
+        sscl * sscl * dvec[:, i]
+        + cscl * cscl * dvec[:, j]
+        + 2.0 * cscl * sscl * bscl
+    )
+    dvec[:, j] = np.where(update, dnew, dvec[:, j])
+    dvec[:, i] = np.where(update, dtemp, dvec[:, i])
+
+
+def q2mat_batch(quats):
+    """Generate left rotation matrices from normalized quaternions.
+
+    Batched version of :func:`q2mat`.
+
+    :param quats:  the normalized quaternions
+    :type quats:  numpy.ndarray with shape (N, 4)
+    :return:  the rotation matrices
+    :rtype:  numpy.ndarray with shape (N, 3, 3)
+    """
+    q0, q1, q2, q3 = np.asarray(quats, dtype=float).T
+    urot = np.empty((len(q0), 3, 3))
+    urot[:, 0, 0] = q0 * q0 + q1 * q1 - q2 * q2 - q3 * q3
+    urot[:, 0, 1] = 2.0 * (q1 * q2 - q0 * q3)
+    urot[:, 0, 2] = 2.0 * (q1 * q3 + q0 * q2)
+    urot[:, 1, 0] = 2.0 * (q2 * q1 + q0 * q3)
+    urot[:, 1, 1] = q0 * q0 - q1 * q1 + q2 * q2 - q3 * q3
+    urot[:, 1, 2] = 2.0 * (q2 * q3 - q0 * q1)
+    urot[:, 2, 0] = 2.0 * (q3 * q1 - q0 * q2)
+    urot[:, 2, 1] = 2.0 * (q3 * q2 + q0 * q1)
+    urot[:, 2, 2] = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+    return urot
+
+
+def rotmol_batch(coor, lrot):
+    """Rotate many molecules.
+
+    Batched version of :func:`rotmol`.
+
+    :param coor:  the input coordinates of each molecule
+    :type coor:  numpy.ndarray with shape (N, M, 3)
+    :param lrot:  the left rotation matrix of each molecule
+    :type lrot:  numpy.ndarray with shape (N, 3, 3)
+    :return:  the rotated coordinates
+    :rtype:  numpy.ndarray with shape (N, M, 3)
+    """
+    lrot = lrot[:, np.newaxis, :, :]
+    out = np.empty(coor.shape)
+    for j in range(3):
+        out[..., j] = (
+            lrot[..., 0, j] * coor[..., 0]
+            + lrot[..., 1, j] * coor[..., 1]
+            + lrot[..., 2, j] * coor[..., 2]
+        )
+    return out
+
+
+def center_batch(coords):
+    """Center many molecules using equally weighted points.
+
+    Batched version of :func:`center`.
+
+    :param coords:  the coordinates of each molecule
+    :type coords:  numpy.ndarray with shape (N, P, 3)
+    :return:  (centers (N, 3), coordinates relative to the centers
+        (N, P, 3))
+    :rtype:  (numpy.ndarray, numpy.ndarray)
+    """
+    coords = np.asarray(coords, dtype=float)
+    centers = np.zeros((len(coords), 3))
+    for ipoint in range(coords.shape[1]):
+        centers += coords[:, ipoint, :]
+    centers /= coords.shape[1]
+    return centers, coords - centers[:, np.newaxis, :]
+
+
 def qchichange(initcoords, refcoords, angle):
     """Change the chiangle of the reference coordinate.
 
@@ -161,6 +462,37 @@ def qchichange(initcoords, refcoords, angle):
     return rotmol(numpoints, refcoords, right)
 
 
+def qchichange_matrices(initcoords, angles):
+    """Get the rotation matrices for several changes of a chiangle.
+
+    Vectorized version of the matrix construction in :func:`qchichange`: the
+    rotated coordinates for the ``i``-th angle are ``refcoords @ result[i]``.
+
+    :param initcoords:  coordinates based on the point and basis atoms
+        (one-dimensional list)
+    :type initcoords:  [float, float, float]
+    :param angles:  the angles to use (in degrees)
+    :type angles:  [float]
+    :return:  array of left rotation matrices with shape (len(angles), 3, 3)
+    :rtype:  numpy.ndarray
+    """
+    radangles = math.pi * np.asarray(angles, dtype=float) / 180.0
+    left = normalize(initcoords)
+    cos = np.cos(radangles)
+    sin = np.sin(radangles)
+    one_minus_cos = 1.0 - cos
+    right = np.empty((len(radangles), 3, 3))
+    for i in range(3):
+        right[:, i, i] = cos + left[i] * left[i] * one_minus_cos
+    right[:, 1, 0] = left[0] * left[1] * one_minus_cos - left[2] * sin
+    right[:, 2, 0] = left[0] * left[2] * one_minus_cos + left[1] * sin
+    right[:, 0, 1] = left[1] * left[0] * one_minus_cos + left[2] * sin
+    right[:, 2, 1] = left[1] * left[2] * one_minus_cos - left[0] * sin
+    right[:, 0, 2] = left[2] * left[0] * one_minus_cos - left[1] * sin
+    right[:, 1, 2] = left[2] * left[1] * one_minus_cos + left[0] * sin
+    return right
+
+
 def rotmol(numpoints, coor, lrot):
     """Rotate a molecule
 
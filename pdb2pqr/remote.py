@@ -0,0 +1,420 @@
+"""Retrieval and caching of structures from the Protein Data Bank.
+
+Structures requested by PDB ID (rather than by path) are downloaded from the
+RCSB PDB through a shared HTTP session with connection pooling and a
+timeout, and kept in an on-disk cache so that later runs do not download
+them again::
+
+    pdb2pqr30-prefetch --jobs 8 1abc 2xyz 3def
+
+(``pdb2pqr30-batch --prefetch`` does the same for the inputs of a batch.)
+
+The cache is content-addressed: each downloaded file is stored once under
+the SHA-256 hash of its contents in the ``structures`` subdirectory of the
+cache directory (see :func:`pdb2pqr.cache.get_cache_dir`), and small
+reference files map PDB IDs to those hashes.
+Files that have not been used recently are removed when the cache grows
+beyond :makevar:`PDB2PQR_PDB_CACHE_MB` megabytes.
+
+Structures can be retrieved from a mirror instead of the RCSB PDB by setting
+:makevar:`PDB2PQR_PDB_MIRROR` to a URL template or to a local directory with
+``{ID}.pdb`` or ``{ID}.cif`` files (optionally compressed with gzip,
+bzip2, or xz).
+
+.. codeauthor:: Nathan Baker (et al.)
+"""
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from . import cache
+from .config import TITLE_STR, PDB_URL, PDB_MIRROR_ENV, PDB_CACHE_MB_ENV
+from .config import PDB_CACHE_MB, DOWNLOAD_TIMEOUT, PREFETCH_JOBS
+from .config import COMPRESSION_SUFFIXES
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Shared HTTP session; see get_session()
+_SESSION = {}
+
+
+def get_session():
+    """Get the HTTP session shared by all downloads.
+
+    The session keeps connections to the server open between downloads and
+    its connection pool is large enough for :data:`PREFETCH_JOBS` concurrent
+    downloads.
+
+    :return:  HTTP session
+    :rtype:  requests.Session
+    """
+    if "session" not in _SESSION:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=PREFETCH_JOBS, pool_maxsize=PREFETCH_JOBS
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _SESSION["session"] = session
+    return _SESSION["session"]
+
+
+def normalize_id(pdb_id):
+    """Normalize a PDB ID for use as a cache key.
+
+    :param pdb_id:  PDB ID (case-insensitive)
+    :type pdb_id:  str
+    :raises ValueError:  if the ID contains characters other than letters,
+        digits, and underscores
+    :return:  upper-case PDB ID
+    :rtype:  str
+    """
+    pdb_id = pdb_id.strip().upper()
+    if not pdb_id or not pdb_id.replace("_", "").isalnum():
+        raise ValueError(f"Invalid PDB ID: {pdb_id!r}")
+    return pdb_id
+
+
+class StructureCache:
+    """Content-addressed on-disk cache of downloaded structure files.
+
+    File contents are stored in ``objects/{sha256}`` and PDB IDs are mapped
+    to contents by ``ids/{ID}.{format}`` files that hold the hash.
+    Reading an entry updates the modification time of its contents, which
+    sets the order in which entries are evicted when the cache is larger
+    than its size limit.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        """Initialize the cache.
+
+        :param directory:  cache directory; defaults to the ``structures``
+            subdirectory of :func:`pdb2pqr.cache.get_cache_dir`
+        :type directory:  str or Path
+        :param max_bytes:  size limit of the cached contents; defaults to
+            :makevar:`PDB2PQR_PDB_CACHE_MB` (or :data:`PDB_CACHE_MB`)
+            megabytes
+        :type max_bytes:  int
+        """
+        if directory is None:
+            directory = cache.get_cache_dir() / "structures"
+        if max_bytes is None:
+            max_mb = float(os.environ.get(PDB_CACHE_MB_ENV, PDB_CACHE_MB))
+            max_bytes = int(max_mb * 2**20)
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def get_object_path(self, digest):
+        """Get the path of cached contents.
+
+        :param digest:  SHA-256 hash of the contents
+        :type digest:  str
+        :return:  path of contents
+        :rtype:  Path
+        """
+        return self.directory / "objects" / digest
+
+    def get_id_path(self, pdb_id, file_format):
+        """Get the path of the reference file of a PDB ID.
+
+        :param pdb_id:  normalized PDB ID
+        :type pdb_id:  str
+        :param file_format:  file format (``pdb`` or ``cif``)
+        :type file_format:  str
+        :return:  path of reference file
+        :rtype:  Path
+        """
+        return self.directory / "ids" / f"{pdb_id}.{file_format}"
+
+    def load(self, pdb_id, file_format="pdb"):
+        """Load a structure file from the cache.
+
+        :param pdb_id:  normalized PDB ID
+        :type pdb_id:  str
+        :param file_format:  file format (``pdb`` or ``cif``)
+        :type file_format:  str
+        :return:  file contents or None if not cached
+        :rtype:  bytes
+        """
+        try:
+            digest = self.get_id_path(pdb_id, file_format).read_text()
+            path = self.get_object_path(digest.strip())
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != path.name:
+            _LOGGER.debug(f"Ignoring corrupted cache file {path}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        _LOGGER.debug(f"Loaded {pdb_id}.{file_format} from cache file {path}")
+        return data
+
+    def store(self, pdb_id, file_format, data):
+        """Store a structure file in the cache.
+
+        Files are written to temporary files and moved into place so that
+        concurrent processes never see partial files.  Failures to write the
+        cache are logged and otherwise ignored.
+
+        :param pdb_id:  normalized PDB ID
+        :type pdb_id:  str
+        :param file_format:  file format (``pdb`` or ``cif``)
+        :type file_format:  str
+        :param data:  file contents
+        :type data:  bytes
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            path = self.get_object_path(digest)
+            if not path.is_file():
+                write_atomic(path, data)
+            write_atomic(
+                self.get_id_path(pdb_id, file_format), digest.encode("ascii")
+            )
+        except OSError as err:
+            _LOGGER.debug(f"Unable to write cache for {pdb_id}: {err}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used contents until the cache is
+        within its size limit.
+
+        References to removed contents are treated as cache misses.
+        """
+        objects = []
+        for path in (self.directory / "objects").glob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in objects)
+        for _, size, path in sorted(objects, key=lambda obj: obj[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            _LOGGER.debug(f"Evicted cache file {path}")
+            total -= size
+
+
+def write_atomic(path, data):
+    """Write a file through a temporary file in the same directory.
+
+    :param path:  path of the file
+    :type path:  Path
+    :param data:  file contents
+    :type data:  bytes
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=path.parent, suffix=".tmp", delete=False
+        ) as temp_file:
+            temp_path = temp_file.name
+            temp_file.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def get_mirror():
+    """Get the mirror set by :makevar:`PDB2PQR_PDB_MIRROR`.
+
+    :return:  URL template (with ``{id}``, ``{ID}``, and ``{format}``
+        fields), local directory, or None to use the RCSB PDB
+    :rtype:  str
+    """
+    return os.environ.get(PDB_MIRROR_ENV) or None
+
+
+def read_mirror_file(directory, pdb_id, file_format):
+    """Read a structure file from a local mirror directory.
+
+    :param directory:  mirror directory
+    :type directory:  str or Path
+    :param pdb_id:  normalized PDB ID
+    :type pdb_id:  str
+    :param file_format:  file format (``pdb`` or ``cif``)
+    :type file_format:  str
+    :raises FileNotFoundError:  if the mirror has no file for the ID
+    :return:  file contents (possibly compressed)
+    :rtype:  bytes
+    """
+    directory = Path(directory)
+    for name in [pdb_id, pdb_id.lower()]:
+        for suffix in [""] + COMPRESSION_SUFFIXES:
+            path = directory / f"{name}.{file_format}{suffix}"
+            if path.is_file():
+                return path.read_bytes()
+    raise FileNotFoundError(
+        f"No {file_format} file for {pdb_id} in mirror {directory}"
+    )
+
+
+def download(pdb_id, file_format="pdb", mirror=None):
+    """Download a structure file without the cache.
+
+    :param pdb_id:  normalized PDB ID
+    :type pdb_id:  str
+    :param file_format:  file format (``pdb`` or ``cif``)
+    :type file_format:  str
+    :param mirror:  URL template or local directory (see
+        :func:`get_mirror`); None for the RCSB PDB
+    :type mirror:  str
+    :raises IOError:  if the file could not be retrieved
+    :return:  file contents (compressed if the mirror stores compressed
+        files)
+    :rtype:  bytes
+    """
+    if mirror is not None and "://" not in mirror:
+        return read_mirror_file(mirror, pdb_id, file_format)
+    template = PDB_URL if mirror is None else mirror
+    url_path = template.format(
+        id=pdb_id.lower(), ID=pdb_id, format=file_format
+    )
+    _LOGGER.debug(f"Attempting to fetch {pdb_id} from {url_path}")
+    resp = get_session().get(url_path, timeout=DOWNLOAD_TIMEOUT)
+    if resp.status_code != 200:
+        errstr = f"Got code {resp.status_code} while retrieving {url_path}"
+        raise IOError(errstr)
+    return resp.content
+
+
+def fetch(pdb_id, file_format="pdb", structure_cache=None):
+    """Get a structure file from the cache or download it.
+
+    :param pdb_id:  PDB ID (case-insensitive)
+    :type pdb_id:  str
+    :param file_format:  file format (``pdb`` or ``cif``)
+    :type file_format:  str
+    :param structure_cache:  cache to use; defaults to a
+        :class:`StructureCache` in the default location unless caching is
+        disabled (see :func:`pdb2pqr.cache.is_enabled`)
+    :type structure_cache:  StructureCache
+    :raises IOError:  if the file could not be retrieved
+    :return:  file contents (compressed if the mirror stores compressed
+        files; see :func:`pdb2pqr.io.detect_compression`)
+    :rtype:  bytes
+    """
+    pdb_id = normalize_id(pdb_id)
+    if structure_cache is None and cache.is_enabled():
+        structure_cache = StructureCache()
+    if structure_cache is not None:
+        data = structure_cache.load(pdb_id, file_format)
+        if data is not None:
+            return data
+    data = download(pdb_id, file_format, get_mirror())
+    if structure_cache is not None:
+        structure_cache.store(pdb_id, file_format, data)
+    return data
+
+
+def prefetch(pdb_ids, file_format="pdb", jobs=PREFETCH_JOBS, **kwargs):
+    """Download several structure files into the cache concurrently.
+
+    :param pdb_ids:  PDB IDs
+    :type pdb_ids:  [str]
+    :param file_format:  file format (``pdb`` or ``cif``)
+    :type file_format:  str
+    :param jobs:  number of concurrent downloads
+    :type jobs:  int
+    :param kwargs:  additional arguments for :func:`fetch`
+    :return:  map from upper-case PDB ID to None for retrieved files or the
+        error message for failed downloads
+    :rtype:  {str: str}
+    """
+
+    def fetch_one(pdb_id):
+        try:
+            fetch(pdb_id, file_format, **kwargs)
+        except (OSError, ValueError, requests.RequestException) as err:
+            _LOGGER.warning(f"Unable to retrieve {pdb_id}: {err}")
+            return str(err)
+        return None
+
+    pdb_ids = list(dict.fromkeys(pdb_id.strip().upper() for pdb_id in pdb_ids))
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        return dict(zip(pdb_ids, executor.map(fetch_one, pdb_ids)))
+
+
+def build_parser():
+    """Build an argument parser.
+
+    :return:  parser
+    :rtype:  argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        description=(
+            f"{TITLE_STR}\nDownload structures into the cache before "
+            "running PDB2PQR."
+        ),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("pdb_ids", nargs="+", help="PDB IDs to download")
+    parser.add_argument(
+        "--format",
+        dest="file_format",
+        choices=["pdb", "cif"],
+        default="pdb",
+        help="File format to download",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=PREFETCH_JOBS,
+        help="Number of concurrent downloads",
+    )
+    parser.add_argument(
+        "--log-level",
+        help="Logging level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+    return parser
+
+
+def main_driver(args):
+    """Download the structures requested on the command line.
+
+    :param args:  command-line arguments
+    :type args:  argparse.Namespace
+    :return:  map from PDB ID to None or error message (see
+        :func:`prefetch`)
+    :rtype:  {str: str}
+    """
+    errors = prefetch(args.pdb_ids, args.file_format, args.jobs)
+    num_failed = sum(error is not None for error in errors.values())
+    _LOGGER.info(
+        f"Retrieved {len(errors) - num_failed} of {len(errors)} structures."
+    )
+    return errors
+
+
+def main():
+    """Hook for command-line usage."""
+    parser = build_parser()
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level))
+    errors = main_driver(args)
+    if any(error is not None for error in errors.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 .. codeauthor:: Nathan Baker
 """
 import logging
+import numpy as np
 from . import pdb
 from . import structures
 from . import utilities as util
@@ -22,8 +23,38 @@ class Residue(object):
 
     The residue class contains a list of Atom objects associated with that
     residue and other helper functions.
+    The attributes of residues (including those used by the subclasses in
+    :mod:`aa` and :mod:`na`) are kept in slots rather than a per-instance
+    dictionary.
     """
 
+    __slots__ = (
+        "atoms",
+        "name",
+        "chain_id",
+        "res_seq",
+        "ins_code",
+        "map",
+        "naname",
+        "ffname",
+        "reference",
+        "is_n_term",
+        "is_c_term",
+        "is5term",
+        "is3term",
+        "dihedrals",
+        "patches",
+        "peptide_c",
+        "peptide_n",
+        "missing",
+        "fixed",
+        "type",
+        "stateboolean",
+        "wasFlipped",
+        "atom_index",
+        "moveable_names",
+    )
+
     def __init__(self, atoms):
         """Initialize the class
 
@@ -40,6 +71,7 @@ class Residue(object):
         self.map = {}
         self.naname = None
         self.reference = None
+        self.type = None
         self.is_n_term = None
         self.is_c_term = None
         self.dihedrals = []
@@ -67,6 +99,9 @@ class Residue(object):
     def get_moveable_names(self, pivot):
         """Return all atom names that are further away than the pivot atom.
 
+        The names for each pivot are kept until the atoms of the residue or
+        their reference distances change.
+
         :param residue:  the residue to use
         :type residue:  Residue
         :param pivot:  the pivot atomname
@@ -74,8 +109,17 @@ class Residue(object):
         :return:  names of atoms further away than pivot atom
         :rtype:  [str]
         """
-        refdist = self.get_atom(pivot).refdistance
-        return [atom.name for atom in self.atoms if atom.refdistance > refdist]
+        moveable_names = getattr(self, "moveable_names", None)
+        if moveable_names is None:
+            moveable_names = self.moveable_names = {}
+        names = moveable_names.get(pivot)
+        if names is None:
+            refdist = self.get_atom(pivot).refdistance
+            names = [
+                atom.name for atom in self.atoms if atom.refdistance > refdist
+            ]
+            moveable_names[pivot] = names
+        return list(names)
 
     def update_terminus_status(self):
         """Update the :makevar:`is_n_terms` and :makevar:`is_c_term` flags."""
@@ -125,12 +169,21 @@ class Residue(object):
         for atom in self.atoms:
             atom.chain_id = value
 
+    def atoms_changed(self):
+        """Invalidate the atom index of the biomolecule and the moveable atom
+        names after atoms of the residue are added, removed, or reordered."""
+        self.moveable_names = None
+        atom_index = getattr(self, "atom_index", None)
+        if atom_index is not None:
+            atom_index.invalidate()
+
     def add_atom(self, atom):
         """Add the atom object to the residue.
 
         :param atom: atom-like object, e.g., :class:`HETATM` or :class:`ATOM`
         """
         self.atoms.append(atom)
+        self.atoms_changed()
         self.map[atom.name] = atom
 
     def remove_atom(self, atomname):
@@ -143,8 +196,12 @@ class Residue(object):
         atom = self.map[atomname]
         bonds = atom.bonds
         del self.map[atomname]
+        # Release the coordinates of the atom
+        if atom.coordinate_store is not None:
+            atom.coordinate_store.detach([atom])
         # Delete the atom from the list
         self.atoms.remove(atom)
+        self.atoms_changed()
         # Delete all instances of the atom as a bond
         for bondatom in bonds:
             if atom in bondatom.bonds:
@@ -163,6 +220,7 @@ class Residue(object):
         atom.name = newname
         self.map[newname] = atom
         del self.map[oldname]
+        self.moveable_names = None
 
     def get_atom(self, name):
         """Retrieve a residue atom based on its name.
@@ -232,10 +290,8 @@ class Residue(object):
             moveatoms.append(atom)
             movecoords.append(util.subtract(atom.coords, atom1.coords))
         newcoords = quat.qchichange(initcoords, movecoords, angle)
-        for iatom, atom in enumerate(moveatoms):
-            atom.x = newcoords[iatom][0] + atom1.x
-            atom.y = newcoords[iatom][1] + atom1.y
-            atom.z = newcoords[iatom][2] + atom1.z
+        newcoords = np.array(newcoords, dtype=float).reshape(-1, 3)
+        structures.set_coordinates(moveatoms, newcoords + atom1.coords)
 
     def pick_dihedral_angle(self, conflict_names, oldnum=None):
         """Choose an angle number to use in debumping.
@@ -329,6 +385,7 @@ class Residue(object):
                 templist.append(atom)
         # Change the list pointer
         self.atoms = templist[:]
+        self.atoms_changed()
 
     @staticmethod
     def letter_code():
@@ -7,6 +7,8 @@ associated methods.
 .. codeauthor:: Nathan Baker
 """
 # from . import pdb
+import functools
+import numpy as np
 from .config import BACKBONE
 
 
@@ -26,6 +28,7 @@ class Chain:
         self.chain_id = chain_id
         self.residues = []
         self.name = None
+        self.atom_index = None
 
     def add_residue(self, residue):
         """Add a residue to the chain
@@ -34,6 +37,20 @@ class Chain:
         :type residue:  Residue
         """
         self.residues.append(residue)
+        residue.atom_index = self.atom_index
+        if self.atom_index is not None:
+            self.atom_index.invalidate()
+
+    def remove_residue(self, residue):
+        """Remove a residue from the chain
+
+        :param residue:  residue to be removed
+        :type residue:  Residue
+        """
+        self.residues.remove(residue)
+        residue.atom_index = None
+        if self.atom_index is not None:
+            self.atom_index.invalidate()
 
     def renumber_residues(self):
         """Renumber atoms.
@@ -62,6 +79,274 @@ class Chain:
         return "".join(output)
 
 
+class AtomIndex:
+    """Ordered atoms of a list of chains and their indices.
+
+    The sequence of atoms and the map from atoms to indices are built on
+    first use and kept until :meth:`invalidate` is called; chains and
+    residues that refer to the index (through their ``atom_index``
+    attribute) invalidate it when atoms or residues are added, removed, or
+    reordered.
+    """
+
+    def __init__(self, chains):
+        """Initialize the index.
+
+        :param chains:  chains in atom order (the list is not copied)
+        :type chains:  [Chain]
+        """
+        self.chains = chains
+        self._atoms = None
+        self._indices = None
+
+    def invalidate(self):
+        """Discard the atom sequence and indices."""
+        self._atoms = None
+        self._indices = None
+
+    @property
+    def atoms(self):
+        """Return the atoms of all residues of all chains.
+
+        :return:  atoms
+        :rtype:  (Atom)
+        """
+        if self._atoms is None:
+            self._atoms = tuple(
+                atom
+                for chain in self.chains
+                for residue in chain.residues
+                for atom in residue.atoms
+            )
+        return self._atoms
+
+    @property
+    def indices(self):
+        """Return the map from atoms to their indices in :attr:`atoms`.
+
+        :return:  map from atoms to indices
+        :rtype:  {Atom: int}
+        """
+        if self._indices is None:
+            self._indices = {
+                atom: iatom for iatom, atom in enumerate(self.atoms)
+            }
+        return self._indices
+
+    def __getstate__(self):
+        """Get the state for copying and pickling without the cached
+        atoms.
+
+        :return:  the index attributes
+        :rtype:  dict
+        """
+        state = dict(vars(self))
+        state["_atoms"] = None
+        state["_indices"] = None
+        return state
+
+
+class CoordinateStore:
+    """Contiguous coordinates for a set of atoms.
+
+    The coordinates of attached atoms are rows of a single (N, 3) float64
+    :attr:`array`; :attr:`Atom.x`, :attr:`Atom.y`, :attr:`Atom.z`, and
+    :attr:`Atom.coords` read and write the row of their atom, so bulk
+    geometry can work on the array directly (see :func:`get_coordinates`
+    and :func:`set_coordinates`).
+    Rows of detached atoms are reused by later attachments.
+    """
+
+    def __init__(self):
+        self.array = np.empty((0, 3))
+        self.atoms = []
+        self.free = []
+
+    def __len__(self):
+        return len(self.atoms) - len(self.free)
+
+    def _allocate(self, count):
+        """Reserve rows for new atoms.
+
+        :param count:  number of rows
+        :type count:  int
+        :return:  row indices
+        :rtype:  [int]
+        """
+        num_free = min(count, len(self.free))
+        rows = self.free[len(self.free) - num_free :]
+        del self.free[len(self.free) - num_free :]
+        rows.reverse()
+        start = len(self.atoms)
+        size = start + count - num_free
+        self.atoms += (size - start) * [None]
+        if size > len(self.array):
+            array = np.empty((max(size, 2 * len(self.array)), 3))
+            array[:start] = self.array[:start]
+            self.array = array
+            # Point the atoms at the new array
+            for atom in self.atoms[:start]:
+                if atom is not None:
+                    atom._row = array[atom._index]
+        return rows + list(range(start, size))
+
+    def attach(self, atoms):
+        """Attach atoms to the store.
+
+        The current coordinates of atoms that are not yet attached are
+        copied into the store (missing coordinates become NaN); atoms
+        attached to another store are moved.
+
+        :param atoms:  atoms to attach
+        :type atoms:  [Atom]
+        :return:  row of each atom in :attr:`array`
+        :rtype:  numpy.ndarray
+        """
+        new_atoms = [atom for atom in atoms if atom._store is not self]
+        if new_atoms:
+            coords = np.array(
+                [atom.coords for atom in new_atoms], dtype=float
+            ).reshape(-1, 3)
+            rows = self._allocate(len(new_atoms))
+            self.array[rows] = coords
+            for atom, row in zip(new_atoms, rows):
+                if atom._store is not None:
+                    atom._store.detach([atom])
+                atom._store = self
+                atom._index = row
+                atom._row = self.array[row]
+                self.atoms[row] = atom
+        return np.array([atom._index for atom in atoms], dtype=np.int64)
+
+    def detach(self, atoms):
+        """Detach atoms from the store.
+
+        The atoms keep a private copy of their coordinates.
+
+        :param atoms:  atoms to detach; atoms not attached to this store are
+            ignored
+        :type atoms:  [Atom]
+        """
+        for atom in atoms:
+            if atom._store is not self:
+                continue
+            atom._row = self.array[atom._index].tolist()
+            self.atoms[atom._index] = None
+            self.free.append(atom._index)
+            atom._store = None
+            atom._index = None
+
+
+def get_coordinates(atoms):
+    """Get the coordinates of atoms as an array.
+
+    :param atoms:  atoms
+    :type atoms:  [Atom]
+    :return:  (N, 3) array of coordinates
+    :rtype:  numpy.ndarray
+    """
+    store = atoms[0]._store if atoms else None
+    if store is not None and all(atom._store is store for atom in atoms):
+        return store.array[[atom._index for atom in atoms]]
+    return np.array([atom.coords for atom in atoms], dtype=float).reshape(
+        -1, 3
+    )
+
+
+def set_coordinates(atoms, coords):
+    """Set the coordinates of atoms from an array.
+
+    :param atoms:  atoms
+    :type atoms:  [Atom]
+    :param coords:  (N, 3) array of coordinates
+    :type coords:  numpy.ndarray
+    """
+    store = atoms[0]._store if atoms else None
+    if store is not None and all(atom._store is store for atom in atoms):
+        store.array[[atom._index for atom in atoms]] = coords
+        return
+    for atom, atom_coords in zip(atoms, np.asarray(coords).tolist()):
+        atom.coords = atom_coords
+
+
+@functools.lru_cache(maxsize=None)
+def slot_names(klass):
+    """Get the names of the slots of a class and its base classes.
+
+    :param klass:  class
+    :type klass:  type
+    :return:  slot names
+    :rtype:  (str)
+    """
+    names = []
+    for base in reversed(klass.__mro__):
+        slots = base.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in ("__dict__", "__weakref__") and name not in names:
+                names.append(name)
+    return tuple(names)
+
+
+def get_attributes(obj):
+    """Get the instance attributes of an object with or without slots.
+
+    :param obj:  object
+    :type obj:  object
+    :return:  attribute values of the object (unset slots are skipped)
+    :rtype:  dict
+    """
+    values = {}
+    for name in slot_names(type(obj)):
+        try:
+            values[name] = object.__getattribute__(obj, name)
+        except AttributeError:
+            pass
+    values.update(getattr(obj, "__dict__", {}))
+    return values
+
+
+def set_attributes(obj, values):
+    """Set instance attributes of an object with or without slots.
+
+    :param obj:  object
+    :type obj:  object
+    :param values:  attribute values
+    :type values:  dict
+    """
+    for name, value in values.items():
+        setattr(obj, name, value)
+
+
+def _coordinate_property(axis, doc):
+    """Build a property for one coordinate of an :class:`Atom`.
+
+    Attached atoms keep a view of their row of the
+    :class:`CoordinateStore`; other atoms keep a list of coordinates.
+
+    :param axis:  coordinate index (0, 1, or 2)
+    :type axis:  int
+    :param doc:  property docstring
+    :type doc:  str
+    :return:  the property
+    :rtype:  property
+    """
+
+    def getter(self):
+        row = self._row
+        if type(row) is list:
+            return row[axis]
+        return row.item(axis)
+
+    def setter(self, value):
+        if value is None and type(self._row) is not list:
+            value = np.nan
+        self._row[axis] = value
+
+    return property(getter, setter, doc=doc)
+
+
 class Atom:
     """Represent an atom.
 
@@ -70,8 +355,42 @@ class Atom:
     for analysis.
     This class also simplifies code by combining :class:`ATOM` and
     :class:`HETATM` objects into a single class.
+    Atoms keep their attributes in slots rather than a per-instance
+    dictionary to reduce the memory used by large structures.
     """
 
+    __slots__ = (
+        "type",
+        "serial",
+        "name",
+        "alt_loc",
+        "res_name",
+        "chain_id",
+        "res_seq",
+        "ins_code",
+        "_store",
+        "_index",
+        "_row",
+        "occupancy",
+        "temp_factor",
+        "seg_id",
+        "element",
+        "charge",
+        "bonds",
+        "reference",
+        "residue",
+        "radius",
+        "ffcharge",
+        "hdonor",
+        "hacceptor",
+        "cell",
+        "added",
+        "optimizeable",
+        "refdistance",
+        "id",
+        "mol2charge",
+    )
+
     def __init__(self, atom=None, type_="ATOM", residue=None):
         """Initialize the new Atom object by using the old object.
 
@@ -91,9 +410,9 @@ class Atom:
         self.chain_id = None
         self.res_seq = None
         self.ins_code = None
-        self.x = None
-        self.y = None
-        self.z = None
+        self._store = None
+        self._index = None
+        self._row = [None, None, None]
         self.occupancy = None
         self.temp_factor = None
         self.seg_id = None
@@ -128,6 +447,10 @@ class Atom:
             self.x = atom.x
             self.y = atom.y
             self.z = atom.z
+            # Atoms built from stored atoms join the same store
+            store = getattr(atom, "_store", None)
+            if store is not None:
+                store.attach([self])
             self.occupancy = atom.occupancy
             self.temp_factor = atom.temp_factor
             self.seg_id = atom.seg_id
@@ -342,17 +665,74 @@ class Atom:
         outstr += str.ljust(tstr, 2)[:2]
         return outstr
 
+    x = _coordinate_property(0, "The x coordinate of the atom.")
+    y = _coordinate_property(1, "The y coordinate of the atom.")
+    z = _coordinate_property(2, "The z coordinate of the atom.")
+
     @property
     def coords(self):
         """Return the x,y,z coordinates of the atom.
 
-        .. todo:
-           All atom coordinates should be converted to :mod:`numpy` arrays
-
         :return:  list of the coordinates
         :rtype:  [float, float, float]
         """
-        return [self.x, self.y, self.z]
+        row = self._row
+        if type(row) is list:
+            return list(row)
+        return row.tolist()
+
+    @coords.setter
+    def coords(self, value):
+        """Set the x,y,z coordinates of the atom.
+
+        :param value:  the coordinates
+        :type value:  [float, float, float]
+        """
+        self.x, self.y, self.z = value
+
+    def __getattr__(self, name):
+        # Views of the coordinate store are not copied (see __getstate__)
+        if name == "_row":
+            store = getattr(self, "_store", None)
+            if store is not None:
+                row = store.array[self._index]
+                self._row = row
+                return row
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}"
+        )
+
+    def __getstate__(self):
+        """Get the state for copying and pickling.
+
+        Copies of attached atoms rebuild their view of the (copied)
+        coordinate store when needed.
+
+        :return:  the atom attributes
+        :rtype:  dict
+        """
+        state = get_attributes(self)
+        if state.get("_store") is not None:
+            state.pop("_row", None)
+        return state
+
+    def __setstate__(self, state):
+        """Set the state when copying and unpickling.
+
+        :param state:  the atom attributes from :meth:`__getstate__`
+        :type state:  dict
+        """
+        set_attributes(self, state)
+
+    @property
+    def coordinate_store(self):
+        """Return the coordinate store of the atom.
+
+        :return:  the store holding the coordinates (None if the atom keeps
+            its own coordinates)
+        :rtype:  CoordinateStore
+        """
+        return self._store
 
     def add_bond(self, bondedatom):
         """Add a bond to the list of bonds.
@@ -12,6 +12,7 @@
 """
 import math
 import logging
+from collections import deque
 
 # from pathlib import Path
 import numpy as np
@@ -24,16 +25,15 @@ _LOGGER = logging.getLogger(__name__)
 def sort_dict_by_value(inputdict):
     """Sort a dictionary by its values.
 
+    Keys with equal values keep their dictionary order, so the keys do not
+    need to be comparable.
+
     :param inputdict:  the dictionary to sort
     :type inputdict:  dict
-    :return:  list of keys sorted by value
+    :return:  list of keys sorted by decreasing value
     :rtype:  list
     """
-    items = [(v, k) for k, v in inputdict.items()]
-    items.sort()
-    items.reverse()
-    items = [k for v, k in items]
-    return items
+    return sorted(inputdict, key=inputdict.get, reverse=True)
 
 
 def shortest_path(graph, start, end, path=[]):
@@ -72,9 +72,38 @@ def shortest_path(graph, start, end, path=[]):
     return shortest
 
 
+def shortest_path_lengths(graph, start):
+    """Find the lengths of the shortest paths from a node to other nodes.
+
+    Uses a breadth-first search of an unweighted graph; only the nodes that
+    are keys of the graph are expanded, as in :func:`shortest_path`.
+
+    :param graph:  a mapping of the graph to analyze, of the form {0: [1,2],
+        1:[3,4], ...} . Each key has a list of edges.
+    :type graph:  dict
+    :param start:  the ID of the key to start the analysis from
+    :type start:  str
+    :return:  number of edges on the shortest path from the start to each
+        connected node
+    :rtype:  dict
+    """
+    lengths = {start: 0}
+    nodes = deque([start])
+    while nodes:
+        node = nodes.popleft()
+        length = lengths[node] + 1
+        for value in graph.get(node, ()):
+            if value not in lengths:
+                lengths[value] = length
+                nodes.append(value)
+    return lengths
+
+
 def analyze_connectivity(map_, key):
     """Analyze the connectivity of a given map using the key value.
 
+    Values are returned in breadth-first order starting from the key.
+
     :param map:  map to analyze
     :type map:  dict
     :param key:  key value
@@ -82,20 +111,88 @@ def analyze_connectivity(map_, key):
     :return:  list of connected values to the key
     :rtype:  list
     """
-    clist = []
-    keys = [key]
+    clist = [key]
+    seen = {key}
+    keys = deque([key])
     while keys:
-        key = keys[0]
-        if key not in clist:
-            clist.append(key)
-            if key in map_:
-                for value in map_[key]:
-                    if value not in clist:
-                        keys.append(value)
-        keys.pop(keys.index(key))
+        key = keys.popleft()
+        for value in map_.get(key, ()):
+            if value not in seen:
+                seen.add(value)
+                clist.append(value)
+                keys.append(value)
     return clist
 
 
+class DisjointSet:
+    """Union-find structure for partitioning items into connected groups.
+
+    Items are added on first use; groups are reported in the order in which
+    their first items were added.
+    """
+
+    def __init__(self, items=()):
+        """Initialize with each item in its own group.
+
+        :param items:  initial items
+        :type items:  iterable
+        """
+        self.parents = {}
+        self.order = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """Add an item in its own group (if it is not already present).
+
+        :param item:  hashable item
+        """
+        if item not in self.parents:
+            self.parents[item] = item
+            self.order[item] = len(self.order)
+
+    def find(self, item):
+        """Find the representative item of the group containing an item.
+
+        :param item:  hashable item
+        :return:  representative item (the first added item of the group)
+        """
+        self.add(item)
+        parents = self.parents
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    def union(self, item1, item2):
+        """Merge the groups containing two items.
+
+        :param item1:  hashable item
+        :param item2:  hashable item
+        :return:  representative item of the merged group
+        """
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 == root2:
+            return root1
+        # Keep the earliest added item as the representative
+        if self.order[root2] < self.order[root1]:
+            root1, root2 = root2, root1
+        self.parents[root2] = root1
+        return root1
+
+    def groups(self):
+        """Get the groups of items.
+
+        :return:  lists of items in the order they were added
+        :rtype:  [list]
+        """
+        groups = {}
+        for item in self.parents:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
 def angle(coords1, coords2, coords3):
     """Get the angle between three coordinates.
 
@@ -94,6 +94,8 @@ setuptools.setup(
         "console_scripts": [
             "pdb2pqr30=pdb2pqr.main:main",
             "dx2cube=pdb2pqr.main:dx_to_cube",
+            "pdb2pqr30-batch=pdb2pqr.batch:main",
+            "pdb2pqr30-prefetch=pdb2pqr.remote:main",
             "psize=pdb2pqr.psize:main",
             "inputgen=pdb2pqr.inputgen:main",
         ]
@@ -0,0 +1,72 @@
+"""Tests of the in-memory library interface."""
+import logging
+import tempfile
+from pathlib import Path
+import pytest
+import common
+import pdb2pqr
+from pdb2pqr.config import CACHE_DIR_ENV, NO_CACHE_ENV
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_process_inputs(input_pdb, tmp_path):
+    """Test that paths, files, and strings match the command-line output."""
+    args = "--log-level=INFO --ff=AMBER --whitespace"
+    common.run_pdb2pqr(
+        args=args,
+        input_pdb=common.DATA_DIR / f"{input_pdb}.pdb",
+        output_pqr="expected.pqr",
+        tmp_path=tmp_path,
+    )
+    expected = (tmp_path / "expected.pqr").read_text()
+    pdb_path = common.DATA_DIR / f"{input_pdb}.pdb"
+    options = {"ff": "AMBER", "whitespace": True}
+    from_path = pdb2pqr.process(pdb_path, options)
+    assert from_path.pqr_text == expected
+    with open(pdb_path, "rt") as pdb_file:
+        from_file = pdb2pqr.process(pdb_file, args.split())
+    assert from_file.pqr_text == expected
+    from_string = pdb2pqr.process(pdb_path.read_text(), options)
+    assert from_string.pqr_text == expected
+    assert not from_string.is_cif
+    assert from_string.pka_table is None
+    num_atoms = len(from_string.atoms)
+    assert from_string.coordinates.shape == (num_atoms, 3)
+    assert from_string.charges.sum() == pytest.approx(
+        from_string.biomolecule.charge[1]
+    )
+    assert from_string.radii.shape == (num_atoms,)
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_process_no_files(input_pdb, tmp_path, monkeypatch):
+    """Test that a PROPKA run does not write any files."""
+    pdb_text = (common.DATA_DIR / f"{input_pdb}.pdb").read_text()
+    temp_dir = Path(tempfile.gettempdir())
+    temp_files = set(temp_dir.iterdir())
+    cache_dir = tmp_path / "cache"
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    monkeypatch.setenv(CACHE_DIR_ENV, str(cache_dir))
+    monkeypatch.delenv(NO_CACHE_ENV, raising=False)
+    monkeypatch.chdir(work_dir)
+    result = pdb2pqr.process(
+        pdb_text, {"ff": "PARSE", "pka_method": "propka", "ph": 7.0}
+    )
+    assert not list(work_dir.iterdir())
+    assert not cache_dir.exists() or not list(cache_dir.rglob("*"))
+    assert set(temp_dir.iterdir()) <= temp_files
+    assert result.pka_table
+    assert all("pKa" in row for row in result.pka_table)
+
+
+def test_process_bad_options():
+    """Test that unknown and file-output options are rejected."""
+    pdb_path = common.DATA_DIR / "1AFS.pdb"
+    with pytest.raises(ValueError):
+        pdb2pqr.process(pdb_path, {"not_an_option": True})
+    with pytest.raises(ValueError):
+        pdb2pqr.process(pdb_path, {"apbs_input": "apbs.in"})
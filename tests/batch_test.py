@@ -0,0 +1,55 @@
+"""Tests of batch processing."""
+import logging
+import json
+from argparse import Namespace
+import pytest
+import common
+from pdb2pqr import batch
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("num_procs", [1, 2], ids=str)
+def test_batch(num_procs, tmp_path):
+    """Test a batch with good and bad jobs against the expected results."""
+    manifest_path = tmp_path / "manifest.txt"
+    data_dir = common.DATA_DIR
+    manifest_path.write_text(
+        "# input output options\n"
+        f"{data_dir / '1AFS.pdb'} {tmp_path / '1AFS-amber.pqr'} --ff=AMBER\n"
+        "\n"
+        f"{data_dir / '1AFS.pdb'} {tmp_path / 'missing.pqr'} "
+        f"--ligand={data_dir / 'missing.mol2'}\n"
+        f"{data_dir / '1AFS.pdb'} {tmp_path / '1AFS-parse.pqr'} --ff=PARSE "
+        "--neutraln --neutralc\n"
+        f"{data_dir / '1AFS.pdb'} {tmp_path / 'bad.pqr'} --ff=NOTAFF\n"
+    )
+    report_path = tmp_path / "report.json"
+    args = Namespace(
+        manifest=manifest_path,
+        common_options=["--", "--whitespace", "--log-level=INFO"],
+        jobs=num_procs,
+        report=report_path,
+        log_level="INFO",
+    )
+    summaries = batch.main_driver(args)
+    statuses = [summary["status"] for summary in summaries]
+    assert statuses == ["success", "failed", "success", "failed"]
+    assert [summary["line_num"] for summary in summaries] == [2, 4, 5, 6]
+    assert "FileNotFoundError" in summaries[1]["error"]
+    assert "NOTAFF" in summaries[3]["error"]
+    common.compare_pqr(
+        tmp_path / "1AFS-amber.pqr",
+        data_dir / "1AFS_whitespace_ff=AMBER.pqr",
+    )
+    common.compare_pqr(
+        tmp_path / "1AFS-parse.pqr",
+        data_dir / "1AFS_neutralc_neutraln_whitespace_ff=PARSE.pqr",
+    )
+    assert (tmp_path / "1AFS-amber.log").stat().st_size > 0
+    with open(report_path, "rt") as report_file:
+        report = json.load(report_file)
+    assert report["succeeded"] == 2
+    assert report["failed"] == 2
+    assert report["jobs"] == summaries
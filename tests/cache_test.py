@@ -0,0 +1,148 @@
+"""Tests of the on-disk cache for parsed data files."""
+import logging
+import pytest
+from pdb2pqr import cache, io
+from pdb2pqr.config import CACHE_DIR_ENV, NO_CACHE_ENV
+from pdb2pqr.definitions import Definition
+from pdb2pqr.forcefield import Forcefield
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Use a temporary cache directory."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV, str(path))
+    monkeypatch.delenv(NO_CACHE_ENV, raising=False)
+    return path
+
+
+def cached_definitions(cache_dir):
+    """Get the list of cached definition files.
+
+    :param cache_dir:  cache directory
+    :type cache_dir:  Path
+    :return:  list of cache files
+    :rtype:  [Path]
+    """
+    return sorted((cache_dir / "definitions").glob("*.pickle"))
+
+
+def compare_definitions(definition1, definition2):
+    """Compare two sets of topology definitions.
+
+    :param definition1:  first definitions
+    :type definition1:  Definition
+    :param definition2:  second definitions
+    :type definition2:  Definition
+    """
+    assert sorted(definition1.map) == sorted(definition2.map)
+    for resname, residue1 in definition1.map.items():
+        residue2 = definition2.map[resname]
+        assert sorted(residue1.map) == sorted(residue2.map)
+        assert residue1.dihedrals == residue2.dihedrals
+        assert residue1.altnames == residue2.altnames
+        for atomname, atom1 in residue1.map.items():
+            atom2 = residue2.map[atomname]
+            assert atom1.bonds == atom2.bonds
+            assert atom1.coords == atom2.coords
+
+
+def compare_forcefields(forcefield1, forcefield2):
+    """Compare the parameters and names of two forcefields.
+
+    :param forcefield1:  first forcefield
+    :type forcefield1:  Forcefield
+    :param forcefield2:  second forcefield
+    :type forcefield2:  Forcefield
+    """
+    assert sorted(forcefield1.map) == sorted(forcefield2.map)
+    for resname, residue in forcefield1.map.items():
+        for atomname in residue.atoms:
+            assert forcefield1.get_params(
+                resname, atomname
+            ) == forcefield2.get_params(resname, atomname)
+            assert forcefield1.get_names(
+                resname, atomname
+            ) == forcefield2.get_names(resname, atomname)
+
+
+def test_definitions_cache(cache_dir):
+    """Test that cached definitions match freshly parsed definitions."""
+    fresh = io.get_definitions(use_cache=False)
+    assert not cached_definitions(cache_dir)
+    first = io.get_definitions()
+    assert len(cached_definitions(cache_dir)) == 1
+    second = io.get_definitions()
+    assert len(cached_definitions(cache_dir)) == 1
+    assert isinstance(second, Definition)
+    assert second is not first
+    compare_definitions(fresh, first)
+    compare_definitions(fresh, second)
+
+
+def test_definitions_cache_invalidation(cache_dir, tmp_path):
+    """Test that changing a definition file invalidates the cache."""
+    io.get_definitions()
+    patch_path = tmp_path / "PATCHES.xml"
+    with open(io.test_xml_file("PATCHES.xml"), "rt") as patch_file:
+        patch_text = patch_file.read()
+    patch_path.write_text(patch_text.replace("NEUTRAL-CTERM", "NEUTRAL-C"))
+    definition = io.get_definitions(patch_path=str(patch_path))
+    assert len(cached_definitions(cache_dir)) == 2
+    assert "NEUTRAL-C" in definition.patches
+
+
+def test_definitions_cache_corrupt(cache_dir):
+    """Test that unreadable cache files are ignored and replaced."""
+    io.get_definitions()
+    [cache_path] = cached_definitions(cache_dir)
+    cache_path.write_bytes(b"not a pickle")
+    definition = io.get_definitions()
+    assert isinstance(definition, Definition)
+    assert cache_path.stat().st_size > len(b"not a pickle")
+
+
+def test_definitions_cache_disabled(cache_dir, monkeypatch):
+    """Test that the cache can be disabled from the environment."""
+    monkeypatch.setenv(NO_CACHE_ENV, "1")
+    assert not cache.is_enabled()
+    io.get_definitions()
+    assert not cached_definitions(cache_dir)
+
+
+@pytest.mark.parametrize("ff_name", ["amber", "charmm", "parse"], ids=str)
+def test_forcefield_cache(cache_dir, ff_name):
+    """Test that cached forcefields match freshly parsed forcefields."""
+    definition = io.get_definitions(use_cache=False)
+    fresh = Forcefield(ff_name, definition, None, use_cache=False)
+    first = Forcefield(ff_name, definition, None)
+    second = Forcefield(ff_name, definition, None)
+    assert len(list((cache_dir / "forcefields").glob("*.pickle"))) == 1
+    compare_forcefields(fresh, first)
+    compare_forcefields(fresh, second)
+
+
+@pytest.mark.parametrize("ff_name", ["amber", "charmm", "parse"], ids=str)
+def test_forcefield_table(cache_dir, ff_name):
+    """Test that the dense parameter table matches the forcefield map."""
+    definition = io.get_definitions()
+    forcefield_ = Forcefield(ff_name, definition, None)
+    table = forcefield_.table
+    keys = [
+        (resname, atomname)
+        for resname, residue in forcefield_.map.items()
+        for atomname in residue.atoms
+    ]
+    indices = table.lookup(keys + [("XXX", "CA")])
+    assert indices[-1] == -1
+    for (resname, atomname), index in zip(keys, indices):
+        charge, radius = forcefield_.get_params(resname, atomname)
+        assert table.charges[index] == charge
+        assert table.radii[index] == radius
+        assert (
+            table.resnames[index],
+            table.atomnames[index],
+        ) == forcefield_.get_names(resname, atomname)
@@ -0,0 +1,106 @@
+"""Tests of the cell-list neighbor search."""
+import logging
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from pdb2pqr.cells import Cells
+from pdb2pqr.structures import Atom
+
+
+_LOGGER = logging.getLogger(__name__)
+NUM_ATOMS = 400
+
+
+def make_biomolecule(seed):
+    """Make a fake biomolecule with randomly placed atoms.
+
+    Half of the coordinates are integers to exercise cell boundaries.
+
+    :param seed:  random number seed
+    :type seed:  int
+    :return:  object with an ``atoms`` list
+    :rtype:  SimpleNamespace
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(-12.0, 12.0, size=(NUM_ATOMS, 3))
+    coords[::2] = np.round(coords[::2])
+    atoms = []
+    for x, y, z in coords:
+        atom = Atom()
+        atom.x, atom.y, atom.z = x, y, z
+        atoms.append(atom)
+    return SimpleNamespace(atoms=atoms)
+
+
+def legacy_near_cells(atoms, atom, size):
+    """Brute-force version of :meth:`Cells.get_near_cells`.
+
+    :param atoms:  all atoms in the cells, in placement order
+    :type atoms:  [Atom]
+    :param atom:  the atom to test
+    :type atom:  Atom
+    :param size:  cell size
+    :type size:  int
+    :return:  atoms in bordering cells
+    :rtype:  [Atom]
+    """
+    near = []
+    for offset_x in (-size, 0, size):
+        for offset_y in (-size, 0, size):
+            for offset_z in (-size, 0, size):
+                key = (
+                    atom.cell[0] + offset_x,
+                    atom.cell[1] + offset_y,
+                    atom.cell[2] + offset_z,
+                )
+                near += [
+                    other
+                    for other in atoms
+                    if other.cell == key and other is not atom
+                ]
+    return near
+
+
+@pytest.mark.parametrize("size", [2, 5])
+def test_near_cells(size):
+    """Test single and batched cell neighbor lists after moving atoms."""
+    biomolecule = make_biomolecule(size)
+    cells = Cells(size)
+    cells.assign_cells(biomolecule)
+    atoms = biomolecule.atoms
+    rng = np.random.default_rng(size)
+    moved = [atoms[iatom] for iatom in rng.choice(NUM_ATOMS, 50, False)]
+    for atom in moved:
+        atom.x, atom.y, atom.z = rng.uniform(-12.0, 12.0, size=3)
+    cells.move_atoms(moved)
+    # Moved atoms are placed at the end of their new cells
+    order = [atom for atom in atoms if atom not in moved] + moved
+    for atom in atoms[:100]:
+        expected = legacy_near_cells(order, atom, size)
+        assert cells.get_near_cells(atom) == expected
+    query, index = cells.get_near_pairs(atoms[:100])
+    for iatom, atom in enumerate(atoms[:100]):
+        expected = legacy_near_cells(order, atom, size)
+        found = [cells.atoms[ifound] for ifound in index[query == iatom]]
+        assert found == expected
+
+
+@pytest.mark.parametrize("radius", [1.5, 4.3, 9.0])
+def test_query_radius(radius):
+    """Test radius queries against a brute-force search."""
+    biomolecule = make_biomolecule(0)
+    cells = Cells(2)
+    cells.assign_cells(biomolecule)
+    removed = biomolecule.atoms[::7]
+    for atom in removed:
+        cells.remove_cell(atom)
+    coords = np.array([atom.coords for atom in cells.atoms])
+    active = np.array([atom not in removed for atom in cells.atoms])
+    points = np.random.default_rng(1).uniform(-13.0, 13.0, size=(25, 3))
+    query, index = cells.query_radius(points, radius)
+    for ipoint, point in enumerate(points):
+        dist = np.linalg.norm(coords - point, axis=1)
+        expected = np.flatnonzero(active & (dist <= radius))
+        assert sorted(index[query == ipoint]) == expected.tolist()
+        single = cells.query_radius(point, radius)
+        assert sorted(single) == expected.tolist()
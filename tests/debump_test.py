@@ -0,0 +1,101 @@
+"""Tests of debumping functionality."""
+import logging
+import numpy as np
+import pytest
+import common
+import pdb2pqr
+from pdb2pqr import aa, debump, io, main
+from pdb2pqr import utilities as util
+from pdb2pqr.config import DEBUMP_ANGLE_STEP_SIZE, DEBUMP_ANGLE_STEPS
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("input_pdb", ["1US0"], ids=str)
+def test_batch_dihedral_scores(input_pdb):
+    """Compare batched dihedral angle scores with one-at-a-time scoring."""
+    definition = io.get_definitions()
+    pdblist, _ = io.get_molecule(common.DATA_DIR / f"{input_pdb}.pdb")
+    biomolecule, definition, _ = main.setup_molecule(
+        pdblist, definition, None
+    )
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    biomolecule.repair_heavy()
+    biomolecule.update_ss_bridges()
+    biomolecule.add_hydrogens()
+    debumper = debump.Debump(biomolecule)
+    debumper.debump_biomolecule()
+    residues = [
+        residue
+        for residue in biomolecule.residues
+        if isinstance(residue, aa.Amino) and residue.dihedrals
+    ]
+    for residue in residues[::25]:
+        for anglenum, orig_angle in enumerate(residue.dihedrals):
+            if orig_angle is None:
+                continue
+            angles = orig_angle + DEBUMP_ANGLE_STEP_SIZE * np.arange(
+                DEBUMP_ANGLE_STEPS
+            )
+            batch_scores = debumper.score_dihedral_angles(
+                residue, anglenum, angles
+            )
+            scores = []
+            for angle in angles:
+                debumper.set_dihedral_angle(residue, anglenum, angle)
+                scores.append(debumper.score_dihedral_angle(residue, anglenum))
+            debumper.set_dihedral_angle(residue, anglenum, orig_angle)
+            np.testing.assert_allclose(batch_scores, scores, atol=1e-2)
+            np.testing.assert_array_equal(
+                batch_scores == 0, np.array(scores) == 0
+            )
+
+
+def legacy_reference_distances(residue):
+    """Exhaustive-path reference distances used before the template cache
+    of :meth:`biomolecule.Biomolecule.set_reference_distance`."""
+    map_ = {atom: atom.bonds for atom in residue.atoms}
+    caatom = residue.get_atom("CA")
+    distances = {}
+    for atom in residue.atoms:
+        if atom.is_backbone:
+            distances[atom.name] = -1
+        elif residue.is_c_term and atom.name == "HO":
+            distances[atom.name] = 3
+        elif residue.is_n_term and atom.name in ["H3", "H2"]:
+            distances[atom.name] = 2
+        else:
+            path = util.shortest_path(map_, atom, caatom)
+            distances[atom.name] = len(path) - 1
+    return distances
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS", "1K1I"], ids=str)
+def test_reference_distances(input_pdb):
+    """Test cached reference distances and moveable atom names."""
+    pdb_path = common.DATA_DIR / f"{input_pdb}.pdb"
+    biomolecule = pdb2pqr.process(pdb_path, {"ff": "AMBER"}).biomolecule
+    biomolecule.set_reference_distance()
+    residues = [
+        residue
+        for residue in biomolecule.residues
+        if isinstance(residue, aa.Amino)
+    ]
+    for residue in residues:
+        expected = legacy_reference_distances(residue)
+        distances = {atom.name: atom.refdistance for atom in residue.atoms}
+        assert distances == expected
+    residue = next(residue for residue in residues if residue.name == "LYS")
+    names = residue.get_moveable_names("CB")
+    assert names == [
+        atom.name
+        for atom in residue.atoms
+        if atom.refdistance > residue.get_atom("CB").refdistance
+    ]
+    assert "NZ" in names and "CA" not in names
+    residue.remove_atom("HZ1")
+    assert residue.get_moveable_names("CB") == [
+        name for name in names if name != "HZ1"
+    ]
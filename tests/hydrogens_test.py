@@ -0,0 +1,180 @@
+"""Tests of hydrogen bond optimization."""
+import logging
+import math
+import pytest
+import common
+import pdb2pqr
+from pdb2pqr import aa, hydrogens, io, main
+from pdb2pqr import quatfit as quat
+from pdb2pqr.config import ANGLE_CUTOFF, DIST_CUTOFF
+from pdb2pqr.hydrogens import optimize
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("input_pdb", ["1K1I", "1US0"], ids=str)
+@pytest.mark.parametrize("ff", ["AMBER", "PARSE"], ids=str)
+def test_parallel_networks(input_pdb, ff, monkeypatch):
+    """Test that parallel network optimization matches the serial path."""
+    group_counts = []
+    group_networks = hydrogens.HydrogenRoutines.group_networks
+
+    def count_groups(routines, networks):
+        groups = group_networks(routines, networks)
+        group_counts.append(len(groups))
+        return groups
+
+    monkeypatch.setattr(
+        hydrogens.HydrogenRoutines, "group_networks", count_groups
+    )
+    pdb_path = common.DATA_DIR / f"{input_pdb}.pdb"
+    serial = pdb2pqr.process(pdb_path, {"ff": ff})
+    parallel = pdb2pqr.process(pdb_path, {"ff": ff, "opt_jobs": 2})
+    assert len(group_counts) == 1
+    assert group_counts[0] > 1
+    assert parallel.pqr_text == serial.pqr_text
+
+
+def reference_angle(coords1, coords2, coords3):
+    """Scalar A-B-C angle in degrees."""
+    vec1 = [coords3[i] - coords2[i] for i in range(3)]
+    vec2 = [coords1[i] - coords2[i] for i in range(3)]
+    dotted = sum(vec1[i] * vec2[i] for i in range(3))
+    dotted /= math.dist(coords3, coords2) * math.dist(coords1, coords2)
+    return math.degrees(math.acos(max(-1.0, min(1.0, dotted))))
+
+
+def reference_hbond(donor, acc):
+    """Scalar hydrogen bond test."""
+    for donorh in [atom for atom in donor.bonds if atom.is_hydrogen]:
+        if math.dist(donorh.coords, acc.coords) > DIST_CUTOFF:
+            continue
+        flag = True
+        for acch in [atom for atom in acc.bonds if atom.is_hydrogen]:
+            flag = False
+            if math.dist(donorh.coords, acch.coords) < 1.5:
+                continue
+            if reference_angle(donorh.coords, acch.coords, acc.coords) < 110:
+                flag = True
+        angle = reference_angle(acc.coords, donor.coords, donorh.coords)
+        if flag and angle <= ANGLE_CUTOFF:
+            return True
+    return False
+
+
+def reference_energy(donor, acc):
+    """Scalar hydrogen bond energy."""
+    energy = 0.0
+    if not (donor.hdonor and acc.hacceptor):
+        return energy
+    acchs = [atom for atom in acc.bonds if atom.is_hydrogen]
+    for donorh in [atom for atom in donor.bonds if atom.is_hydrogen]:
+        dist = math.dist(donorh.coords, acc.coords)
+        if DIST_CUTOFF < dist < 5.0:
+            energy -= 1.0 / (dist * dist)
+            continue
+        angle1 = reference_angle(acc.coords, donor.coords, donorh.coords)
+        angleterm = (ANGLE_CUTOFF - angle1) / ANGLE_CUTOFF
+        for acch in acchs:
+            if math.dist(donorh.coords, acch.coords) < 1.5:
+                energy += 10.0
+                continue
+            if angle1 <= ANGLE_CUTOFF:
+                angle2 = reference_angle(
+                    donorh.coords, acch.coords, acc.coords
+                )
+                angle2 = 1.0 if angle2 < 110.0 else (110.0 - angle2) / 110.0
+                energy -= 10.0 / dist**3 * angleterm * angle2
+        if not acchs and angle1 <= ANGLE_CUTOFF:
+            energy -= 10.0 / dist**2 * angleterm
+    return energy
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_batched_pair_energies(input_pdb):
+    """Test batched hydrogen bond scoring against scalar reference code."""
+    pdb_path = common.DATA_DIR / f"{input_pdb}.pdb"
+    atoms = pdb2pqr.process(pdb_path, {"ff": "AMBER"}).biomolecule.atoms
+    polar = [atom for atom in atoms if atom.hdonor or atom.hacceptor]
+    pairs = [
+        (donor, acc)
+        for donor in polar
+        for acc in polar
+        if donor is not acc and math.dist(donor.coords, acc.coords) < 6.0
+    ]
+    assert len(pairs) > 100
+    energies = optimize.Optimize.get_pair_energies(pairs)
+    expected = [reference_energy(donor, acc) for donor, acc in pairs]
+    assert energies == pytest.approx(expected, rel=1e-6, abs=1e-10)
+    assert any(energy < 0.0 for energy in energies)
+    hbonds = optimize.Optimize.find_hbonds(pairs)
+    expected = [reference_hbond(donor, acc) for donor, acc in pairs]
+    assert hbonds.tolist() == expected
+    assert any(expected)
+    for (donor, acc), energy in list(zip(pairs, energies))[:50]:
+        assert optimize.Optimize.get_pair_energy(donor, acc) == energy
+
+
+def reference_add_hydrogens(biomolecule):
+    """Add hydrogens one at a time, as before the batched placements."""
+    for residue in biomolecule.residues:
+        if not isinstance(residue, aa.Amino):
+            continue
+        for atomname in residue.reference.map:
+            if not atomname.startswith("H") or residue.has_atom(atomname):
+                continue
+            if isinstance(residue, aa.CYS) and (
+                residue.ss_bonded and atomname == "HG"
+            ):
+                continue
+            if residue.rebuild_tetrahedral(atomname):
+                continue
+            coords = []
+            refcoords = []
+            for bond in residue.reference.get_nearest_bonds(atomname):
+                if bond == "N+1":
+                    atom = residue.peptide_n
+                elif bond == "C-1":
+                    atom = residue.peptide_c
+                else:
+                    atom = residue.get_atom(bond)
+                if atom is None:
+                    continue
+                coords.append(atom.coords)
+                refcoords.append(residue.reference.map[bond].coords)
+                if len(coords) == 3:
+                    break
+            if len(coords) == 3:
+                refatomcoords = residue.reference.map[atomname].coords
+                newcoords = quat.find_coordinates(
+                    3, coords, refcoords, refatomcoords
+                )
+                residue.create_atom(atomname, newcoords)
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS", "1K1I"], ids=str)
+def test_batched_add_hydrogens(input_pdb):
+    """Test batched hydrogen placement against one-at-a-time placement."""
+    molecules = []
+    for add_hydrogens in [
+        reference_add_hydrogens,
+        lambda biomolecule: biomolecule.add_hydrogens(),
+    ]:
+        with open(common.DATA_DIR / f"{input_pdb}.pdb", "rt") as pdb_file:
+            pdblist = io.read_molecule(pdb_file, False, input_pdb)
+        biomolecule, _, _ = main.setup_molecule(
+            pdblist, io.get_definitions(), None
+        )
+        biomolecule.set_termini()
+        biomolecule.update_bonds()
+        add_hydrogens(biomolecule)
+        molecules.append(
+            [
+                (str(atom.residue), atom.name, atom.coords)
+                for atom in biomolecule.atoms
+            ]
+        )
+    expected, batched = molecules
+    assert sum(name.startswith("H") for _, name, _ in batched) > 100
+    assert batched == expected
@@ -1,14 +1,214 @@
 """Tests of I/O functions."""
+import bz2
+import copy
+import gzip
 import logging
+import lzma
 from difflib import Differ
+from io import StringIO
 from pathlib import Path
+import numpy as np
 import pytest
+import pdbx
+import common
+import pdb2pqr
+from pdb2pqr import cif, io, pdb
 from pdb2pqr.io import read_pqr, read_dx, write_cube, read_qcd
+from pdb2pqr.structures import get_attributes
 
 
 _LOGGER = logging.getLogger(__name__)
 DATA_DIR = Path("tests/data")
 PQR_LIST = list(DATA_DIR.glob("**/*.pqr"))
+PDB_LIST = list(DATA_DIR.glob("*.pdb"))
+
+
+def read_records(pdb_file):
+    """Parse PDB data record by record.
+
+    :param pdb_file:  PDB file object
+    :type pdb_file:  file
+    :return:  list of (record class name, record attributes) tuples
+    :rtype:  list
+    """
+    records = []
+    errlist = []
+    for line in pdb_file:
+        line = line.strip()
+        if line == "":
+            break
+        record = pdb.parse_record(line, errlist)
+        if record is not None:
+            records.append((type(record).__name__, get_attributes(record)))
+    return records
+
+
+def compare_pdb_reader(pdb_text):
+    """Compare :func:`pdb.read_pdb` with record-by-record parsing.
+
+    :param pdb_text:  PDB file contents
+    :type pdb_text:  str
+    """
+    try:
+        expected = read_records(StringIO(pdb_text))
+    except ValueError:
+        with pytest.raises(ValueError):
+            pdb.read_pdb(StringIO(pdb_text))
+        return
+    records, _ = pdb.read_pdb(StringIO(pdb_text))
+    found = [
+        (type(record).__name__, get_attributes(record)) for record in records
+    ]
+    assert found == expected
+    _, columns, _ = pdb.read_pdb_columns(StringIO(pdb_text))
+    num_atoms = sum(1 for name, _ in expected if name in ("ATOM", "HETATM"))
+    assert columns.coords.shape == (len(columns), 3)
+    assert len(columns) <= num_atoms
+
+
+def legacy_print_atoms(atomlist, chainflag=False, pdbfile=False):
+    """Format atom records one atom at a time, as PDB2PQR used to.
+
+    :param atomlist:  atoms to format
+    :type atomlist:  [Atom]
+    :param chainflag:  flag whether to print chain IDs
+    :type chainflag:  bool
+    :param pdbfile:  format PDB records instead of PQR records
+    :type pdbfile:  bool
+    :return:  atom, "TER", and "END" records
+    :rtype:  [str]
+    """
+    text = []
+    currentchain_id = None
+    for iatom, atom in enumerate(atomlist):
+        if currentchain_id is None:
+            currentchain_id = atom.chain_id
+        elif atom.chain_id != currentchain_id:
+            currentchain_id = atom.chain_id
+            text.append("TER\n")
+        atom.serial = iatom + 1
+        if pdbfile is True:
+            text.append(f"{atom.get_pdb_string()}\n")
+        else:
+            text.append(f"{atom.get_pqr_string(chainflag=chainflag)}\n")
+    text.append("TER\nEND")
+    return text
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS", "1K1I"], ids=str)
+def test_print_biomolecule_atoms(input_pdb):
+    """Test that bulk-formatted records match atom-by-atom formatting,
+    including values that overflow their columns."""
+    result = pdb2pqr.process(DATA_DIR / f"{input_pdb}.pdb", {"ff": "AMBER"})
+    biomolecule = copy.deepcopy(result.biomolecule)
+    atoms = list(biomolecule.atoms)
+    atoms[0].x = 12345.6789
+    atoms[1].y = -999.9996
+    atoms[2].z = 9999.9996
+    atoms[3].ffcharge = -123.45678
+    atoms[4].radius = None
+    atoms[5].res_seq = 12345
+    atoms[6].ins_code = "AB"
+    atoms[7].name = "FLIPX"
+    atoms[8].res_name = "ABCDE"
+    atoms[9].occupancy = 1234.5
+    atoms[10].temp_factor = -100.0
+    atoms[11].seg_id = "SEGMENT"
+    for atomlist in [result.atoms, atoms]:
+        for chainflag in [False, True]:
+            expected = legacy_print_atoms(atomlist, chainflag)
+            assert io.print_biomolecule_atoms(atomlist, chainflag) == expected
+            expected = [
+                io.add_whitespace(line)
+                for line in expected
+                if line.startswith(("ATOM", "HETATM"))
+            ]
+            assert (
+                io.print_biomolecule_atoms(
+                    atomlist, chainflag, whitespace=True
+                )
+                == expected
+            )
+        expected = legacy_print_atoms(atomlist, pdbfile=True)
+        assert io.print_biomolecule_atoms(atomlist, pdbfile=True) == expected
+    assert io.print_biomolecule_atoms([]) == ["TER\nEND"]
+
+
+@pytest.mark.parametrize(
+    "suffix,codec",
+    [(".gz", gzip), (".bz2", bz2), (".xz", lzma)],
+    ids=["gzip", "bzip2", "xz"],
+)
+def test_compressed_files(suffix, codec, tmp_path):
+    """Test reading compressed structures and writing compressed outputs."""
+    pdb_text = (DATA_DIR / "1AFS.pdb").read_text()
+    args = "--log-level=INFO --ff=AMBER"
+    common.run_pdb2pqr(
+        args=f"{args} --pdb-output={tmp_path / 'plain.pdb'}",
+        input_pdb=DATA_DIR / "1AFS.pdb",
+        output_pqr="plain.pqr",
+        tmp_path=tmp_path,
+    )
+    input_path = tmp_path / f"1AFS.pdb{suffix}"
+    with codec.open(input_path, "wt") as input_file:
+        input_file.write(pdb_text)
+    # Compressed inputs are also recognized without the suffix
+    magic_path = tmp_path / "1AFS-compressed.pdb"
+    magic_path.write_bytes(input_path.read_bytes())
+    for structure in [input_path, magic_path]:
+        common.run_pdb2pqr(
+            args=f"{args} --pdb-output={tmp_path / f'output.pdb{suffix}'}",
+            input_pdb=structure,
+            output_pqr=f"output.pqr{suffix}",
+            tmp_path=tmp_path,
+        )
+        for name in ["pqr", "pdb"]:
+            with codec.open(tmp_path / f"output.{name}{suffix}", "rt") as out:
+                assert out.read() == (tmp_path / f"plain.{name}").read_text()
+    expected = pdb2pqr.process(DATA_DIR / "1AFS.pdb").pqr_text
+    with open(input_path, "rb") as input_file:
+        assert pdb2pqr.process(input_file).pqr_text == expected
+    assert io.strip_compression_suffix(input_path) == tmp_path / "1AFS.pdb"
+
+
+@pytest.mark.parametrize("input_pdb", PDB_LIST, ids=str)
+def test_read_pdb(input_pdb):
+    """Test that :func:`pdb.read_pdb` matches record-by-record parsing."""
+    compare_pdb_reader(input_pdb.read_text())
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "ATOM      1  N   ALA A   1      11.104   6.134  -6.504",
+        "ATOM      1  N   ALA A   1      11.104   6.134  -6.504  1.00",
+        "ATOM      1  N   ALA A   1      11.104   6.134  -6.504   x.x  0.00",
+        "ATOM      1  N   ALA A   1      11.104   6.134  -6.504  1.00  0.00 "
+        "      é   N",
+        "HETATM    1  O  HOH A   1     11.104 6.134 -6.504 1.00 0.00",
+        "ATOM      1  N   ALA A   1  11.104   6.134  -6.504",
+        "HETATM  1 O HOH 1 11.104 6.134 -6.504 1.00 0.00",
+    ],
+    ids=str,
+)
+def test_read_pdb_irregular(line):
+    """Test that :func:`pdb.read_pdb` handles irregular coordinate records
+    like record-by-record parsing."""
+    pdb_text = (DATA_DIR / "1K1I.pdb").read_text().splitlines()
+    iline = next(
+        iline
+        for iline, text in enumerate(pdb_text)
+        if text.startswith("ATOM")
+    )
+    pdb_text[iline] = line
+    compare_pdb_reader("\n".join(pdb_text) + "\n")
+
+
+def test_read_pdb_bad_coordinates():
+    """Test that unparseable coordinates raise an error."""
+    pdb_text = "ATOM      1  N   ALA A   1      11.104   abc    -6.504\n"
+    with pytest.raises(ValueError):
+        pdb.read_pdb(StringIO(pdb_text))
 
 
 @pytest.mark.parametrize("input_pqr", PQR_LIST, ids=str)
@@ -35,6 +235,202 @@ def test_read_qcd():
         read_qcd(qcd_file)
 
 
+def legacy_read_dx(dx_file):
+    """Read DX-format volumetric information value by value, as PDB2PQR
+    used to.
+
+    :param dx_file:  file object for DX file, ready for reading as text
+    :type dx_file:  file
+    :returns:  dictionary with data from DX file
+    :rtype:  dict
+    """
+    dx_dict = {
+        "grid spacing": [],
+        "values": [],
+        "number of grid points": None,
+        "lower left corner": None,
+    }
+    for line in dx_file:
+        words = [w.strip() for w in line.split()]
+        if words[0] in ["#", "attribute", "component"]:
+            pass
+        elif words[0] == "object":
+            if words[1] == "1":
+                dx_dict["number of grid points"] = (
+                    int(words[5]),
+                    int(words[6]),
+                    int(words[7]),
+                )
+        elif words[0] == "origin":
+            dx_dict["lower left corner"] = [
+                float(words[1]),
+                float(words[2]),
+                float(words[3]),
+            ]
+        elif words[0] == "delta":
+            spacing = [float(words[1]), float(words[2]), float(words[3])]
+            dx_dict["grid spacing"].append(spacing)
+        else:
+            for word in words:
+                dx_dict["values"].append(float(word))
+    return dx_dict
+
+
+def make_dx(shape, seed, items=None):
+    """Build the text of an APBS-style DX file with random values.
+
+    :param shape:  number of grid points in each direction
+    :type shape:  (int, int, int)
+    :param seed:  random number seed
+    :type seed:  int
+    :param items:  number of values declared in the header (defaults to the
+        number of grid points)
+    :type items:  int
+    :return:  DX file contents
+    :rtype:  str
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.normal(scale=100.0, size=np.prod(shape))
+    counts = " ".join(str(count) for count in shape)
+    lines = [
+        "# Data from APBS",
+        "#",
+        f"object 1 class gridpositions counts {counts}",
+        "origin -1.234500e+01 5.000000e-01 3.000000e+00",
+        "delta 5.000000e-01 0.000000e+00 0.000000e+00",
+        "delta 0.000000e+00 4.000000e-01 0.000000e+00",
+        "delta 0.000000e+00 0.000000e+00 3.000000e-01",
+        f"object 2 class gridconnections counts {counts}",
+        "object 3 class array type double rank 0 items "
+        f"{len(values) if items is None else items} data follows",
+    ]
+    for i in range(0, len(values), 3):
+        lines.append(" ".join(f"{value:e}" for value in values[i : i + 3]))
+    lines += [
+        'attribute "dep" string "positions"',
+        'object "regular positions regular connections" class field',
+        'component "positions" value 1',
+        'component "connections" value 2',
+        'component "data" value 3',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000, 1 << 20])
+def test_read_dx(chunk_size, tmp_path):
+    """Test bulk, chunked, and memory-mapped reading of DX files."""
+    shape = (9, 8, 7)
+    dx_text = make_dx(shape, chunk_size)
+    expected = legacy_read_dx(StringIO(dx_text))
+    dx_dict = read_dx(StringIO(dx_text), chunk_size=chunk_size)
+    for key in ["grid spacing", "number of grid points", "lower left corner"]:
+        assert dx_dict[key] == expected[key]
+    assert dx_dict["values"].shape == shape
+    np.testing.assert_array_equal(
+        dx_dict["values"].ravel(), expected["values"]
+    )
+    dx_file = StringIO(dx_text)
+    header = io.read_dx_header(dx_file)
+    chunks = list(io.iter_dx_values(dx_file, header, chunk_size=chunk_size))
+    assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+    np.testing.assert_array_equal(np.concatenate(chunks), expected["values"])
+    memmap_path = tmp_path / "values.npy"
+    dx_dict = read_dx(
+        StringIO(dx_text),
+        dtype=np.float32,
+        chunk_size=chunk_size,
+        memmap_path=memmap_path,
+    )
+    assert isinstance(dx_dict["values"], np.memmap)
+    np.testing.assert_array_equal(
+        np.load(memmap_path),
+        np.array(expected["values"], dtype=np.float32).reshape(shape),
+    )
+    cube_file = StringIO()
+    write_cube(cube_file, read_dx(StringIO(dx_text)), [])
+    legacy_cube_file = StringIO()
+    write_cube(legacy_cube_file, expected, [])
+    assert cube_file.getvalue() == legacy_cube_file.getvalue()
+
+
+def legacy_write_cube_values(cube_file, values):
+    """Write Cube-format values one value at a time, as PDB2PQR used to.
+
+    :param cube_file:  file object ready for writing text data
+    :type cube_file:  file
+    :param values:  values to write
+    :type values:  [float]
+    """
+    stride = 6
+    for i in range(0, len(values), 6):
+        if i + stride < len(values):
+            imax = i + 6
+            words = [f"{val:< 13.5E}" for val in values[i:imax]]
+            cube_file.write(" ".join(words) + "\n")
+        else:
+            words = [f"{val:< 13.5E}" for val in values[i:]]
+            cube_file.write(" ".join(words))
+
+
+@pytest.mark.parametrize("num_values", [0, 1, 5, 6, 7, 12, 1000])
+def test_write_cube_values(num_values):
+    """Test that streamed Cube values match value-by-value formatting."""
+    rng = np.random.default_rng(num_values)
+    values = rng.normal(size=num_values) * 10.0 ** rng.integers(
+        -200, 200, size=num_values
+    )
+    special = [0.0, -0.0, 1e-310, -1e300, np.nan, np.inf, -np.inf]
+    # Rounding ties and carries, and the largest and smallest values
+    special += [1234565.0, -9.999995, 999999.5, 1.7976931348623157e308]
+    special += [5e-324, 1e-300, 1e22, 0.5]
+    values[: len(special)] = special[:num_values]
+    expected = StringIO()
+    legacy_write_cube_values(expected, values.tolist())
+    for chunk_size in [1, 4, 6, 13, 1000]:
+        chunks = [
+            values[start : start + chunk_size]
+            for start in range(0, num_values, chunk_size)
+        ]
+        cube_file = StringIO()
+        io.write_cube_values(cube_file, chunks)
+        assert cube_file.getvalue() == expected.getvalue()
+
+
+def test_dx2cube_stream(tmp_path, monkeypatch):
+    """Test streamed conversion of compressed DX files to Cube files."""
+    dx_text = make_dx((13, 11, 7), 2)
+    pqr_path = DATA_DIR / "dx2cube.pqr"
+    with open(pqr_path, "rt") as pqr_file:
+        atom_list = read_pqr(pqr_file)
+    expected = StringIO()
+    write_cube(expected, legacy_read_dx(StringIO(dx_text)), atom_list)
+    dx_path = tmp_path / "grid.dx.gz"
+    with gzip.open(dx_path, "wt") as dx_file:
+        dx_file.write(dx_text)
+    cube_path = tmp_path / "grid.cube.xz"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["dx2cube", str(dx_path), str(pqr_path), str(cube_path)],
+    )
+    pdb2pqr.main.dx_to_cube()
+    with lzma.open(cube_path, "rt") as cube_file:
+        assert cube_file.read() == expected.getvalue()
+
+
+def test_read_dx_errors():
+    """Test that malformed DX files raise errors."""
+    dx_text = make_dx((3, 4, 5), 0)
+    data_start = dx_text.index("data follows") + len("data follows")
+    with pytest.raises(ValueError):
+        read_dx(StringIO(dx_text[:data_start] + " 1.x" + dx_text[data_start:]))
+    with pytest.raises(ValueError):
+        read_dx(StringIO(make_dx((3, 4, 5), 0, items=59)))
+    with pytest.raises(ValueError):
+        read_dx(StringIO(dx_text[: dx_text.index("attribute") - 40]))
+    with pytest.raises(ValueError):
+        read_dx(StringIO(dx_text[: dx_text.index("object 3")]))
+
+
 def test_dx2cube(tmp_path):
     """Test conversion of OpenDX files to Cube files."""
     pqr_path = DATA_DIR / "dx2cube.pqr"
@@ -66,3 +462,88 @@ def test_dx2cube(tmp_path):
             _LOGGER.error(f"Found difference:  {diff}")
         raise ValueError()
     _LOGGER.info("No differences found in output")
+
+
+ATOM_SITE_CIF = """data_TEST
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.pdbx_formal_charge
+_atom_site.auth_seq_id
+_atom_site.auth_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_atom_id
+_atom_site.pdbx_PDB_model_num
+ATOM 123456 N N . ALA A 1 ? 1.5 -2.25 1000.125 1.00 20.55 ? 12345 ALA AAA N 1
+ATOM 123457 H HD21 A ASN A 2 B 0 0 0 0.5 7.0 1 12346 ASN AAA HD21 1
+HETATM 123458 C C1 . LONG B . ? 1 2 3 ? ? ? 12347 LONG BB C1 1
+ATOM 123459 N N . ALA A 1 ? abc 0 0 1.00 0 ? 12345 ALA AAA N 1
+ATOM 1 N N . ALA A 1 ? 2.5 0 0 1.00 0 ? 12345 ALA AAA N 2
+"""
+
+
+def test_read_cif_atom_site():
+    """Test typed atom records from the mmCIF atom_site category."""
+    [block] = pdbx.load(StringIO(ATOM_SITE_CIF))
+    records, errors = cif.atom_site(block)
+    assert errors == ["ATOM"]
+    assert [type(record).__name__ for record in records] == [
+        "MODEL",
+        "ATOM",
+        "ATOM",
+        "HETATM",
+        "ENDMDL",
+        "MODEL",
+        "ATOM",
+        "ENDMDL",
+    ]
+    atom1, atom2, hetatm = records[1:4]
+    assert atom1.serial == 123456
+    assert atom1.chain_id == "AAA"
+    assert atom1.res_seq == 12345
+    assert (atom1.x, atom1.y, atom1.z) == (1.5, -2.25, 1000.125)
+    assert (atom1.occupancy, atom1.temp_factor) == (1.0, 20.55)
+    assert (atom1.alt_loc, atom1.ins_code, atom1.element) == ("", "", "N")
+    assert atom1.charge == ""
+    assert (atom2.name, atom2.alt_loc, atom2.ins_code) == ("HD21", "A", "B")
+    assert atom2.charge == "1"
+    assert (hetatm.res_name, hetatm.chain_id, hetatm.name) == (
+        "LONG",
+        "BB",
+        "C1",
+    )
+    assert (hetatm.occupancy, hetatm.temp_factor) == (0.0, 0.0)
+    assert records[5].serial == 2
+    assert records[6].x == 2.5
+
+
+def test_read_cif_single_model():
+    """Test that single-model mmCIF files match the PDB-format records."""
+    records, errors = cif.read_cif(open(DATA_DIR / "1FAS.cif", "rt"))
+    assert not errors
+    atoms = [
+        record
+        for record in records
+        if isinstance(record, (pdb.ATOM, pdb.HETATM))
+    ]
+    assert len(atoms) == 575
+    assert not any(isinstance(record, pdb.MODEL) for record in records)
+    assert (atoms[0].name, atoms[0].res_name, atoms[0].chain_id) == (
+        "N",
+        "THR",
+        "A",
+    )
+    assert (atoms[-1].res_name, atoms[-1].res_seq) == ("HOH", 166)
+    assert (atoms[-1].x, atoms[-1].y, atoms[-1].z) == (29.627, 27.168, 24.722)
@@ -0,0 +1,79 @@
+"""Tests of the stage profiles."""
+import json
+import logging
+import pytest
+import common
+import pdb2pqr
+from pdb2pqr import profiling
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def test_profile_stages():
+    """Test nested stages, counters, and inactive profiles."""
+    profiling.count("neighbor_queries")
+    with profiling.stage("outside") as counters:
+        assert counters == {}
+    with profiling.profile() as prof:
+        with profiling.stage("outer"):
+            profiling.count("trials", 2)
+            with profiling.stage("inner"):
+                profiling.count("trials")
+            profiling.count("trials")
+    with profiling.profile(False) as disabled:
+        assert disabled is None
+    profiling.count("trials")
+    report = prof.report()
+    assert [stage["stage"] for stage in report["stages"]] == [
+        "inner",
+        "outer",
+    ]
+    inner, outer = report["stages"]
+    assert inner["counters"] == {"trials": 1}
+    assert outer["counters"] == {"trials": 3}
+    assert outer["wall_time"] >= inner["wall_time"]
+    assert report["wall_time"] >= outer["wall_time"]
+    assert json.loads(json.dumps(report)) == report
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_profile_output(input_pdb, tmp_path):
+    """Test the profile written by the command line and the library."""
+    common.run_pdb2pqr(
+        args="--log-level=INFO --ff=AMBER --profile",
+        input_pdb=common.DATA_DIR / f"{input_pdb}.pdb",
+        output_pqr="output.pqr",
+        tmp_path=tmp_path,
+    )
+    report = json.loads((tmp_path / "output.profile.json").read_text())
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    for name in [
+        "parse",
+        "setup",
+        "debump",
+        "add_hydrogens",
+        "optimize",
+        "forcefield",
+        "output",
+        "write",
+    ]:
+        assert name in stages
+        assert stages[name]["cpu_time"] >= 0.0
+    assert stages["setup"]["counters"]["atoms"] > 0
+    assert (
+        stages["add_hydrogens"]["counters"]["atoms"]
+        > stages["setup"]["counters"]["atoms"]
+    )
+    assert stages["optimize"]["counters"]["hbond_networks"] > 0
+    assert stages["optimize"]["counters"]["neighbor_queries"] > 0
+    result = pdb2pqr.process(
+        common.DATA_DIR / f"{input_pdb}.pdb", {"ff": "AMBER", "profile": True}
+    )
+    names = [stage["stage"] for stage in report["stages"]]
+    assert [stage["stage"] for stage in result.profile["stages"]] == [
+        name for name in names if name != "write"
+    ]
+    assert (
+        pdb2pqr.process(common.DATA_DIR / f"{input_pdb}.pdb").profile is None
+    )
@@ -1,8 +1,12 @@
 """Tests for PROPKA functionality."""
+import argparse
 import logging
+from io import StringIO
 from pathlib import Path
 import pytest
+import propka.input as pk_in
 import common
+from pdb2pqr import io, main
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -24,3 +28,99 @@ def test_propka_apo(input_pdb, tmp_path):
         output_pqr=output_pqr,
         tmp_path=tmp_path,
     )
+
+
+@pytest.mark.parametrize("input_pdb", ["1K1I", "1AFS", "1US0"], ids=str)
+def test_propka_atoms(input_pdb):
+    """Compare PROPKA atoms built in memory with atoms read from PDB text."""
+    args = common.PARSER.parse_args(
+        ["--titration-state-method=propka", input_pdb, "output.pqr"]
+    )
+    definition = io.get_definitions()
+    pdblist, _ = io.get_molecule(common.DATA_DIR / f"{input_pdb}.pdb")
+    biomolecule, definition, _ = main.setup_molecule(
+        pdblist, definition, None
+    )
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    biomolecule.repair_heavy()
+    biomolecule.remove_hydrogens()
+    molecule = main.get_propka_molecule(args, biomolecule)
+    lines = io.print_biomolecule_atoms(biomolecule.atoms, pdbfile=True)
+    expected = pk_in.get_atom_lines_from_pdb(
+        StringIO("".join(lines)),
+        ignore_residues=molecule.version.parameters.ignore_residues,
+        keep_protons=molecule.options.keep_protons,
+        chains=molecule.options.chains,
+    )
+    found = main.get_propka_atoms(biomolecule, molecule)
+    fields = [
+        "name",
+        "numb",
+        "x",
+        "y",
+        "z",
+        "res_num",
+        "res_name",
+        "chain_id",
+        "type",
+        "occ",
+        "beta",
+        "icode",
+        "element",
+        "terminal",
+        "residue_label",
+    ]
+    expected = [
+        (name, [getattr(atom, field) for field in fields])
+        for name, atom in expected
+    ]
+    found = [
+        (name, [getattr(atom, field) for field in fields])
+        for name, atom in found
+    ]
+    assert found == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("7", [7.0]),
+        ("4,7.4", [4.0, 7.4]),
+        ("2:4:0.5", [2.0, 2.5, 3.0, 3.5, 4.0]),
+        ("1:2:0.3,9", [1.0, 1.3, 1.6, 1.9, 9.0]),
+    ],
+    ids=str,
+)
+def test_parse_ph_values(text, expected):
+    """Test parsing of pH lists and ranges."""
+    assert main.parse_ph_values(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", ["x", "4:2:1", "2:4", "2:4:0"], ids=str)
+def test_parse_ph_values_bad(text):
+    """Test rejection of invalid pH lists and ranges."""
+    with pytest.raises(argparse.ArgumentTypeError):
+        main.parse_ph_values(text)
+
+
+@pytest.mark.parametrize("ph_jobs", [1, 2], ids=str)
+def test_propka_ph_scan(ph_jobs, tmp_path):
+    """Compare a pH scan with separate runs at each pH."""
+    args = "--log-level=INFO --ff=AMBER --titration-state-method=propka"
+    common.run_pdb2pqr(
+        args=f"{args} --with-ph=3,7 --ph-jobs={ph_jobs}",
+        input_pdb=common.DATA_DIR / "1AFS.pdb",
+        output_pqr="scan.pqr",
+        tmp_path=tmp_path,
+    )
+    for ph in [3, 7]:
+        common.run_pdb2pqr(
+            args=f"{args} --with-ph={ph}",
+            input_pdb=common.DATA_DIR / "1AFS.pdb",
+            output_pqr=f"single{ph}.pqr",
+            tmp_path=tmp_path,
+        )
+        scan_text = (tmp_path / f"scan_pH{ph:.2f}.pqr").read_text()
+        assert scan_text == (tmp_path / f"single{ph}.pqr").read_text()
+    assert not (tmp_path / "scan.pqr").exists()
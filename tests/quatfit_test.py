@@ -0,0 +1,62 @@
+"""Tests of the quaternion superposition functions."""
+import logging
+import numpy as np
+import pytest
+from pdb2pqr import quatfit
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def random_frames(num_frames, num_points, seed):
+    """Build reference and definition coordinates for fitting.
+
+    The reference coordinates are noisy rigid transformations of the
+    definition coordinates; some frames are exact copies or collapse to a
+    single point to exercise degenerate fits.
+
+    :param num_frames:  number of frames
+    :type num_frames:  int
+    :param num_points:  number of points per frame
+    :type num_points:  int
+    :param seed:  random number seed
+    :type seed:  int
+    :return:  (reference coordinates, definition coordinates, definition
+        coordinates of the new atoms)
+    :rtype:  (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    rng = np.random.default_rng(seed)
+    defcoords = rng.normal(size=(num_frames, num_points, 3))
+    refcoords = np.empty_like(defcoords)
+    for iframe in range(num_frames):
+        rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        refcoords[iframe] = defcoords[iframe] @ rotation + rng.normal(size=3)
+    refcoords += rng.normal(scale=0.05, size=refcoords.shape)
+    refcoords[::5] = defcoords[::5]
+    refcoords[1::7] = refcoords[1::7, :1]
+    atomcoords = rng.normal(size=(num_frames, 2, 3))
+    return refcoords, defcoords, atomcoords
+
+
+@pytest.mark.parametrize("num_points", [1, 2, 3, 4])
+def test_find_coordinates_batch(num_points):
+    """Test that batched placements match frame-by-frame placements."""
+    refcoords, defcoords, atomcoords = random_frames(200, num_points, 1)
+    expected = [
+        [
+            quatfit.find_coordinates(
+                num_points,
+                refcoords[iframe].tolist(),
+                defcoords[iframe].tolist(),
+                atom.tolist(),
+            )
+            for atom in atomcoords[iframe]
+        ]
+        for iframe in range(len(refcoords))
+    ]
+    batch = quatfit.find_coordinates_batch(refcoords, defcoords, atomcoords)
+    np.testing.assert_array_equal(batch, expected)
+    single = quatfit.find_coordinates_batch(
+        refcoords, defcoords, atomcoords[:, 0]
+    )
+    np.testing.assert_array_equal(single, batch[:, 0])
@@ -0,0 +1,141 @@
+"""Tests of the retrieval and caching of remote structures."""
+import gzip
+import logging
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+import pytest
+import common
+from pdb2pqr import batch, io, remote
+from pdb2pqr.config import CACHE_DIR_ENV, NO_CACHE_ENV, PDB_MIRROR_ENV
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+#: Structures served by the local HTTP server
+PDB_IDS = ["1AFS", "1K1I", "1QBS", "1US0", "1A1P"]
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    """Serve files and count the requests."""
+
+    requests = []
+
+    def do_GET(self):
+        """Record and serve a request."""
+        self.requests.append(self.path)
+        super().do_GET()
+
+    def log_message(self, *args):
+        """Send messages to the test log instead of standard error."""
+        _LOGGER.debug(args[0] % args[1:])
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Serve the test structures from a local HTTP server and use a
+    temporary cache directory.
+
+    :return:  list of requested paths
+    :rtype:  [str]
+    """
+    serve_dir = tmp_path / "served"
+    serve_dir.mkdir()
+    for pdb_id in PDB_IDS:
+        (serve_dir / f"{pdb_id}.pdb").write_bytes(
+            (common.DATA_DIR / f"{pdb_id}.pdb").read_bytes()
+        )
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.delenv(NO_CACHE_ENV, raising=False)
+    requests = []
+    handler = type("Handler", (CountingHandler,), {"requests": requests})
+    httpd = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(handler, directory=str(serve_dir))
+    )
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    port = httpd.server_address[1]
+    monkeypatch.setenv(
+        PDB_MIRROR_ENV, f"http://127.0.0.1:{port}/{{ID}}.{{format}}"
+    )
+    yield requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_cache(server, tmp_path):
+    """Test that downloaded structures are cached by content."""
+    expected = (common.DATA_DIR / "1AFS.pdb").read_bytes()
+    assert remote.fetch("1afs") == expected
+    assert server == ["/1AFS.pdb"]
+    assert remote.fetch("1AFS") == expected
+    with io.get_pdb_file("1afs.pdb") as pdb_file:
+        assert pdb_file.read() == expected.decode("utf-8")
+    assert len(server) == 1
+    objects = list((tmp_path / "cache" / "structures" / "objects").iterdir())
+    assert len(objects) == 1
+    with pytest.raises(IOError):
+        remote.fetch("9XYZ")
+    with pytest.raises(FileNotFoundError):
+        io.get_pdb_file("not-a-file.pdb")
+
+
+def test_cache_eviction(tmp_path):
+    """Test that the least recently used structures are evicted."""
+    structure_cache = remote.StructureCache(tmp_path, max_bytes=300)
+    for iid, pdb_id in enumerate(["1ABC", "2ABC", "3ABC"]):
+        structure_cache.store(pdb_id, "pdb", bytes([iid]) * 100)
+        os.utime(
+            structure_cache.get_object_path(
+                structure_cache.get_id_path(pdb_id, "pdb").read_text()
+            ),
+            (iid, iid),
+        )
+    assert structure_cache.load("1ABC", "pdb") == bytes([0]) * 100
+    structure_cache.store("4ABC", "pdb", bytes([3]) * 100)
+    assert structure_cache.load("2ABC", "pdb") is None
+    for pdb_id, content in [("1ABC", 0), ("3ABC", 2), ("4ABC", 3)]:
+        assert structure_cache.load(pdb_id, "pdb") == bytes([content]) * 100
+    # Identical contents are stored once
+    structure_cache.store("5ABC", "pdb", bytes([3]) * 100)
+    assert len(list((tmp_path / "objects").iterdir())) == 3
+    # Corrupted contents are cache misses
+    path = structure_cache.get_object_path(
+        structure_cache.get_id_path("5ABC", "pdb").read_text()
+    )
+    path.write_bytes(b"corrupted")
+    assert structure_cache.load("5ABC", "pdb") is None
+
+
+def test_prefetch(server):
+    """Test concurrent downloads ahead of a batch."""
+    manifest = StringIO(
+        "".join(f"{pdb_id} {pdb_id}.pqr\n" for pdb_id in PDB_IDS[:3])
+        + f"{common.DATA_DIR / '1AFS.pdb'} local.pqr\n"
+        + "1us0.pdb 1US0.pqr\n9XYZ 9XYZ.pqr\n"
+    )
+    inputs = batch.get_remote_inputs(batch.read_manifest(manifest))
+    assert inputs == {"pdb": ["1AFS", "1K1I", "1QBS", "1us0", "9XYZ"]}
+    errors = remote.prefetch(inputs["pdb"] + ["1afs", "1A1P"], jobs=4)
+    assert [pdb_id for pdb_id, error in errors.items() if error] == ["9XYZ"]
+    assert len(server) == 6
+    for pdb_id in PDB_IDS:
+        expected = (common.DATA_DIR / f"{pdb_id}.pdb").read_bytes()
+        assert remote.fetch(pdb_id) == expected
+    assert len(server) == 6
+
+
+def test_mirror_directory(tmp_path, monkeypatch):
+    """Test structures from a local mirror directory."""
+    expected = (common.DATA_DIR / "1AFS.pdb").read_text()
+    with gzip.open(tmp_path / "1afs.pdb.gz", "wt") as mirror_file:
+        mirror_file.write(expected)
+    monkeypatch.setenv(PDB_MIRROR_ENV, str(tmp_path))
+    monkeypatch.setenv(NO_CACHE_ENV, "1")
+    with io.get_pdb_file("1AFS") as pdb_file:
+        assert pdb_file.read() == expected
+    with pytest.raises(FileNotFoundError):
+        remote.fetch("1K1I")
@@ -0,0 +1,186 @@
+"""Tests of the atom coordinate store."""
+import copy
+import logging
+import pickle
+import numpy as np
+import pytest
+import common
+from pdb2pqr import forcefield, io, main, pdb
+from pdb2pqr.structures import Atom, CoordinateStore, get_attributes
+from pdb2pqr.structures import get_coordinates, set_coordinates
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def make_atoms(coords):
+    """Make detached atoms at the given coordinates.
+
+    :param coords:  coordinates
+    :type coords:  [[float, float, float]]
+    :return:  atoms
+    :rtype:  [Atom]
+    """
+    atoms = []
+    for atom_coords in coords:
+        atom = Atom()
+        atom.coords = atom_coords
+        atoms.append(atom)
+    return atoms
+
+
+def test_store_views():
+    """Test that attached atoms read and write rows of the store."""
+    coords = np.arange(30, dtype=float).reshape(10, 3)
+    atoms = make_atoms(coords.tolist())
+    store = CoordinateStore()
+    rows = store.attach(atoms[:4])
+    rows = np.concatenate([rows, store.attach(atoms)[4:]])
+    assert len(store) == 10
+    assert store.attach(atoms).tolist() == rows.tolist()
+    np.testing.assert_array_equal(store.array[rows], coords)
+    atoms[3].y = -1.0
+    assert store.array[rows[3], 1] == -1.0
+    store.array[rows[5]] = [7.0, 8.0, 9.0]
+    assert atoms[5].coords == [7.0, 8.0, 9.0]
+    assert isinstance(atoms[5].x, float)
+    set_coordinates(atoms, -coords)
+    np.testing.assert_array_equal(get_coordinates(atoms), -coords)
+    # Detached atoms keep their coordinates and free their rows
+    store.detach(atoms[2:4])
+    assert len(store) == 8
+    assert atoms[2].coordinate_store is None
+    assert atoms[2].coords == (-coords[2]).tolist()
+    atoms[2].x = 100.0
+    assert not (store.array == 100.0).any()
+    new_atoms = make_atoms([[1.0, 2.0, 3.0]] * 3)
+    new_rows = store.attach(new_atoms)
+    assert sorted(new_rows[:2].tolist()) == sorted(rows[2:4].tolist())
+    assert len(store) == 11
+    mixed = atoms[:3] + new_atoms
+    expected = [atom.coords for atom in mixed]
+    np.testing.assert_array_equal(get_coordinates(mixed), expected)
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_biomolecule_coordinates(input_pdb):
+    """Test the biomolecule coordinate array through repairs and copies."""
+    with open(common.DATA_DIR / f"{input_pdb}.pdb", "rt") as pdb_file:
+        pdblist = io.read_molecule(pdb_file, False, input_pdb)
+    biomolecule, _, _ = main.setup_molecule(
+        pdblist, io.get_definitions(), None
+    )
+    atoms = biomolecule.atoms
+    coords = biomolecule.get_coordinates()
+    assert coords.shape == (len(atoms), 3)
+    store = biomolecule.coordinates
+    assert all(atom.coordinate_store is store for atom in atoms)
+    np.testing.assert_array_equal(
+        coords, [[atom.x, atom.y, atom.z] for atom in atoms]
+    )
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    biomolecule.add_hydrogens()
+    atoms = biomolecule.atoms
+    added = [atom for atom in atoms if atom.added]
+    assert added
+    assert all(atom.coordinate_store is store for atom in added)
+    coords = biomolecule.get_coordinates()
+    np.testing.assert_array_equal(coords, [atom.coords for atom in atoms])
+    # Copies have their own coordinates
+    biocopy = copy.deepcopy(biomolecule)
+    biomolecule.set_coordinates(coords + 1.0)
+    np.testing.assert_array_equal(biocopy.get_coordinates(), coords)
+    assert biocopy.atoms[0].coords == coords[0].tolist()
+    assert biomolecule.atoms[0].coords == (coords[0] + 1.0).tolist()
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_compact_structures(input_pdb):
+    """Test the slots of atoms, residues, and records and the release of
+    the coordinate records."""
+    with open(common.DATA_DIR / f"{input_pdb}.pdb", "rt") as pdb_file:
+        pdblist = io.read_molecule(pdb_file, False, input_pdb)
+    records = [
+        record
+        for record in pdblist
+        if isinstance(record, (pdb.ATOM, pdb.HETATM))
+    ]
+    assert not any(hasattr(record, "__dict__") for record in records)
+    biomolecule, _, _ = main.setup_molecule(
+        pdblist, io.get_definitions(), None
+    )
+    assert not any(
+        isinstance(record, (pdb.ATOM, pdb.HETATM))
+        for record in biomolecule.pdblist
+    )
+    assert io.get_old_header(biomolecule.pdblist) == io.get_old_header(
+        pdblist
+    )
+    assert not any(hasattr(atom, "__dict__") for atom in biomolecule.atoms)
+    assert not any(
+        hasattr(residue, "__dict__") for residue in biomolecule.residues
+    )
+    # Every attribute set on residues must have a slot
+    assert all(residue.type is None for residue in biomolecule.residues)
+    biomolecule.update_residue_types()
+    definition = io.get_definitions()
+    for ff_name in ["amber", "charmm", "parse"]:
+        forcefield_ = forcefield.Forcefield(ff_name, definition, None)
+        for residue in biomolecule.residues:
+            for atom in residue.atoms:
+                forcefield_.get_params1(residue, atom.name)
+    # Copies keep the attributes of the atoms
+    assert "_row" not in biomolecule.atoms[0].__getstate__()
+    atom = Atom(records[0], "ATOM")
+    atom.ffcharge = -0.5
+    values = get_attributes(atom)
+    assert values["ffcharge"] == -0.5
+    for new_atom in [copy.deepcopy(atom), pickle.loads(pickle.dumps(atom))]:
+        new_values = get_attributes(new_atom)
+        for name in ["name", "serial", "res_name", "ffcharge", "radius"]:
+            assert new_values[name] == values[name]
+        assert new_atom.coords == atom.coords
+
+
+def chain_atoms(biomolecule):
+    """Get the atoms of a biomolecule by walking its chains.
+
+    :param biomolecule:  biomolecule
+    :type biomolecule:  Biomolecule
+    :return:  atoms
+    :rtype:  [Atom]
+    """
+    return [atom for chain in biomolecule.chains for atom in chain.atoms]
+
+
+@pytest.mark.parametrize("input_pdb", ["1AFS"], ids=str)
+def test_atom_index(input_pdb):
+    """Test that the atom sequence is kept until atoms change."""
+    with open(common.DATA_DIR / f"{input_pdb}.pdb", "rt") as pdb_file:
+        pdblist = io.read_molecule(pdb_file, False, input_pdb)
+    biomolecule, _, _ = main.setup_molecule(
+        pdblist, io.get_definitions(), None
+    )
+    atoms = biomolecule.atoms
+    assert biomolecule.atoms is atoms
+    assert list(atoms) == chain_atoms(biomolecule)
+    biomolecule.set_termini()
+    biomolecule.update_bonds()
+    biomolecule.add_hydrogens()
+    assert biomolecule.atoms is not atoms
+    atoms = biomolecule.atoms
+    assert list(atoms) == chain_atoms(biomolecule)
+    indices = biomolecule.atom_indices
+    assert all(indices[atom] == iatom for iatom, atom in enumerate(atoms))
+    residue = atoms[100].residue
+    removed = residue.atoms[-1]
+    residue.remove_atom(removed.name)
+    assert removed not in biomolecule.atom_indices
+    assert list(biomolecule.atoms) == chain_atoms(biomolecule)
+    residue.reorder()
+    assert list(biomolecule.atoms) == chain_atoms(biomolecule)
+    # Copies have their own index
+    biocopy = copy.deepcopy(biomolecule)
+    assert list(biocopy.atoms) == chain_atoms(biocopy)
+    assert not set(biocopy.atoms).intersection(biomolecule.atoms)
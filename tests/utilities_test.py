@@ -0,0 +1,66 @@
+"""Tests of utility functions."""
+import logging
+from pdb2pqr import utilities as util
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def legacy_connectivity(map_, key):
+    """List-based connectivity analysis used before the breadth-first
+    rewrite of :func:`utilities.analyze_connectivity`."""
+    clist = []
+    keys = [key]
+    while keys:
+        key = keys[0]
+        if key not in clist:
+            clist.append(key)
+            if key in map_:
+                for value in map_[key]:
+                    if value not in clist:
+                        keys.append(value)
+        keys.pop(keys.index(key))
+    return clist
+
+
+def test_analyze_connectivity():
+    """Test that the connectivity order matches the list-based version."""
+    map_ = {
+        0: [3, 1],
+        1: [0, 4, 2],
+        2: [1, 5],
+        3: [0, 4],
+        4: [3, 1, 6],
+        5: [2],
+        6: [4],
+        7: [8],
+        8: [7],
+    }
+    for key in map_:
+        assert util.analyze_connectivity(map_, key) == legacy_connectivity(
+            map_, key
+        )
+
+
+def test_disjoint_set():
+    """Test the groups and representatives of a union-find structure."""
+    components = util.DisjointSet("abcdef")
+    components.union("e", "c")
+    components.union("f", "b")
+    components.union("c", "f")
+    components.add("g")
+    assert components.find("f") == "b"
+    assert components.find("e") == "b"
+    assert components.groups() == [["a"], ["b", "c", "e", "f"], ["d"], ["g"]]
+
+
+def test_sort_dict_by_value():
+    """Test sorting of keys that cannot be compared with equal values."""
+    keys = [object() for _ in range(4)]
+    inputdict = dict(zip(keys, [1.0, 3.0, 1.0, 2.0]))
+    assert util.sort_dict_by_value(inputdict) == [
+        keys[1],
+        keys[3],
+        keys[0],
+        keys[2],
+    ]